@@ -15,6 +15,8 @@ import sqlite3
 from datetime import datetime
 import logging
 
+from modules.weclapp.weclapp_client import WeClappError, get_weclapp_client
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/fahrtenbuch", tags=["Fahrtenbuch"])
@@ -237,27 +239,20 @@ async def search_customers(q: str):
     Query param:
     - q: Search term (company name, city, address)
     """
-    import os
-    import requests
-    
-    api_token = os.getenv("WECLAPP_API_TOKEN")
-    base_url = os.getenv("WECLAPP_BASE_URL")
-    
-    if not api_token or not base_url:
+    client = get_weclapp_client()
+    if not client.configured:
         raise HTTPException(status_code=500, detail="WeClapp API not configured")
     
     # Search WeClapp
-    url = f"{base_url}customer"
-    headers = {"AuthenticationToken": api_token}
-    params = {"term": q, "pageSize": 20}
-    
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        results = await client.list(
+            "customer", {"term": q},
+            properties=("id", "company", "customerNumber", "addresses"),
+            limit=20
+        )
         
         customers = []
-        for c in data.get("result", []):
+        for c in results:
             # Get primary address
             addresses = c.get('addresses', [])
             address_str = ""
@@ -300,22 +295,11 @@ async def create_customer_and_assign(data: NewCustomerData = Body(...)):
         "notes": "Aus Fahrtenbuch angelegt"
     }
     """
-    import os
-    import requests
-    
-    api_token = os.getenv("WECLAPP_API_TOKEN")
-    base_url = os.getenv("WECLAPP_BASE_URL")
-    
-    if not api_token or not base_url:
+    client = get_weclapp_client()
+    if not client.configured:
         raise HTTPException(status_code=500, detail="WeClapp API not configured")
     
     # Create customer in WeClapp
-    url = f"{base_url}customer"
-    headers = {
-        "AuthenticationToken": api_token,
-        "Content-Type": "application/json"
-    }
-    
     customer_payload = {
         "company": data.company,
         "partyType": "ORGANIZATION",
@@ -338,9 +322,7 @@ async def create_customer_and_assign(data: NewCustomerData = Body(...)):
         }]
     
     try:
-        response = requests.post(url, headers=headers, json=customer_payload, timeout=10)
-        response.raise_for_status()
-        new_customer = response.json()
+        new_customer = await client.post("customer", json=customer_payload)
         
         customer_id = new_customer.get('id')
         
@@ -377,9 +359,9 @@ async def create_customer_and_assign(data: NewCustomerData = Body(...)):
             "trip_id": data.trip_id
         }
     
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"WeClapp API error: {e.response.text}")
-        raise HTTPException(status_code=500, detail=f"Failed to create customer: {e.response.text}")
+    except WeClappError as e:
+        logger.error(f"WeClapp API error: {e.body}")
+        raise HTTPException(status_code=500, detail=f"Failed to create customer: {e.body}")
     except Exception as e:
         logger.error(f"Error creating customer: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+⏱️ Bank Matching Benchmark
+===========================
+
+Vergleicht das vektorisierte Scoring (score_transaction_matches) mit der
+bisherigen verschachtelten iterrows()-Schleife über calculate_match_score
+auf synthetischen Rechnungen/Bankumsätzen (1k / 10k / 50k Zeilen je Seite).
+
+Die alte Schleife ist quadratisch in Python - bei großen Mengen wird sie nur
+auf einer Stichprobe von Transaktionen gemessen und hochgerechnet. Auf der
+Stichprobe wird außerdem geprüft, dass beide Verfahren dieselben Matches liefern.
+
+Usage:
+    python bank_matching_benchmark.py --sizes 1000 10000 50000 --legacy-sample 50
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+# Import initialisiert die Invoice-DB → auf temporäre Datei umleiten
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.gettempdir(), "bank_matching_benchmark.db"))
+
+import pandas as pd
+
+from intelligent_invoice_integration import (
+    MATCH_THRESHOLD,
+    calculate_match_score,
+    score_transaction_matches,
+)
+
+COMPANY_WORDS = ["Dach", "Bau", "Holz", "Ziegel", "Spengler", "Handel", "Logistik", "Werkzeug", "Fenster", "Metall"]
+COMPANY_FORMS = ["GmbH", "GmbH & Co. KG", "AG", "e.K.", "KG"]
+
+
+def generate_data(size: int, seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Synthetische offene Rechnungen + unzugeordnete Bankumsätze (je ``size`` Zeilen)"""
+    rng = random.Random(seed)
+    today = datetime(2025, 10, 1)
+    companies = [
+        f"{rng.choice(COMPANY_WORDS)}{rng.choice(COMPANY_WORDS).lower()} {rng.choice(['Müller', 'Schmidt', 'Weber', 'Becker', 'Wagner'])} {i} {rng.choice(COMPANY_FORMS)}"
+        for i in range(max(10, size // 20))
+    ]
+
+    invoices = []
+    for i in range(size):
+        vendor = rng.choice(companies)
+        invoices.append({
+            "id": i + 1,
+            "invoice_number": f"RE-2025-{i:06d}",
+            "invoice_date": (today - timedelta(days=rng.randint(0, 365))).date().isoformat(),
+            "amount_total": round(rng.uniform(50, 25000), 2),
+            "vendor_name": vendor,
+            "customer_name": "C&D Lenzen GmbH",
+            "status": "open",
+        })
+
+    transactions = []
+    for i in range(size):
+        transaction = {
+            "id": i + 1,
+            "reference": "",
+            "purpose": "",
+            "counterpart_name": rng.choice(companies),
+            "transaction_date": (today - timedelta(days=rng.randint(0, 365))).date().isoformat(),
+            "amount": round(rng.uniform(50, 25000), 2),
+        }
+        if rng.random() < 0.6:
+            # Zahlung zu einer Rechnung: Betrag ggf. mit Skonto, Datum danach
+            invoice = rng.choice(invoices)
+            invoice_date = datetime.fromisoformat(invoice["invoice_date"])
+            transaction.update({
+                "amount": round(invoice["amount_total"] * rng.choice([1.0, 1.0, 0.98, 0.97]), 2),
+                "transaction_date": (invoice_date + timedelta(days=rng.randint(0, 40))).date().isoformat(),
+                "counterpart_name": invoice["vendor_name"].upper() if rng.random() < 0.7 else rng.choice(companies),
+                "purpose": f"Rechnung {invoice['invoice_number']}" if rng.random() < 0.5 else "Zahlung",
+            })
+        transactions.append(transaction)
+
+    return pd.DataFrame(transactions), pd.DataFrame(invoices)
+
+
+def legacy_match(transactions: pd.DataFrame, invoices: pd.DataFrame) -> List[Tuple[int, int, float]]:
+    """Bisherige verschachtelte Schleife (Referenz)"""
+    matches = []
+    for transaction_pos, (_, transaction) in enumerate(transactions.iterrows()):
+        best_match = None
+        best_score = 0.0
+        for invoice_pos, (_, invoice) in enumerate(invoices.iterrows()):
+            score = calculate_match_score(transaction, invoice)
+            if score > best_score and score > MATCH_THRESHOLD:
+                best_score = score
+                best_match = invoice_pos
+        if best_match is not None:
+            matches.append((transaction_pos, best_match, best_score))
+    return matches
+
+
+def run(sizes: List[int], legacy_sample: int):
+    print("\n" + "=" * 80)
+    print("⏱️ BANK MATCHING BENCHMARK")
+    print("=" * 80)
+    print(f"{'Zeilen':>8} | {'vektorisiert':>13} | {'Schleife':>15} | {'Speedup':>8} | {'Matches':>8} | Stichprobe")
+    print("-" * 80)
+
+    for size in sizes:
+        transactions, invoices = generate_data(size)
+
+        start = time.perf_counter()
+        vectorized = score_transaction_matches(transactions, invoices)
+        vectorized_seconds = time.perf_counter() - start
+
+        sample_rows = min(size, legacy_sample)
+        sample = transactions.iloc[:sample_rows]
+        start = time.perf_counter()
+        legacy = legacy_match(sample, invoices)
+        legacy_seconds = (time.perf_counter() - start) * size / sample_rows
+
+        expected = [(t, i, round(s, 9)) for t, i, s in legacy]
+        actual = [(t, i, round(s, 9)) for t, i, s in vectorized if t < sample_rows]
+        verdict = "✅ identisch" if expected == actual else f"❌ abweichend ({len(expected)} vs {len(actual)})"
+        estimated = "~" if sample_rows < size else " "
+
+        print(
+            f"{size:>8} | {vectorized_seconds:>12.2f}s | {estimated}{legacy_seconds:>13.1f}s | "
+            f"{legacy_seconds / vectorized_seconds:>7.0f}x | {len(vectorized):>8} | {verdict}"
+        )
+
+    print("-" * 80)
+    print("~ = aus Stichprobe hochgerechnet\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bank matching benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--legacy-sample", type=int, default=50,
+                        help="Anzahl Transaktionen, auf denen die alte Schleife gemessen wird")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_sample)
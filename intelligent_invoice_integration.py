@@ -8,13 +8,14 @@ import os
 import asyncio
 import logging
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
 import sqlite3
 import json
 import httpx
 from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import JSONResponse, HTMLResponse
+import numpy as np
 import pandas as pd
 
 # Configure logging
@@ -267,61 +268,48 @@ async def match_bank_transactions():
         ORDER BY invoice_date DESC
         """, conn)
         
-        matches = []
+        # Vectorized scoring: one best invoice per transaction (score > threshold)
+        best_matches = score_transaction_matches(unmatched_transactions, open_invoices)
         
-        for _, transaction in unmatched_transactions.iterrows():
-            best_match = None
-            best_score = 0.0
-            
-            for _, invoice in open_invoices.iterrows():
-                score = calculate_match_score(transaction, invoice)
-                
-                if score > best_score and score > 0.7:  # 70% confidence threshold
-                    best_score = score
-                    best_match = invoice
-            
-            if best_match is not None:
-                matches.append({
-                    "transaction_id": transaction["id"],
-                    "invoice_id": best_match["id"],
-                    "confidence": best_score,
-                    "transaction_amount": transaction["amount"],
-                    "invoice_amount": best_match["amount_total"],
-                    "transaction_date": transaction["transaction_date"],
-                    "invoice_number": best_match["invoice_number"]
-                })
-        
-        # Save matches to database
+        matches = []
+        for transaction_pos, invoice_pos, score in best_matches:
+            transaction = unmatched_transactions.iloc[transaction_pos]
+            invoice = open_invoices.iloc[invoice_pos]
+            matches.append({
+                "transaction_id": int(transaction["id"]),
+                "invoice_id": int(invoice["id"]),
+                "confidence": score,
+                "transaction_amount": float(transaction["amount"]),
+                "invoice_amount": float(invoice["amount_total"]),
+                "transaction_date": transaction["transaction_date"],
+                "invoice_number": invoice["invoice_number"]
+            })
+        
+        # Save matches to database (batched)
         cursor = conn.cursor()
-        for match in matches:
-            cursor.execute("""
-            INSERT INTO invoice_bank_matches 
-            (invoice_id, bank_transaction_id, match_type, confidence_score, matched_by)
-            VALUES (?, ?, 'automatic', ?, 'ai-system')
-            """, (
-                match["invoice_id"],
-                match["transaction_id"],
-                match["confidence"]
-            ))
-            
-            # Update bank transaction
-            cursor.execute("""
-            UPDATE bank_transactions 
-            SET matched_invoice_id = ?, matching_confidence = ?
-            WHERE id = ?
-            """, (
-                match["invoice_id"],
-                match["confidence"],
-                match["transaction_id"]
-            ))
-            
-            # Update invoice status if full match
-            if abs(match["transaction_amount"] - match["invoice_amount"]) < 1.0:
-                cursor.execute("""
-                UPDATE invoices 
-                SET status = 'paid', updated_at = ?
-                WHERE id = ?
-                """, (datetime.now().isoformat(), match["invoice_id"]))
+        cursor.executemany("""
+        INSERT INTO invoice_bank_matches 
+        (invoice_id, bank_transaction_id, match_type, confidence_score, matched_by)
+        VALUES (?, ?, 'automatic', ?, 'ai-system')
+        """, [(m["invoice_id"], m["transaction_id"], m["confidence"]) for m in matches])
+        
+        # Update bank transactions
+        cursor.executemany("""
+        UPDATE bank_transactions 
+        SET matched_invoice_id = ?, matching_confidence = ?
+        WHERE id = ?
+        """, [(m["invoice_id"], m["confidence"], m["transaction_id"]) for m in matches])
+        
+        # Update invoice status if full match
+        paid_at = datetime.now().isoformat()
+        cursor.executemany("""
+        UPDATE invoices 
+        SET status = 'paid', updated_at = ?
+        WHERE id = ?
+        """, [
+            (paid_at, m["invoice_id"]) for m in matches
+            if abs(m["transaction_amount"] - m["invoice_amount"]) < 1.0
+        ])
         
         conn.commit()
         logger.info(f"✅ Matched {len(matches)} bank transactions")
@@ -331,7 +319,7 @@ async def match_bank_transactions():
         conn.close()
 
 def calculate_match_score(transaction: pd.Series, invoice: pd.Series) -> float:
-    """Calculate matching score between bank transaction and invoice"""
+    """Calculate matching score between bank transaction and invoice (single pair reference)"""
     score = 0.0
     
     # Amount matching (most important)
@@ -376,6 +364,200 @@ def calculate_match_score(transaction: pd.Series, invoice: pd.Series) -> float:
     
     return min(score, 1.0)  # Cap at 100%
 
+# ===============================
+# VECTORIZED MATCH SCORING
+# ===============================
+# Same scoring rules as calculate_match_score, evaluated as NumPy matrices
+# over (transaction x invoice) blocks instead of per-pair Python calls.
+
+MATCH_THRESHOLD = 0.7
+MAX_BLOCK_CELLS = 2_000_000  # ~16 MB per float64 score matrix
+
+_AMOUNT_EDGES = np.array([1.0, 10.0, 100.0])
+_AMOUNT_SCORES = np.array([0.6, 0.4, 0.2, 0.0])
+_DATE_EDGES = np.array([5, 30])
+_DATE_SCORES = np.array([0.2, 0.1, 0.0])
+_MICROSECONDS_PER_DAY = 86_400_000_000
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _lower_texts(frame: pd.DataFrame, column: str) -> List[str]:
+    """Column values as lowercase strings (same coercion as calculate_match_score)"""
+    if column not in frame.columns:
+        return [""] * len(frame)
+    return [str(value).lower() for value in frame[column].tolist()]
+
+
+def _date_features(values: List[Any]):
+    """Parse dates once per row -> (microseconds since epoch, valid mask, tz-aware mask)"""
+    micros = np.zeros(len(values), dtype=np.int64)
+    valid = np.zeros(len(values), dtype=bool)
+    aware = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except ValueError:
+            continue
+        is_aware = parsed.tzinfo is not None
+        micros[i] = (parsed - (_EPOCH_UTC if is_aware else _EPOCH)) // timedelta(microseconds=1)
+        valid[i] = True
+        aware[i] = is_aware
+    return micros, valid, aware
+
+
+def _substring_hits(haystacks: List[str], needles: List[str]) -> Dict[str, List[str]]:
+    """
+    Which needles occur as substring in which haystack.
+
+    Instead of testing every (haystack, needle) pair, each distinct haystack is
+    sliced into windows of the needle lengths that actually occur and the
+    windows are intersected with the needle set.
+    """
+    needles_by_length: Dict[int, set] = {}
+    for needle in set(needles):
+        if needle:
+            needles_by_length.setdefault(len(needle), set()).add(needle)
+    lengths = sorted(needles_by_length)
+
+    hits: Dict[str, List[str]] = {}
+    for text in set(haystacks):
+        found = []
+        for length in lengths:
+            if length > len(text):
+                break
+            found.extend(needles_by_length[length].intersection(
+                text[pos:pos + length] for pos in range(len(text) - length + 1)
+            ))
+        if found:
+            hits[text] = found
+    return hits
+
+
+def _needle_positions(needles: List[str]) -> Dict[str, np.ndarray]:
+    """needle -> sorted array of invoice positions carrying it"""
+    positions: Dict[str, List[int]] = {}
+    for pos, needle in enumerate(needles):
+        if needle:
+            positions.setdefault(needle, []).append(pos)
+    return {needle: np.array(pos_list, dtype=np.int64) for needle, pos_list in positions.items()}
+
+
+def _hit_mask(found: List[str], positions: Dict[str, np.ndarray], columns: np.ndarray) -> np.ndarray:
+    """Boolean mask over ``columns`` (sorted invoice positions) for the found needles"""
+    mask = np.zeros(len(columns), dtype=bool)
+    for needle in found:
+        invoice_positions = positions.get(needle)
+        if invoice_positions is None:
+            continue
+        idx = np.searchsorted(columns, invoice_positions)
+        in_range = idx < len(columns)
+        idx, invoice_positions = idx[in_range], invoice_positions[in_range]
+        mask[idx[columns[idx] == invoice_positions]] = True
+    return mask
+
+
+def score_transaction_matches(
+    transactions: pd.DataFrame,
+    invoices: pd.DataFrame,
+    threshold: float = MATCH_THRESHOLD,
+    max_block_cells: int = MAX_BLOCK_CELLS,
+) -> List[tuple]:
+    """
+    Best invoice per bank transaction, vectorized.
+
+    Amount difference and date proximity are computed as NumPy matrices over
+    blocks of (transactions x invoices); reference and name matches are
+    precomputed once per distinct text and added as sparse masks. One
+    threshold + argmax pass per block picks the best invoice (first invoice
+    wins on ties, like the former nested loop).
+
+    Pairs with an amount difference >= 100 can reach at most 0.7 and never
+    pass the threshold, so each block (transactions sorted by amount) is only
+    scored against the invoices inside its amount window.
+
+    Returns:
+        List of (transaction_position, invoice_position, score) in transaction order
+    """
+    if transactions.empty or invoices.empty:
+        return []
+
+    tx_amounts = pd.to_numeric(transactions["amount"], errors="coerce").to_numpy(dtype=float)
+    inv_amounts = pd.to_numeric(invoices["amount_total"], errors="coerce").to_numpy(dtype=float)
+    tx_micros, tx_date_valid, tx_aware = _date_features(transactions["transaction_date"].tolist())
+    inv_micros, inv_date_valid, inv_aware = _date_features(invoices["invoice_date"].tolist())
+    mixed_tz = bool(tx_aware.any() or inv_aware.any())
+
+    # Reference / invoice number: invoice_number in reference or purpose
+    invoice_numbers = _lower_texts(invoices, "invoice_number")
+    references = _lower_texts(transactions, "reference")
+    purposes = _lower_texts(transactions, "purpose")
+    number_positions = _needle_positions(invoice_numbers)
+    number_hits = _substring_hits(references + purposes, invoice_numbers)
+
+    # Counterpart name: vendor_name or customer_name in counterpart_name
+    vendors = _lower_texts(invoices, "vendor_name")
+    customers = _lower_texts(invoices, "customer_name")
+    counterparts = _lower_texts(transactions, "counterpart_name")
+    vendor_positions = _needle_positions(vendors)
+    customer_positions = _needle_positions(customers)
+    name_hits = _substring_hits(counterparts, vendors + customers)
+
+    # Only rows/columns with a usable amount can pass the threshold
+    inv_valid = np.flatnonzero(~np.isnan(inv_amounts))
+    inv_by_amount = inv_valid[np.argsort(inv_amounts[inv_valid], kind="stable")]
+    sorted_inv_amounts = inv_amounts[inv_by_amount]
+    tx_valid = np.flatnonzero(~np.isnan(tx_amounts))
+    tx_by_amount = tx_valid[np.argsort(tx_amounts[tx_valid], kind="stable")]
+
+    max_window = _AMOUNT_EDGES[-1]
+    block_rows = max(1, max_block_cells // max(1, len(inv_valid)))
+    best: Dict[int, tuple] = {}
+
+    for block_start in range(0, len(tx_by_amount), block_rows):
+        rows = tx_by_amount[block_start:block_start + block_rows]
+        row_amounts = tx_amounts[rows]
+        lo = np.searchsorted(sorted_inv_amounts, row_amounts[0] - max_window, side="left")
+        hi = np.searchsorted(sorted_inv_amounts, row_amounts[-1] + max_window, side="right")
+        if lo >= hi:
+            continue
+        columns = np.sort(inv_by_amount[lo:hi])  # original invoice order for tie-breaking
+
+        # Amount score (dense)
+        amount_diff = np.abs(row_amounts[:, None] - inv_amounts[columns][None, :])
+        scores = _AMOUNT_SCORES[np.searchsorted(_AMOUNT_EDGES, amount_diff, side="right")]
+
+        # Date proximity (dense), same day arithmetic as timedelta.days
+        day_diff = np.abs(np.floor_divide(
+            tx_micros[rows][:, None] - inv_micros[columns][None, :], _MICROSECONDS_PER_DAY
+        ))
+        date_scores = _DATE_SCORES[np.searchsorted(_DATE_EDGES, day_diff, side="left")]
+        date_valid = tx_date_valid[rows][:, None] & inv_date_valid[columns][None, :]
+        if mixed_tz:
+            date_valid &= tx_aware[rows][:, None] == inv_aware[columns][None, :]
+        scores += np.where(date_valid, date_scores, 0.0)
+
+        # Reference and name matches (sparse)
+        for r, row in enumerate(rows):
+            found = number_hits.get(references[row], []) + number_hits.get(purposes[row], [])
+            if found:
+                scores[r, _hit_mask(found, number_positions, columns)] += 0.3
+            found = name_hits.get(counterparts[row])
+            if found:
+                mask = _hit_mask(found, vendor_positions, columns)
+                mask |= _hit_mask(found, customer_positions, columns)
+                scores[r, mask] += 0.2
+
+        np.minimum(scores, 1.0, out=scores)
+
+        # One threshold + argmax pass
+        best_columns = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(len(rows)), best_columns]
+        for r in np.flatnonzero(best_scores > threshold):
+            best[int(rows[r])] = (int(columns[best_columns[r]]), float(best_scores[r]))
+
+    return [(row, invoice_pos, score) for row, (invoice_pos, score) in sorted(best.items())]
+
 # ===============================
 # DASHBOARD AND REPORTING
 # ===============================
@@ -29,7 +29,6 @@ import sys
 import os
 import json
 import sqlite3
-import requests
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
@@ -40,6 +39,7 @@ sys.path.append('/Users/cdtechgmbh/railway-orchestrator-clean')
 
 from modules.database.umsatzabgleich import UmsatzabgleichEngine
 from modules.database.invoice_monitoring import InvoiceMonitoringDB
+from modules.database.email_search_index import EmailSearchIndex
 
 @dataclass
 class IncomingInvoice:
@@ -95,8 +95,6 @@ class IntelligentInvoiceManager:
         
         try:
             # Nutze die echte Email-Datenbank aus production_langgraph_orchestrator.py
-            import sqlite3
-            
             # Verbinde zur email_data.db
             email_db_path = "/Users/cdtechgmbh/railway-orchestrator-clean/email_data.db"
             
@@ -104,44 +102,21 @@ class IntelligentInvoiceManager:
                 print("❌ email_data.db nicht gefunden - verwende Mock-Daten")
                 return self._get_mock_invoices()
                 
-            conn = sqlite3.connect(email_db_path)
-            cursor = conn.cursor()
-            
-            # Suche nach E-Mails mit PDF-Anhängen der letzten X Tage
+            # Suche nach E-Mails mit PDF-Anhängen / Rechnungs-Keywords der letzten X Tage
+            # über den FTS5 Index (statt LIKE-Scans über alle Bodies)
             cutoff_date = (datetime.now() - timedelta(days=days_back)).isoformat()
             
-            query = """
-            SELECT DISTINCT 
-                ed.message_id,
-                ed.subject,
-                ed.from_email,
-                ed.body_content,
-                ed.received_datetime,
-                ea.attachment_name,
-                ea.attachment_content_type,
-                ea.attachment_size
-            FROM email_data ed
-            LEFT JOIN email_attachments ea ON ed.message_id = ea.email_message_id
-            WHERE ed.received_datetime > ?
-            AND (
-                ea.attachment_content_type LIKE '%pdf%' 
-                OR ea.attachment_name LIKE '%.pdf'
-                OR ed.subject LIKE '%rechnung%'
-                OR ed.subject LIKE '%invoice%'
-                OR ed.subject LIKE '%faktura%'
-                OR ed.body_content LIKE '%rechnung%'
-                OR ed.body_content LIKE '%invoice%'
-            )
-            ORDER BY ed.received_datetime DESC
-            """
-            
-            cursor.execute(query, (cutoff_date,))
-            email_results = cursor.fetchall()
+            candidates = EmailSearchIndex(email_db_path).find_invoice_candidates(since=cutoff_date)
             
-            print(f"🔍 Gefunden: {len(email_results)} potentielle Rechnungs-E-Mails")
+            print(f"🔍 Gefunden: {len(candidates)} potentielle Rechnungs-E-Mails")
             
-            for row in email_results:
-                message_id, subject, from_email, body, received_datetime, attachment_name, content_type, size = row
+            for candidate in candidates:
+                message_id = candidate["message_id"] or str(candidate["id"])
+                subject = candidate["subject"] or ""
+                from_email = candidate["sender"] or ""
+                body = candidate["body_text"]
+                received_datetime = candidate["received_date"] or datetime.now().isoformat()
+                attachment_name = candidate["attachments"][0]["filename"] if candidate["attachments"] else None
                 
                 # Extrahiere Rechnungsinformationen aus E-Mail
                 invoice_data = self._extract_invoice_data_from_email(
@@ -157,14 +132,16 @@ class IntelligentInvoiceManager:
                         invoice_date=invoice_data.get("invoice_date", received_datetime[:10]),
                         due_date=invoice_data.get("due_date", (datetime.strptime(received_datetime[:10], "%Y-%m-%d") + timedelta(days=30)).strftime("%Y-%m-%d")),
                         received_date=received_datetime[:10],
+                        payment_status="unpaid",  # Wird im nächsten Schritt geprüft
+                        payment_date=None,
+                        bank_transaction_id=None,
                         email_message_id=message_id,
                         pdf_path=f"/attachments/{attachment_name}" if attachment_name else None,
                         tax_category=invoice_data.get("tax_category", "general"),
-                        description=subject[:100]
+                        weclapp_vendor_id=None,
+                        notes=subject[:100]
                     )
                     found_invoices.append(invoice)
-                    
-            conn.close()
             
         except Exception as e:
             print(f"❌ Fehler beim Email-Scanning: {e}")
@@ -596,54 +573,39 @@ class IntelligentInvoiceManager:
         }
     
     def _fetch_weclapp_invoices(self) -> List[Dict[str, Any]]:
-        """Holt ausgehende Rechnungen aus WeClapp API (sync version)"""
-        
-        # WeClapp API Konfiguration aus production_orchestrator
-        WECLAPP_TENANT = os.getenv('WECLAPP_TENANT', 'cundd')
-        WECLAPP_USERNAME = os.getenv('WECLAPP_USERNAME', 'cdtech@cundd.net')
-        WECLAPP_PASSWORD = os.getenv('WECLAPP_PASSWORD', '')
+        """Holt ausgehende Rechnungen aus WeClapp API (sync version, alle Seiten)"""
+        from modules.weclapp.weclapp_client import get_weclapp_client
         
-        if not WECLAPP_PASSWORD:
+        client = get_weclapp_client()
+        if not client.configured:
             raise Exception("WeClapp API-Token nicht konfiguriert")
         
-        # WeClapp API Aufruf für Ausgangsrechnungen
-        url = f"https://{WECLAPP_TENANT}.weclapp.com/webapp/api/v1/salesInvoice"
-        
         # Suche Rechnungen der letzten 90 Tage
         ninety_days_ago = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
         
         params = {
             'createdDate-gt': ninety_days_ago,
             'invoiceStatus': 'CONFIRMED',  # Nur bestätigte Rechnungen
-            'page': 1,
-            'pageSize': 100
         }
         
-        auth = (WECLAPP_USERNAME, WECLAPP_PASSWORD)
+        invoices = client.run_sync(client.list("salesInvoice", params))
+        weclapp_invoices = []
         
-        response = requests.get(url, params=params, auth=auth, timeout=30)
+        for invoice in invoices:
+            # Extrahiere relevante Daten
+            invoice_data = {
+                "invoice_number": invoice.get('invoiceNumber', ''),
+                "customer": invoice.get('customer', {}).get('name', 'Unbekannt'),
+                "amount": float(invoice.get('grossAmount', 0)),
+                "invoice_date": invoice.get('invoiceDate', ''),
+                "due_date": invoice.get('dueDate', ''),
+                "status": invoice.get('invoiceStatus', ''),
+                "weclapp_id": invoice.get('id')
+            }
+            weclapp_invoices.append(invoice_data)
         
-        if response.status_code == 200:
-            data = response.json()
-            weclapp_invoices = []
-            
-            for invoice in data.get('result', []):
-                # Extrahiere relevante Daten
-                invoice_data = {
-                    "invoice_number": invoice.get('invoiceNumber', ''),
-                    "customer": invoice.get('customer', {}).get('name', 'Unbekannt'),
-                    "amount": float(invoice.get('grossAmount', 0)),
-                    "invoice_date": invoice.get('invoiceDate', ''),
-                    "due_date": invoice.get('dueDate', ''),
-                    "status": invoice.get('invoiceStatus', ''),
-                    "weclapp_id": invoice.get('id')
-                }
-                weclapp_invoices.append(invoice_data)
-            
-            print(f"✅ {len(weclapp_invoices)} WeClapp-Rechnungen geladen")
-            return weclapp_invoices
-        else:
-            raise Exception(f"WeClapp API Fehler: {response.status_code}")
+        print(f"✅ {len(weclapp_invoices)} WeClapp-Rechnungen geladen")
+        return weclapp_invoices
     
     def _get_mock_weclapp_invoices(self) -> List[Dict[str, Any]]:
         """Mock WeClapp Rechnungen für Demo/Fallback"""
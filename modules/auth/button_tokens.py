@@ -0,0 +1,71 @@
+"""
+Button Tokens - UUID-Links für Action Buttons in Notifications
+
+Jeder Button einer Notification bekommt eine eigene UUID; der Link zeigt auf
+/api/action/{button_uuid}, die Aktion selbst steht in action_buttons.
+
+Beim Rendern werden die Buttons gesammelt (collect_buttons) und anschließend
+zusammen mit der Communication in einer Transaktion registriert
+(EmailTrackingDB.register_communication_with_buttons). Ohne offenen Sammler
+wird jeder Button wie bisher einzeln registriert.
+"""
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BUTTON_TTL_DAYS = int(os.getenv("ACTION_BUTTON_TTL_DAYS", "30"))
+
+_pending_buttons: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("pending_buttons", default=None)
+
+
+@contextmanager
+def collect_buttons() -> Iterator[List[Dict[str, Any]]]:
+    """Sammelt alle innerhalb erzeugten Buttons statt sie einzeln zu registrieren"""
+    buttons: List[Dict[str, Any]] = []
+    token = _pending_buttons.set(buttons)
+    try:
+        yield buttons
+    finally:
+        _pending_buttons.reset(token)
+
+
+def create_button_url(
+    base_url: str,
+    action_type: str,
+    email_message_id: str,
+    communication_uuid: str,
+    action_config: Optional[Dict[str, Any]] = None,
+    action_label: Optional[str] = None,
+    button_color: Optional[str] = None,
+    button_icon: Optional[str] = None,
+    ttl_days: int = BUTTON_TTL_DAYS,
+) -> str:
+    """Erzeugt Button-UUID + Link und merkt den Button zur Registrierung vor"""
+    button = {
+        "button_uuid": str(uuid.uuid4()),
+        "communication_uuid": communication_uuid,
+        "email_message_id": email_message_id,
+        "action_type": action_type,
+        "action_label": action_label or action_type,
+        "action_config": action_config,
+        "button_color": button_color,
+        "button_icon": button_icon,
+        "expires_at": (datetime.now() + timedelta(days=ttl_days)).isoformat() if ttl_days else None,
+    }
+
+    pending = _pending_buttons.get()
+    if pending is not None:
+        pending.append(button)
+    else:
+        from modules.database.email_tracking_db import get_email_tracking_db
+
+        if not get_email_tracking_db().register_button(**button):
+            logger.warning(f"⚠️ Button {action_type} could not be registered")
+
+    return f"{base_url.rstrip('/')}/api/action/{button['button_uuid']}"
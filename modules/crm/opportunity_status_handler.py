@@ -18,17 +18,13 @@ SALES PIPELINE PHASEN:
 - Won (100%) → Abschluss Actions
 """
 
-import os
-import requests
 from typing import Dict, List, Optional, Any
 import logging
 
-logger = logging.getLogger(__name__)
+from modules.weclapp.opportunity_mirror import get_opportunity_mirror
+from modules.weclapp.weclapp_client import extract_result, get_weclapp_client
 
-# WeClapp API Configuration
-WECLAPP_API_KEY = os.environ.get("WECLAPP_API_KEY", "")
-WECLAPP_TENANT = os.environ.get("WECLAPP_TENANT", "cundd")
-WECLAPP_BASE_URL = f"https://{WECLAPP_TENANT}.weclapp.com/webapp/api/v1"
+logger = logging.getLogger(__name__)
 
 # WeClapp Sales Stage Mapping (WeClapp internal IDs)
 WECLAPP_STAGES = {
@@ -48,45 +44,47 @@ def get_opportunity_by_contact(contact_id: int) -> Optional[Dict[str, Any]]:
     """
     Holt aktuelle Opportunity für einen Kontakt aus WeClapp
     
+    Liest aus dem lokalen Opportunity Mirror; der direkte API-Call ist nur
+    der Kaltstart-Fallback, solange noch kein Sync gelaufen ist.
+    
     Args:
         contact_id: WeClapp Party/Contact ID
         
     Returns:
         Dict mit Opportunity-Daten oder None
     """
-    if not WECLAPP_API_KEY:
-        logger.warning("⚠️ WECLAPP_API_KEY not configured")
+    try:
+        mirror = get_opportunity_mirror()
+        if mirror.is_ready():
+            opp = mirror.get_open_opportunity(contact_id)
+            if opp:
+                logger.info(f"✅ Opportunity gefunden (Mirror): ID={opp.get('id')}, Stage={opp.get('salesStage')}, Probability={opp.get('probability')}%")
+            else:
+                logger.info(f"ℹ️ Keine offene Opportunity für Contact {contact_id}")
+            return opp
+    except Exception as e:
+        logger.warning(f"⚠️ Opportunity mirror unavailable, falling back to WeClapp API: {e}")
+    
+    client = get_weclapp_client()
+    if not client.configured:
+        logger.warning("⚠️ WeClapp API token not configured")
         return None
     
     try:
-        headers = {
-            "AuthenticationToken": WECLAPP_API_KEY,
-            "Content-Type": "application/json"
-        }
-        
-        # Suche nach offenen Opportunities für diesen Kontakt
-        url = f"{WECLAPP_BASE_URL}/opportunity"
-        params = {
+        # Suche nach offenen Opportunities für diesen Kontakt (neueste zuerst)
+        data = client.run_sync(client.get("opportunity", params={
             "partyId-eq": contact_id,
             "status-eq": "OPEN",  # Nur offene Opportunities
             "pageSize": 1,
-            "sort": "-lastModifiedDate"  # Neueste zuerst
-        }
-        
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("result") and len(data["result"]) > 0:
-                opp = data["result"][0]
-                logger.info(f"✅ Opportunity gefunden: ID={opp.get('id')}, Stage={opp.get('salesStage')}, Probability={opp.get('probability')}%")
-                return opp
-            else:
-                logger.info(f"ℹ️ Keine offene Opportunity für Contact {contact_id}")
-                return None
-        else:
-            logger.error(f"❌ WeClapp API Error: {response.status_code}")
-            return None
+            "sort": "-lastModifiedDate"
+        }))
+        result = extract_result(data)
+        if result:
+            opp = result[0]
+            logger.info(f"✅ Opportunity gefunden: ID={opp.get('id')}, Stage={opp.get('salesStage')}, Probability={opp.get('probability')}%")
+            return opp
+        logger.info(f"ℹ️ Keine offene Opportunity für Contact {contact_id}")
+        return None
             
     except Exception as e:
         logger.error(f"❌ Error fetching opportunity: {str(e)}")
@@ -428,18 +426,12 @@ def update_opportunity_stage(
     Returns:
         True wenn erfolgreich, sonst False
     """
-    if not WECLAPP_API_KEY:
-        logger.warning("⚠️ WECLAPP_API_KEY not configured")
+    client = get_weclapp_client()
+    if not client.configured:
+        logger.warning("⚠️ WeClapp API token not configured")
         return False
     
     try:
-        headers = {
-            "AuthenticationToken": WECLAPP_API_KEY,
-            "Content-Type": "application/json"
-        }
-        
-        url = f"{WECLAPP_BASE_URL}/opportunity/id/{opportunity_id}"
-        
         update_data = {
             "salesStage": new_stage
         }
@@ -447,14 +439,15 @@ def update_opportunity_stage(
         if probability is not None:
             update_data["probability"] = probability
         
-        response = requests.put(url, headers=headers, json=update_data, timeout=10)
-        
-        if response.status_code == 200:
-            logger.info(f"✅ Opportunity {opportunity_id} updated: Stage={new_stage}, Probability={probability}%")
-            return True
-        else:
-            logger.error(f"❌ WeClapp API Error updating opportunity: {response.status_code}")
-            return False
+        updated = client.run_sync(client.put(f"opportunity/id/{opportunity_id}", json=update_data))
+        logger.info(f"✅ Opportunity {opportunity_id} updated: Stage={new_stage}, Probability={probability}%")
+        # Write-Through: Mirror nicht erst beim nächsten Sync aktualisieren
+        try:
+            if updated:
+                get_opportunity_mirror().upsert([updated])
+        except Exception as e:
+            logger.warning(f"⚠️ Opportunity mirror write-through failed: {e}")
+        return True
             
     except Exception as e:
         logger.error(f"❌ Error updating opportunity: {str(e)}")
@@ -0,0 +1,168 @@
+"""
+Communication Content Store - Komprimierte Ablage gerenderter Notifications
+
+Die Notification-HTMLs bestehen zum Großteil aus identischem Boilerplate
+(CSS, <head>). Statt jede Notification komplett in user_communications zu
+speichern, wird:
+- der gemeinsame <head>-Block einmalig in notification_fragments abgelegt (Hash-dedupliziert)
+- der individuelle Rest zlib-komprimiert in communication_bodies gespeichert
+
+user_communications bleibt damit schlank (html_content / text_content = NULL).
+"""
+import sqlite3
+import hashlib
+import zlib
+from datetime import datetime
+from typing import Optional, Dict, Tuple
+
+CODEC_ZLIB = "zlib"
+COMPRESSION_LEVEL = 6
+HEAD_END_MARKER = "</head>"
+
+
+def split_template_fragment(html_content: str) -> Tuple[str, str]:
+    """Trennt den statischen Template-Kopf (bis inkl. </head>) vom individuellen Rest"""
+    if not html_content:
+        return "", html_content or ""
+    marker_pos = html_content.find(HEAD_END_MARKER)
+    if marker_pos == -1:
+        return "", html_content
+    split_at = marker_pos + len(HEAD_END_MARKER)
+    return html_content[:split_at], html_content[split_at:]
+
+
+def compress_text(value: Optional[str]) -> Optional[bytes]:
+    """Komprimiert Text mit zlib (None bleibt None)"""
+    if value is None:
+        return None
+    return zlib.compress(value.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decompress_text(blob: Optional[bytes], codec: str = CODEC_ZLIB) -> Optional[str]:
+    """Dekomprimiert einen gespeicherten Body"""
+    if blob is None:
+        return None
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"Unknown codec: {codec}")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class CommunicationContentStore:
+    """Side-Table Storage für Notification-Inhalte (dedupliziert + komprimiert)"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    @staticmethod
+    def init_schema(cursor: sqlite3.Cursor):
+        """Legt die Side-Tables an (wird aus EmailTrackingDB._init_database aufgerufen)"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notification_fragments (
+                fragment_hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS communication_bodies (
+                communication_uuid TEXT PRIMARY KEY,
+                fragment_hash TEXT,
+                html_body BLOB,
+                text_body BLOB,
+                codec TEXT NOT NULL DEFAULT 'zlib',
+                original_size INTEGER DEFAULT 0,
+                stored_size INTEGER DEFAULT 0,
+                stored_at TEXT NOT NULL,
+                FOREIGN KEY (fragment_hash) REFERENCES notification_fragments(fragment_hash)
+            )
+        """)
+
+    def store(self, cursor: sqlite3.Cursor, communication_uuid: str,
+              html_content: Optional[str] = None, text_content: Optional[str] = None) -> Dict:
+        """
+        Speichert HTML/Text einer Communication innerhalb einer bestehenden Transaktion.
+
+        Returns:
+            Dict mit original_size / stored_size für Statistiken
+        """
+        fragment, remainder = split_template_fragment(html_content) if html_content else ("", None)
+
+        fragment_hash = None
+        if fragment:
+            fragment_hash = hashlib.sha256(fragment.encode("utf-8")).hexdigest()[:32]
+            cursor.execute("""
+                INSERT OR IGNORE INTO notification_fragments
+                (fragment_hash, content, size_bytes, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (fragment_hash, fragment, len(fragment.encode("utf-8")), datetime.now().isoformat()))
+
+        html_blob = compress_text(remainder)
+        text_blob = compress_text(text_content)
+
+        original_size = len((html_content or "").encode("utf-8")) + len((text_content or "").encode("utf-8"))
+        stored_size = len(html_blob or b"") + len(text_blob or b"")
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO communication_bodies
+            (communication_uuid, fragment_hash, html_body, text_body, codec,
+             original_size, stored_size, stored_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (communication_uuid, fragment_hash, html_blob, text_blob, CODEC_ZLIB,
+              original_size, stored_size, datetime.now().isoformat()))
+
+        return {"original_size": original_size, "stored_size": stored_size}
+
+    def load(self, communication_uuid: str) -> Optional[Dict]:
+        """Rekonstruiert HTML/Text einer Communication"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT cb.html_body, cb.text_body, cb.codec, nf.content
+            FROM communication_bodies cb
+            LEFT JOIN notification_fragments nf ON cb.fragment_hash = nf.fragment_hash
+            WHERE cb.communication_uuid = ?
+        """, (communication_uuid,))
+
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row:
+            return None
+
+        html_body, text_body, codec, fragment = row
+        html_remainder = decompress_text(html_body, codec)
+        html_content = None
+        if html_remainder is not None:
+            html_content = (fragment or "") + html_remainder
+
+        return {
+            "html_content": html_content,
+            "text_content": decompress_text(text_body, codec)
+        }
+
+    def get_statistics(self) -> Dict:
+        """Speicher-Statistiken der Side-Tables"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(original_size), 0), COALESCE(SUM(stored_size), 0)
+            FROM communication_bodies
+        """)
+        count, original_size, stored_size = cursor.fetchone()
+
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM notification_fragments")
+        fragment_count, fragment_size = cursor.fetchone()
+
+        conn.close()
+
+        total_stored = stored_size + fragment_size
+        return {
+            "communications": count,
+            "fragments": fragment_count,
+            "original_bytes": original_size,
+            "stored_bytes": total_stored,
+            "compression_ratio": round(original_size / total_stored, 2) if total_stored else 0
+        }
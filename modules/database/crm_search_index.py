@@ -0,0 +1,427 @@
+"""
+CRM Search Index - FTS5 Volltextsuche über Opportunities, Rechnungen und Kontakte
+
+search_opportunities lief bisher als LIKE '%q%' über vier Spalten (Full Scan
+pro Tastendruck, Sortierung nur nach created_at). Die Indizes hier:
+- opportunity_fts          → opportunities (title, company_name, contact_name, contact_email, description)
+- opportunity_activity_fts → opportunity_activities (title, description)
+- invoice_fts              → invoices der Invoice-Tracking-DB
+- Kontakte                 → parties/leads der WeClapp Sync-DB (In-Memory FTS5,
+                             Neuaufbau wenn die heruntergeladene DB-Datei wechselt)
+
+Opportunity- und Rechnungsindex sind external-content Tabellen, Trigger halten
+sie aktuell. Tokenizer ist unicode61 mit Prefix-Index, damit Teileingaben
+("muster" → "Mustermann") ohne Scan gefunden werden. Treffer werden per BM25
+gerankt und mit [..]-Markierungen hervorgehoben.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from modules.database.email_search_index import build_match_query
+
+logger = logging.getLogger(__name__)
+
+WECLAPP_SYNC_DB_PATH = "/tmp/weclapp_sync.db"
+CONTACT_REFRESH_CHECK_SECONDS = 60
+
+PREFIX_TOKENIZER = "unicode61 remove_diacritics 2"
+PREFIX_LENGTHS = "2 3"
+HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE = "[", "]"
+
+SEARCH_TYPES = ("opportunities", "invoices", "contacts")
+
+OPPORTUNITY_COLUMNS = ("title", "company_name", "contact_name", "contact_email", "description")
+ACTIVITY_COLUMNS = ("title", "description")
+INVOICE_COLUMNS = ("invoice_number", "vendor_name", "customer_name", "notes")
+CONTACT_COLUMNS = ("name", "company", "email", "phone", "customer_number")
+
+# BM25 Gewichte pro Spalte (in Spaltenreihenfolge oben)
+OPPORTUNITY_BM25_WEIGHTS = (10.0, 6.0, 4.0, 4.0, 1.0)
+ACTIVITY_BM25_WEIGHTS = (2.0, 1.0)
+INVOICE_BM25_WEIGHTS = (10.0, 5.0, 5.0, 1.0)
+CONTACT_BM25_WEIGHTS = (10.0, 6.0, 4.0, 2.0, 4.0)
+
+
+def _fts_create_sql(fts_table: str, columns: Iterable[str], content_table: Optional[str] = None) -> str:
+    content = f"content='{content_table}', content_rowid='id', " if content_table else ""
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{', '.join(columns)}, {content}"
+        f"tokenize='{PREFIX_TOKENIZER}', prefix='{PREFIX_LENGTHS}')"
+    )
+
+
+def install_fts_index(cursor: sqlite3.Cursor, fts_table: str, content_table: str, columns: Tuple[str, ...]) -> bool:
+    """
+    Legt einen external-content FTS5 Index samt Sync-Triggern an (idempotent).
+
+    Returns:
+        True wenn der Index neu angelegt und aus dem Bestand aufgebaut wurde
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+    created = cursor.fetchone() is None
+
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    cursor.execute(_fts_create_sql(fts_table, columns, content_table))
+    cursor.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {content_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END;
+    """)
+
+    if created:
+        cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+        logger.info(f"🔎 {fts_table} index built from existing {content_table}")
+    return created
+
+
+def _highlights(row: sqlite3.Row, columns: Tuple[str, ...]) -> Dict[str, str]:
+    """Nur Spalten mit Treffer (highlight() weicht vom Spaltenwert ab)"""
+    return {
+        column: row[f"hl_{column}"]
+        for column in columns
+        if row[f"hl_{column}"] is not None and row[f"hl_{column}"] != row[column]
+    }
+
+
+def _highlight_sql(fts_table: str, columns: Tuple[str, ...]) -> str:
+    return ", ".join(
+        f"highlight({fts_table}, {position}, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS hl_{column}"
+        for position, column in enumerate(columns)
+    )
+
+
+class OpportunitySearchIndex:
+    """🔎 FTS5 Suche über Verkaufschancen und deren Aktivitäten"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._schema_ready = False
+
+    @staticmethod
+    def init_schema(cursor: sqlite3.Cursor):
+        """Legt beide FTS5-Indizes + Trigger an (aus sales_pipeline_db.init_db)"""
+        install_fts_index(cursor, "opportunity_fts", "opportunities", OPPORTUNITY_COLUMNS)
+        install_fts_index(cursor, "opportunity_activity_fts", "opportunity_activities", ACTIVITY_COLUMNS)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            self.init_schema(conn.cursor())
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def search(self, query: str, limit: int = 50, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Prefix-Volltextsuche, BM25-gerankt.
+
+        Treffer in Aktivitäten (Notizen, Stage-Wechsel) zählen für die
+        zugehörige Opportunity; das bessere Ranking gewinnt.
+
+        Returns:
+            Opportunities (bestes Ranking zuerst) mit rank, highlights und
+            den passenden Aktivitäten als snippets
+        """
+        match = build_match_query(query, prefix=True)
+        if not match:
+            return []
+
+        stage_sql = " AND o.stage = ?" if stage else ""
+        stage_params = [stage] if stage else []
+
+        conn = self._connect()
+        try:
+            opportunity_rows = conn.execute(f"""
+                SELECT o.*, {_highlight_sql('opportunity_fts', OPPORTUNITY_COLUMNS)},
+                       bm25(opportunity_fts, {', '.join(map(str, OPPORTUNITY_BM25_WEIGHTS))}) AS rank
+                FROM opportunity_fts
+                JOIN opportunities o ON o.id = opportunity_fts.rowid
+                WHERE opportunity_fts MATCH ?{stage_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, [match, *stage_params, limit]).fetchall()
+
+            activity_rows = conn.execute(f"""
+                SELECT a.id AS activity_id, a.opportunity_id, a.activity_type, a.created_at,
+                       snippet(opportunity_activity_fts, -1, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', 10) AS snippet,
+                       bm25(opportunity_activity_fts, {', '.join(map(str, ACTIVITY_BM25_WEIGHTS))}) AS rank
+                FROM opportunity_activity_fts
+                JOIN opportunity_activities a ON a.id = opportunity_activity_fts.rowid
+                JOIN opportunities o ON o.id = a.opportunity_id
+                WHERE opportunity_activity_fts MATCH ?{stage_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, [match, *stage_params, limit]).fetchall()
+
+            results: Dict[int, Dict[str, Any]] = {}
+            for row in opportunity_rows:
+                entry = {key: row[key] for key in row.keys() if not key.startswith("hl_")}
+                entry["highlights"] = _highlights(row, OPPORTUNITY_COLUMNS)
+                entry["activities"] = []
+                results[row["id"]] = entry
+
+            # Opportunities, die nur über Aktivitäten gefunden wurden
+            missing = sorted({row["opportunity_id"] for row in activity_rows} - set(results))
+            if missing:
+                placeholders = ", ".join("?" for _ in missing)
+                for row in conn.execute(f"SELECT * FROM opportunities WHERE id IN ({placeholders})", missing):
+                    entry = dict(row)
+                    # bm25 ist negativ (kleiner = besser) → 0.0 wird vom Aktivitäts-Rank ersetzt
+                    entry.update({"rank": 0.0, "highlights": {}, "activities": []})
+                    results[row["id"]] = entry
+        finally:
+            conn.close()
+
+        for row in activity_rows:
+            entry = results[row["opportunity_id"]]
+            entry["rank"] = min(entry["rank"], row["rank"])
+            entry["activities"].append({
+                "activity_id": row["activity_id"],
+                "activity_type": row["activity_type"],
+                "created_at": row["created_at"],
+                "snippet": row["snippet"],
+            })
+
+        return sorted(results.values(), key=lambda entry: entry["rank"])[:limit]
+
+
+class InvoiceSearchIndex:
+    """🔎 FTS5 Suche über Rechnungen (Invoice-Tracking-DB)"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._schema_ready = False
+
+    @staticmethod
+    def init_schema(cursor: sqlite3.Cursor):
+        """Legt invoice_fts + Trigger an (aus invoice_tracking_db.init_invoice_db)"""
+        install_fts_index(cursor, "invoice_fts", "invoices", INVOICE_COLUMNS)
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Prefix-Volltextsuche über Rechnungsnummer, Lieferant, Kunde und Notizen"""
+        match = build_match_query(query, prefix=True)
+        if not match or not os.path.exists(self.db_path):
+            return []
+
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            if not self._schema_ready:
+                self.init_schema(conn.cursor())
+                conn.commit()
+                self._schema_ready = True
+            rows = conn.execute(f"""
+                SELECT i.id, i.invoice_number, i.invoice_date, i.due_date, i.amount_total, i.currency,
+                       i.vendor_name, i.customer_name, i.notes, i.direction, i.status, i.onedrive_link,
+                       {_highlight_sql('invoice_fts', INVOICE_COLUMNS)},
+                       bm25(invoice_fts, {', '.join(map(str, INVOICE_BM25_WEIGHTS))}) AS rank
+                FROM invoice_fts
+                JOIN invoices i ON i.id = invoice_fts.rowid
+                WHERE invoice_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (match, limit)).fetchall()
+        finally:
+            conn.close()
+
+        results = []
+        for row in rows:
+            entry = {key: row[key] for key in row.keys() if not key.startswith("hl_")}
+            entry["highlights"] = _highlights(row, INVOICE_COLUMNS)
+            results.append(entry)
+        return results
+
+
+class ContactSearchIndex:
+    """
+    🔎 FTS5 Suche über WeClapp Kontakte (parties + leads der Sync-DB)
+
+    Die Sync-DB wird als Ganzes von OneDrive ersetzt - Trigger darin gingen
+    verloren. Der Index liegt daher in einer In-Memory-DB und wird neu
+    aufgebaut, sobald sich mtime/Größe der Datei ändern.
+    """
+
+    def __init__(self, db_path: str = WECLAPP_SYNC_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._file_signature: Optional[Tuple[float, int]] = None
+        self._last_check = 0.0
+        self.stats = {"rebuilds": 0, "contacts": 0, "last_rebuild_ms": 0.0}
+
+    def _current_signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.db_path)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Baut den Index neu auf, wenn sich die Sync-DB geändert hat.
+
+        Returns:
+            True wenn neu aufgebaut wurde
+        """
+        signature = self._current_signature()
+        self._last_check = time.monotonic()
+        if signature is None or (not force and signature == self._file_signature):
+            return False
+
+        start = time.perf_counter()
+        try:
+            contacts = self._read_contacts()
+        except Exception as e:
+            logger.error(f"❌ Contact search index refresh failed: {e}")
+            return False
+
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(_fts_create_sql(
+            "contact_fts", CONTACT_COLUMNS + ("entity_type UNINDEXED", "contact_id UNINDEXED")
+        ))
+        conn.executemany(
+            "INSERT INTO contact_fts (name, company, email, phone, customer_number, entity_type, contact_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            contacts,
+        )
+        conn.commit()
+
+        with self._lock:
+            previous, self._conn = self._conn, conn
+            self._file_signature = signature
+        if previous is not None:
+            previous.close()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats.update({
+            "rebuilds": self.stats["rebuilds"] + 1,
+            "contacts": len(contacts),
+            "last_rebuild_ms": round(elapsed_ms, 2),
+        })
+        logger.info(f"📇 Contact search index rebuilt: {len(contacts)} contacts ({elapsed_ms:.1f}ms)")
+        return True
+
+    def _read_contacts(self) -> List[Tuple]:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            cursor = conn.cursor()
+            contacts: List[Tuple] = []
+
+            party_columns = self._columns(cursor, "parties")
+            if party_columns:
+                cursor.execute("SELECT id, name, email, phone, customerNumber, partyType FROM parties")
+                for party_id, name, email, phone, customer_number, party_type in cursor.fetchall():
+                    company = name if (party_type or "").upper() == "ORGANIZATION" else None
+                    contacts.append((name, company, email, phone, customer_number, "party", str(party_id)))
+
+            lead_columns = self._columns(cursor, "leads")
+            if lead_columns:
+                cursor.execute("SELECT id, firstName, lastName, email, phone, company FROM leads")
+                for lead_id, first_name, last_name, email, phone, company in cursor.fetchall():
+                    name = f"{first_name or ''} {last_name or ''}".strip() or company
+                    contacts.append((name, company, email, phone, None, "lead", str(lead_id)))
+
+            return contacts
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [col[1] for col in cursor.fetchall()]
+
+    def search(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Prefix-Volltextsuche über Name, Firma, Email, Telefon und Kundennummer"""
+        match = build_match_query(query, prefix=True)
+        if not match:
+            return []
+        if self._conn is None or time.monotonic() - self._last_check >= CONTACT_REFRESH_CHECK_SECONDS:
+            self.refresh()
+
+        with self._lock:
+            if self._conn is None:
+                return []
+            rows = self._conn.execute(f"""
+                SELECT entity_type, contact_id, name, company, email, phone, customer_number,
+                       {_highlight_sql('contact_fts', CONTACT_COLUMNS)},
+                       bm25(contact_fts, {', '.join(map(str, CONTACT_BM25_WEIGHTS))}) AS rank
+                FROM contact_fts
+                WHERE contact_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            """, (match, limit)).fetchall()
+
+        results = []
+        for row in rows:
+            entry = {key: row[key] for key in row.keys() if not key.startswith("hl_")}
+            entry["highlights"] = _highlights(row, CONTACT_COLUMNS)
+            results.append(entry)
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+# Globale Instanzen (Singleton-Pattern)
+_opportunity_search_index: Optional[OpportunitySearchIndex] = None
+_invoice_search_index: Optional[InvoiceSearchIndex] = None
+_contact_search_index: Optional[ContactSearchIndex] = None
+
+
+def get_opportunity_search_index(db_path: Optional[str] = None) -> OpportunitySearchIndex:
+    """Holt globale OpportunitySearchIndex Instanz (Default: Sales Pipeline DB)"""
+    global _opportunity_search_index
+    if db_path is None:
+        from modules.database.sales_pipeline_db import DB_PATH as db_path
+    if _opportunity_search_index is None or _opportunity_search_index.db_path != db_path:
+        _opportunity_search_index = OpportunitySearchIndex(db_path)
+    return _opportunity_search_index
+
+
+def get_invoice_search_index(db_path: Optional[str] = None) -> InvoiceSearchIndex:
+    """Holt globale InvoiceSearchIndex Instanz (Default: Invoice Tracking DB)"""
+    global _invoice_search_index
+    if db_path is None:
+        from modules.database.invoice_tracking_db import DB_PATH as db_path
+    if _invoice_search_index is None or _invoice_search_index.db_path != db_path:
+        _invoice_search_index = InvoiceSearchIndex(db_path)
+    return _invoice_search_index
+
+
+def get_contact_search_index(db_path: str = WECLAPP_SYNC_DB_PATH) -> ContactSearchIndex:
+    """Holt globale ContactSearchIndex Instanz"""
+    global _contact_search_index
+    if _contact_search_index is None or _contact_search_index.db_path != db_path:
+        _contact_search_index = ContactSearchIndex(db_path)
+    return _contact_search_index
+
+
+def search_all(query: str, limit: int = 10, types: Iterable[str] = SEARCH_TYPES) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Kombinierte Suche über Opportunities, Rechnungen und Kontakte.
+
+    Returns:
+        {"opportunities": [...], "invoices": [...], "contacts": [...]} - je Typ BM25-gerankt
+    """
+    searches = {
+        "opportunities": lambda: get_opportunity_search_index().search(query, limit),
+        "invoices": lambda: get_invoice_search_index().search(query, limit),
+        "contacts": lambda: get_contact_search_index().search(query, limit),
+    }
+    return {search_type: searches[search_type]() for search_type in types if search_type in searches}
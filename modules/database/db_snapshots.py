@@ -0,0 +1,468 @@
+"""
+DB Snapshots - Sicherung & Wiederherstellung der /tmp Datenbanken
+
+Die heißen SQLite-Datenbanken (email_tracking, payment_tracking,
+invoice_tracking, weclapp_sync, weclapp_fallback) liegen in /tmp und sind
+nach jedem Railway Redeploy leer: Duplikatprüfung, Caches und Tracking
+starten kalt, die ersten Stunden wird erneut OCR gemacht und benachrichtigt.
+
+- Snapshot: SQLite Online Backup API (seitenweise, Schreiber werden nicht
+  blockiert) in eine Temp-Datei, gzip-komprimiert in den Store. Unveränderte
+  Datenbanken (Dateisignatur bzw. Inhalts-Hash) werden übersprungen
+- Store: lokales Volume (SNAPSHOT_STORE=/data/snapshots) oder ein
+  Object-Store per HTTP PUT/GET/DELETE (SNAPSHOT_STORE=https://…)
+  je DB: <name>/<zeitstempel>.db.gz + <name>/manifest.json
+- Restore beim Start: alle Datenbanken parallel, bevor der Server Traffic
+  annimmt; danach laufen die Schema-Initialisierungen erneut (neue Tabellen)
+- Dauer und Größe jedes Snapshots/Restores stehen in get_stats() (/status,
+  /admin/snapshots, /metrics)
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_STORE = os.getenv("SNAPSHOT_STORE", "")
+SNAPSHOT_STORE_TOKEN = os.getenv("SNAPSHOT_STORE_TOKEN", "")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "6"))
+SNAPSHOT_PAGES_PER_STEP = int(os.getenv("SNAPSHOT_PAGES_PER_STEP", "1024"))
+SNAPSHOT_RESTORE_MODE = os.getenv("SNAPSHOT_RESTORE_MODE", "auto")  # auto | always | never
+SNAPSHOT_RESTORE_TIMEOUT_SECONDS = float(os.getenv("SNAPSHOT_RESTORE_TIMEOUT_SECONDS", "120"))
+SNAPSHOT_HTTP_TIMEOUT_SECONDS = 120
+
+
+def _process_started_at() -> float:
+    """Startzeit des Prozesses (Linux: /proc/<pid>, sonst Import-Zeitpunkt)"""
+    try:
+        return os.stat(f"/proc/{os.getpid()}").st_ctime
+    except OSError:
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_started_at()
+
+
+# ===============================
+# STORES
+# ===============================
+
+class SnapshotStore:
+    """Schlüssel → Datei/Bytes (Schlüssel wie '<db>/<stamp>.db.gz')"""
+
+    description = ""
+
+    def put_file(self, key: str, source_path: str):
+        raise NotImplementedError
+
+    def get_file(self, key: str, target_path: str) -> bool:
+        raise NotImplementedError
+
+    def put_bytes(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+
+class LocalSnapshotStore(SnapshotStore):
+    """Verzeichnis auf einem persistenten Volume"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.description = f"local:{root}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put_file(self, key: str, source_path: str):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source_path, target + ".part")
+        os.replace(target + ".part", target)
+
+    def get_file(self, key: str, target_path: str) -> bool:
+        source = self._path(key)
+        if not os.path.exists(source):
+            return False
+        shutil.copyfile(source, target_path)
+        return True
+
+    def put_bytes(self, key: str, data: bytes):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + ".part", "wb") as handle:
+            handle.write(data)
+        os.replace(target + ".part", target)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        source = self._path(key)
+        if not os.path.exists(source):
+            return None
+        with open(source, "rb") as handle:
+            return handle.read()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class HttpObjectStore(SnapshotStore):
+    """Object-Store per HTTP (PUT/GET/DELETE auf <base>/<key>, optional Bearer Token)"""
+
+    def __init__(self, base_url: str, token: str = ""):
+        self.base_url = base_url.rstrip("/")
+        self.description = self.base_url
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def _url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def put_file(self, key: str, source_path: str):
+        with open(source_path, "rb") as handle:
+            response = self.session.put(self._url(key), data=handle, timeout=SNAPSHOT_HTTP_TIMEOUT_SECONDS)
+        response.raise_for_status()
+
+    def get_file(self, key: str, target_path: str) -> bool:
+        with self.session.get(self._url(key), stream=True, timeout=SNAPSHOT_HTTP_TIMEOUT_SECONDS) as response:
+            if response.status_code == 404:
+                return False
+            response.raise_for_status()
+            with open(target_path, "wb") as handle:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    handle.write(chunk)
+        return True
+
+    def put_bytes(self, key: str, data: bytes):
+        self.session.put(self._url(key), data=data, timeout=SNAPSHOT_HTTP_TIMEOUT_SECONDS).raise_for_status()
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        response = self.session.get(self._url(key), timeout=SNAPSHOT_HTTP_TIMEOUT_SECONDS)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    def delete(self, key: str):
+        response = self.session.delete(self._url(key), timeout=SNAPSHOT_HTTP_TIMEOUT_SECONDS)
+        if response.status_code not in (200, 202, 204, 404):
+            response.raise_for_status()
+
+
+def store_from_spec(spec: str, token: str = SNAPSHOT_STORE_TOKEN) -> Optional[SnapshotStore]:
+    """'' → deaktiviert, http(s)://… → Object-Store, sonst lokaler Pfad (auch file://)"""
+    if not spec:
+        return None
+    if spec.startswith(("http://", "https://")):
+        return HttpObjectStore(spec, token)
+    return LocalSnapshotStore(spec[len("file://"):] if spec.startswith("file://") else spec)
+
+
+# ===============================
+# SNAPSHOT MANAGER
+# ===============================
+
+@dataclass
+class SnapshotTarget:
+    """Eine gesicherte Datenbank; after_restore legt neue Tabellen/Indizes an"""
+    name: str
+    path: str
+    after_restore: Optional[Callable[[], Any]] = None
+
+
+def _init_email_tracking():
+    from modules.database.email_tracking_db import get_email_tracking_db
+    tracking_db = get_email_tracking_db()
+    tracking_db._init_database()
+    # Bloom-Filter stammt sonst noch aus der Datei vor dem Restore
+    tracking_db.duplicate_index.rebuild()
+
+
+def _init_payment_tracking():
+    from modules.database.payment_matching import init_payment_db
+    init_payment_db()
+
+
+def _init_invoice_tracking():
+    from modules.database.invoice_tracking_db import init_invoice_db
+    init_invoice_db()
+
+
+def _init_weclapp_fallback():
+    from modules.database.weclapp_fallback import get_weclapp_fallback_db
+    get_weclapp_fallback_db().ensure_database_exists()
+
+
+def default_snapshot_targets() -> List[SnapshotTarget]:
+    """Die heißen /tmp Datenbanken (+ SNAPSHOT_EXTRA_DBS='name=/pfad,…')"""
+    from modules.database.invoice_tracking_db import DB_PATH as invoice_db_path
+    from modules.database.payment_matching import PAYMENT_DB_PATH
+
+    targets = [
+        SnapshotTarget("email_tracking", "/tmp/email_tracking.db", _init_email_tracking),
+        SnapshotTarget("payment_tracking", PAYMENT_DB_PATH, _init_payment_tracking),
+        SnapshotTarget("invoice_tracking", invoice_db_path, _init_invoice_tracking),
+        SnapshotTarget("weclapp_sync", "/tmp/weclapp_sync.db"),
+        SnapshotTarget("weclapp_fallback", "/tmp/weclapp_fallback.db", _init_weclapp_fallback),
+    ]
+    for entry in filter(None, (e.strip() for e in os.getenv("SNAPSHOT_EXTRA_DBS", "").split(","))):
+        name, _, path = entry.partition("=")
+        if name and path:
+            targets.append(SnapshotTarget(name.strip(), path.strip()))
+    return targets
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int, int]]:
+    """Größe + mtime von DB und WAL - ändert sich bei jedem Commit"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    try:
+        wal = os.stat(path + "-wal")
+        wal_sig = (wal.st_size, wal.st_mtime_ns)
+    except FileNotFoundError:
+        wal_sig = (0, 0)
+    return (stat.st_size, stat.st_mtime_ns) + wal_sig
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotManager:
+    """💾 Snapshots der /tmp Datenbanken in einen persistenten Store und Restore beim Start"""
+
+    def __init__(self, store: Optional[SnapshotStore], targets: Optional[List[SnapshotTarget]] = None,
+                 keep: int = SNAPSHOT_KEEP):
+        self.store = store
+        self.targets = targets if targets is not None else default_snapshot_targets()
+        self.keep = keep
+        self._signatures: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {target.name: {} for target in self.targets}
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    # -------------------------------------------------------------- manifest
+    def _manifest(self, name: str) -> Dict[str, Any]:
+        data = self.store.get_bytes(f"{name}/manifest.json")
+        return json.loads(data) if data else {"snapshots": []}
+
+    def _write_manifest(self, name: str, manifest: Dict[str, Any]):
+        self.store.put_bytes(f"{name}/manifest.json", json.dumps(manifest, indent=2).encode())
+
+    # -------------------------------------------------------------- snapshot
+    def snapshot_target(self, target: SnapshotTarget, force: bool = False) -> Dict[str, Any]:
+        """Sichert eine Datenbank (blockierend - aus einem Thread aufrufen)"""
+        stats = self._stats.setdefault(target.name, {})
+        signature = _file_signature(target.path)
+        if signature is None:
+            return {"name": target.name, "status": "missing"}
+        if not force and self._signatures.get(target.name) == signature:
+            stats["skipped"] = stats.get("skipped", 0) + 1
+            return {"name": target.name, "status": "unchanged"}
+
+        started = time.perf_counter()
+        workdir = tempfile.mkdtemp(prefix=f"snapshot_{target.name}_")
+        raw_path = os.path.join(workdir, "snapshot.db")
+        gz_path = raw_path + ".gz"
+        try:
+            # Online Backup: seitenweise Kopie, konsistent auch bei gleichzeitigen Schreibern
+            source = sqlite3.connect(f"file:{target.path}?mode=ro", uri=True)
+            destination = sqlite3.connect(raw_path)
+            try:
+                source.backup(destination, pages=SNAPSHOT_PAGES_PER_STEP, sleep=0.001)
+            finally:
+                destination.close()
+                source.close()
+
+            size_bytes = os.path.getsize(raw_path)
+            content_hash = _sha256(raw_path)
+            manifest = self._manifest(target.name)
+            latest = manifest["snapshots"][0] if manifest["snapshots"] else None
+            if not force and latest and latest.get("sha256") == content_hash:
+                self._signatures[target.name] = signature
+                stats["skipped"] = stats.get("skipped", 0) + 1
+                return {"name": target.name, "status": "unchanged"}
+
+            with open(raw_path, "rb") as source_file, gzip.open(gz_path, "wb", compresslevel=6) as gz_file:
+                shutil.copyfileobj(source_file, gz_file, length=1024 * 1024)
+            compressed_bytes = os.path.getsize(gz_path)
+
+            created_at = datetime.now()
+            key = f"{target.name}/{created_at:%Y%m%dT%H%M%S%f}.db.gz"
+            self.store.put_file(key, gz_path)
+
+            entry = {
+                "key": key,
+                "created_at": created_at.isoformat(),
+                "created_ts": created_at.timestamp(),
+                "size_bytes": size_bytes,
+                "compressed_bytes": compressed_bytes,
+                "sha256": content_hash,
+            }
+            manifest["snapshots"].insert(0, entry)
+            for old in manifest["snapshots"][self.keep:]:
+                self.store.delete(old["key"])
+            manifest["snapshots"] = manifest["snapshots"][:self.keep]
+            self._write_manifest(target.name, manifest)
+
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            self._signatures[target.name] = signature
+            stats.update({
+                "last_snapshot_at": entry["created_at"],
+                "last_snapshot_ts": entry["created_ts"],
+                "duration_ms": duration_ms,
+                "size_bytes": size_bytes,
+                "compressed_bytes": compressed_bytes,
+                "snapshots": stats.get("snapshots", 0) + 1,
+                "last_error": None,
+            })
+            logger.info(f"💾 Snapshot {target.name}: {size_bytes / 1024:.0f} KB → {compressed_bytes / 1024:.0f} KB in {duration_ms} ms")
+            return {"name": target.name, "status": "saved", **entry, "duration_ms": duration_ms}
+        except Exception as e:
+            stats["last_error"] = str(e)
+            logger.error(f"❌ Snapshot {target.name} failed: {e}")
+            return {"name": target.name, "status": "error", "error": str(e)}
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    async def snapshot_all(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Sichert alle Datenbanken nacheinander in einem Worker-Thread"""
+        if not self.enabled:
+            return []
+        async with self._lock:
+            return await asyncio.to_thread(lambda: [self.snapshot_target(t, force) for t in self.targets])
+
+    # --------------------------------------------------------------- restore
+    def _should_restore(self, target: SnapshotTarget, mode: str) -> bool:
+        if mode == "always":
+            return True
+        if not os.path.exists(target.path):
+            return True
+        # Datei erst von diesem Prozess angelegt (Schema-Init beim Import) → /tmp war leer
+        return os.path.getmtime(target.path) >= PROCESS_STARTED_AT - 1
+
+    def restore_target(self, target: SnapshotTarget, mode: str = SNAPSHOT_RESTORE_MODE) -> Dict[str, Any]:
+        """Stellt den neuesten Snapshot wieder her (blockierend - aus einem Thread aufrufen)"""
+        stats = self._stats.setdefault(target.name, {})
+        if mode == "never" or not self._should_restore(target, mode):
+            return {"name": target.name, "status": "kept_local"}
+
+        started = time.perf_counter()
+        workdir = tempfile.mkdtemp(prefix=f"restore_{target.name}_")
+        gz_path = os.path.join(workdir, "snapshot.db.gz")
+        raw_path = os.path.join(workdir, "snapshot.db")
+        try:
+            manifest = self._manifest(target.name)
+            if not manifest["snapshots"]:
+                return {"name": target.name, "status": "no_snapshot"}
+            entry = manifest["snapshots"][0]
+            if not self.store.get_file(entry["key"], gz_path):
+                return {"name": target.name, "status": "no_snapshot"}
+
+            with gzip.open(gz_path, "rb") as gz_file, open(raw_path, "wb") as raw_file:
+                shutil.copyfileobj(gz_file, raw_file, length=1024 * 1024)
+            if entry.get("sha256") and _sha256(raw_path) != entry["sha256"]:
+                raise ValueError("checksum mismatch")
+
+            source = sqlite3.connect(raw_path)
+            try:
+                check = source.execute("PRAGMA quick_check").fetchone()[0]
+                if check != "ok":
+                    raise ValueError(f"quick_check: {check}")
+                os.makedirs(os.path.dirname(target.path) or ".", exist_ok=True)
+                destination = sqlite3.connect(target.path)
+                try:
+                    source.backup(destination)
+                finally:
+                    destination.close()
+            finally:
+                source.close()
+
+            if target.after_restore:
+                target.after_restore()
+            # mtime = Snapshot-Zeit, damit Alters-Checks (z.B. WEClapp Sync-DB < 1h) korrekt bleiben
+            os.utime(target.path, (entry["created_ts"], entry["created_ts"]))
+            self._signatures[target.name] = _file_signature(target.path)
+
+            duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            stats["last_restore"] = {
+                "restored_at": datetime.now().isoformat(),
+                "snapshot_created_at": entry["created_at"],
+                "duration_ms": duration_ms,
+                "size_bytes": entry["size_bytes"],
+                "compressed_bytes": entry["compressed_bytes"],
+            }
+            logger.info(f"♻️ Restored {target.name} from snapshot {entry['created_at']} ({entry['size_bytes'] / 1024:.0f} KB, {duration_ms} ms)")
+            return {"name": target.name, "status": "restored", "duration_ms": duration_ms, "snapshot": entry["created_at"]}
+        except Exception as e:
+            stats["last_error"] = f"restore: {e}"
+            logger.error(f"❌ Restore {target.name} failed: {e}")
+            return {"name": target.name, "status": "error", "error": str(e)}
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    async def restore_all(self, mode: str = SNAPSHOT_RESTORE_MODE,
+                          timeout: float = SNAPSHOT_RESTORE_TIMEOUT_SECONDS) -> List[Dict[str, Any]]:
+        """Alle Datenbanken parallel wiederherstellen (vor Annahme von Traffic)"""
+        if not self.enabled or mode == "never":
+            return []
+        started = time.perf_counter()
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*(asyncio.to_thread(self.restore_target, t, mode) for t in self.targets)),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Snapshot restore timed out after {timeout}s - starting with local state")
+            return [{"status": "timeout"}]
+        restored = [r["name"] for r in results if r["status"] == "restored"]
+        logger.info(f"♻️ Snapshot restore: {len(restored)}/{len(results)} databases in {(time.perf_counter() - started) * 1000:.0f} ms {restored}")
+        return list(results)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "store": self.store.description if self.store else None,
+            "keep": self.keep,
+            "databases": {name: dict(stats) for name, stats in self._stats.items()},
+        }
+
+
+# Globale Instanz (Singleton-Pattern)
+_snapshot_manager: Optional[SnapshotManager] = None
+
+
+def get_snapshot_manager() -> SnapshotManager:
+    """Gibt die globale SnapshotManager Instanz zurück"""
+    global _snapshot_manager
+    if _snapshot_manager is None:
+        _snapshot_manager = SnapshotManager(store_from_spec(SNAPSHOT_STORE))
+    return _snapshot_manager
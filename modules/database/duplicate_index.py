@@ -0,0 +1,371 @@
+"""
+Duplicate Index - einheitliche Duplikaterkennung mit Bloom-Filter davor
+
+Bisher kostete jede Email bis zu ~7 SQLite-Lookups über zwei Datenbanken
+(message_id, Content-Hash, je Anhang der File-Hash in email_tracking.db;
+message_id, Dokument-Hash, OneDrive-Pfad und die 24h-Heuristik in
+processed_documents). Jetzt liegen alle bekannten Schlüssel in einer
+Tabelle duplicate_keys (kind, key) und zusätzlich in einem Bloom-Filter
+im Speicher:
+
+- Bloom-Filter negativ für alle Schlüssel → sicher kein Duplikat, ohne SQLite
+- sonst bestätigt EINE indizierte Abfrage über alle positiven Schlüssel
+  (Bloom-False-Positives werden dort aussortiert)
+- Schlüssel mit Zeitfenster (Content-Hash, Heuristik) zählen nur, wenn sie
+  innerhalb des Fensters zuletzt gesehen wurden
+
+Der Filter wird beim Start aus duplicate_keys aufgebaut; ist die Tabelle
+noch leer, wird sie einmalig aus processed_emails und email_attachments
+befüllt. processed_documents liegt in einer anderen Datenbank (DATABASE_PATH)
+und wird bei jedem rebuild() ab einem Watermark (letzte übernommene id)
+nachgezogen - so kommen auch Dokumente nach einem Snapshot-Restore der
+Tracking-DB oder nach einem fehlgeschlagenen record() wieder in den Index.
+"""
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BLOOM_CAPACITY = int(os.getenv("DUPLICATE_BLOOM_CAPACITY", "200000"))
+BLOOM_ERROR_RATE = float(os.getenv("DUPLICATE_BLOOM_ERROR_RATE", "0.001"))
+DOCUMENT_DB_PATH = os.getenv("DATABASE_PATH", "./email_data.db")
+
+# Schlüsselarten
+KIND_MESSAGE_ID = "message_id"          # processed_emails.message_id
+KIND_CONTENT_HASH = "content_hash"      # Betreff + Body + Absender (Zeitfenster)
+KIND_FILE_HASH = "file_hash"            # Anhang (email_attachments.file_hash)
+KIND_DOCUMENT_MESSAGE = "document_message_id"  # processed_documents.message_id
+KIND_DOCUMENT_HASH = "document_hash"    # SHA256 des Dokuments
+KIND_ONEDRIVE_PATH = "onedrive_path"    # Ablagepfad in OneDrive
+KIND_HEURISTIC = "heuristic"            # Absender + Betreff + Dateiname (Zeitfenster)
+
+# Bei diesen Arten wird created_at bei jedem Auftreten erneuert (Zeitfenster)
+WINDOWED_KINDS = (KIND_CONTENT_HASH, KIND_HEURISTIC)
+
+
+def heuristic_key(sender: str, subject: str, filename: str) -> str:
+    """Schlüssel der 24h-Heuristik (Absender + Betreff + Dateiname)"""
+    normalized = "|".join((value or "").strip().lower() for value in (sender, subject, filename))
+    return hashlib.sha256(normalized.encode()).hexdigest()[:32]
+
+
+class BloomFilter:
+    """Einfacher Bloom-Filter (bytearray + Double Hashing über blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1000)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def estimated_error_rate(self) -> float:
+        """Erwartete False-Positive-Rate beim aktuellen Füllstand"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+def _bloom_item(kind: str, key: str) -> str:
+    return f"{kind}\x00{key}"
+
+
+def _as_utc(value: Optional[str]) -> Optional[datetime]:
+    """processed_emails speichert naive UTC-Zeiten, processed_documents Berlin mit Offset"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class DuplicateIndex:
+    """🔍 Einheitlicher Schlüssel-Index für Duplikate (SQLite + Bloom-Filter)"""
+
+    def __init__(self, db_path: str, document_db_path: Optional[str] = DOCUMENT_DB_PATH,
+                 capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.db_path = db_path
+        self.document_db_path = document_db_path
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.stats = {"checks": 0, "bloom_negative": 0, "confirmed": 0, "false_positive": 0, "expired": 0}
+        self.last_rebuild: Optional[Dict[str, Any]] = None
+        self._init_schema()
+        self.rebuild()
+
+    @staticmethod
+    def init_schema(cursor: sqlite3.Cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS duplicate_keys (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                ref TEXT,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (kind, key)
+            ) WITHOUT ROWID
+        """)
+        # Watermark je Quelle (processed_documents: letzte übernommene id)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS duplicate_sync_state (
+                source TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                synced_at TEXT NOT NULL
+            )
+        """)
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        self.init_schema(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    # ---------------------------------------------------------------- rebuild
+    def rebuild(self) -> Dict[str, Any]:
+        """Baut den Bloom-Filter aus duplicate_keys neu auf (inkl. Erstbefüllung)"""
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        backfilled = 0
+        if conn.execute("SELECT 1 FROM duplicate_keys LIMIT 1").fetchone() is None:
+            backfilled = self._backfill(conn)
+        documents = self._sync_documents(conn)
+
+        total = conn.execute("SELECT COUNT(*) FROM duplicate_keys").fetchone()[0]
+        # Reserve für Wachstum bis zum nächsten Start
+        bloom = BloomFilter(max(self._bloom.capacity, total * 2), self.error_rate)
+        for kind, key in conn.execute("SELECT kind, key FROM duplicate_keys"):
+            bloom.add(_bloom_item(kind, key))
+        conn.close()
+
+        with self._lock:
+            self._bloom = bloom
+        self.last_rebuild = {
+            "keys": total,
+            "backfilled": backfilled,
+            "documents_synced": documents,
+            "bloom_bits": bloom.num_bits,
+            "bloom_hashes": bloom.num_hashes,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "rebuilt_at": datetime.now().isoformat(),
+        }
+        logger.info(f"🔍 Duplicate index loaded: {total} keys ({backfilled} backfilled, {documents} documents synced) "
+                    f"in {self.last_rebuild['duration_ms']} ms")
+        return self.last_rebuild
+
+    def _backfill(self, conn: sqlite3.Connection) -> int:
+        """Einmalige Übernahme der Schlüssel aus den Tabellen der Tracking-DB"""
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        before = conn.total_changes
+        if "processed_emails" in tables:
+            conn.execute("""
+                INSERT OR IGNORE INTO duplicate_keys (kind, key, ref, created_at)
+                SELECT ?, message_id, message_id, processed_date FROM processed_emails
+                WHERE message_id IS NOT NULL
+            """, (KIND_MESSAGE_ID,))
+            # Content-Hash: Referenz ist das erste Vorkommen, das jüngste zählt fürs Zeitfenster
+            conn.execute("""
+                INSERT OR IGNORE INTO duplicate_keys (kind, key, ref, created_at)
+                SELECT ?, p.content_hash,
+                       (SELECT first.message_id FROM processed_emails first
+                        WHERE first.content_hash = p.content_hash ORDER BY first.id LIMIT 1),
+                       MAX(p.processed_date)
+                FROM processed_emails p
+                WHERE p.content_hash IS NOT NULL AND p.content_hash != ''
+                GROUP BY p.content_hash
+            """, (KIND_CONTENT_HASH,))
+        if "email_attachments" in tables:
+            conn.execute("""
+                INSERT OR IGNORE INTO duplicate_keys (kind, key, ref, created_at)
+                SELECT ?, file_hash, email_message_id, MIN(processed_date) FROM email_attachments
+                WHERE file_hash IS NOT NULL AND file_hash != ''
+                GROUP BY file_hash
+            """, (KIND_FILE_HASH,))
+        conn.commit()
+        return conn.total_changes - before
+
+    def sync_documents(self) -> int:
+        """processed_documents ab dem Watermark übernehmen (z.B. nach fehlgeschlagenem record())"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return self._sync_documents(conn)
+        finally:
+            conn.close()
+
+    def _sync_documents(self, conn: sqlite3.Connection) -> int:
+        """Schlüssel aller processed_documents mit id > Watermark (idempotent, erstes Vorkommen bleibt ref)"""
+        if not self.document_db_path or not os.path.exists(self.document_db_path):
+            return 0
+        with self._sync_lock:
+            row = conn.execute("SELECT last_id FROM duplicate_sync_state WHERE source = 'processed_documents'").fetchone()
+            watermark = row[0] if row else 0
+
+            conn.execute("ATTACH DATABASE ? AS docs", (self.document_db_path,))
+            try:
+                has_documents = conn.execute(
+                    "SELECT 1 FROM docs.sqlite_master WHERE type = 'table' AND name = 'processed_documents'"
+                ).fetchone()
+                if not has_documents:
+                    return 0
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM docs.processed_documents").fetchone()[0]
+                if max_id < watermark:
+                    # Dokument-DB älter als der Index (Restore) → ids könnten neu vergeben werden
+                    logger.warning(f"⚠️ processed_documents max id {max_id} < watermark {watermark} - full resync")
+                    watermark = 0
+                documents = conn.execute("""
+                    SELECT id, message_id, document_hash, onedrive_path, sender, subject,
+                           attachment_filename, processing_timestamp
+                    FROM docs.processed_documents
+                    WHERE id > ?
+                    ORDER BY id
+                """, (watermark,)).fetchall()
+            finally:
+                conn.commit()
+                conn.execute("DETACH DATABASE docs")
+
+            rows = []
+            for doc_id, message_id, document_hash, onedrive_path, sender, subject, filename, timestamp in documents:
+                created_at = (_as_utc(timestamp) or datetime.utcnow()).isoformat()
+                ref = str(doc_id)
+                rows += [
+                    (KIND_DOCUMENT_MESSAGE, message_id, ref, created_at),
+                    (KIND_DOCUMENT_HASH, document_hash, ref, created_at),
+                    (KIND_ONEDRIVE_PATH, onedrive_path, ref, created_at),
+                ]
+                if sender and subject and filename:
+                    rows.append((KIND_HEURISTIC, heuristic_key(sender, subject, filename), ref, created_at))
+            rows = [row for row in rows if row[1]]
+
+            cursor = conn.cursor()
+            self._upsert(cursor, rows)
+            cursor.execute("""
+                INSERT INTO duplicate_sync_state (source, last_id, synced_at) VALUES ('processed_documents', ?, ?)
+                ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id, synced_at = excluded.synced_at
+            """, (documents[-1][0] if documents else watermark, datetime.now().isoformat()))
+            conn.commit()
+
+        with self._lock:
+            for kind, key, _, _ in rows:
+                self._bloom.add(_bloom_item(kind, key))
+        return len(documents)
+
+    # ------------------------------------------------------------------ write
+    def record(self, entries: Iterable[Tuple[str, str, Optional[str]]], cursor: Optional[sqlite3.Cursor] = None):
+        """
+        Merkt Schlüssel vor: entries = [(kind, key, ref)].
+
+        Mit cursor läuft das INSERT in der Transaktion des Aufrufers
+        (z.B. save_email); der Bloom-Filter wird sofort ergänzt - ein späterer
+        Rollback erzeugt höchstens ein False Positive, das SQLite aussortiert.
+        """
+        rows = [(kind, key, ref) for kind, key, ref in entries if key]
+        if not rows:
+            return
+        now = datetime.utcnow().isoformat()
+        own_conn = None
+        if cursor is None:
+            own_conn = sqlite3.connect(self.db_path)
+            cursor = own_conn.cursor()
+        self._upsert(cursor, [(kind, key, ref, now) for kind, key, ref in rows])
+        if own_conn is not None:
+            own_conn.commit()
+            own_conn.close()
+        with self._lock:
+            for kind, key, _ in rows:
+                self._bloom.add(_bloom_item(kind, key))
+
+    @staticmethod
+    def _upsert(cursor: sqlite3.Cursor, rows: List[Tuple[str, str, Optional[str], str]]):
+        """rows = [(kind, key, ref, created_at)] in Auftretensreihenfolge"""
+        windowed = [row for row in rows if row[0] in WINDOWED_KINDS]
+        permanent = [row for row in rows if row[0] not in WINDOWED_KINDS]
+        if permanent:
+            # erstes Vorkommen bleibt die Referenz
+            cursor.executemany(
+                "INSERT OR IGNORE INTO duplicate_keys (kind, key, ref, created_at) VALUES (?, ?, ?, ?)", permanent
+            )
+        if windowed:
+            # Zeitfenster startet mit dem jüngsten Vorkommen neu, Referenz bleibt das erste Vorkommen
+            cursor.executemany("""
+                INSERT INTO duplicate_keys (kind, key, ref, created_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(kind, key) DO UPDATE SET created_at = MAX(created_at, excluded.created_at)
+            """, windowed)
+
+    # ------------------------------------------------------------------ check
+    def check(self, keys: Sequence[Tuple[str, Optional[str]]], window_hours: float = 24) -> List[Dict[str, Any]]:
+        """
+        Prüft mehrere Schlüssel auf einmal.
+
+        Args:
+            keys: [(kind, key)] in Prioritätsreihenfolge (leere Keys werden ignoriert)
+            window_hours: Zeitfenster für Content-Hash / Heuristik
+
+        Returns:
+            Treffer als [{"kind", "key", "ref", "created_at"}] in der Reihenfolge von keys
+        """
+        self.stats["checks"] += 1
+        candidates = [(kind, key) for kind, key in keys if key]
+        with self._lock:
+            candidates = [(kind, key) for kind, key in candidates if _bloom_item(kind, key) in self._bloom]
+        if not candidates:
+            self.stats["bloom_negative"] += 1
+            return []
+
+        conn = sqlite3.connect(self.db_path)
+        # OR statt (kind, key) IN (VALUES ...): nur so nutzt SQLite den Primary Key je Schlüssel
+        conditions = " OR ".join("(kind = ? AND key = ?)" for _ in candidates)
+        rows = conn.execute(
+            f"SELECT kind, key, ref, created_at FROM duplicate_keys WHERE {conditions}",
+            [value for pair in candidates for value in pair],
+        ).fetchall()
+        conn.close()
+
+        found = {(kind, key): (ref, created_at) for kind, key, ref, created_at in rows}
+        cutoff = datetime.utcnow() - timedelta(hours=window_hours)
+        matches = []
+        for kind, key in candidates:
+            if (kind, key) not in found:
+                self.stats["false_positive"] += 1
+                continue
+            ref, created_at = found[(kind, key)]
+            if kind in WINDOWED_KINDS and (_as_utc(created_at) or datetime.min) < cutoff:
+                self.stats["expired"] += 1
+                continue
+            matches.append({"kind": kind, "key": key, "ref": ref, "created_at": created_at})
+        if matches:
+            self.stats["confirmed"] += 1
+        return matches
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            bloom = self._bloom
+            return {
+                **self.stats,
+                "bloom_items": bloom.count,
+                "bloom_capacity": bloom.capacity,
+                "bloom_estimated_error_rate": round(bloom.estimated_error_rate, 6),
+                "last_rebuild": self.last_rebuild,
+            }
@@ -0,0 +1,330 @@
+"""
+Email Search Index - FTS5 Volltextindex über email_data.db
+
+Rechnungssuche, Email-Preview und Dashboard-Suche liefen bisher über
+LIKE '%rechnung%' Full-Table-Scans bzw. über die Graph API. Der Index hält
+zwei FTS5-Tabellen (external content, keine Datenkopie der Spalten):
+- email_fts            → email_data (subject, sender, body_text, ocr_text)
+- email_attachment_fts → email_attachments (filename, ocr_text)
+
+Trigger auf INSERT/UPDATE/DELETE halten den Index aktuell, Abfragen werden
+per BM25 gerankt. Tokenizer ist trigram (Teilwort-Treffer für deutsche
+Komposita wie "Abschlagsrechnung"); ältere SQLite-Versionen ohne trigram
+fallen auf unicode61 zurück.
+"""
+import logging
+import os
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("DATABASE_PATH", "./email_data.db")
+EMAIL_BODY_MAX_CHARS = 50_000
+INVOICE_KEYWORDS = ("rechnung", "invoice", "faktura")
+
+# BM25 Gewichte pro Spalte (Betreff zählt mehr als Body)
+EMAIL_BM25_WEIGHTS = (10.0, 3.0, 1.0, 1.0)       # subject, sender, body_text, ocr_text
+ATTACHMENT_BM25_WEIGHTS = (5.0, 1.0)             # filename, ocr_text
+
+_QUERY_OPERATORS = {"OR", "AND", "NOT"}
+_QUERY_TOKEN = re.compile(r'"[^"]*"|\S+')
+
+_tokenizer: Optional[str] = None
+
+
+def fts_tokenizer() -> str:
+    """trigram wenn von der SQLite-Version unterstützt (>= 3.34), sonst unicode61"""
+    global _tokenizer
+    if _tokenizer is None:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(value, tokenize='trigram')")
+            _tokenizer = "trigram"
+        except sqlite3.OperationalError:
+            _tokenizer = "unicode61 remove_diacritics 2"
+        finally:
+            conn.close()
+    return _tokenizer
+
+
+def build_match_query(query: str, prefix: bool = False) -> Optional[str]:
+    """
+    Übersetzt eine Outlook/Graph-artige Suche ("Rechnung OR Invoice") in einen
+    FTS5 MATCH-Ausdruck. Jeder Begriff wird gequotet (keine FTS-Syntaxfehler
+    durch Sonderzeichen), OR/AND/NOT bleiben Operatoren.
+
+    Args:
+        prefix: Begriffe als Prefix-Suche ("mus" → "mus"*), für Indizes mit
+            Token-Tokenizer (unicode61) statt trigram
+
+    Returns:
+        MATCH-Ausdruck oder None wenn kein suchbarer Begriff übrig bleibt
+    """
+    min_length = 3 if fts_tokenizer() == "trigram" and not prefix else 1
+    parts: List[str] = []
+    for token in _QUERY_TOKEN.findall(query or ""):
+        if token.upper() in _QUERY_OPERATORS:
+            if parts and parts[-1] not in _QUERY_OPERATORS:
+                parts.append(token.upper())
+            continue
+        term = token.strip('"').strip()
+        if len(term) < min_length:
+            continue
+        if parts and parts[-1] not in _QUERY_OPERATORS:
+            parts.append("AND")
+        parts.append('"' + term.replace('"', '""') + '"' + ("*" if prefix else ""))
+
+    while parts and parts[-1] in _QUERY_OPERATORS:
+        parts.pop()
+    return " ".join(parts) or None
+
+
+class EmailSearchIndex:
+    """FTS5 Index über email_data + email_attachments"""
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._schema_ready = False
+        self._optional_columns = ""
+
+    @staticmethod
+    def init_schema(cursor: sqlite3.Cursor):
+        """
+        Legt Spalten, FTS5-Tabellen und Trigger an (aus initialize_contact_cache).
+        Beim ersten Anlegen wird der Index aus den vorhandenen Zeilen aufgebaut.
+        """
+        cursor.execute("PRAGMA table_info(email_data)")
+        columns = {col[1] for col in cursor.fetchall()}
+        for column in ("message_id", "body_text", "ocr_text"):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE email_data ADD COLUMN {column} TEXT")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_data_message_id ON email_data(message_id)")
+
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('email_fts', 'email_attachment_fts')")
+        existing = {row[0] for row in cursor.fetchall()}
+        tokenizer = fts_tokenizer()
+
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS email_fts USING fts5(
+                subject, sender, body_text, ocr_text,
+                content='email_data', content_rowid='id', tokenize='{tokenizer}'
+            )
+        """)
+        # einzelne execute()-Aufrufe: executescript() würde die Transaktion des
+        # Aufrufers (Migration, BEGIN IMMEDIATE) vorzeitig committen
+        for trigger in (
+            """
+            CREATE TRIGGER IF NOT EXISTS email_fts_ai AFTER INSERT ON email_data BEGIN
+                INSERT INTO email_fts(rowid, subject, sender, body_text, ocr_text)
+                VALUES (new.id, new.subject, new.sender, new.body_text, new.ocr_text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS email_fts_ad AFTER DELETE ON email_data BEGIN
+                INSERT INTO email_fts(email_fts, rowid, subject, sender, body_text, ocr_text)
+                VALUES ('delete', old.id, old.subject, old.sender, old.body_text, old.ocr_text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS email_fts_au AFTER UPDATE OF subject, sender, body_text, ocr_text ON email_data BEGIN
+                INSERT INTO email_fts(email_fts, rowid, subject, sender, body_text, ocr_text)
+                VALUES ('delete', old.id, old.subject, old.sender, old.body_text, old.ocr_text);
+                INSERT INTO email_fts(rowid, subject, sender, body_text, ocr_text)
+                VALUES (new.id, new.subject, new.sender, new.body_text, new.ocr_text);
+            END
+            """,
+        ):
+            cursor.execute(trigger)
+
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS email_attachment_fts USING fts5(
+                filename, ocr_text,
+                content='email_attachments', content_rowid='id', tokenize='{tokenizer}'
+            )
+        """)
+        for trigger in (
+            """
+            CREATE TRIGGER IF NOT EXISTS email_attachment_fts_ai AFTER INSERT ON email_attachments BEGIN
+                INSERT INTO email_attachment_fts(rowid, filename, ocr_text)
+                VALUES (new.id, new.filename, new.ocr_text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS email_attachment_fts_ad AFTER DELETE ON email_attachments BEGIN
+                INSERT INTO email_attachment_fts(email_attachment_fts, rowid, filename, ocr_text)
+                VALUES ('delete', old.id, old.filename, old.ocr_text);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS email_attachment_fts_au AFTER UPDATE OF filename, ocr_text ON email_attachments BEGIN
+                INSERT INTO email_attachment_fts(email_attachment_fts, rowid, filename, ocr_text)
+                VALUES ('delete', old.id, old.filename, old.ocr_text);
+                INSERT INTO email_attachment_fts(rowid, filename, ocr_text)
+                VALUES (new.id, new.filename, new.ocr_text);
+            END
+            """,
+        ):
+            cursor.execute(trigger)
+
+        # Backfill bestehender Zeilen (nur beim ersten Anlegen)
+        if "email_fts" not in existing:
+            cursor.execute("INSERT INTO email_fts(email_fts) VALUES ('rebuild')")
+            logger.info("🔎 email_fts index built from existing emails")
+        if "email_attachment_fts" not in existing:
+            cursor.execute("INSERT INTO email_attachment_fts(email_attachment_fts) VALUES ('rebuild')")
+            logger.info("🔎 email_attachment_fts index built from existing attachments")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        if not self._schema_ready:
+            cursor = conn.cursor()
+            self.init_schema(cursor)
+            conn.commit()
+            # message_type / attachments_count kommen aus der Orchestrator-Migration
+            cursor.execute("PRAGMA table_info(email_data)")
+            columns = {col[1] for col in cursor.fetchall()}
+            self._optional_columns = ", ".join(
+                f"e.{column}" if column in columns else f"NULL AS {column}"
+                for column in ("message_type", "attachments_count")
+            )
+            self._schema_ready = True
+        return conn
+
+    def search(
+        self,
+        query: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        Volltextsuche über Emails und deren Anhänge, BM25-gerankt.
+
+        Args:
+            query: Suchbegriffe, Outlook-Syntax (z.B. "Rechnung OR Invoice")
+            start_date / end_date: optionaler Datumsbereich (YYYY-MM-DD, inklusiv)
+            limit: max. Anzahl Emails
+
+        Returns:
+            Liste von Emails (bestes Ranking zuerst), jeweils mit snippet und
+            den passenden Anhängen
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        return self._search_match(match, start_date, end_date, limit)
+
+    def find_invoice_candidates(self, since: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Emails, die nach Rechnung aussehen: Rechnungs-Keywords in Betreff/Body/OCR
+        oder ein PDF-Anhang. Ersetzt die LIKE-Scans der Rechnungssuche.
+        """
+        keywords = " OR ".join(f'"{keyword}"' for keyword in INVOICE_KEYWORDS)
+        return self._search_match(
+            keywords, since[:10] if since else None, None, limit,
+            attachment_match=f'{keywords} OR filename:".pdf"',
+        )
+
+    def _search_match(
+        self,
+        match: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        limit: int,
+        attachment_match: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        date_sql = ""
+        date_params: List[Any] = []
+        if start_date:
+            date_sql += " AND substr(e.received_date, 1, 10) >= ?"
+            date_params.append(start_date[:10])
+        if end_date:
+            date_sql += " AND substr(e.received_date, 1, 10) <= ?"
+            date_params.append(end_date[:10])
+
+        conn = self._connect()
+        try:
+            email_rows = conn.execute(f"""
+                SELECT e.id, e.message_id, e.subject, e.sender, e.received_date,
+                       {self._optional_columns}, e.body_text,
+                       snippet(email_fts, -1, '[', ']', '…', 12) AS snippet,
+                       bm25(email_fts, {', '.join(map(str, EMAIL_BM25_WEIGHTS))}) AS rank
+                FROM email_fts
+                JOIN email_data e ON e.id = email_fts.rowid
+                WHERE email_fts MATCH ?{date_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, [match, *date_params, limit]).fetchall()
+
+            attachment_rows = conn.execute(f"""
+                SELECT e.id, e.message_id, e.subject, e.sender, e.received_date,
+                       {self._optional_columns}, e.body_text,
+                       a.filename, a.content_type, a.size_bytes,
+                       snippet(email_attachment_fts, -1, '[', ']', '…', 12) AS snippet,
+                       bm25(email_attachment_fts, {', '.join(map(str, ATTACHMENT_BM25_WEIGHTS))}) AS rank
+                FROM email_attachment_fts
+                JOIN email_attachments a ON a.id = email_attachment_fts.rowid
+                JOIN email_data e ON e.message_id = a.email_message_id
+                WHERE email_attachment_fts MATCH ?{date_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, [attachment_match or match, *date_params, limit]).fetchall()
+        finally:
+            conn.close()
+
+        results: Dict[int, Dict[str, Any]] = {}
+        for row in email_rows:
+            results[row["id"]] = self._result_entry(row)
+        for row in attachment_rows:
+            entry = results.get(row["id"])
+            if entry is None:
+                entry = results[row["id"]] = self._result_entry(row)
+            entry["rank"] = min(entry["rank"], row["rank"])
+            entry["attachments"].append({
+                "filename": row["filename"],
+                "content_type": row["content_type"],
+                "size_bytes": row["size_bytes"],
+            })
+
+        return sorted(results.values(), key=lambda entry: entry["rank"])[:limit]
+
+    @staticmethod
+    def _result_entry(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "message_id": row["message_id"],
+            "subject": row["subject"],
+            "sender": row["sender"],
+            "received_date": row["received_date"],
+            "message_type": row["message_type"],
+            "attachments_count": row["attachments_count"] or 0,
+            "preview": (row["body_text"] or "")[:255],
+            "body_text": row["body_text"] or "",
+            "snippet": row["snippet"],
+            "rank": row["rank"],
+            "attachments": [],
+        }
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Anzahl indizierter Emails/Anhänge"""
+        conn = self._connect()
+        try:
+            emails = conn.execute("SELECT COUNT(*) FROM email_data").fetchone()[0]
+            attachments = conn.execute("SELECT COUNT(*) FROM email_attachments").fetchone()[0]
+        finally:
+            conn.close()
+        return {"emails": emails, "attachments": attachments, "tokenizer": fts_tokenizer()}
+
+
+# Globale Instanz (Singleton-Pattern)
+_email_search_index_instance = None
+
+def get_email_search_index(db_path: str = DB_PATH) -> EmailSearchIndex:
+    """Holt globale EmailSearchIndex Instanz"""
+    global _email_search_index_instance
+    if _email_search_index_instance is None or _email_search_index_instance.db_path != db_path:
+        _email_search_index_instance = EmailSearchIndex(db_path)
+    return _email_search_index_instance
@@ -5,23 +5,51 @@ Separate DB für Email-Processing neben weclapp_sync.db
 import sqlite3
 import hashlib
 import json
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 import os
 
+from modules.database.communication_store import CommunicationContentStore
+from modules.database.schema_migrations import Migration, run_migrations
+from modules.database.duplicate_index import (
+    DuplicateIndex, KIND_CONTENT_HASH, KIND_FILE_HASH, KIND_MESSAGE_ID,
+)
+
+# LRU für get_button_info (Button-Klicks) & Aufräumen abgelaufener Buttons
+BUTTON_CACHE_SIZE = int(os.getenv("ACTION_BUTTON_CACHE_SIZE", "512"))
+BUTTON_ARCHIVE_AFTER_DAYS = int(os.getenv("ACTION_BUTTON_ARCHIVE_AFTER_DAYS", "30"))
+
+BUTTON_COLUMNS = (
+    "button_uuid, communication_uuid, email_message_id, action_type, action_label, "
+    "action_config, button_color, button_icon, created_at, expires_at, is_active"
+)
+
 
 class EmailTrackingDB:
     """Verwaltet Email Processing History & Duplikatprüfung"""
     
     def __init__(self, db_path: str = "/tmp/email_tracking.db"):
         self.db_path = db_path
+        self.content_store = CommunicationContentStore(db_path)
+        self._button_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._button_cache_lock = threading.Lock()
         self._init_database()
+        self.duplicate_index = DuplicateIndex(db_path)
     
     def _init_database(self):
-        """Erstellt Database Schema wenn nicht vorhanden"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Bringt das Schema über die versionierten Migrationen auf den aktuellen Stand"""
+        status = run_migrations(self.db_path, [
+            Migration(1, "tracking baseline schema", self._baseline_schema),
+            Migration(2, "covering indexes for hot lookups", self._hot_indexes),
+        ], component="email_tracking")
         
+        print(f"✅ Email Tracking DB initialized: {self.db_path} (schema v{status['version']})")
+    
+    @staticmethod
+    def _baseline_schema(cursor: sqlite3.Cursor):
+        """Ursprüngliches Schema (bis v1 bei jedem Start per CREATE IF NOT EXISTS)"""
         # Haupttabelle für Email-Verarbeitung
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS processed_emails (
@@ -104,6 +132,25 @@ class EmailTrackingDB:
             )
         """)
         
+        # 2b. Archiv abgelaufener Buttons (vom Sweeper verschoben, hält action_buttons klein)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS action_buttons_archive (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                button_uuid TEXT NOT NULL UNIQUE,
+                communication_uuid TEXT NOT NULL,
+                email_message_id TEXT NOT NULL,
+                action_type TEXT NOT NULL,
+                action_label TEXT NOT NULL,
+                action_config TEXT,
+                button_color TEXT,
+                button_icon TEXT,
+                created_at TEXT NOT NULL,
+                expires_at TEXT,
+                is_active BOOLEAN DEFAULT 0,
+                archived_at TEXT NOT NULL
+            )
+        """)
+        
         # 3. Action History - Execution Log für alle Button-Klicks
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS action_history (
@@ -199,6 +246,9 @@ class EmailTrackingDB:
             )
         """)
         
+        # 7. Notification-Inhalte (dedupliziert + komprimiert, außerhalb von user_communications)
+        CommunicationContentStore.init_schema(cursor)
+        
         # Indizes für schnelle Suche
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_message_id ON processed_emails(message_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_subject_hash ON processed_emails(subject_hash)")
@@ -215,12 +265,28 @@ class EmailTrackingDB:
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_uuid ON task_queue(task_uuid)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_link_uuid ON trip_opportunity_links(link_uuid)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_message_id_actions ON action_buttons(email_message_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_button_expiry ON action_buttons(is_active, expires_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_status ON task_queue(status, execute_after)")
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✅ Email Tracking DB initialized: {self.db_path}")
+    
+    @staticmethod
+    def _hot_indexes(cursor: sqlite3.Cursor):
+        """Indizes für die heißen Abfragen (siehe test_query_plans.py)"""
+        # get_pending_tasks: status = 'pending' AND execute_after <= ? ORDER BY priority DESC
+        cursor.execute("DROP INDEX IF EXISTS idx_task_status")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_task_pending
+            ON task_queue(status, execute_after, priority, attempts, max_attempts)
+        """)
+        # requeue_stale_tasks: status = 'running' AND last_attempt_at < ?
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_running ON task_queue(status, last_attempt_at)")
+        # get_execution_history: Join action_buttons → action_history, neueste zuerst
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_action_history_button ON action_history(button_uuid, executed_at)")
+        # check_duplicate_attachments: file_hash IN (...) ORDER BY processed_date
+        cursor.execute("DROP INDEX IF EXISTS idx_file_hash")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_attachment_file_hash
+            ON email_attachments(file_hash, processed_date)
+        """)
     
     @staticmethod
     def calculate_content_hash(subject: str, body: str, from_address: str) -> str:
@@ -236,29 +302,9 @@ class EmailTrackingDB:
     
     def check_duplicate_by_message_id(self, message_id: str) -> Optional[Dict]:
         """Prüft ob message_id bereits verarbeitet wurde"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT message_id, processed_date, workflow_path, document_type, 
-                   ordnerstruktur, onedrive_link
-            FROM processed_emails 
-            WHERE message_id = ?
-        """, (message_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return {
-                "message_id": row[0],
-                "processed_date": row[1],
-                "workflow_path": row[2],
-                "document_type": row[3],
-                "ordnerstruktur": row[4],
-                "onedrive_link": row[5]
-            }
-        return None
+        if not self.duplicate_index.check([(KIND_MESSAGE_ID, message_id)]):
+            return None
+        return self._load_email_details(message_id)
     
     def check_duplicate_by_content(
         self, 
@@ -277,17 +323,56 @@ class EmailTrackingDB:
             hours_window: Zeitfenster in Stunden (default 24h)
         """
         content_hash = self.calculate_content_hash(subject, body, from_address)
+        matches = self.duplicate_index.check([(KIND_CONTENT_HASH, content_hash)], window_hours=hours_window)
+        if not matches:
+            return None
+        return self._load_email_details(matches[0]["ref"])
+    
+    def check_email_duplicate(
+        self,
+        message_id: str,
+        subject: str,
+        body: str,
+        from_address: str,
+        hours_window: int = 24
+    ) -> Optional[Dict]:
+        """
+        Prüft message_id UND Content-Hash in einem Durchgang
+        
+        Bloom-Filter negativ → kein SQLite-Zugriff; sonst eine Abfrage auf
+        duplicate_keys und nur bei bestätigtem Treffer die Details.
+        
+        Returns:
+            Details der Original-Email inkl. "match" ("message_id" | "content") oder None
+        """
+        content_hash = self.calculate_content_hash(subject, body, from_address)
+        matches = self.duplicate_index.check(
+            [(KIND_MESSAGE_ID, message_id), (KIND_CONTENT_HASH, content_hash)],
+            window_hours=hours_window,
+        )
+        if not matches:
+            return None
         
+        match = matches[0]
+        details = self._load_email_details(match["ref"])
+        if details is None:
+            return None
+        details["match"] = "message_id" if match["kind"] == KIND_MESSAGE_ID else "content"
+        return details
+    
+    def _load_email_details(self, message_id: str) -> Optional[Dict]:
+        """Details einer verarbeiteten Email (nur nach bestätigtem Index-Treffer)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
-            SELECT message_id, subject, from_address, processed_date, 
-                   ordnerstruktur, onedrive_link
+            SELECT message_id, processed_date, workflow_path, document_type, 
+                   ordnerstruktur, onedrive_link, subject, from_address
             FROM processed_emails 
-            WHERE content_hash = ? 
-            AND datetime(processed_date) > datetime('now', '-' || ? || ' hours')
-        """, (content_hash, hours_window))
+            WHERE message_id = ?
+            ORDER BY processed_date DESC
+            LIMIT 1
+        """, (message_id,))
         
         row = cursor.fetchone()
         conn.close()
@@ -295,41 +380,58 @@ class EmailTrackingDB:
         if row:
             return {
                 "message_id": row[0],
-                "subject": row[1],
-                "from_address": row[2],
-                "processed_date": row[3],
+                "processed_date": row[1],
+                "workflow_path": row[2],
+                "document_type": row[3],
                 "ordnerstruktur": row[4],
-                "onedrive_link": row[5]
+                "onedrive_link": row[5],
+                "subject": row[6],
+                "from_address": row[7]
             }
         return None
     
     def check_duplicate_attachment(self, file_hash: str) -> Optional[Dict]:
         """Prüft ob Anhang-Hash bereits existiert"""
+        return self.check_duplicate_attachments([file_hash]).get(file_hash)
+    
+    def check_duplicate_attachments(self, file_hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Prüft alle Anhang-Hashes einer Email auf einmal
+        
+        Returns:
+            {file_hash: {"filename", "processed_date", "onedrive_link", "email_message_id", "email_subject"}}
+            nur für bereits bekannte Hashes
+        """
+        matches = self.duplicate_index.check([(KIND_FILE_HASH, file_hash) for file_hash in dict.fromkeys(file_hashes)])
+        if not matches:
+            return {}
+        
+        hashes = [match["key"] for match in matches]
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT a.filename, a.processed_date, a.onedrive_link, 
+        cursor.execute(f"""
+            SELECT a.file_hash, a.filename, a.processed_date, a.onedrive_link, 
                    e.message_id, e.subject
             FROM email_attachments a
             JOIN processed_emails e ON a.email_message_id = e.message_id
-            WHERE a.file_hash = ?
-            ORDER BY a.processed_date DESC
-            LIMIT 1
-        """, (file_hash,))
+            WHERE a.file_hash IN ({",".join("?" * len(hashes))})
+            ORDER BY a.processed_date ASC
+        """, hashes)
         
-        row = cursor.fetchone()
+        duplicates = {}
+        # Aufsteigend sortiert → der jüngste Eintrag je Hash gewinnt
+        for row in cursor.fetchall():
+            duplicates[row[0]] = {
+                "filename": row[1],
+                "processed_date": row[2],
+                "onedrive_link": row[3],
+                "email_message_id": row[4],
+                "email_subject": row[5]
+            }
         conn.close()
         
-        if row:
-            return {
-                "filename": row[0],
-                "processed_date": row[1],
-                "onedrive_link": row[2],
-                "email_message_id": row[3],
-                "email_subject": row[4]
-            }
-        return None
+        return duplicates
     
     def save_email(
         self,
@@ -391,11 +493,13 @@ class EmailTrackingDB:
         ))
         
         email_id = cursor.lastrowid
+        index_keys = [(KIND_MESSAGE_ID, message_id, message_id), (KIND_CONTENT_HASH, content_hash, message_id)]
         
         # Anhänge speichern
         if attachment_results:
             for att in attachment_results:
                 file_hash = att.get("file_hash", "")
+                index_keys.append((KIND_FILE_HASH, file_hash, message_id))
                 
                 cursor.execute("""
                     INSERT INTO email_attachments (
@@ -413,6 +517,9 @@ class EmailTrackingDB:
                     datetime.utcnow().isoformat()
                 ))
         
+        # Duplikat-Schlüssel in derselben Transaktion
+        self.duplicate_index.record(index_keys, cursor=cursor)
+        
         conn.commit()
         conn.close()
         
@@ -487,8 +594,8 @@ class EmailTrackingDB:
     
     def register_communication(self, communication_uuid: str, email_message_id: str, 
                                notification_type: str, sent_via: str, recipient_email: str,
-                               subject: str, html_content: str = None) -> bool:
-        """Registriert eine gesendete Notification"""
+                               subject: str, html_content: str = None, text_content: str = None) -> bool:
+        """Registriert eine gesendete Notification (Inhalte landen komprimiert im Content Store)"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
@@ -496,10 +603,13 @@ class EmailTrackingDB:
             cursor.execute("""
                 INSERT INTO user_communications 
                 (communication_uuid, email_message_id, notification_type, sent_via, sent_at,
-                 recipient_email, subject, html_content, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'sent')
+                 recipient_email, subject, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'sent')
             """, (communication_uuid, email_message_id, notification_type, sent_via,
-                  datetime.now().isoformat(), recipient_email, subject, html_content))
+                  datetime.now().isoformat(), recipient_email, subject))
+            
+            if html_content or text_content:
+                self.content_store.store(cursor, communication_uuid, html_content, text_content)
             
             conn.commit()
             conn.close()
@@ -508,6 +618,43 @@ class EmailTrackingDB:
             print(f"❌ Error registering communication: {e}")
             return False
     
+    def store_communication_content(self, communication_uuid: str, html_content: str = None,
+                                    text_content: str = None) -> bool:
+        """Hängt gerenderte Inhalte an eine bereits registrierte Communication an"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            self.content_store.store(cursor, communication_uuid, html_content, text_content)
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"❌ Error storing communication content: {e}")
+            return False
+    
+    def get_communication_content(self, communication_uuid: str) -> Optional[Dict]:
+        """Holt HTML/Text einer Communication (Content Store, Fallback: Legacy-Spalten)"""
+        try:
+            content = self.content_store.load(communication_uuid)
+            if content:
+                return content
+            
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT html_content, text_content FROM user_communications
+                WHERE communication_uuid = ?
+            """, (communication_uuid,))
+            row = cursor.fetchone()
+            conn.close()
+            
+            if row and (row[0] or row[1]):
+                return {"html_content": row[0], "text_content": row[1]}
+            return None
+        except Exception as e:
+            print(f"❌ Error loading communication content: {e}")
+            return None
+    
     def register_button(self, button_uuid: str, communication_uuid: str, email_message_id: str,
                        action_type: str, action_label: str, action_config: Dict = None,
                        button_color: str = None, button_icon: str = None, expires_at: str = None) -> bool:
@@ -532,35 +679,157 @@ class EmailTrackingDB:
             print(f"❌ Error registering button: {e}")
             return False
     
-    def get_button_info(self, button_uuid: str) -> Optional[Dict]:
-        """Holt Button-Informationen für Action Execution"""
+    def register_communication_with_buttons(self, communication_uuid: str, email_message_id: str,
+                                            notification_type: str, sent_via: str, recipient_email: str,
+                                            subject: str, buttons: List[Dict] = None,
+                                            html_content: str = None, text_content: str = None) -> bool:
+        """
+        Registriert eine Notification samt aller Action Buttons und Inhalt in einer Transaktion.
+        
+        buttons: Dicts mit den Parametern von register_button (button_uuid, action_type, action_label, ...)
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (button["button_uuid"], communication_uuid, button.get("email_message_id") or email_message_id,
+             button["action_type"], button["action_label"],
+             json.dumps(button["action_config"]) if button.get("action_config") else None,
+             button.get("button_color"), button.get("button_icon"), now, button.get("expires_at"))
+            for button in (buttons or [])
+        ]
         try:
             conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT ab.*, pe.from_address, pe.subject as email_subject, pe.received_date,
-                       uc.recipient_email, uc.notification_type
-                FROM action_buttons ab
-                JOIN processed_emails pe ON ab.email_message_id = pe.message_id
-                JOIN user_communications uc ON ab.communication_uuid = uc.communication_uuid
-                WHERE ab.button_uuid = ?
-            """, (button_uuid,))
+                INSERT OR IGNORE INTO user_communications 
+                (communication_uuid, email_message_id, notification_type, sent_via, sent_at,
+                 recipient_email, subject, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'sent')
+            """, (communication_uuid, email_message_id, notification_type, sent_via,
+                  now, recipient_email, subject))
             
-            row = cursor.fetchone()
+            if rows:
+                cursor.executemany(f"""
+                    INSERT INTO action_buttons ({BUTTON_COLUMNS})
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                """, rows)
+            
+            if html_content or text_content:
+                self.content_store.store(cursor, communication_uuid, html_content, text_content)
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"❌ Error registering communication with {len(rows)} buttons: {e}")
+            return False
+    
+    def get_button_info(self, button_uuid: str) -> Optional[Dict]:
+        """Holt Button-Informationen für Action Execution (LRU, Fallback: Archiv)"""
+        cached = self.get_cached_button_info(button_uuid)
+        if cached:
+            return cached
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            row = None
+            for table in ("action_buttons", "action_buttons_archive"):
+                cursor.execute(f"""
+                    SELECT ab.*, pe.from_address, pe.subject as email_subject, pe.received_date,
+                           uc.recipient_email, uc.notification_type
+                    FROM {table} ab
+                    JOIN processed_emails pe ON ab.email_message_id = pe.message_id
+                    JOIN user_communications uc ON ab.communication_uuid = uc.communication_uuid
+                    WHERE ab.button_uuid = ?
+                """, (button_uuid,))
+                row = cursor.fetchone()
+                if row:
+                    break
             conn.close()
             
             if row:
                 result = dict(row)
                 if result.get('action_config'):
                     result['action_config'] = json.loads(result['action_config'])
-                return result
+                self._cache_button_info(button_uuid, result)
+                return dict(result)
             return None
         except Exception as e:
             print(f"❌ Error getting button info: {e}")
             return None
     
+    def get_cached_button_info(self, button_uuid: str) -> Optional[Dict]:
+        """Button-Info nur aus dem LRU (kein DB-Zugriff) - None bei Cache-Miss"""
+        with self._button_cache_lock:
+            cached = self._button_cache.get(button_uuid)
+            if cached is None:
+                return None
+            self._button_cache.move_to_end(button_uuid)
+        return dict(cached)
+    
+    def _cache_button_info(self, button_uuid: str, info: Dict):
+        with self._button_cache_lock:
+            self._button_cache[button_uuid] = info
+            self._button_cache.move_to_end(button_uuid)
+            while len(self._button_cache) > BUTTON_CACHE_SIZE:
+                self._button_cache.popitem(last=False)
+    
+    def _evict_buttons(self, button_uuids: List[str] = None):
+        """Entfernt Buttons aus dem LRU (None = alle)"""
+        with self._button_cache_lock:
+            if button_uuids is None:
+                self._button_cache.clear()
+            else:
+                for button_uuid in button_uuids:
+                    self._button_cache.pop(button_uuid, None)
+    
+    def sweep_expired_buttons(self, archive_after_days: int = BUTTON_ARCHIVE_AFTER_DAYS) -> Dict[str, int]:
+        """
+        Deaktiviert abgelaufene Buttons und verschiebt Buttons, die seit mehr als
+        archive_after_days abgelaufen sind, nach action_buttons_archive.
+        """
+        now = datetime.now()
+        archive_before = (now - timedelta(days=archive_after_days)).isoformat()
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT button_uuid FROM action_buttons
+            WHERE is_active = 1 AND expires_at IS NOT NULL AND expires_at < ?
+        """, (now.isoformat(),))
+        deactivated = [row[0] for row in cursor.fetchall()]
+        if deactivated:
+            cursor.execute("""
+                UPDATE action_buttons SET is_active = 0
+                WHERE is_active = 1 AND expires_at IS NOT NULL AND expires_at < ?
+            """, (now.isoformat(),))
+        
+        cursor.execute("""
+            SELECT button_uuid FROM action_buttons
+            WHERE is_active = 0 AND expires_at IS NOT NULL AND expires_at < ?
+        """, (archive_before,))
+        archived = [row[0] for row in cursor.fetchall()]
+        if archived:
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO action_buttons_archive ({BUTTON_COLUMNS}, archived_at)
+                SELECT {BUTTON_COLUMNS}, ? FROM action_buttons
+                WHERE is_active = 0 AND expires_at IS NOT NULL AND expires_at < ?
+            """, (now.isoformat(), archive_before))
+            cursor.execute("""
+                DELETE FROM action_buttons
+                WHERE is_active = 0 AND expires_at IS NOT NULL AND expires_at < ?
+            """, (archive_before,))
+        
+        conn.commit()
+        conn.close()
+        
+        self._evict_buttons(deactivated + archived)
+        return {"deactivated": len(deactivated), "archived": len(archived)}
+    
     def log_action_execution(self, button_uuid: str, execution_status: str,
                             execution_result: str = None, error_message: str = None,
                             processing_time: float = None, side_effects: Dict = None,
@@ -758,7 +1027,68 @@ class EmailTrackingDB:
         except Exception as e:
             print(f"❌ Error getting pending tasks: {e}")
             return []
-    
+
+    def claim_task(self, task_uuid: str) -> bool:
+        """Markiert einen pending Task atomar als running (nur ein Worker gewinnt)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE task_queue
+                SET status = 'running', last_attempt_at = ?
+                WHERE task_uuid = ? AND status = 'pending'
+            """, (datetime.now().isoformat(), task_uuid))
+            claimed = cursor.rowcount == 1
+
+            conn.commit()
+            conn.close()
+            return claimed
+        except Exception as e:
+            print(f"❌ Error claiming task: {e}")
+            return False
+
+    def requeue_stale_tasks(self, stale_after_minutes: int = 30) -> int:
+        """Setzt Tasks zurück auf pending, die nach einem Absturz in running hängen"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cutoff = (datetime.now() - timedelta(minutes=stale_after_minutes)).isoformat()
+            cursor.execute("""
+                UPDATE task_queue
+                SET status = 'pending'
+                WHERE status = 'running' AND last_attempt_at < ?
+            """, (cutoff,))
+            requeued = cursor.rowcount
+
+            conn.commit()
+            conn.close()
+            return requeued
+        except Exception as e:
+            print(f"❌ Error requeueing stale tasks: {e}")
+            return 0
+
+    def release_task(self, task_uuid: str) -> bool:
+        """Gibt einen geclaimten (running) Task ohne Attempt-Zählung wieder frei"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                UPDATE task_queue
+                SET status = 'pending'
+                WHERE task_uuid = ? AND status = 'running'
+            """, (task_uuid,))
+            released = cursor.rowcount == 1
+
+            conn.commit()
+            conn.close()
+            return released
+        except Exception as e:
+            print(f"❌ Error releasing task: {e}")
+            return False
+
     def update_task_status(self, task_uuid: str, status: str, error_message: str = None) -> bool:
         """Updated Task Status nach Execution"""
         try:
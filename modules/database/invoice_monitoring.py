@@ -21,11 +21,38 @@ from dataclasses import dataclass
 from typing import List, Optional, Dict, Any
 import logging
 
+from modules.database.stats_snapshots import (
+    SOURCE_MONITORING,
+    SummarySpec,
+    ensure_summaries,
+    install_summary,
+    notify_stats_changed,
+)
+
 logger = logging.getLogger(__name__)
 
 # Database Configuration
 INVOICE_DB_PATH = "invoice_monitoring.db"
 
+
+def _invoice_summary_spec(direction: str, booked_column: str) -> SummarySpec:
+    """Summen je Zahlstatus/Fälligkeit/Buchungsdatum, per Trigger gepflegt (siehe stats_snapshots)"""
+    return SummarySpec(
+        table=f"{direction}_invoice_summary",
+        source=f"{direction}_invoices",
+        keys=(
+            ("payment_status", "COALESCE({row}.payment_status, '')"),
+            ("due_date", "COALESCE({row}.due_date, '')"),
+            ("booked_date", f"COALESCE({{row}}.{booked_column}, '')"),
+        ),
+        measures=(("amount", "COALESCE({row}.amount, 0)"),),
+        watch_columns=("payment_status", "due_date", booked_column, "amount"),
+    )
+
+
+INCOMING_INVOICE_SUMMARY = _invoice_summary_spec("incoming", "received_date")
+OUTGOING_INVOICE_SUMMARY = _invoice_summary_spec("outgoing", "sent_date")
+
 @dataclass
 class IncomingInvoice:
     """📥 Eingehende Rechnung"""
@@ -146,6 +173,13 @@ class InvoiceMonitoringDB:
             )
             """)
             
+            # Top-Überfällige je Richtung ohne Full Scan
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_incoming_status_due ON incoming_invoices(payment_status, due_date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_outgoing_status_due ON outgoing_invoices(payment_status, due_date)")
+            
+            install_summary(cursor, INCOMING_INVOICE_SUMMARY)
+            install_summary(cursor, OUTGOING_INVOICE_SUMMARY)
+            
             conn.commit()
             logger.info("✅ Invoice monitoring database initialized")
     
@@ -153,6 +187,8 @@ class InvoiceMonitoringDB:
         """📥 Eingehende Rechnung hinzufügen"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            # REPLACE löscht die alte Zeile - Delete-Trigger der Summary nur mit recursive_triggers
+            cursor.execute("PRAGMA recursive_triggers = ON")
             
             cursor.execute("""
             INSERT OR REPLACE INTO incoming_invoices 
@@ -170,6 +206,7 @@ class InvoiceMonitoringDB:
             
             invoice_id = cursor.lastrowid
             conn.commit()
+            notify_stats_changed(SOURCE_MONITORING)
             logger.info(f"📥 Incoming invoice added: {invoice.invoice_number}")
             return invoice_id
     
@@ -177,6 +214,8 @@ class InvoiceMonitoringDB:
         """📤 Ausgehende Rechnung hinzufügen"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
+            # REPLACE löscht die alte Zeile - Delete-Trigger der Summary nur mit recursive_triggers
+            cursor.execute("PRAGMA recursive_triggers = ON")
             
             cursor.execute("""
             INSERT OR REPLACE INTO outgoing_invoices 
@@ -195,10 +234,11 @@ class InvoiceMonitoringDB:
             
             invoice_id = cursor.lastrowid
             conn.commit()
+            notify_stats_changed(SOURCE_MONITORING)
             logger.info(f"📤 Outgoing invoice added: {invoice.invoice_number}")
             return invoice_id
     
-    def get_overdue_incoming_invoices(self, days_overdue: int = 0) -> List[Dict]:
+    def get_overdue_incoming_invoices(self, days_overdue: int = 0, limit: Optional[int] = None) -> List[Dict]:
         """⚠️ Überfällige eingehende Rechnungen"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
@@ -210,12 +250,12 @@ class InvoiceMonitoringDB:
             WHERE payment_status = 'open' 
             AND due_date < date('now', '-{} days')
             ORDER BY due_date ASC
-            """.format(days_overdue))
+            """.format(days_overdue) + (f" LIMIT {int(limit)}" if limit else ""))
             
             columns = [desc[0] for desc in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
-    def get_overdue_outgoing_invoices(self, days_overdue: int = 0) -> List[Dict]:
+    def get_overdue_outgoing_invoices(self, days_overdue: int = 0, limit: Optional[int] = None) -> List[Dict]:
         """⚠️ Überfällige ausgehende Rechnungen"""
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
@@ -225,7 +265,7 @@ class InvoiceMonitoringDB:
             WHERE payment_status = 'open'
             AND due_date < date('now', '-{} days')
             ORDER BY due_date ASC
-            """.format(days_overdue))
+            """.format(days_overdue) + (f" LIMIT {int(limit)}" if limit else ""))
             
             columns = [desc[0] for desc in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -263,33 +303,34 @@ class InvoiceMonitoringDB:
             }
     
     def get_critical_points(self) -> Dict[str, Any]:
-        """🔴 Kritische Punkte Zusammenfassung"""
-        overdue_incoming = self.get_overdue_incoming_invoices(0)
-        overdue_outgoing = self.get_overdue_outgoing_invoices(0)
-        
+        """🔴 Kritische Punkte Zusammenfassung (Summen aus den Summary-Tabellen)"""
         with sqlite3.connect(self.db_path) as conn:
+            ensure_summaries(conn, self.db_path, INCOMING_INVOICE_SUMMARY, OUTGOING_INVOICE_SUMMARY)
             cursor = conn.cursor()
             
-            # Offene Beträge
-            cursor.execute("""
-            SELECT SUM(amount) FROM incoming_invoices WHERE payment_status = 'open'
-            """)
-            open_incoming_total = cursor.fetchone()[0] or 0
-            
-            cursor.execute("""
-            SELECT SUM(amount) FROM outgoing_invoices WHERE payment_status = 'open'
-            """)
-            open_outgoing_total = cursor.fetchone()[0] or 0
-            
-            return {
-                "overdue_incoming_count": len(overdue_incoming),
-                "overdue_outgoing_count": len(overdue_outgoing),
-                "open_incoming_total": open_incoming_total,
-                "open_outgoing_total": open_outgoing_total,
-                "cash_flow_balance": open_outgoing_total - open_incoming_total,
-                "overdue_incoming": overdue_incoming[:5],  # Top 5
-                "overdue_outgoing": overdue_outgoing[:5]   # Top 5
-            }
+            # Offene Beträge + Anzahl überfälliger Rechnungen
+            totals = {}
+            for direction in ("incoming", "outgoing"):
+                cursor.execute(f"""
+                SELECT SUM(amount),
+                       SUM(CASE WHEN due_date <> '' AND due_date < date('now') THEN row_count ELSE 0 END)
+                FROM {direction}_invoice_summary WHERE payment_status = 'open'
+                """)
+                open_total, overdue_count = cursor.fetchone()
+                totals[direction] = (round(open_total or 0, 2), overdue_count or 0)
+        
+        open_incoming_total, overdue_incoming_count = totals["incoming"]
+        open_outgoing_total, overdue_outgoing_count = totals["outgoing"]
+        
+        return {
+            "overdue_incoming_count": overdue_incoming_count,
+            "overdue_outgoing_count": overdue_outgoing_count,
+            "open_incoming_total": open_incoming_total,
+            "open_outgoing_total": open_outgoing_total,
+            "cash_flow_balance": round(open_outgoing_total - open_incoming_total, 2),
+            "overdue_incoming": self.get_overdue_incoming_invoices(0, limit=5),  # Top 5
+            "overdue_outgoing": self.get_overdue_outgoing_invoices(0, limit=5)   # Top 5
+        }
 
 # Global instance
 invoice_db = InvoiceMonitoringDB()
@@ -9,10 +9,32 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
 
+from modules.database.crm_search_index import InvoiceSearchIndex
+from modules.database.stats_snapshots import (
+    SOURCE_INVOICES,
+    SummarySpec,
+    ensure_summaries,
+    install_summary,
+    notify_stats_changed,
+)
+
 logger = logging.getLogger(__name__)
 
 DB_PATH = "/tmp/invoice_tracking.db"
 
+# Per Trigger gepflegte Summen je Status/Richtung/Fälligkeit (siehe stats_snapshots)
+INVOICE_STATUS_SUMMARY = SummarySpec(
+    table="invoice_status_summary",
+    source="invoices",
+    keys=(
+        ("status", "COALESCE({row}.status, '')"),
+        ("direction", "COALESCE({row}.direction, '')"),
+        ("due_date", "COALESCE({row}.due_date, '')"),
+    ),
+    measures=(("amount_total", "COALESCE({row}.amount_total, 0)"),),
+    watch_columns=("status", "direction", "due_date", "amount_total"),
+)
+
 
 def init_invoice_db():
     """Initialize Invoice Tracking Database with comprehensive schema"""
@@ -88,6 +110,9 @@ def init_invoice_db():
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_direction ON invoices(direction)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_document_hash ON invoices(document_hash)")
     
+    install_summary(cursor, INVOICE_STATUS_SUMMARY)
+    InvoiceSearchIndex.init_schema(cursor)
+    
     conn.commit()
     conn.close()
     
@@ -142,6 +167,7 @@ def save_invoice(invoice_data: Dict) -> int:
         
         invoice_id = cursor.lastrowid
         conn.commit()
+        notify_stats_changed(SOURCE_INVOICES)
         
         logger.info(f"✅ Invoice saved: {invoice_data.get('invoice_number')} (ID: {invoice_id})")
         
@@ -174,6 +200,7 @@ def save_invoice(invoice_data: Dict) -> int:
         ))
         
         conn.commit()
+        notify_stats_changed(SOURCE_INVOICES)
         
         # Get invoice_id of updated record
         cursor.execute("SELECT id FROM invoices WHERE invoice_number = ?", 
@@ -272,52 +299,39 @@ def mark_invoice_paid(invoice_number: str, payment_date: str = None, payment_met
     
     conn.commit()
     conn.close()
+    notify_stats_changed(SOURCE_INVOICES)
     
     logger.info(f"✅ Invoice {invoice_number} marked as paid")
 
 
 def get_invoice_statistics() -> Dict:
-    """Get invoice statistics"""
+    """Get invoice statistics (aus invoice_status_summary statt Scans über invoices)"""
     
     conn = sqlite3.connect(DB_PATH)
+    ensure_summaries(conn, DB_PATH, INVOICE_STATUS_SUMMARY)
     cursor = conn.cursor()
     
-    # Total open amount
-    cursor.execute("""
-        SELECT SUM(amount_total) FROM invoices 
-        WHERE status = 'open' AND direction = 'incoming'
-    """)
-    total_open_incoming = cursor.fetchone()[0] or 0.0
-    
-    cursor.execute("""
-        SELECT SUM(amount_total) FROM invoices 
-        WHERE status = 'open' AND direction = 'outgoing'
-    """)
-    total_open_outgoing = cursor.fetchone()[0] or 0.0
-    
-    # Overdue amount
     today = datetime.now().date().isoformat()
     cursor.execute("""
-        SELECT SUM(amount_total) FROM invoices 
-        WHERE status = 'open' AND due_date < ? AND direction = 'incoming'
-    """, (today,))
-    total_overdue = cursor.fetchone()[0] or 0.0
-    
-    # Count invoices
-    cursor.execute("SELECT COUNT(*) FROM invoices WHERE status = 'open'")
-    count_open = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM invoices WHERE status = 'open' AND due_date < ?", (today,))
-    count_overdue = cursor.fetchone()[0]
+        SELECT
+            SUM(CASE WHEN direction = 'incoming' THEN amount_total ELSE 0 END),
+            SUM(CASE WHEN direction = 'outgoing' THEN amount_total ELSE 0 END),
+            SUM(CASE WHEN direction = 'incoming' AND due_date <> '' AND due_date < ? THEN amount_total ELSE 0 END),
+            SUM(row_count),
+            SUM(CASE WHEN due_date <> '' AND due_date < ? THEN row_count ELSE 0 END)
+        FROM invoice_status_summary
+        WHERE status = 'open'
+    """, (today, today))
+    total_open_incoming, total_open_outgoing, total_overdue, count_open, count_overdue = cursor.fetchone()
     
     conn.close()
     
     return {
-        "total_open_incoming": total_open_incoming,
-        "total_open_outgoing": total_open_outgoing,
-        "total_overdue": total_overdue,
-        "count_open": count_open,
-        "count_overdue": count_overdue
+        "total_open_incoming": round(total_open_incoming or 0.0, 2),
+        "total_open_outgoing": round(total_open_outgoing or 0.0, 2),
+        "total_overdue": round(total_overdue or 0.0, 2),
+        "count_open": count_open or 0,
+        "count_overdue": count_overdue or 0
     }
 
 
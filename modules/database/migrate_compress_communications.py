@@ -0,0 +1,98 @@
+"""
+Database Migration: Compress Notification Contents
+
+Moves html_content / text_content of existing user_communications rows
+into the deduplicated, compressed content store:
+- shared <head>/CSS block -> notification_fragments (stored once)
+- per-message remainder   -> communication_bodies (zlib)
+
+Afterwards the legacy columns are set to NULL. Optional VACUUM reclaims the space.
+Safe to run multiple times - already migrated rows have NULL contents.
+
+Usage:
+    python -m modules.database.migrate_compress_communications [db_path] [--vacuum]
+"""
+import sqlite3
+import logging
+import os
+import sys
+
+from modules.database.communication_store import CommunicationContentStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_PATH = "/tmp/email_tracking.db"
+BATCH_SIZE = 200
+
+
+def migrate_database(db_path: str = DB_PATH, vacuum: bool = False) -> dict:
+    """
+    Compact all user_communications rows that still carry inline contents.
+    Each batch is committed separately so the migration can be interrupted.
+    """
+    store = CommunicationContentStore(db_path)
+    size_before = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    logger.info("🔧 Starting communication content compaction...")
+
+    stats = {"migrated": 0, "original_bytes": 0, "stored_bytes": 0}
+
+    try:
+        CommunicationContentStore.init_schema(cursor)
+        conn.commit()
+
+        while True:
+            cursor.execute("""
+                SELECT communication_uuid, html_content, text_content
+                FROM user_communications
+                WHERE html_content IS NOT NULL OR text_content IS NOT NULL
+                LIMIT ?
+            """, (BATCH_SIZE,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            for communication_uuid, html_content, text_content in rows:
+                sizes = store.store(cursor, communication_uuid, html_content, text_content)
+                stats["original_bytes"] += sizes["original_size"]
+                stats["stored_bytes"] += sizes["stored_size"]
+
+            cursor.executemany("""
+                UPDATE user_communications
+                SET html_content = NULL, text_content = NULL
+                WHERE communication_uuid = ?
+            """, [(row[0],) for row in rows])
+
+            conn.commit()
+            stats["migrated"] += len(rows)
+            logger.info(f"📦 {stats['migrated']} communications compacted...")
+
+        if vacuum:
+            logger.info("🧹 Running VACUUM...")
+            conn.execute("VACUUM")
+
+        logger.info("✅ Compaction completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ Compaction failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    stats["file_bytes_before"] = size_before
+    stats["file_bytes_after"] = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    logger.info(
+        f"📊 {stats['migrated']} rows | {stats['original_bytes']} → {stats['stored_bytes']} bytes "
+        f"| DB file {stats['file_bytes_before']} → {stats['file_bytes_after']} bytes"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    migrate_database(args[0] if args else DB_PATH, vacuum="--vacuum" in sys.argv)
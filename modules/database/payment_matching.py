@@ -9,10 +9,28 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import logging
 
+from modules.database.stats_snapshots import (
+    SOURCE_INVOICES,
+    SOURCE_PAYMENTS,
+    SummarySpec,
+    ensure_summaries,
+    install_summary,
+    notify_stats_changed,
+)
+
 logger = logging.getLogger(__name__)
 
 PAYMENT_DB_PATH = "/tmp/payment_tracking.db"
 
+# Per Trigger gepflegte Anzahl/Beträge je Match-Status (siehe stats_snapshots)
+PAYMENT_MATCH_SUMMARY = SummarySpec(
+    table="payment_match_summary",
+    source="bank_transactions",
+    keys=(("matched", "CASE WHEN {row}.matched_invoice_id IS NULL THEN 0 ELSE 1 END"),),
+    measures=(("abs_amount", "ABS(COALESCE({row}.amount, 0))"),),
+    watch_columns=("matched_invoice_id", "amount"),
+)
+
 
 def init_payment_db():
     """Initialize Payment Tracking Database"""
@@ -69,6 +87,8 @@ def init_payment_db():
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_sender_iban ON bank_transactions(sender_iban)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_matched_invoice ON bank_transactions(matched_invoice_id)")
     
+    install_summary(cursor, PAYMENT_MATCH_SUMMARY)
+    
     conn.commit()
     conn.close()
     
@@ -114,6 +134,7 @@ def import_bank_transaction(transaction_data: Dict) -> int:
         
         transaction_db_id = cursor.lastrowid
         conn.commit()
+        notify_stats_changed(SOURCE_PAYMENTS)
         
         logger.info(f"✅ Transaction imported: {transaction_data.get('transaction_id')} (DB ID: {transaction_db_id})")
         
@@ -374,6 +395,7 @@ def match_transaction_to_invoice(transaction_db_id: int, invoice_number: str, ma
         """, (invoice_id, datetime.utcnow().isoformat(), "manual", transaction_db_id))
         
         pay_conn.commit()
+        notify_stats_changed(SOURCE_PAYMENTS)
         
         logger.info(f"✅ Match created: Transaction {transaction_db_id} → Invoice {invoice_number}")
         
@@ -396,6 +418,7 @@ def match_transaction_to_invoice(transaction_db_id: int, invoice_number: str, ma
         
         inv_conn.commit()
         inv_conn.close()
+        notify_stats_changed(SOURCE_INVOICES)
         
         logger.info(f"   💰 Invoice {invoice_number} marked as PAID")
         
@@ -498,31 +521,26 @@ def get_unmatched_transactions() -> List[Dict]:
 
 
 def get_payment_statistics() -> Dict:
-    """Get payment matching statistics"""
+    """Get payment matching statistics (aus payment_match_summary)"""
     
     pay_conn = sqlite3.connect(PAYMENT_DB_PATH)
+    ensure_summaries(pay_conn, PAYMENT_DB_PATH, PAYMENT_MATCH_SUMMARY)
     pay_cursor = pay_conn.cursor()
     
-    # Total transactions
-    pay_cursor.execute("SELECT COUNT(*) FROM bank_transactions")
-    total_transactions = pay_cursor.fetchone()[0]
-    
-    # Matched
-    pay_cursor.execute("SELECT COUNT(*) FROM bank_transactions WHERE matched_invoice_id IS NOT NULL")
-    matched_count = pay_cursor.fetchone()[0]
-    
-    # Total matched amount
-    pay_cursor.execute("SELECT SUM(ABS(amount)) FROM bank_transactions WHERE matched_invoice_id IS NOT NULL")
-    matched_amount = pay_cursor.fetchone()[0] or 0.0
+    pay_cursor.execute("SELECT matched, row_count, abs_amount FROM payment_match_summary")
+    summary = {matched: (count, amount) for matched, count, amount in pay_cursor.fetchall()}
     
     pay_conn.close()
     
+    matched_count, matched_amount = summary.get(1, (0, 0.0))
+    total_transactions = matched_count + summary.get(0, (0, 0.0))[0]
+    
     return {
         "total_transactions": total_transactions,
         "matched_count": matched_count,
         "unmatched_count": total_transactions - matched_count,
         "match_rate": (matched_count / total_transactions * 100) if total_transactions > 0 else 0.0,
-        "matched_amount": matched_amount
+        "matched_amount": round(matched_amount, 2)
     }
 
 
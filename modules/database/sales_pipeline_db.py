@@ -23,11 +23,34 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 import logging
 
+from modules.database.crm_search_index import OpportunitySearchIndex, get_opportunity_search_index
+from modules.database.stats_snapshots import (
+    SOURCE_PIPELINE,
+    SummarySpec,
+    ensure_summaries,
+    install_summary,
+    notify_stats_changed,
+)
+
 logger = logging.getLogger(__name__)
 
 # Database path - Railway uses /tmp, local can use relative path
 DB_PATH = os.environ.get("SALES_PIPELINE_DB_PATH", "/tmp/sales_pipeline.db")
 
+# Per Trigger gepflegte Pipeline-Kennzahlen je Stage (siehe stats_snapshots)
+PIPELINE_STAGE_SUMMARY = SummarySpec(
+    table="pipeline_stage_summary",
+    source="opportunities",
+    keys=(("stage", "COALESCE({row}.stage, '')"),),
+    measures=(
+        ("total_value", "COALESCE({row}.value, 0)"),
+        ("probability_sum", "COALESCE({row}.probability, 0)"),
+        ("probability_count", "CASE WHEN {row}.probability IS NULL THEN 0 ELSE 1 END"),
+        ("weighted_value", "COALESCE({row}.value * {row}.probability / 100.0, 0)"),
+    ),
+    watch_columns=("stage", "value", "probability"),
+)
+
 def init_db():
     """Initialisiere Sales Pipeline Datenbank mit allen Tabellen"""
     conn = sqlite3.connect(DB_PATH)
@@ -77,6 +100,9 @@ def init_db():
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_weclapp_id ON opportunities(weclapp_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON opportunities(created_at)")
     
+    install_summary(cursor, PIPELINE_STAGE_SUMMARY)
+    OpportunitySearchIndex.init_schema(cursor)
+    
     conn.commit()
     conn.close()
     logger.info(f"✅ Sales Pipeline DB initialized: {DB_PATH}")
@@ -143,6 +169,7 @@ def create_opportunity(opportunity_data: Dict[str, Any]) -> int:
     
     conn.commit()
     conn.close()
+    notify_stats_changed(SOURCE_PIPELINE)
     
     logger.info(f"💼 Opportunity created: ID={opportunity_id}, Title={opportunity_data.get('title')}")
     return opportunity_id
@@ -179,69 +206,45 @@ def update_opportunity_stage(opportunity_id: int, new_stage: str, note: Optional
     conn.commit()
     success = cursor.rowcount > 0
     conn.close()
+    notify_stats_changed(SOURCE_PIPELINE)
     
     return success
 
 
 def get_pipeline_statistics() -> Dict[str, Any]:
-    """Get Sales Pipeline Statistics"""
+    """Get Sales Pipeline Statistics (aus pipeline_stage_summary, eine Zeile je Stage)"""
     conn = sqlite3.connect(DB_PATH)
+    ensure_summaries(conn, DB_PATH, PIPELINE_STAGE_SUMMARY)
     cursor = conn.cursor()
     
-    # Total value by stage
     cursor.execute("""
-        SELECT 
-            stage,
-            COUNT(*) as count,
-            SUM(value) as total_value,
-            AVG(probability) as avg_probability
-        FROM opportunities
-        WHERE stage NOT IN ('won', 'lost')
-        GROUP BY stage
+        SELECT stage, row_count, total_value, probability_sum, probability_count, weighted_value
+        FROM pipeline_stage_summary
     """)
     
     stages = {}
-    for row in cursor.fetchall():
-        stage, count, total_value, avg_probability = row
-        stages[stage] = {
-            "count": count,
-            "total_value": total_value or 0.0,
-            "avg_probability": avg_probability or 0
-        }
-    
-    # Won/Lost stats
-    cursor.execute("""
-        SELECT 
-            stage,
-            COUNT(*) as count,
-            SUM(value) as total_value
-        FROM opportunities
-        WHERE stage IN ('won', 'lost')
-        GROUP BY stage
-    """)
-    
     won_lost = {}
-    for row in cursor.fetchall():
-        stage, count, total_value = row
-        won_lost[stage] = {
+    weighted_value = 0.0
+    for stage, count, total_value, probability_sum, probability_count, weighted in cursor.fetchall():
+        if stage in ('won', 'lost'):
+            won_lost[stage] = {
+                "count": count,
+                "total_value": round(total_value, 2)
+            }
+            continue
+        stages[stage] = {
             "count": count,
-            "total_value": total_value or 0.0
+            "total_value": round(total_value, 2),
+            "avg_probability": probability_sum / probability_count if probability_count else 0
         }
-    
-    # Weighted pipeline value (probability * value)
-    cursor.execute("""
-        SELECT SUM(value * probability / 100.0) as weighted_value
-        FROM opportunities
-        WHERE stage NOT IN ('won', 'lost')
-    """)
-    weighted_value = cursor.fetchone()[0] or 0.0
+        weighted_value += weighted
     
     conn.close()
     
     return {
         "stages": stages,
         "won_lost": won_lost,
-        "weighted_pipeline_value": weighted_value,
+        "weighted_pipeline_value": round(weighted_value, 2),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -336,27 +339,14 @@ def add_activity(opportunity_id: int, activity_data: Dict[str, Any]) -> int:
     return activity_id
 
 
-def search_opportunities(query: str) -> List[Dict[str, Any]]:
-    """Search opportunities by title, company, or contact"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    search_pattern = f"%{query}%"
-    cursor.execute("""
-        SELECT * FROM opportunities
-        WHERE title LIKE ? 
-           OR company_name LIKE ?
-           OR contact_name LIKE ?
-           OR contact_email LIKE ?
-        ORDER BY created_at DESC
-        LIMIT 50
-    """, (search_pattern, search_pattern, search_pattern, search_pattern))
-    
-    opportunities = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+def search_opportunities(query: str, limit: int = 50, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Search opportunities by title, company, contact, description and activities
     
-    return opportunities
+    FTS5 Prefix-Suche mit BM25-Ranking (siehe crm_search_index), Ergebnisse
+    enthalten zusätzlich rank, highlights und passende activities.
+    """
+    return get_opportunity_search_index(DB_PATH).search(query, limit=limit, stage=stage)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+"""
+Schema Migrations - versionierte Migrationen für die SQLite-Datenbanken
+
+Statt CREATE TABLE IF NOT EXISTS / PRAGMA table_info + ALTER TABLE verstreut
+in Laufzeitpfaden hat jede Datenbank eine geordnete Liste von Migrationen.
+run_migrations() läuft einmal beim Start, wendet nur noch fehlende Versionen
+an (je eine Transaktion, BEGIN IMMEDIATE serialisiert parallel startende
+Worker) und protokolliert sie in schema_migrations.
+
+Migrationen laufen komplett in der Transaktion (nur cursor.execute, kein
+executescript()) und müssen idempotent sein (IF NOT EXISTS, add_missing_columns):
+bestehende Datenbanken ohne schema_migrations durchlaufen beim ersten Start
+einfach alle Versionen.
+
+Hier liegen die Migrationen von email_data.db (DATABASE_PATH); die der
+Tracking-DB stehen in email_tracking_db.py.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+_status: Dict[str, Dict[str, Any]] = {}
+_status_lock = threading.Lock()
+
+
+def add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]) -> List[str]:
+    """ALTER TABLE ADD COLUMN für alle noch fehlenden Spalten"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {col[1] for col in cursor.fetchall()}
+    added = []
+    for column, definition in columns.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            added.append(column)
+    return added
+
+
+def run_migrations(db_path: str, migrations: List[Migration], component: str = None) -> Dict[str, Any]:
+    """
+    Wendet alle noch nicht angewendeten Migrationen in Versionsreihenfolge an
+
+    Returns:
+        {"component", "db_path", "version", "applied": [...]} (auch über get_migration_status)
+    """
+    component = component or os.path.basename(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
+    applied = []
+
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL,
+                duration_ms REAL
+            )
+        """)
+
+        for migration in sorted(migrations, key=lambda m: m.version):
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (migration.version,))
+            if cursor.fetchone():
+                continue
+
+            start = time.perf_counter()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Ein parallel startender Worker könnte schneller gewesen sein
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (migration.version,))
+                if cursor.fetchone():
+                    cursor.execute("COMMIT")
+                    continue
+
+                migration.apply(cursor)
+                if not conn.in_transaction:
+                    # executescript() committet vorzeitig → Schritt wäre nicht atomar
+                    raise RuntimeError(f"Migration {component} v{migration.version} committed its own transaction")
+                duration_ms = round((time.perf_counter() - start) * 1000, 1)
+                cursor.execute("""
+                    INSERT INTO schema_migrations (version, name, applied_at, duration_ms)
+                    VALUES (?, ?, ?, ?)
+                """, (migration.version, migration.name, datetime.now().isoformat(), duration_ms))
+                cursor.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                logger.error(f"❌ Migration {component} v{migration.version} ({migration.name}) failed")
+                raise
+
+            applied.append({"version": migration.version, "name": migration.name, "duration_ms": duration_ms})
+            logger.info(f"🔧 Migration {component} v{migration.version}: {migration.name} ({duration_ms} ms)")
+
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        version = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    status = {
+        "component": component,
+        "db_path": db_path,
+        "version": version,
+        "applied": applied,
+        "checked_at": datetime.now().isoformat(),
+    }
+    with _status_lock:
+        _status[component] = status
+    if applied:
+        logger.info(f"✅ Schema {component} migrated to v{version} ({len(applied)} applied)")
+    return status
+
+
+def get_migration_status() -> Dict[str, Dict[str, Any]]:
+    """Schema-Versionen aller beim Start migrierten Datenbanken (für /status)"""
+    with _status_lock:
+        return {component: dict(status) for component, status in _status.items()}
+
+
+# ===============================
+# email_data.db (DATABASE_PATH)
+# ===============================
+
+def _email_data_baseline(cursor: sqlite3.Cursor):
+    """Ursprüngliches Schema aus initialize_contact_cache"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS email_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject TEXT,
+        sender TEXT,
+        recipient TEXT,
+        received_date TEXT,
+        ocr_text TEXT,
+        gpt_result TEXT,
+        weclapp_contact_id TEXT,
+        weclapp_customer_id TEXT,
+        weclapp_opportunity_id TEXT,
+        current_stage TEXT,
+        gpt_status_suggestion TEXT,
+        status_deviation BOOLEAN,
+        remarks TEXT
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sender ON email_data(sender)")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS email_attachments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email_message_id TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        content_type TEXT,
+        size_bytes INTEGER,
+        file_hash TEXT,
+        ocr_text TEXT,
+        ocr_route TEXT,
+        onedrive_path TEXT,
+        onedrive_link TEXT,
+        processed_date TEXT NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_message_id ON email_attachments(email_message_id)")
+
+
+def _email_data_processing_columns(cursor: sqlite3.Cursor):
+    """Verarbeitungs-Spalten (früher PRAGMA-Check in initialize_contact_cache)"""
+    add_missing_columns(cursor, "email_data", {
+        "message_type": "TEXT",
+        "direction": "TEXT",
+        "workflow_path": "TEXT",
+        "ai_intent": "TEXT",
+        "ai_urgency": "TEXT",
+        "ai_sentiment": "TEXT",
+        "attachments_count": "INTEGER DEFAULT 0",
+        "processing_timestamp": "TEXT",
+        "processing_duration_ms": "INTEGER",
+        "price_estimate_json": "TEXT",
+        # vom Sync-Actor befüllt, lokal angelegte DBs hatten die Spalte nicht
+        "sender_name": "TEXT",
+    })
+
+
+def _email_data_search_index(cursor: sqlite3.Cursor):
+    """FTS5 Volltextindex (Rechnungssuche, Email-Preview, Dashboard-Suche)"""
+    from modules.database.email_search_index import EmailSearchIndex
+
+    EmailSearchIndex.init_schema(cursor)
+
+
+def _processed_documents(cursor: sqlite3.Cursor):
+    """Dokument-Tracking (früher bei jedem Speichern in _save_processed_document_sync)"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS processed_documents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_id TEXT UNIQUE,
+        sender TEXT,
+        subject TEXT,
+        attachment_filename TEXT,
+        document_hash TEXT UNIQUE,
+        document_type TEXT,
+        onedrive_path TEXT UNIQUE,
+        onedrive_link TEXT,
+        ordnerstruktur TEXT,
+        kunde TEXT,
+        lieferant TEXT,
+        summe TEXT,
+        processing_timestamp TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _email_data_hot_indexes(cursor: sqlite3.Cursor):
+    """Covering-Indizes für die heißen Lookups (siehe test_query_plans.py)"""
+    # _sync_lookup_contact: sender = ? AND weclapp_contact_id IS NOT NULL ORDER BY id DESC LIMIT 1
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_email_data_sender_contact
+    ON email_data(sender, id, weclapp_contact_id, weclapp_customer_id, sender_name)
+    WHERE weclapp_contact_id IS NOT NULL
+    """)
+    # Heuristik sender + subject + filename im Zeitfenster
+    cursor.execute("DROP INDEX IF EXISTS idx_sender_subject_filename")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_processed_documents_heuristic
+    ON processed_documents(sender, subject, attachment_filename, processing_timestamp)
+    """)
+    # message_id / document_hash / onedrive_path sind UNIQUE und damit bereits indiziert
+
+
+EMAIL_DATA_MIGRATIONS = [
+    Migration(1, "email_data + email_attachments baseline", _email_data_baseline),
+    Migration(2, "email_data processing columns", _email_data_processing_columns),
+    Migration(3, "FTS5 search index", _email_data_search_index),
+    Migration(4, "processed_documents", _processed_documents),
+    Migration(5, "covering indexes for hot lookups", _email_data_hot_indexes),
+]
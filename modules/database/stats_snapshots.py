@@ -0,0 +1,240 @@
+"""
+📸 Statistik-Snapshots für Dashboards
+
+Die Kennzahlen der Dashboards und /api/*/statistics Endpunkte werden nicht mehr
+bei jedem Seitenaufruf aus den Quelltabellen aggregiert:
+
+1. Summary-Tabellen (SummarySpec) werden per SQLite-Trigger bei jedem
+   INSERT/UPDATE/DELETE der Quelltabelle inkrementell mitgeführt
+   (Zeilenanzahl + Summen je Schlüssel, z.B. Status/Richtung/Fälligkeit).
+2. Davor liegt ein In-Memory-Cache (StatsSnapshotCache), der über
+   notify_stats_changed() von den Schreibfunktionen invalidiert wird.
+
+Ein Dashboard-Aufruf ohne zwischenzeitliche Änderung ist damit ein Dict-Lookup,
+nach einer Änderung eine Abfrage auf wenige Summary-Zeilen. Jeder Snapshot
+liefert computed_at/age_seconds mit, damit die Dashboards den Stand anzeigen.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sicherheitsnetz für Schreibzugriffe außerhalb dieses Prozesses (Skripte, CSV-Import)
+STATS_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("STATS_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+STATS_SNAPSHOT_MAX_ENTRIES = 128
+
+# Event-Quellen für die Invalidierung
+SOURCE_INVOICES = "invoice_tracking"
+SOURCE_PAYMENTS = "payment_tracking"
+SOURCE_PIPELINE = "sales_pipeline"
+SOURCE_MONITORING = "invoice_monitoring"
+
+
+@dataclass(frozen=True)
+class SummarySpec:
+    """
+    Beschreibt eine per Trigger gepflegte Summary-Tabelle.
+
+    Schlüssel und Kennzahlen sind SQL-Ausdrücke mit ``{row}`` als Platzhalter
+    für NEW/OLD bzw. den Tabellennamen beim initialen Befüllen.
+    """
+    table: str
+    source: str
+    keys: Tuple[Tuple[str, str], ...]
+    measures: Tuple[Tuple[str, str], ...]
+    watch_columns: Tuple[str, ...] = field(default_factory=tuple)
+
+    def _key_names(self) -> str:
+        return ", ".join(name for name, _ in self.keys)
+
+    def _exprs(self, pairs: Tuple[Tuple[str, str], ...], row: str) -> List[str]:
+        return [expr.format(row=row) for _, expr in pairs]
+
+    def create_sql(self) -> str:
+        columns = [f"{name} NOT NULL" for name, _ in self.keys]
+        columns.append("row_count INTEGER NOT NULL DEFAULT 0")
+        columns += [f"{name} REAL NOT NULL DEFAULT 0" for name, _ in self.measures]
+        return (
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"{', '.join(columns)}, PRIMARY KEY ({self._key_names()}))"
+        )
+
+    def backfill_sql(self) -> str:
+        key_exprs = self._exprs(self.keys, self.source)
+        measure_exprs = [f"SUM({expr})" for expr in self._exprs(self.measures, self.source)]
+        measure_names = "".join(f", {name}" for name, _ in self.measures)
+        return (
+            f"INSERT INTO {self.table} ({self._key_names()}, row_count{measure_names}) "
+            f"SELECT {', '.join(key_exprs + ['COUNT(*)'] + measure_exprs)} "
+            f"FROM {self.source} GROUP BY {', '.join(key_exprs)}"
+        )
+
+    def _add_sql(self) -> str:
+        values = self._exprs(self.keys, "NEW") + ["1"] + self._exprs(self.measures, "NEW")
+        measure_names = "".join(f", {name}" for name, _ in self.measures)
+        updates = ["row_count = row_count + 1"] + [f"{name} = {name} + excluded.{name}" for name, _ in self.measures]
+        return (
+            f"INSERT INTO {self.table} ({self._key_names()}, row_count{measure_names}) "
+            f"VALUES ({', '.join(values)}) "
+            f"ON CONFLICT ({self._key_names()}) DO UPDATE SET {', '.join(updates)};"
+        )
+
+    def _remove_sql(self) -> str:
+        match = " AND ".join(f"{name} = {expr}" for (name, _), expr in zip(self.keys, self._exprs(self.keys, "OLD")))
+        updates = ["row_count = row_count - 1"] + [
+            f"{name} = {name} - {expr}" for (name, _), expr in zip(self.measures, self._exprs(self.measures, "OLD"))
+        ]
+        return (
+            f"UPDATE {self.table} SET {', '.join(updates)} WHERE {match};\n"
+            f"DELETE FROM {self.table} WHERE {match} AND row_count <= 0;"
+        )
+
+    def trigger_sql(self) -> List[str]:
+        update_of = f" OF {', '.join(self.watch_columns)}" if self.watch_columns else ""
+        return [
+            f"CREATE TRIGGER IF NOT EXISTS {self.table}_ai AFTER INSERT ON {self.source} BEGIN\n"
+            f"{self._add_sql()}\nEND",
+            f"CREATE TRIGGER IF NOT EXISTS {self.table}_ad AFTER DELETE ON {self.source} BEGIN\n"
+            f"{self._remove_sql()}\nEND",
+            f"CREATE TRIGGER IF NOT EXISTS {self.table}_au AFTER UPDATE{update_of} ON {self.source} BEGIN\n"
+            f"{self._remove_sql()}\n{self._add_sql()}\nEND",
+        ]
+
+
+def install_summary(cursor: sqlite3.Cursor, spec: SummarySpec) -> bool:
+    """
+    Legt Summary-Tabelle + Trigger an (idempotent).
+
+    Beim ersten Anlegen wird die Tabelle aus dem Bestand befüllt.
+
+    Returns:
+        True wenn die Tabelle neu angelegt wurde
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (spec.table,))
+    created = cursor.fetchone() is None
+
+    cursor.execute(spec.create_sql())
+    for statement in spec.trigger_sql():
+        cursor.execute(statement)
+
+    if created:
+        cursor.execute(spec.backfill_sql())
+        logger.info(f"📸 Summary table {spec.table} created from {spec.source} ({cursor.rowcount} rows)")
+    return created
+
+
+_installed = set()
+_installed_lock = threading.Lock()
+
+
+def ensure_summaries(conn: sqlite3.Connection, db_path: str, *specs: SummarySpec):
+    """Installiert Summary-Tabellen einmal pro Prozess (auch für Bestands-DBs)"""
+    with _installed_lock:
+        missing = [spec for spec in specs if (os.path.abspath(db_path), spec.table) not in _installed]
+        if not missing:
+            return
+        cursor = conn.cursor()
+        for spec in missing:
+            install_summary(cursor, spec)
+        conn.commit()
+        _installed.update((os.path.abspath(db_path), spec.table) for spec in missing)
+
+
+class StatsSnapshotCache:
+    """🗂️ In-Memory Snapshots mit Event-basierter Invalidierung"""
+
+    def __init__(self, max_age_seconds: int = STATS_SNAPSHOT_MAX_AGE_SECONDS,
+                 max_entries: int = STATS_SNAPSHOT_MAX_ENTRIES):
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[Any, float, datetime, tuple]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._last_event: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def invalidate(self, *sources: str):
+        """Schreib-Event: alle Snapshots dieser Quellen werden beim nächsten Zugriff neu berechnet"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            for source in sources:
+                self._versions[source] = self._versions.get(source, 0) + 1
+                self._last_event[source] = now
+
+    def get(self, name: str, compute: Callable[..., Any], sources: Tuple[str, ...],
+            *args: Any) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Liefert (Wert, Snapshot-Metadaten).
+
+        Fälligkeiten hängen vom Datum ab - der Tageswechsel gehört daher zum Schlüssel.
+        """
+        key = (name, args, date.today().isoformat())
+        with self._lock:
+            versions = tuple(self._versions.get(source, 0) for source in sources)
+            entry = self._entries.get(key)
+            if entry and entry[3] == versions and time.monotonic() - entry[1] < self.max_age_seconds:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0], self._meta(entry, cached=True)
+            self._misses += 1
+
+        # Versionen vor der Berechnung festhalten: ein paralleler Schreibzugriff
+        # macht den Snapshot sofort wieder ungültig
+        value = compute(*args)
+        entry = (value, time.monotonic(), datetime.now(), versions)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value, self._meta(entry, cached=False)
+
+    def _meta(self, entry: tuple, cached: bool) -> Dict[str, Any]:
+        return {
+            "computed_at": entry[2].isoformat(),
+            "age_seconds": round(time.monotonic() - entry[1], 1),
+            "max_age_seconds": self.max_age_seconds,
+            "cached": cached,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "versions": dict(self._versions),
+                "last_events": dict(self._last_event),
+            }
+
+
+# Globale Instanz (Singleton-Pattern)
+_stats_snapshot_cache: Optional[StatsSnapshotCache] = None
+
+
+def get_stats_snapshot_cache() -> StatsSnapshotCache:
+    """Gibt die globale StatsSnapshotCache Instanz zurück"""
+    global _stats_snapshot_cache
+    if _stats_snapshot_cache is None:
+        _stats_snapshot_cache = StatsSnapshotCache()
+    return _stats_snapshot_cache
+
+
+def notify_stats_changed(*sources: str):
+    """Von Schreibfunktionen aufzurufen, nachdem Rechnungen/Transaktionen/Opportunities geändert wurden"""
+    get_stats_snapshot_cache().invalidate(*sources)
+
+
+def cached_statistics(name: str, compute: Callable[..., Any], sources: Tuple[str, ...],
+                      *args: Any) -> Tuple[Any, Dict[str, Any]]:
+    """Kurzform für get_stats_snapshot_cache().get(...)"""
+    return get_stats_snapshot_cache().get(name, compute, sources, *args)
@@ -23,8 +23,30 @@ from dataclasses import dataclass
 from typing import List, Optional, Dict, Any, Tuple
 import logging
 
+from modules.database.invoice_monitoring import INCOMING_INVOICE_SUMMARY, OUTGOING_INVOICE_SUMMARY
+from modules.database.stats_snapshots import (
+    SOURCE_MONITORING,
+    SummarySpec,
+    ensure_summaries,
+    install_summary,
+    notify_stats_changed,
+)
+
 logger = logging.getLogger(__name__)
 
+# Per Trigger gepflegte Tagessummen je Transaktionstyp/Match-Status (siehe stats_snapshots)
+BANK_TRANSACTION_SUMMARY = SummarySpec(
+    table="bank_transaction_daily_summary",
+    source="bank_transactions",
+    keys=(
+        ("day", "COALESCE({row}.transaction_date, '')"),
+        ("transaction_type", "COALESCE({row}.transaction_type, '')"),
+        ("matched", "CASE WHEN {row}.matched_invoice_id IS NULL THEN 0 ELSE 1 END"),
+    ),
+    measures=(("amount", "COALESCE({row}.amount, 0)"),),
+    watch_columns=("transaction_date", "transaction_type", "matched_invoice_id", "amount"),
+)
+
 @dataclass
 class BankTransaction:
     """💳 Bank-Transaktion für Umsatzabgleich"""
@@ -88,6 +110,8 @@ class UmsatzabgleichEngine:
             )
             """)
             
+            install_summary(cursor, BANK_TRANSACTION_SUMMARY)
+            
             conn.commit()
             logger.info("✅ Umsatzabgleich tables initialized")
     
@@ -193,6 +217,9 @@ class UmsatzabgleichEngine:
                 transaction.source
             ))
             
+            conn.commit()
+            if cursor.rowcount:
+                notify_stats_changed(SOURCE_MONITORING)
             return cursor.lastrowid
     
     def auto_match_transactions(self) -> Dict[str, Any]:
@@ -330,6 +357,7 @@ class UmsatzabgleichEngine:
             """, (invoice_id, confidence, transaction_id))
             
             conn.commit()
+            notify_stats_changed(SOURCE_MONITORING)
     
     def _update_invoice_payment_status(self, invoice_id: str, invoice_type: str, payment_date: str):
         """💰 Rechnungsstatus auf bezahlt setzen"""
@@ -345,43 +373,46 @@ class UmsatzabgleichEngine:
             """, (payment_date, invoice_id))
             
             conn.commit()
+            notify_stats_changed(SOURCE_MONITORING)
     
     def get_umsatzabgleich_report(self, start_date: str, end_date: str) -> Dict[str, Any]:
-        """📊 Umsatzabgleich Report generieren"""
+        """📊 Umsatzabgleich Report generieren (aus den Tagessummen statt Scans über die Quelltabellen)"""
         with sqlite3.connect(self.db_path) as conn:
+            ensure_summaries(conn, self.db_path, BANK_TRANSACTION_SUMMARY,
+                             INCOMING_INVOICE_SUMMARY, OUTGOING_INVOICE_SUMMARY)
             cursor = conn.cursor()
             
             # Bank-Transaktionen im Zeitraum
             cursor.execute("""
-            SELECT transaction_type, SUM(amount) as total, COUNT(*) as count
-            FROM bank_transactions 
-            WHERE transaction_date BETWEEN ? AND ?
+            SELECT NULLIF(transaction_type, '') as transaction_type, SUM(amount) as total, SUM(row_count) as count
+            FROM bank_transaction_daily_summary 
+            WHERE day BETWEEN ? AND ?
             GROUP BY transaction_type
             """, (start_date, end_date))
             
-            bank_summary = {row[0]: {"total": row[1], "count": row[2]} for row in cursor.fetchall()}
+            bank_summary = {row[0]: {"total": round(row[1], 2), "count": row[2]} for row in cursor.fetchall()}
             
             # Rechnungen im Zeitraum
             cursor.execute("""
-            SELECT 'incoming' as type, SUM(amount) as total, COUNT(*) as count
-            FROM incoming_invoices 
-            WHERE received_date BETWEEN ? AND ?
+            SELECT 'incoming' as type, SUM(amount) as total, SUM(row_count) as count
+            FROM incoming_invoice_summary 
+            WHERE booked_date BETWEEN ? AND ?
             UNION ALL
-            SELECT 'outgoing' as type, SUM(amount) as total, COUNT(*) as count
-            FROM outgoing_invoices 
-            WHERE sent_date BETWEEN ? AND ?
+            SELECT 'outgoing' as type, SUM(amount) as total, SUM(row_count) as count
+            FROM outgoing_invoice_summary 
+            WHERE booked_date BETWEEN ? AND ?
             """, (start_date, end_date, start_date, end_date))
             
-            invoice_summary = {row[0]: {"total": row[1], "count": row[2]} for row in cursor.fetchall()}
+            invoice_summary = {row[0]: {"total": round(row[1] or 0, 2), "count": row[2] or 0} for row in cursor.fetchall()}
             
             # Unmatched Transaktionen
             cursor.execute("""
-            SELECT COUNT(*) FROM bank_transactions 
-            WHERE transaction_date BETWEEN ? AND ? 
-            AND matched_invoice_id IS NULL
+            SELECT SUM(row_count) FROM bank_transaction_daily_summary 
+            WHERE day BETWEEN ? AND ? 
+            AND matched = 0
             """, (start_date, end_date))
             
-            unmatched_count = cursor.fetchone()[0]
+            unmatched_count = cursor.fetchone()[0] or 0
             
             # Abweichungen berechnen
             bank_income = bank_summary.get('income', {}).get('total', 0)
@@ -7,11 +7,28 @@ Ensures continuous operation with persistent data storage
 import os
 import sqlite3
 import logging
-from typing import Optional, Dict, List
+import time
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Spalten, die aus der OneDrive Sync-DB übernommen werden (Zuordnung per Name, nicht per Position)
+MIGRATION_COLUMNS = {
+    "parties": ("id", "name", "email", "phone", "customerNumber", "partyType"),
+    "leads": ("id", "firstName", "lastName", "email", "phone", "company", "leadStatus"),
+}
+
+# Sekundär-Indizes, die bei großen Deltas vor dem Kopieren entfernt und am Ende einmal neu gebaut werden
+SECONDARY_INDEXES = {
+    "parties": (("idx_parties_email", "email"), ("idx_parties_origin", "origin")),
+    "leads": (("idx_leads_email", "email"), ("idx_leads_origin", "origin")),
+}
+
+# Ab diesem Anteil geänderter Zeilen lohnt Drop + Rebuild der Indizes
+BULK_REBUILD_RATIO = 0.2
+BULK_REBUILD_MIN_ROWS = 1000
+
 class WEClappFallbackDB:
     """
     Fallback WEClapp database system
@@ -22,6 +39,7 @@ class WEClappFallbackDB:
     
     def __init__(self, db_path: str = "/tmp/weclapp_fallback.db"):
         self.db_path = db_path
+        self.last_migration: Optional[Dict] = None
         self.ensure_database_exists()
     
     def ensure_database_exists(self):
@@ -77,9 +95,18 @@ class WEClappFallbackDB:
                 )
             """)
             
+            # Migration: Herkunft (sync/local) + lastModifiedDate für Delta-Erkennung
+            for table in ("parties", "leads"):
+                existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+                if "lastModifiedDate" not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN lastModifiedDate INTEGER")
+                if "origin" not in existing:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN origin TEXT DEFAULT 'local'")
+            
             # Create indexes for performance
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_parties_email ON parties(email)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_leads_email ON leads(email)")
+            for table, indexes in SECONDARY_INDEXES.items():
+                for index_name, column in indexes:
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table}({column})")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_party ON opportunities(party_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_lead ON opportunities(lead_id)")
             
@@ -159,18 +186,19 @@ class WEClappFallbackDB:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
+            # Lokale Kontakte bekommen negative IDs - WEClapp IDs aus der Sync-Migration sind positiv
             if contact_type == "customer":
                 # Add as party (customer)
                 cursor.execute("""
-                    INSERT OR REPLACE INTO parties (name, email, phone, partyType)
-                    VALUES (?, ?, ?, ?)
+                    INSERT OR REPLACE INTO parties (id, name, email, phone, partyType)
+                    VALUES ((SELECT MIN(COALESCE(MIN(id), 0), 0) - 1 FROM parties), ?, ?, ?, ?)
                 """, (name, email, phone, "customer"))
             else:
                 # Add as lead
                 first_name, last_name = (name.split(" ", 1) + [""])[:2]
                 cursor.execute("""
-                    INSERT OR REPLACE INTO leads (firstName, lastName, email, phone, company, leadStatus)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    INSERT OR REPLACE INTO leads (id, firstName, lastName, email, phone, company, leadStatus)
+                    VALUES ((SELECT MIN(COALESCE(MIN(id), 0), 0) - 1 FROM leads), ?, ?, ?, ?, ?, ?)
                 """, (first_name, last_name, email, phone, company, "new"))
             
             contact_id = cursor.lastrowid
@@ -207,7 +235,8 @@ class WEClappFallbackDB:
                 "opportunities": opportunities_count,
                 "total_contacts": parties_count + leads_count,
                 "database_path": self.db_path,
-                "source": "fallback_database"
+                "source": "fallback_database",
+                "last_migration": self.last_migration
             }
             
         except Exception as e:
@@ -216,50 +245,130 @@ class WEClappFallbackDB:
     
     def migrate_from_onedrive_db(self, onedrive_db_path: str) -> bool:
         """Migrate data from OneDrive WEClapp database to fallback database"""
+        return self.migrate(onedrive_db_path).get("success", False)
+    
+    def migrate(self, onedrive_db_path: str) -> Dict:
+        """
+        Set-basierter Abgleich Sync-DB → Fallback-DB in einer Transaktion.
+        
+        - ATTACH der Sync-DB (read-only), INSERT … SELECT per Spaltenname
+        - Delta: lastModifiedDate (falls in der Quelle vorhanden), sonst
+          spaltenweiser Vergleich der übernommenen Felder
+        - Aus der Quelle verschwundene Sync-Zeilen werden entfernt, lokal
+          angelegte Kontakte (add_contact) bleiben erhalten
+        - Große Deltas: Sekundär-Indizes einmal am Ende neu bauen
+        
+        Returns: Report mit Zeilenzahlen je Tabelle und Dauer
+        """
+        if not os.path.exists(onedrive_db_path):
+            logger.warning(f"OneDrive DB not found: {onedrive_db_path}")
+            return {"success": False, "error": "source not found"}
+        
+        started = time.perf_counter()
+        report = {"success": False, "source": onedrive_db_path, "tables": {}}
+        conn = sqlite3.connect(self.db_path, uri=True)
         try:
-            if not os.path.exists(onedrive_db_path):
-                logger.warning(f"OneDrive DB not found: {onedrive_db_path}")
-                return False
-            
-            # Open both databases
-            source_conn = sqlite3.connect(onedrive_db_path)
-            target_conn = sqlite3.connect(self.db_path)
-            
-            source_cursor = source_conn.cursor()
-            target_cursor = target_conn.cursor()
-            
-            # Migrate parties
-            source_cursor.execute("SELECT * FROM parties")
-            parties = source_cursor.fetchall()
-            
-            for party in parties:
-                target_cursor.execute("""
-                    INSERT OR REPLACE INTO parties 
-                    (id, name, email, phone, customerNumber, partyType)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, party[:6])  # First 6 columns
-            
-            # Migrate leads
-            source_cursor.execute("SELECT * FROM leads")
-            leads = source_cursor.fetchall()
-            
-            for lead in leads:
-                target_cursor.execute("""
-                    INSERT OR REPLACE INTO leads 
-                    (id, firstName, lastName, email, phone, company, leadStatus)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, lead[:7])  # First 7 columns
-            
-            target_conn.commit()
-            source_conn.close()
-            target_conn.close()
-            
-            logger.info(f"✅ Migrated {len(parties)} parties and {len(leads)} leads from OneDrive DB")
-            return True
-            
+            conn.execute("ATTACH DATABASE ? AS src", (f"file:{onedrive_db_path}?mode=ro",))
+            conn.execute("BEGIN IMMEDIATE")
+            for table, columns in MIGRATION_COLUMNS.items():
+                report["tables"][table] = self._migrate_table(conn, table, columns)
+            conn.commit()
+            report["success"] = True
         except Exception as e:
+            conn.rollback()
+            report["error"] = str(e)
             logger.error(f"❌ Migration from OneDrive DB failed: {e}")
-            return False
+        finally:
+            conn.close()
+        
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        report["migrated_at"] = datetime.now().isoformat()
+        self.last_migration = report
+        if report["success"]:
+            summary = ", ".join(
+                f"{table}: {stats.get('source_rows', 0)} rows, +{stats.get('inserted', 0)} ~{stats.get('updated', 0)} -{stats.get('deleted', 0)}"
+                for table, stats in report["tables"].items()
+            )
+            logger.info(f"✅ Fallback DB refreshed in {report['duration_ms']} ms ({summary})")
+        return report
+    
+    def _migrate_table(self, conn: sqlite3.Connection, table: str, columns: Tuple[str, ...]) -> Dict:
+        source_columns = {row[1] for row in conn.execute(f"PRAGMA src.table_info({table})")}
+        if "id" not in source_columns:
+            return {"skipped": "table or id column missing in source"}
+        
+        # Quell-Ausdruck je Zielspalte (fehlende Spalten → NULL, leere Emails → NULL wegen UNIQUE)
+        expressions = []
+        for column in columns:
+            if column not in source_columns:
+                expressions.append("NULL")
+            elif column == "email":
+                expressions.append("NULLIF(TRIM(s.email), '')")
+            else:
+                expressions.append(f's."{column}"')
+        
+        if "lastModifiedDate" in source_columns:
+            delta_mode = "lastModifiedDate"
+            modified_expr = 's."lastModifiedDate"'
+            changed = "t.id IS NULL OR t.lastModifiedDate IS NOT s.\"lastModifiedDate\""
+        else:
+            delta_mode = "compare"
+            modified_expr = "NULL"
+            changed = "t.id IS NULL OR " + " OR ".join(
+                f't."{column}" IS NOT {expr}' for column, expr in zip(columns[1:], expressions[1:])
+            )
+        
+        select_list = ", ".join(f'{expr} AS "{column}"' for column, expr in zip(columns, expressions))
+        conn.execute("DROP TABLE IF EXISTS temp.migration_delta")
+        conn.execute(f"""
+            CREATE TEMP TABLE migration_delta AS
+            SELECT {select_list}, {modified_expr} AS lastModifiedDate, (t.id IS NULL) AS is_new
+            FROM src.{table} s
+            LEFT JOIN main.{table} t ON t.id = s.id
+            WHERE {changed}
+        """)
+        
+        source_rows = conn.execute(f"SELECT COUNT(*) FROM src.{table}").fetchone()[0]
+        target_rows = conn.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+        delta_rows, new_rows = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(is_new), 0) FROM temp.migration_delta"
+        ).fetchone()
+        
+        rebuild = delta_rows >= max(BULK_REBUILD_MIN_ROWS, target_rows * BULK_REBUILD_RATIO)
+        if rebuild:
+            for index_name, _ in SECONDARY_INDEXES[table]:
+                conn.execute(f"DROP INDEX IF EXISTS main.{index_name}")
+        
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO main.{table} ({column_list}, lastModifiedDate, origin, updated_at)
+            SELECT {column_list}, lastModifiedDate, 'sync', CURRENT_TIMESTAMP FROM temp.migration_delta
+        """)
+        
+        # In der Quelle gelöschte Sync-Zeilen entfernen
+        conn.execute("DROP TABLE IF EXISTS temp.migration_ids")
+        conn.execute("CREATE TEMP TABLE migration_ids (id INTEGER PRIMARY KEY)")
+        conn.execute(f"INSERT OR IGNORE INTO temp.migration_ids SELECT id FROM src.{table}")
+        deleted = conn.execute(f"""
+            DELETE FROM main.{table}
+            WHERE origin = 'sync' AND id NOT IN (SELECT id FROM temp.migration_ids)
+        """).rowcount
+        
+        if rebuild:
+            for index_name, column in SECONDARY_INDEXES[table]:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS main.{index_name} ON {table}({column})")
+        
+        conn.execute("DROP TABLE temp.migration_delta")
+        conn.execute("DROP TABLE temp.migration_ids")
+        return {
+            "delta_mode": delta_mode,
+            "source_rows": source_rows,
+            "inserted": new_rows,
+            "updated": delta_rows - new_rows,
+            "deleted": deleted,
+            "unchanged": source_rows - delta_rows,
+            "indexes_rebuilt": rebuild,
+        }
 
 # Global fallback database instance
 _fallback_db = None
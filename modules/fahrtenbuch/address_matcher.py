@@ -7,25 +7,27 @@ Matching-Strategien:
 3. GPS Match: Koordinaten-Radius <500m (80-100%)
 """
 
-import os
-import requests
 import re
 from typing import Dict, List, Optional, Tuple
 from difflib import SequenceMatcher
 import logging
 import math
 
+from modules.weclapp.weclapp_client import get_weclapp_client
+
 logger = logging.getLogger(__name__)
 
+# Nur die Felder, die fürs Matching gebraucht werden
+CUSTOMER_PROPERTIES = ("id", "company", "customerNumber", "addresses", "contacts")
+
 class AddressMatcher:
     """Matcher für Fahrtenadressen gegen WeClapp CRM"""
     
     def __init__(self):
-        """Initialize WeClapp API credentials"""
-        self.api_token = os.getenv("WECLAPP_API_TOKEN")
-        self.base_url = os.getenv("WECLAPP_BASE_URL")
+        """Initialize WeClapp API client"""
+        self.client = get_weclapp_client()
         
-        if not self.api_token or not self.base_url:
+        if not self.client.configured:
             raise ValueError("WeClapp credentials missing! Set WECLAPP_API_TOKEN and WECLAPP_BASE_URL")
     
     def parse_german_address(self, address: str) -> Dict[str, str]:
@@ -113,17 +115,29 @@ class AddressMatcher:
         Returns:
             Liste von Kunden-Dicts
         """
-        url = f"{self.base_url}customer"
-        headers = {"AuthenticationToken": self.api_token}
-        params = {"term": search_term, "pageSize": 20}
-        
         try:
             logger.info(f"🔎 WeClapp Suche: '{search_term}'")
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            customers = data.get("result", [])
+            customers = self.client.run_sync(self.client.list(
+                "customer", {"term": search_term}, properties=CUSTOMER_PROPERTIES, limit=20
+            ))
+            logger.info(f"✅ Gefunden: {len(customers)} Kunden")
+            return customers
+        
+        except Exception as e:
+            logger.error(f"❌ WeClapp API Error: {e}")
+            return []
+    
+    def search_weclapp_customers_by_location(self, city: str, zipcode: Optional[str] = None) -> List[Dict]:
+        """
+        Suche Kunden nach Stadt, bei keinem Treffer nach PLZ - beide Abfragen
+        laufen parallel, die Stadt hat Vorrang.
+        """
+        options = [{"term": term} for term in (city, zipcode) if term]
+        try:
+            logger.info(f"🔎 WeClapp Suche: {' / '.join(o['term'] for o in options)}")
+            customers = self.client.run_sync(self.client.first_result(
+                "customer", options, properties=CUSTOMER_PROPERTIES, limit=20
+            ))
             logger.info(f"✅ Gefunden: {len(customers)} Kunden")
             return customers
         
@@ -162,15 +176,8 @@ class AddressMatcher:
         
         logger.info(f"🏠 Matching: {parsed.get('street', '')} {parsed.get('house_number', '')}, {parsed.get('zipcode', '')} {parsed.get('city', '')}")
         
-        # Search WeClapp by city
-        city = parsed.get('city', '')
-        customers = self.search_weclapp_customers(city)
-        
-        if not customers:
-            # Try zipcode
-            zipcode = parsed.get('zipcode', '')
-            if zipcode:
-                customers = self.search_weclapp_customers(zipcode)
+        # Search WeClapp by city (fallback: zipcode)
+        customers = self.search_weclapp_customers_by_location(parsed.get('city', ''), parsed.get('zipcode', ''))
         
         if not customers:
             logger.info("❌ Keine Kunden gefunden")
@@ -0,0 +1,97 @@
+"""
+Trip Sync - PAJ GPS Fahrtenbuch-Routen → trip_logs
+
+Generiert die Logbuch-Routen aller PAJ-Geräte für die letzten Tage und
+speichert sie über den TripManager (Duplikate werden dort erkannt).
+Wird periodisch vom Scheduler des Orchestrators ausgeführt.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from modules.fahrtenbuch.paj_gps_client import PAJGPSClient
+from modules.fahrtenbuch.trip_manager import TripManager
+
+logger = logging.getLogger(__name__)
+
+
+def _first(route: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = route.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    """PAJ liefert Zeitpunkte als Unix-Timestamp oder ISO-String"""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)) or str(value).isdigit():
+            return datetime.fromtimestamp(float(value))
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except (ValueError, OSError):
+        return None
+
+
+def route_to_trip(route: Dict[str, Any], device: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Mappt eine PAJ Logbuch-Route auf das trip_logs Format"""
+    start = _parse_time(_first(route, "start_time", "startTime", "dateStart", "start_date"))
+    end = _parse_time(_first(route, "end_time", "endTime", "dateEnd", "end_date"))
+    destination = _first(route, "end_address", "endAddress", "destination_address", "destination")
+    if start is None or not destination:
+        return None
+
+    return {
+        "trip_date": start.strftime("%Y-%m-%d"),
+        "start_time": start.strftime("%H:%M"),
+        "end_time": end.strftime("%H:%M") if end else None,
+        "duration_minutes": int((end - start).total_seconds() // 60) if end else None,
+        "start_address": _first(route, "start_address", "startAddress"),
+        "destination_address": destination,
+        "destination_latitude": _first(route, "end_lat", "endLat"),
+        "destination_longitude": _first(route, "end_lng", "endLng"),
+        "distance_km": _first(route, "distance_km", "distance"),
+        "driver_name": _first(route, "driver", "driver_name"),
+        "vehicle_plate": device.get("license_plate") or device.get("name"),
+        "paj_device_id": str(device.get("idNo") or device.get("id") or ""),
+        "paj_route_id": str(_first(route, "id", "_id", "routeId") or ""),
+        "status": "OPEN",
+    }
+
+
+async def sync_paj_trips(days_back: int = 1) -> Dict[str, Any]:
+    """
+    Holt die Routen der letzten ``days_back`` Tage aller Geräte und speichert neue Fahrten.
+
+    Returns:
+        {"devices": int, "routes": int, "stored": int, "skipped": int}
+    """
+    stats = {"devices": 0, "routes": 0, "stored": 0, "skipped": 0}
+    if not os.getenv("PAJ_GPS_EMAIL") or not os.getenv("PAJ_GPS_PASSWORD"):
+        logger.info("⏭️ Fahrtenbuch sync skipped - PAJ GPS credentials not configured")
+        return stats
+
+    start_date = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
+    end_date = datetime.now().strftime("%Y-%m-%d")
+    manager = TripManager()
+
+    async with PAJGPSClient() as paj:
+        for device in await paj.get_devices():
+            device_id = device.get("idNo") or device.get("id")
+            if not device_id:
+                continue
+            stats["devices"] += 1
+            for route in await paj.generate_routes(str(device_id), start_date, end_date):
+                stats["routes"] += 1
+                trip = route_to_trip(route, device) if isinstance(route, dict) else None
+                if trip is None:
+                    stats["skipped"] += 1
+                    continue
+                if manager.save_trip(trip):
+                    stats["stored"] += 1
+
+    logger.info(f"🚗 Fahrtenbuch sync: {stats['routes']} routes from {stats['devices']} device(s), {stats['stored']} stored")
+    return stats
@@ -34,7 +34,7 @@ async def analyze_call_content(
     Analysiert Gesprächsinhalt und extrahiert Tasks, Termine, Follow-Ups
     
     Args:
-        transcription: Transkript des Gesprächs
+        transcription: Transkript des Gesprächs (String oder CallTranscript)
         contact_name: Name des Kontakts
         duration_seconds: Dauer des Gesprächs
     
@@ -47,6 +47,9 @@ async def analyze_call_content(
         }
     """
     
+    # Normalisiertes CallTranscript (modules.speech.call_transcript) oder String
+    transcription = getattr(transcription, "text", transcription)
+    
     if not transcription or len(transcription.strip()) < 10:
         return {
             "tasks": [],
@@ -0,0 +1,262 @@
+"""
+Metrics - Counter, Gauges & Histogramme im Prometheus Textformat
+
+Schlanke Registry ohne zusätzliche Abhängigkeit (prometheus_client ist nicht
+Teil der Deployments). Messpunkte kosten einen Dict-Lookup plus Addition
+unter einem Lock; der Text für /metrics wird erst beim Scrape erzeugt.
+
+Erfasst werden u.a.:
+- Webhook-Requests je Kanal/Status und deren Antwortzeit
+- Verarbeitungs-Latenz je Stage (aus den Tracing-Spans)
+- Kontakt-Lookups je Cache-Stufe (email_data, Sync-DB, Phone-Index, API)
+- Duplikat-Prüfungen je Ergebnis, OCR-Latenz je Route
+- GPT Tokens und Latenz je Modell, Upstream-HTTP-Status je Host
+
+Zustände anderer Komponenten (Admission Pools, Task Registry, Dispatcher
+Queue, Snapshot Cache) liefern Collector-Funktionen beim Scrape.
+"""
+import logging
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "orchestrator_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (name, type, help, [(labels, value)])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monoton steigender Zähler"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    """Aktueller Wert (setzen oder hoch/runter zählen)"""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: Any):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Verteilung (kumulative Buckets + Summe + Anzahl)"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key → [counts je Bucket (nicht kumulativ) + Überlauf, Summe]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(entry[0]), entry[1])) for key, entry in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """📈 Sammelt Metriken und Collector-Funktionen und rendert das Textformat"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, Callable[[], Iterable[MetricFamily]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, name: str, collector: Callable[[], Iterable[MetricFamily]]):
+        """Collector liefert beim Scrape (name, type, help, [(labels, value)])"""
+        self._collectors = [(n, c) for n, c in self._collectors if n != name]
+        self._collectors.append((name, collector))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector_name, collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"⚠️ Metrics collector {collector_name} failed: {e}")
+                continue
+            for name, type_name, documentation, samples in families:
+                full_name = METRIC_PREFIX + name
+                lines.append(f"# HELP {full_name} {documentation}")
+                lines.append(f"# TYPE {full_name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{full_name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Globale Instanz (Singleton-Pattern)
+_metrics_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Gibt die globale MetricsRegistry Instanz zurück"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
+
+
+# ===============================
+# METRIKEN
+# ===============================
+
+_registry = get_metrics_registry()
+
+WEBHOOK_REQUESTS = _registry.counter(
+    "webhook_requests_total", "Webhook requests by channel and HTTP status", ("channel", "status"))
+WEBHOOK_DURATION = _registry.histogram(
+    "webhook_duration_seconds", "Webhook response time by channel", ("channel",))
+STAGE_DURATION = _registry.histogram(
+    "stage_duration_seconds", "Processing latency per workflow stage or external call", ("stage", "kind"))
+CONTACT_LOOKUPS = _registry.counter(
+    "contact_lookups_total", "Contact lookups by cache tier and result", ("tier", "result"))
+DUPLICATE_CHECKS = _registry.counter(
+    "duplicate_checks_total", "Duplicate detection outcomes", ("outcome",))
+OCR_DURATION = _registry.histogram(
+    "ocr_duration_seconds", "OCR latency by route", ("route",))
+GPT_TOKENS = _registry.counter(
+    "gpt_tokens_total", "OpenAI tokens by model and type", ("model", "type"))
+GPT_DURATION = _registry.histogram(
+    "gpt_request_duration_seconds", "OpenAI request latency by model", ("model",))
+UPSTREAM_REQUESTS = _registry.counter(
+    "upstream_requests_total", "Outgoing HTTP requests by service, host and status", ("service", "host", "status"))
+UPSTREAM_DURATION = _registry.histogram(
+    "upstream_request_duration_seconds", "Outgoing HTTP request latency by service", ("service",))
+WECLAPP_REQUEST_DURATION = _registry.histogram(
+    "weclapp_request_duration_seconds", "WeClapp API latency by endpoint and method", ("endpoint", "method"))
+
+
+def record_upstream_call(service: str, host: Optional[str], status: Any, duration: float,
+                         response: Any = None):
+    """
+    Ein externer HTTP-Call (aus der HTTP-Instrumentierung in tracing).
+
+    Bei OpenAI werden zusätzlich Token-Verbrauch und Latenz je Modell aus der
+    (bereits gelesenen, nicht gestreamten) JSON-Antwort übernommen.
+    """
+    UPSTREAM_REQUESTS.inc(service=service, host=host or "", status=status)
+    UPSTREAM_DURATION.observe(duration, service=service)
+    if service != "openai" or response is None:
+        return
+    try:
+        # nur httpx-Responses, deren Body bereits gelesen ist (kein Streaming)
+        if not getattr(response, "is_stream_consumed", False) or "json" not in response.headers.get("content-type", ""):
+            return
+        body = response.json()
+    except Exception:
+        return
+    if not isinstance(body, dict) or not isinstance(body.get("usage"), dict):
+        return
+    model = body.get("model") or "unknown"
+    usage = body["usage"]
+    GPT_DURATION.observe(duration, model=model)
+    GPT_TOKENS.inc(usage.get("prompt_tokens") or 0, model=model, type="prompt")
+    GPT_TOKENS.inc(usage.get("completion_tokens") or 0, model=model, type="completion")
+
+
+def render_metrics() -> str:
+    """Prometheus Textformat für /metrics"""
+    return get_metrics_registry().render()
@@ -0,0 +1,472 @@
+"""
+Tracing - Latenz pro Verarbeitungsschritt
+
+Jede Email / jeder Anruf / jede WhatsApp bekommt einen Trace (trace_id,
+Kanal, Message-ID). Darin werden Spans aufgezeichnet für:
+
+- die LangGraph Nodes (contact_lookup, ai_analysis, workflow_routing,
+  weg_a/weg_b, finalize_processing) und übergeordnete Pipelines
+- alle externen HTTP-Calls (Graph, WeClapp, PDF.co, OpenAI, Zapier, …):
+  httpx, aiohttp und requests werden einmalig instrumentiert, der Dienst
+  wird aus dem Hostnamen abgeleitet
+
+Der Kontext wird über contextvars weitergereicht und gilt damit auch in
+Background-Tasks, die innerhalb eines Traces gestartet werden.
+
+Abgeschlossene Spans landen in einem Ringpuffer (letzte TRACE_RING_SIZE
+Spans) und gebündelt in SQLite (TRACE_DB_PATH). get_stage_latencies()
+liefert p50/p95/p99 je Stage für /debug/traces.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from modules.monitoring.metrics import STAGE_DURATION, record_upstream_call
+
+logger = logging.getLogger(__name__)
+
+TRACE_DB_PATH = os.getenv("TRACE_DB_PATH", "/tmp/traces.db")
+TRACE_RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "5000"))
+TRACE_FLUSH_BATCH = 50
+TRACE_FLUSH_INTERVAL_SECONDS = 5.0
+TRACE_RETENTION_DAYS = int(os.getenv("TRACE_RETENTION_DAYS", "7"))
+
+KIND_STAGE = "stage"
+KIND_EXTERNAL = "external"
+
+# Hostname-Fragment → Dienstname der externen Spans
+EXTERNAL_SERVICES = (
+    ("graph.microsoft.com", "graph"),
+    ("login.microsoftonline.com", "graph_auth"),
+    ("weclapp.com", "weclapp"),
+    ("pdf.co", "pdfco"),
+    ("openai.com", "openai"),
+    ("zapier.com", "zapier"),
+    ("sipgate", "sipgate"),
+    ("apify.com", "apify"),
+    ("paj-gps", "paj_gps"),
+)
+
+
+class Trace:
+    """Kontext eines Verarbeitungsvorgangs (eine Nachricht)"""
+
+    def __init__(self, channel: str, message_id: Optional[str] = None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.channel = channel
+        self.message_id = message_id
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-Rank Perzentil"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def service_for_host(host: Optional[str]) -> str:
+    host = (host or "").lower()
+    for fragment, service in EXTERNAL_SERVICES:
+        if fragment in host:
+            return service
+    return "http"
+
+
+class Tracer:
+    """🔭 Ringpuffer + SQLite Store für Spans"""
+
+    def __init__(self, db_path: str = TRACE_DB_PATH, ring_size: int = TRACE_RING_SIZE):
+        self.db_path = db_path
+        self._ring: Deque[Dict[str, Any]] = deque(maxlen=ring_size)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trace_spans (
+                span_id TEXT PRIMARY KEY,
+                trace_id TEXT,
+                parent_id TEXT,
+                name TEXT NOT NULL,
+                kind TEXT,
+                channel TEXT,
+                message_id TEXT,
+                started_at REAL NOT NULL,
+                duration_ms REAL NOT NULL,
+                status TEXT,
+                error TEXT,
+                attrs TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_trace_spans_started ON trace_spans(started_at);
+            CREATE INDEX IF NOT EXISTS idx_trace_spans_name ON trace_spans(name, started_at);
+            CREATE INDEX IF NOT EXISTS idx_trace_spans_trace ON trace_spans(trace_id);
+            CREATE INDEX IF NOT EXISTS idx_trace_spans_message ON trace_spans(message_id);
+        """)
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------ record
+    def record(self, span: Dict[str, Any]):
+        with self._lock:
+            self._ring.append(span)
+            self._pending.append(span)
+            due = (len(self._pending) >= TRACE_FLUSH_BATCH
+                   or time.monotonic() - self._last_flush >= TRACE_FLUSH_INTERVAL_SECONDS)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Schreibt gepufferte Spans nach SQLite"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not batch:
+            return
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.executemany("""
+                INSERT OR REPLACE INTO trace_spans (
+                    span_id, trace_id, parent_id, name, kind, channel, message_id,
+                    started_at, duration_ms, status, error, attrs
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (s["span_id"], s["trace_id"], s["parent_id"], s["name"], s["kind"], s["channel"],
+                 s["message_id"], s["started_at"], s["duration_ms"], s["status"], s["error"],
+                 json.dumps(s["attrs"], ensure_ascii=False, default=str) if s["attrs"] else None)
+                for s in batch
+            ])
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Trace flush failed ({len(batch)} spans dropped): {e}")
+
+    def purge(self, retention_days: int = TRACE_RETENTION_DAYS) -> int:
+        """Löscht Spans älter als retention_days"""
+        self.flush()
+        conn = sqlite3.connect(self.db_path)
+        deleted = conn.execute(
+            "DELETE FROM trace_spans WHERE started_at < ?", (time.time() - retention_days * 86400,)
+        ).rowcount
+        conn.commit()
+        conn.close()
+        logger.info(f"🔭 Trace retention: {deleted} spans older than {retention_days} days deleted")
+        return deleted
+
+    # ------------------------------------------------------------------ query
+    def _recent_spans(self, window_seconds: float, source: str, channel: Optional[str]) -> List[Dict[str, Any]]:
+        since = time.time() - window_seconds
+        if source == "db":
+            self.flush()
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            query = "SELECT name, kind, channel, duration_ms, status FROM trace_spans WHERE started_at >= ?"
+            params: List[Any] = [since]
+            if channel:
+                query += " AND channel = ?"
+                params.append(channel)
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+            conn.close()
+            return rows
+        with self._lock:
+            spans = list(self._ring)
+        return [s for s in spans if s["started_at"] >= since and (not channel or s["channel"] == channel)]
+
+    def get_stage_latencies(self, window_seconds: float = 3600, source: str = "memory",
+                            channel: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Latenz-Perzentile je Stage über den letzten Zeitraum.
+
+        Args:
+            window_seconds: Betrachtungszeitraum
+            source: "memory" (Ringpuffer) oder "db" (SQLite, längere Zeiträume)
+            channel: optional nur email/call/whatsapp
+        """
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for s in self._recent_spans(window_seconds, source, channel):
+            entry = by_name.setdefault(s["name"], {"kind": s["kind"], "durations": [], "errors": 0})
+            entry["durations"].append(s["duration_ms"])
+            if s["status"] == "error":
+                entry["errors"] += 1
+
+        stages = {}
+        for name, entry in sorted(by_name.items()):
+            durations = sorted(entry["durations"])
+            stages[name] = {
+                "kind": entry["kind"],
+                "count": len(durations),
+                "errors": entry["errors"],
+                "p50_ms": round(_percentile(durations, 0.50), 1),
+                "p95_ms": round(_percentile(durations, 0.95), 1),
+                "p99_ms": round(_percentile(durations, 0.99), 1),
+                "max_ms": round(durations[-1], 1),
+            }
+        return {"window_seconds": window_seconds, "source": source, "channel": channel, "stages": stages}
+
+    def get_recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Letzte Traces (Root-Spans) aus dem Ringpuffer, neueste zuerst"""
+        with self._lock:
+            roots = [s for s in self._ring if s["parent_id"] is None and s["trace_id"]]
+        return [
+            {key: s[key] for key in ("trace_id", "name", "channel", "message_id", "started_at", "duration_ms", "status")}
+            for s in reversed(roots[-limit:])
+        ]
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Alle Spans eines Traces (chronologisch)"""
+        self.flush()
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT * FROM trace_spans WHERE trace_id = ? ORDER BY started_at", (trace_id,)
+        ).fetchall()
+        conn.close()
+        spans = []
+        for row in rows:
+            span = dict(row)
+            span["attrs"] = json.loads(span["attrs"]) if span["attrs"] else {}
+            spans.append(span)
+        return spans
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ring_spans": len(self._ring), "ring_size": self._ring.maxlen, "pending_flush": len(self._pending)}
+
+
+# Globale Instanz (Singleton-Pattern)
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Gibt die globale Tracer Instanz zurück"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+# ===============================
+# SPANS
+# ===============================
+
+@contextmanager
+def span(name: str, kind: str = KIND_STAGE, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Zeichnet einen Span auf (auch um ``await`` herum verwendbar).
+
+    Liefert das attrs-Dict, das innerhalb des Blocks ergänzt werden kann.
+    """
+    trace = _current_trace.get()
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    started_at = time.time()
+    start = time.perf_counter()
+    status, error = "ok", None
+    try:
+        yield attrs
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        _current_span.reset(token)
+        duration = time.perf_counter() - start
+        STAGE_DURATION.observe(duration, stage=name, kind=kind)
+        get_tracer().record({
+            "span_id": span_id,
+            "trace_id": trace.trace_id if trace else None,
+            "parent_id": parent_id,
+            "name": name,
+            "kind": kind,
+            "channel": trace.channel if trace else None,
+            "message_id": trace.message_id if trace else None,
+            "started_at": started_at,
+            "duration_ms": round(duration * 1000, 2),
+            "status": status,
+            "error": error,
+            "attrs": attrs,
+        })
+
+
+@contextmanager
+def start_trace(channel: str, name: str, message_id: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Startet einen Trace mit Root-Span ``name``.
+
+    Läuft bereits ein Trace (z.B. Workflow innerhalb der Email-Pipeline), wird
+    nur ein weiterer Span darin aufgezeichnet.
+    """
+    current = _current_trace.get()
+    if current is not None:
+        if message_id and not current.message_id:
+            current.message_id = str(message_id)
+        with span(name):
+            yield current
+        return
+
+    trace = Trace(channel, str(message_id) if message_id else None)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        with span(name):
+            yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+def annotate_trace(message_id: Optional[Any] = None):
+    """Message-ID nachträglich setzen (z.B. erst nach dem Parsen des Payloads bekannt)"""
+    trace = _current_trace.get()
+    if trace is not None and message_id and not trace.message_id:
+        trace.message_id = str(message_id)
+
+
+def traced(name: str, channel: Optional[str] = None, channel_param: Optional[str] = None,
+           message_id_param: Optional[str] = None) -> Callable:
+    """
+    Decorator für async Funktionen: Span ``name``; mit channel/channel_param
+    wird ein Trace gestartet, falls noch keiner läuft.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            trace_channel = channel
+            message_id = None
+            if channel_param or message_id_param:
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                trace_channel = bound.get(channel_param, trace_channel) if channel_param else trace_channel
+                message_id = bound.get(message_id_param) if message_id_param else None
+            if trace_channel:
+                with start_trace(trace_channel, name, message_id):
+                    return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_node(name: str, node: Callable) -> Callable:
+    """Wrappt einen LangGraph Node in einen Span ``node.<name>``"""
+    @functools.wraps(node)
+    async def wrapper(state):
+        with span(f"node.{name}"):
+            return await node(state)
+    return wrapper
+
+
+# ===============================
+# HTTP INSTRUMENTIERUNG
+# ===============================
+
+@contextmanager
+def _http_span(method: str, url: Any) -> Iterator[Dict[str, Any]]:
+    """Metriken für jeden externen Call, Span nur innerhalb eines Traces"""
+    parts = urlsplit(str(url))
+    service = service_for_host(parts.hostname)
+    call: Dict[str, Any] = {"status_code": "error", "response": None}
+    start = time.perf_counter()
+    try:
+        if _current_trace.get() is None:
+            # Außerhalb eines Traces (Scheduler, Startup) kein Span
+            yield call
+        else:
+            with span(f"http.{service}", kind=KIND_EXTERNAL,
+                      method=str(method).upper(), host=parts.hostname, path=parts.path[:200]) as attrs:
+                try:
+                    yield call
+                finally:
+                    attrs["status_code"] = call["status_code"]
+    finally:
+        record_upstream_call(service, parts.hostname, call["status_code"], time.perf_counter() - start, call["response"])
+
+
+_instrumented = False
+
+
+def instrument_http_clients():
+    """Patcht httpx, aiohttp und requests einmalig, sodass jeder externe Call einen Span erzeugt"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    try:
+        import httpx
+
+        original_async_send = httpx.AsyncClient.send
+        original_send = httpx.Client.send
+
+        @functools.wraps(original_async_send)
+        async def async_send(self, request, *args, **kwargs):
+            with _http_span(request.method, request.url) as call:
+                response = await original_async_send(self, request, *args, **kwargs)
+                call["status_code"], call["response"] = response.status_code, response
+                return response
+
+        @functools.wraps(original_send)
+        def send(self, request, *args, **kwargs):
+            with _http_span(request.method, request.url) as call:
+                response = original_send(self, request, *args, **kwargs)
+                call["status_code"], call["response"] = response.status_code, response
+                return response
+
+        httpx.AsyncClient.send = async_send
+        httpx.Client.send = send
+    except ImportError:
+        pass
+
+    try:
+        import aiohttp
+
+        original_request = aiohttp.ClientSession._request
+
+        # Misst bis zum Eintreffen der Response-Header (Body wird vom Aufrufer gelesen)
+        @functools.wraps(original_request)
+        async def aiohttp_request(self, method, str_or_url, *args, **kwargs):
+            with _http_span(method, str_or_url) as call:
+                response = await original_request(self, method, str_or_url, *args, **kwargs)
+                call["status_code"] = response.status
+                return response
+
+        aiohttp.ClientSession._request = aiohttp_request
+    except ImportError:
+        pass
+
+    try:
+        import requests
+
+        original_session_request = requests.Session.request
+
+        @functools.wraps(original_session_request)
+        def session_request(self, method, url, *args, **kwargs):
+            with _http_span(method, url) as call:
+                response = original_session_request(self, method, url, *args, **kwargs)
+                call["status_code"] = response.status_code
+                return response
+
+        requests.Session.request = session_request
+    except ImportError:
+        pass
+
+    logger.info("🔭 HTTP clients instrumented for tracing and metrics")
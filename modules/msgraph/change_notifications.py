@@ -0,0 +1,623 @@
+"""
+Graph Email Ingestion - Change Notifications + Delta Query statt Zapier-Polling
+
+Bisher fragt Zapier die Postfächer ab und ruft pro Email /webhook/ai-email
+auf (Verzögerung je nach Zap-Intervall, verpasste Emails bei Ausfällen).
+Die native Ingestion bekommt neue Emails direkt von Microsoft Graph:
+
+- pro Postfach (MAILBOXES) und Ordner (INGESTION_FOLDERS) eine Subscription
+  auf users/{postfach}/mailFolders('{ordner}')/messages (changeType created).
+  Subscriptions laufen nach wenigen Tagen ab → der Job graph_subscriptions
+  verlängert sie rechtzeitig (PATCH), 404/abgelaufen → neu anlegen
+- Notifications (/webhook/graph/notifications) werden per clientState
+  geprüft und stoßen nur einen Delta-Sync des Ordners an; Notifications
+  während eines laufenden Syncs → genau ein weiterer Durchlauf
+- Delta-Sync: GET .../messages/delta mit dem gespeicherten deltaLink liefert
+  alle Änderungen seit dem letzten Lauf - auch nach Redeploys, Ausfällen und
+  verpassten Notifications. Der erste Lauf beginnt INGESTION_LOOKBACK_HOURS
+  zurück; der deltaLink wird erst gespeichert, wenn alle Seiten eingereiht
+  sind (Warteschlange voll → später ab dem alten Stand erneut)
+- neue Emails gehen per Callback direkt in die Warteschlange des Postfachs
+  (Mailbox Registry → process_email_background); bereits verarbeitete
+  Message IDs (Duplicate Index) und geänderte Emails werden übersprungen
+
+Die Zapier-Webhooks bleiben parallel nutzbar (Duplikate fängt der Index ab).
+Für Tests: base_url auf den lokalen Graph-Ersatz (graph_standin.py) setzen.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from modules.msgraph.folder_resolver import GRAPH_BASE_URL, GRAPH_TIMEOUT_SECONDS
+from modules.scheduler.admission import AdmissionRejected
+from modules.scheduler.job_scheduler import LeaderLock, get_task_registry
+from modules.scheduler.mailboxes import MailboxRegistry, get_mailbox_registry
+
+logger = logging.getLogger(__name__)
+
+GRAPH_INGESTION_ENABLED = os.getenv("GRAPH_INGESTION_ENABLED", "false").lower() == "true"
+GRAPH_NOTIFICATION_URL = os.getenv("GRAPH_NOTIFICATION_URL", "")
+GRAPH_LIFECYCLE_URL = os.getenv("GRAPH_LIFECYCLE_URL", "")
+GRAPH_CLIENT_STATE = os.getenv("GRAPH_CLIENT_STATE", "")
+INGESTION_DB_PATH = os.getenv("INGESTION_DB_PATH", "/tmp/email_tracking.db")
+# ordner[:richtung], kommagetrennt (Well-known Names oder Ordner-IDs)
+INGESTION_FOLDERS = os.getenv("INGESTION_FOLDERS", "inbox:incoming")
+INGESTION_LOOKBACK_HOURS = float(os.getenv("INGESTION_LOOKBACK_HOURS", "24"))
+INGESTION_PAGE_SIZE = int(os.getenv("INGESTION_PAGE_SIZE", "50"))
+
+# Outlook-Nachrichten: maximal 10080 Minuten; Verlängerung wenn weniger als 24h übrig
+SUBSCRIPTION_LIFETIME_MINUTES = int(os.getenv("GRAPH_SUBSCRIPTION_MINUTES", "4200"))
+SUBSCRIPTION_RENEW_BEFORE = timedelta(hours=24)
+
+DELTA_SELECT = "id,subject,from,receivedDateTime,hasAttachments,importance,isDraft"
+DELTA_LEASE_SECONDS = 300
+DELTA_MAX_ATTEMPTS = 5
+LOCKED_RETRY_SECONDS = 30
+RECENT_MESSAGE_IDS = 5000
+
+FolderKey = Tuple[str, str]
+Dispatch = Callable[[str, str, Dict[str, Any]], None]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _graph_time(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_graph_time(value: Optional[str]) -> Optional[datetime]:
+    """'2025-10-21T10:00:00.1234567Z' → aware datetime (Graph liefert 7 Nachkommastellen)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_folders(spec: str) -> List[Tuple[str, str]]:
+    """'inbox:incoming,sentitems:outgoing' → [(ordner, richtung)]"""
+    folders = []
+    for entry in spec.split(","):
+        folder, _, direction = entry.strip().partition(":")
+        if folder.strip():
+            folders.append((folder.strip().lower(), direction.strip() or "incoming"))
+    return folders
+
+
+def _default_is_known(message_id: str) -> bool:
+    """Bereits verarbeitet? (Duplicate Index der Tracking-DB, Bloom-Filter zuerst)"""
+    from modules.database.duplicate_index import KIND_MESSAGE_ID
+    from modules.database.email_tracking_db import get_email_tracking_db
+
+    return bool(get_email_tracking_db().duplicate_index.check([(KIND_MESSAGE_ID, message_id)]))
+
+
+class GraphIngestion:
+    """📥 Subscriptions + Delta-Sync pro Postfach und Ordner"""
+
+    def __init__(self, db_path: str = INGESTION_DB_PATH, base_url: str = GRAPH_BASE_URL,
+                 folders: str = INGESTION_FOLDERS, registry: Optional[MailboxRegistry] = None,
+                 client_state: str = GRAPH_CLIENT_STATE, enabled: bool = GRAPH_INGESTION_ENABLED,
+                 is_known: Callable[[str], bool] = _default_is_known):
+        self.db_path = db_path
+        self.base_url = base_url.rstrip("/")
+        self.folders = parse_folders(folders)
+        self.registry = registry or get_mailbox_registry()
+        self.client_state = client_state
+        self.enabled = enabled
+        self.is_known = is_known
+        self.notification_url = GRAPH_NOTIFICATION_URL
+        self.lifecycle_url = GRAPH_LIFECYCLE_URL
+        self.token_provider: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+        self.dispatch: Optional[Dispatch] = None
+        self.leader_lock = LeaderLock(db_path)
+        self._syncing: set = set()
+        self._dirty: set = set()
+        self._timers: Dict[FolderKey, asyncio.Task] = {}
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {
+            "notifications": 0, "notifications_rejected": 0, "notifications_unknown": 0, "lifecycle_events": 0,
+            "subscriptions_created": 0, "subscriptions_renewed": 0, "subscriptions_failed": 0,
+            "syncs": 0, "syncs_coalesced": 0, "syncs_failed": 0, "syncs_locked": 0, "syncs_deferred": 0,
+            "resyncs": 0, "pages": 0, "dispatched": 0, "skipped_known": 0, "skipped_removed": 0,
+        }
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS graph_subscriptions (
+                mailbox TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                subscription_id TEXT NOT NULL UNIQUE,
+                resource TEXT,
+                expires_at TEXT NOT NULL,
+                created_at TEXT,
+                renewed_at TEXT,
+                PRIMARY KEY (mailbox, folder)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS graph_delta_state (
+                mailbox TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                delta_link TEXT,
+                synced_at TEXT,
+                messages_total INTEGER DEFAULT 0,
+                PRIMARY KEY (mailbox, folder)
+            )
+        """)
+        # Leases gegen parallele Syncs mehrerer Worker (gleiche Tabelle wie im JobScheduler)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduler_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def configure(self, token_provider: Callable[[], Awaitable[Optional[str]]], dispatch: Dispatch,
+                  notification_url: Optional[str] = None, lifecycle_url: Optional[str] = None):
+        """
+        Verdrahtung durch den Orchestrator (beim Start)
+
+        Args:
+            token_provider: async () → Graph Access Token (Mail.Read, Application)
+            dispatch: (postfach, richtung, message) → reiht die Email ein;
+                      darf AdmissionRejected werfen (Warteschlange voll)
+            notification_url / lifecycle_url: öffentliche URLs der Webhooks
+        """
+        self.token_provider = token_provider
+        self.dispatch = dispatch
+        self.notification_url = self.notification_url or notification_url or ""
+        self.lifecycle_url = self.lifecycle_url or lifecycle_url or ""
+        if self.enabled and not self.client_state:
+            logger.warning("⚠️ GRAPH_CLIENT_STATE not set - Graph ingestion disabled (notifications could not be verified)")
+            self.enabled = False
+
+    def targets(self) -> List[Tuple[str, str, str]]:
+        """(postfach, ordner, richtung) für alle konfigurierten Postfächer"""
+        return [
+            (mailbox, folder, direction)
+            for mailbox in self.registry.configured_addresses
+            for folder, direction in self.folders
+        ]
+
+    def _direction(self, folder: str) -> str:
+        return next((direction for name, direction in self.folders if name == folder), "incoming")
+
+    async def _token(self) -> Optional[str]:
+        token = await self.token_provider() if self.token_provider else None
+        if not token:
+            logger.error("❌ Graph ingestion: no access token")
+        return token
+
+    # --------------------------------------------------------- subscriptions
+    def _load_subscription(self, mailbox: str, folder: str) -> Optional[Dict[str, Any]]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT * FROM graph_subscriptions WHERE mailbox = ? AND folder = ?", (mailbox, folder)
+        ).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def _subscription_by_id(self, subscription_id: str) -> Optional[Dict[str, Any]]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT * FROM graph_subscriptions WHERE subscription_id = ?", (subscription_id,)
+        ).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def _save_subscription(self, mailbox: str, folder: str, subscription: Dict[str, Any], renewed: bool = False):
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT INTO graph_subscriptions (mailbox, folder, subscription_id, resource, expires_at, created_at, renewed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(mailbox, folder) DO UPDATE SET
+                subscription_id = excluded.subscription_id, resource = excluded.resource,
+                expires_at = excluded.expires_at, renewed_at = excluded.renewed_at,
+                created_at = CASE WHEN graph_subscriptions.subscription_id = excluded.subscription_id
+                                  THEN graph_subscriptions.created_at ELSE excluded.created_at END
+        """, (mailbox, folder, subscription["id"], subscription.get("resource"),
+              subscription["expirationDateTime"], now, now if renewed else None))
+        conn.commit()
+        conn.close()
+
+    def _delete_subscription(self, subscription_id: str):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM graph_subscriptions WHERE subscription_id = ?", (subscription_id,))
+        conn.commit()
+        conn.close()
+
+    async def ensure_subscriptions(self) -> Dict[str, str]:
+        """Fehlende Subscriptions anlegen, bald ablaufende verlängern (Job graph_subscriptions)"""
+        if not self.enabled:
+            return {}
+        if not self.notification_url:
+            logger.warning("⚠️ Graph ingestion: no notification URL - subscriptions skipped, delta sync only")
+            return {}
+        token = await self._token()
+        if not token:
+            return {}
+
+        results = {}
+        async with httpx.AsyncClient(timeout=GRAPH_TIMEOUT_SECONDS) as client:
+            for mailbox, folder, _ in self.targets():
+                subscription = self._load_subscription(mailbox, folder)
+                expires_at = _parse_graph_time(subscription["expires_at"]) if subscription else None
+                try:
+                    if expires_at and expires_at - _utcnow() > SUBSCRIPTION_RENEW_BEFORE:
+                        status = "active"
+                    elif expires_at and expires_at > _utcnow():
+                        status = await self._renew(client, token, subscription)
+                    else:
+                        if subscription:
+                            self._delete_subscription(subscription["subscription_id"])
+                        status = await self._create(client, token, mailbox, folder)
+                except httpx.HTTPError as e:
+                    self.stats["subscriptions_failed"] += 1
+                    logger.error(f"❌ Graph subscription {mailbox}/{folder} failed: {e!r}")
+                    status = "failed"
+                results[f"{mailbox}/{folder}"] = status
+
+        changed = {key: status for key, status in results.items() if status != "active"}
+        if changed:
+            logger.info(f"📡 Graph subscriptions: {changed}")
+        return results
+
+    async def _create(self, client: httpx.AsyncClient, token: str, mailbox: str, folder: str) -> str:
+        body = {
+            "changeType": "created",
+            "notificationUrl": self.notification_url,
+            "resource": f"users/{mailbox}/mailFolders('{folder}')/messages",
+            "expirationDateTime": _graph_time(_utcnow() + timedelta(minutes=SUBSCRIPTION_LIFETIME_MINUTES)),
+            "clientState": self.client_state,
+            "latestSupportedTlsVersion": "v1_2",
+        }
+        if self.lifecycle_url:
+            body["lifecycleNotificationUrl"] = self.lifecycle_url
+
+        # Graph validiert die notificationUrl synchron, bevor es antwortet
+        budget = self.registry.graph_budget(mailbox)
+        async with budget.request():
+            response = await client.post(f"{self.base_url}/subscriptions", json=body,
+                                         headers={"Authorization": f"Bearer {token}"})
+        budget.record_response(response)
+        if response.status_code != 201:
+            self.stats["subscriptions_failed"] += 1
+            logger.error(f"❌ Graph subscription {mailbox}/{folder}: {response.status_code} - {response.text[:200]}")
+            return "failed"
+
+        self._save_subscription(mailbox, folder, response.json())
+        self.stats["subscriptions_created"] += 1
+        return "created"
+
+    async def _renew(self, client: httpx.AsyncClient, token: str, subscription: Dict[str, Any]) -> str:
+        mailbox, folder = subscription["mailbox"], subscription["folder"]
+        expiration = _graph_time(_utcnow() + timedelta(minutes=SUBSCRIPTION_LIFETIME_MINUTES))
+        budget = self.registry.graph_budget(mailbox)
+        async with budget.request():
+            response = await client.patch(f"{self.base_url}/subscriptions/{subscription['subscription_id']}",
+                                          json={"expirationDateTime": expiration},
+                                          headers={"Authorization": f"Bearer {token}"})
+        budget.record_response(response)
+        if response.status_code == 404:
+            # Von Graph entfernt (abgelaufen, Berechtigung entzogen) → neu anlegen + verpasste Emails nachholen
+            self._delete_subscription(subscription["subscription_id"])
+            self.request_sync(mailbox, folder)
+            return await self._create(client, token, mailbox, folder)
+        if response.status_code != 200:
+            self.stats["subscriptions_failed"] += 1
+            logger.error(f"❌ Graph subscription renew {mailbox}/{folder}: {response.status_code} - {response.text[:200]}")
+            return "failed"
+
+        self._save_subscription(mailbox, folder, {**response.json(), "id": subscription["subscription_id"]}, renewed=True)
+        self.stats["subscriptions_renewed"] += 1
+        return "renewed"
+
+    async def refresh_subscription(self, subscription_id: str) -> str:
+        """Einzelne Subscription sofort verlängern bzw. neu anlegen (Lifecycle-Events)"""
+        subscription = self._subscription_by_id(subscription_id)
+        token = await self._token() if subscription else None
+        if not token:
+            return "unknown" if not subscription else "failed"
+        async with httpx.AsyncClient(timeout=GRAPH_TIMEOUT_SECONDS) as client:
+            return await self._renew(client, token, subscription)
+
+    # --------------------------------------------------------- notifications
+    def _verified(self, notification: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """clientState prüfen (konstante Zeit) und Subscription zuordnen"""
+        if not hmac.compare_digest(str(notification.get("clientState") or ""), self.client_state):
+            self.stats["notifications_rejected"] += 1
+            logger.warning(f"🚫 Graph notification with invalid clientState (subscription {notification.get('subscriptionId')})")
+            return None
+        subscription = self._subscription_by_id(str(notification.get("subscriptionId") or ""))
+        if subscription is None:
+            self.stats["notifications_unknown"] += 1
+            logger.warning(f"⚠️ Graph notification for unknown subscription {notification.get('subscriptionId')}")
+        return subscription
+
+    def handle_notifications(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Change Notifications → Delta-Sync der betroffenen Ordner (kehrt sofort zurück;
+        Graph erwartet die Antwort innerhalb von 3 Sekunden)
+        """
+        accepted = 0
+        for notification in (payload or {}).get("value") or []:
+            self.stats["notifications"] += 1
+            subscription = self._verified(notification) if self.enabled else None
+            if subscription is None:
+                continue
+            accepted += 1
+            self.request_sync(subscription["mailbox"], subscription["folder"])
+        return {"status": "accepted", "accepted": accepted}
+
+    def handle_lifecycle(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Lifecycle Notifications: reauthorizationRequired | subscriptionRemoved | missed"""
+        accepted = 0
+        for notification in (payload or {}).get("value") or []:
+            self.stats["lifecycle_events"] += 1
+            subscription = self._verified(notification) if self.enabled else None
+            if subscription is None:
+                continue
+            accepted += 1
+            event = notification.get("lifecycleEvent")
+            mailbox, folder = subscription["mailbox"], subscription["folder"]
+            logger.info(f"📡 Graph lifecycle event '{event}' for {mailbox}/{folder}")
+            if event in ("reauthorizationRequired", "subscriptionRemoved"):
+                # subscriptionRemoved → PATCH liefert 404 → neu anlegen + Delta-Sync
+                get_task_registry().spawn(self.refresh_subscription(subscription["subscription_id"]),
+                                          name=f"graph-subscription:{mailbox}/{folder}")
+            if event in ("missed", "subscriptionRemoved"):
+                self.request_sync(mailbox, folder)
+        return {"status": "accepted", "accepted": accepted}
+
+    # ------------------------------------------------------------ delta sync
+    def request_sync(self, mailbox: str, folder: str):
+        """Delta-Sync anstoßen; läuft schon einer für den Ordner → danach genau ein weiterer"""
+        key = (mailbox, folder)
+        if key in self._syncing:
+            self._dirty.add(key)
+            self.stats["syncs_coalesced"] += 1
+            return
+        self._syncing.add(key)
+        get_task_registry().spawn(self._sync_loop(key), name=f"graph-delta:{mailbox}/{folder}")
+
+    async def _sync_loop(self, key: FolderKey) -> Dict[str, Any]:
+        """Caller hat ``key`` in _syncing eingetragen; Ergebnis des letzten Laufs"""
+        try:
+            while True:
+                self._dirty.discard(key)
+                result = await self.sync_folder(*key)
+                if key not in self._dirty:
+                    return result
+        finally:
+            self._syncing.discard(key)
+
+    async def sync_all(self) -> Dict[str, Any]:
+        """Delta-Sync aller Postfächer/Ordner (Start-Catch-up und Job graph_delta_sync)"""
+        if not self.enabled:
+            return {}
+        keys, coalesced = [], []
+        for mailbox, folder, _ in self.targets():
+            key = (mailbox, folder)
+            (coalesced if key in self._syncing else keys).append(key)
+        # wie request_sync: laufender Sync → danach genau ein weiterer, sonst als laufend markieren,
+        # damit Notifications während des Catch-ups keinen zweiten Sync desselben Ordners starten
+        self._dirty.update(coalesced)
+        self.stats["syncs_coalesced"] += len(coalesced)
+        self._syncing.update(keys)
+        results = await asyncio.gather(*(self._sync_loop(key) for key in keys), return_exceptions=True)
+        return {
+            **{f"{mailbox}/{folder}": {"status": "coalesced"} for mailbox, folder in coalesced},
+            **{
+                f"{mailbox}/{folder}": {"status": "failed", "error": repr(r)} if isinstance(r, Exception) else r
+                for (mailbox, folder), r in zip(keys, results)
+            },
+        }
+
+    def _load_delta(self, mailbox: str, folder: str) -> Tuple[Optional[str], Optional[str]]:
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT delta_link, synced_at FROM graph_delta_state WHERE mailbox = ? AND folder = ?", (mailbox, folder)
+        ).fetchone()
+        conn.close()
+        return (row[0], row[1]) if row else (None, None)
+
+    def _save_delta(self, mailbox: str, folder: str, delta_link: Optional[str], dispatched: int):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT INTO graph_delta_state (mailbox, folder, delta_link, synced_at, messages_total)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(mailbox, folder) DO UPDATE SET
+                delta_link = excluded.delta_link, synced_at = excluded.synced_at,
+                messages_total = graph_delta_state.messages_total + excluded.messages_total
+        """, (mailbox, folder, delta_link, _utcnow().isoformat(), dispatched))
+        conn.commit()
+        conn.close()
+
+    def _initial_request(self, mailbox: str, folder: str, synced_at: Optional[str]) -> Tuple[str, Dict[str, str]]:
+        """Erster Lauf bzw. nach abgelaufenem Token: ab letztem Sync (-1h) oder INGESTION_LOOKBACK_HOURS"""
+        last_sync = _parse_graph_time(synced_at)
+        since = last_sync - timedelta(hours=1) if last_sync else _utcnow() - timedelta(hours=INGESTION_LOOKBACK_HOURS)
+        return (
+            f"{self.base_url}/users/{mailbox}/mailFolders/{folder}/messages/delta",
+            {"$select": DELTA_SELECT, "$filter": f"receivedDateTime ge {_graph_time(since)}"},
+        )
+
+    def _seen(self, message_id: str) -> bool:
+        if message_id in self._recent:
+            self._recent.move_to_end(message_id)
+            return True
+        return self.is_known(message_id)
+
+    def _remember(self, message_id: str):
+        self._recent[message_id] = None
+        if len(self._recent) > RECENT_MESSAGE_IDS:
+            self._recent.popitem(last=False)
+
+    def _retry_later(self, key: FolderKey, delay: float):
+        """Sync nach ``delay`` Sekunden erneut anstoßen (ein Timer pro Ordner)"""
+        if key in self._timers:
+            return
+
+        async def _timer():
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._timers.pop(key, None)
+            self.request_sync(*key)
+
+        self._timers[key] = asyncio.create_task(_timer(), name=f"graph-delta-retry:{key[0]}/{key[1]}")
+
+    async def sync_folder(self, mailbox: str, folder: str) -> Dict[str, Any]:
+        """
+        Holt alle Änderungen seit dem letzten deltaLink und reiht neue Emails ein
+
+        Returns:
+            {"status": ok|locked|deferred|failed|disabled, "pages", "dispatched", "skipped"}
+        """
+        if not self.enabled or self.dispatch is None:
+            return {"status": "disabled"}
+
+        lock_name = f"graph_delta:{mailbox}:{folder}"
+        if not self.leader_lock.acquire(lock_name, DELTA_LEASE_SECONDS):
+            # Anderer Worker synchronisiert gerade; danach nochmal, falls er die Email knapp verpasst
+            self.stats["syncs_locked"] += 1
+            self._retry_later((mailbox, folder), LOCKED_RETRY_SECONDS)
+            return {"status": "locked"}
+
+        result = {"status": "ok", "pages": 0, "dispatched": 0, "skipped": 0}
+        try:
+            token = await self._token()
+            if not token:
+                result["status"] = "failed"
+                return result
+
+            direction = self._direction(folder)
+            delta_link, synced_at = self._load_delta(mailbox, folder)
+            url, params = (delta_link, None) if delta_link else self._initial_request(mailbox, folder, synced_at)
+            headers = {"Authorization": f"Bearer {token}", "Prefer": f"odata.maxpagesize={INGESTION_PAGE_SIZE}"}
+            budget = self.registry.graph_budget(mailbox)
+            attempts = 0
+            resynced = False
+            next_delta = None
+
+            async with httpx.AsyncClient(timeout=GRAPH_TIMEOUT_SECONDS) as client:
+                while url:
+                    async with budget.request():
+                        response = await client.get(url, params=params, headers=headers)
+                    budget.record_response(response)
+
+                    if response.status_code in (429, 503) and attempts < DELTA_MAX_ATTEMPTS:
+                        attempts += 1  # budget wartet beim nächsten Request das Retry-After ab
+                        continue
+                    if response.status_code == 410 and not resynced:
+                        # Delta-Token abgelaufen (syncStateNotFound) → neue Runde ab letztem Sync
+                        logger.warning(f"⚠️ Graph delta token expired for {mailbox}/{folder} - resyncing")
+                        self.stats["resyncs"] += 1
+                        resynced = True
+                        url, params = self._initial_request(mailbox, folder, synced_at)
+                        continue
+                    if response.status_code != 200:
+                        self.stats["syncs_failed"] += 1
+                        logger.error(f"❌ Graph delta {mailbox}/{folder}: {response.status_code} - {response.text[:200]}")
+                        result["status"] = "failed"
+                        return result
+
+                    attempts = 0
+                    page = response.json()
+                    result["pages"] += 1
+                    self.stats["pages"] += 1
+                    for message in page.get("value", []):
+                        message_id = message.get("id")
+                        if "@removed" in message or message.get("isDraft"):
+                            self.stats["skipped_removed"] += 1
+                            continue
+                        if not message_id or self._seen(message_id):
+                            result["skipped"] += 1
+                            self.stats["skipped_known"] += 1
+                            continue
+                        # AdmissionRejected → deltaLink bleibt auf dem alten Stand
+                        self.dispatch(mailbox, direction, message)
+                        self._remember(message_id)
+                        result["dispatched"] += 1
+                        self.stats["dispatched"] += 1
+
+                    url, params = page.get("@odata.nextLink"), None
+                    next_delta = page.get("@odata.deltaLink")
+
+            self._save_delta(mailbox, folder, next_delta, result["dispatched"])
+            self.stats["syncs"] += 1
+            if result["dispatched"]:
+                logger.info(f"📥 Graph delta {mailbox}/{folder}: {result['dispatched']} new email(s) queued "
+                            f"({result['pages']} page(s), {result['skipped']} known)")
+            return result
+
+        except AdmissionRejected as e:
+            # Emails dieser Runde bis hierher sind eingereiht (_recent) → später ab altem deltaLink weiter
+            self.stats["syncs_deferred"] += 1
+            logger.warning(f"🚦 Graph delta {mailbox}/{folder} deferred: queue full (retry after {e.retry_after}s)")
+            self._retry_later((mailbox, folder), e.retry_after)
+            result["status"] = "deferred"
+            return result
+        except httpx.HTTPError as e:
+            self.stats["syncs_failed"] += 1
+            logger.error(f"❌ Graph delta {mailbox}/{folder} failed: {e!r}")
+            result["status"] = "failed"
+            return result
+        finally:
+            self.leader_lock.release(lock_name)
+
+    async def stop(self):
+        """Wartende Retry-Timer abbrechen (laufende Syncs beendet die TaskRegistry)"""
+        timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = sqlite3.connect(self.db_path)
+        subscriptions = conn.execute("SELECT mailbox, folder, expires_at FROM graph_subscriptions").fetchall()
+        deltas = conn.execute("SELECT mailbox, folder, delta_link IS NOT NULL, synced_at, messages_total FROM graph_delta_state").fetchall()
+        conn.close()
+        return {
+            "enabled": self.enabled,
+            "folders": [f"{folder}:{direction}" for folder, direction in self.folders],
+            **self.stats,
+            "syncing": sorted(f"{m}/{f}" for m, f in self._syncing),
+            "subscriptions": {f"{m}/{f}": expires_at for m, f, expires_at in subscriptions},
+            "delta": {f"{m}/{f}": {"has_token": bool(has_token), "synced_at": synced_at, "messages_total": total}
+                      for m, f, has_token, synced_at, total in deltas},
+        }
+
+
+# Globale Instanz (Singleton-Pattern)
+_graph_ingestion: Optional[GraphIngestion] = None
+
+
+def get_graph_ingestion() -> GraphIngestion:
+    """Gibt die globale GraphIngestion Instanz zurück"""
+    global _graph_ingestion
+    if _graph_ingestion is None:
+        _graph_ingestion = GraphIngestion()
+    return _graph_ingestion
@@ -1,86 +1,66 @@
-import requests
+from modules.msgraph.folder_resolver import DRIVE_ME, get_folder_resolver
 from modules.utils.debug_log import debug_log
 
-async def ensure_folder_exists(folder_path, access_token_onedrive):
+async def ensure_folder_exists(folder_path, access_token_onedrive, user_email=None):
     """
-    Stellt sicher, dass ein Ordner in OneDrive existiert. Falls nicht, wird er erstellt.
+    Stellt sicher, dass ein Ordner in OneDrive existiert. Fehlende Ordner im Pfad
+    werden von oben nach unten angelegt; bekannte Ordner kommen aus dem Cache.
 
     Args:
-        folder_path (str): Der Pfad des Ordners.
+        folder_path (str): Der Pfad des Ordners (auch verschachtelt).
         access_token_onedrive (str): Der Zugriffstoken für OneDrive.
+        user_email (str, optional): Besitzer des Drives (Standard: /me).
+
+    Returns:
+        str: Die Drive-Item-ID des Ordners.
 
     Raises:
         Exception: Wenn der Ordner nicht erstellt werden konnte.
     """
     try:
-        # Prüfe, ob der Ordner existiert
-        folder_exists = await check_folder_exists(folder_path, access_token_onedrive)
-        if not folder_exists:
-            debug_log(f"📂 Ordner existiert nicht. Erstelle Ordner: {folder_path}")
-            await create_folder_in_onedrive(folder_path, access_token_onedrive)
-        else:
-            debug_log(f"📂 Ordner existiert bereits: {folder_path}")
+        folder_id = await get_folder_resolver().resolve(user_email or DRIVE_ME, folder_path, access_token_onedrive)
+        debug_log(f"📂 Ordner bereit: {folder_path} ({folder_id})")
+        return folder_id
     except Exception as e:
         debug_log(f"❌ Fehler beim Überprüfen/Erstellen des Ordners: {folder_path} - {e}")
         raise
-    
 
 
-async def check_folder_exists(folder_path, access_token_onedrive):
+
+async def check_folder_exists(folder_path, access_token_onedrive, user_email=None):
     """
-    Überprüft, ob ein Ordner in OneDrive existiert.
+    Überprüft, ob ein Ordner in OneDrive existiert (Cache, sonst ein Graph Call).
 
     Args:
         folder_path (str): Der Pfad des Ordners.
         access_token_onedrive (str): Der Zugriffstoken für OneDrive.
+        user_email (str, optional): Besitzer des Drives (Standard: /me).
 
     Returns:
         bool: True, wenn der Ordner existiert, False sonst.
     """
     try:
-        headers = {
-            "Authorization": f"Bearer {access_token_onedrive}",
-            "Content-Type": "application/json"
-        }
-        # API-Aufruf, um den Ordner zu überprüfen
-        response = requests.get(f"https://graph.microsoft.com/v1.0/me/drive/root:/{folder_path}", headers=headers)
-        return response.status_code == 200
+        folder_id = await get_folder_resolver().find(user_email or DRIVE_ME, folder_path, access_token_onedrive)
+        return folder_id is not None
     except Exception as e:
         debug_log(f"❌ Fehler beim Überprüfen des Ordners: {folder_path} - {e}")
         return False
-    
-async def create_folder_in_onedrive(folder_path, access_token_onedrive):
+
+async def create_folder_in_onedrive(folder_path, access_token_onedrive, user_email=None):
     """
-    Erstellt einen Ordner in OneDrive.
+    Erstellt einen Ordner (inkl. fehlender übergeordneter Ordner) in OneDrive.
 
     Args:
         folder_path (str): Der Pfad des Ordners.
         access_token_onedrive (str): Der Zugriffstoken für OneDrive.
+        user_email (str, optional): Besitzer des Drives (Standard: /me).
 
     Raises:
         Exception: Wenn der Ordner nicht erstellt werden konnte.
     """
     try:
-        headers = {
-            "Authorization": f"Bearer {access_token_onedrive}",
-            "Content-Type": "application/json"
-        }
-        # API-Aufruf, um den Ordner zu erstellen
-        folder_name = folder_path.split("/")[-1]
-        parent_path = "/".join(folder_path.split("/")[:-1])
-        payload = {
-            "name": folder_name,
-            "folder": {},
-            "@microsoft.graph.conflictBehavior": "rename"
-        }
-        response = requests.post(
-            f"https://graph.microsoft.com/v1.0/me/drive/root:/{parent_path}:/children",
-            headers=headers,
-            json=payload
-        )
-        if response.status_code not in [200, 201]:
-            raise Exception(f"Fehler beim Erstellen des Ordners: {response.status_code} - {response.text}")
+        await get_folder_resolver().resolve(user_email or DRIVE_ME, folder_path, access_token_onedrive)
         debug_log(f"✅ Ordner erfolgreich erstellt: {folder_path}")
     except Exception as e:
         debug_log(f"❌ Fehler beim Erstellen des Ordners: {folder_path} - {e}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,302 @@
+"""
+OneDrive Folder Resolver - Cache der Ordner-IDs für die Dokumentablage
+
+Die Ablage (generate_folder_and_filenames) erzeugt tiefe Pfade wie
+Scan/Buchhaltung/2025/10/Eingang/<Lieferant>. Bisher wurde pro Dokument per
+Pfad geprüft bzw. angelegt (blockierend, nur das letzte Segment). Der Resolver
+hält die Drive-Item-IDs bekannter Ordner im Speicher und in SQLite:
+
+- Treffer im Cache → keine Graph Calls; Upload direkt per Item-ID
+  (PUT /drive/items/{ordner_id}:/{datei}:/content)
+- Unbekannter Pfad → ein GET auf den vollen Pfad; existiert er nicht, werden
+  ab dem tiefsten bekannten Vorfahren die fehlenden Segmente von oben nach
+  unten einmal angelegt (409 = existiert bereits → ID per GET übernehmen)
+- Gleichzeitige Auflösungen desselben Pfads teilen sich einen Task (mit
+  eigenem HTTP-Client - der Client eines Aufrufers kann vorher geschlossen werden)
+- 404 auf eine gecachte ID (Ordner gelöscht/verschoben) → Pfad inkl.
+  Unterordnern invalidieren und neu auflösen
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+FOLDER_CACHE_DB_PATH = os.getenv("ONEDRIVE_FOLDER_CACHE_DB_PATH", "/tmp/onedrive_folders.db")
+# Lokaler Graph-Ersatz für Tests: GRAPH_BASE_URL=http://127.0.0.1:8765/v1.0 (graph_standin.py)
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0").rstrip("/")
+GRAPH_TIMEOUT_SECONDS = 30.0
+
+# Drive-Besitzer für /me/drive (delegierte Tokens)
+DRIVE_ME = "me"
+
+
+class FolderResolveError(Exception):
+    """Ordner konnte weder gefunden noch angelegt werden"""
+
+
+def normalize_folder_path(folder_path: str) -> str:
+    """'/Scan//Buchhaltung/' → 'Scan/Buchhaltung'"""
+    return "/".join(segment.strip() for segment in (folder_path or "").replace("\\", "/").split("/") if segment.strip())
+
+
+def _cache_key(path: str) -> str:
+    # OneDrive Pfade sind case-insensitive
+    return path.lower()
+
+
+def _drive_url(drive_owner: str) -> str:
+    return f"{GRAPH_BASE_URL}/me/drive" if drive_owner == DRIVE_ME else f"{GRAPH_BASE_URL}/users/{drive_owner}/drive"
+
+
+class FolderResolver:
+    """📂 Pfad → Drive-Item-ID mit Speicher- und SQLite-Cache"""
+
+    def __init__(self, db_path: str = FOLDER_CACHE_DB_PATH):
+        self.db_path = db_path
+        self._memory: Dict[Tuple[str, str], str] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.stats = {"hits": 0, "misses": 0, "graph_calls": 0, "created": 0, "invalidations": 0, "coalesced": 0}
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS onedrive_folders (
+                drive_owner TEXT NOT NULL,
+                path_key TEXT NOT NULL,
+                path TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                updated_at TEXT,
+                PRIMARY KEY (drive_owner, path_key)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------ cache
+    def get_cached(self, drive_owner: str, folder_path: str) -> Optional[str]:
+        """Item-ID aus Speicher oder SQLite (ohne Graph Call)"""
+        path = normalize_folder_path(folder_path)
+        key = (drive_owner.lower(), _cache_key(path))
+        item_id = self._memory.get(key)
+        if item_id:
+            return item_id
+
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT item_id FROM onedrive_folders WHERE drive_owner = ? AND path_key = ?", key
+        ).fetchone()
+        conn.close()
+        if row:
+            self._memory[key] = row[0]
+            return row[0]
+        return None
+
+    def _remember(self, drive_owner: str, entries: List[Tuple[str, str]]):
+        """entries: [(pfad, item_id)]"""
+        owner = drive_owner.lower()
+        now = datetime.now().isoformat()
+        for path, item_id in entries:
+            self._memory[(owner, _cache_key(path))] = item_id
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            """
+            INSERT INTO onedrive_folders (drive_owner, path_key, path, item_id, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(drive_owner, path_key) DO UPDATE SET
+                path = excluded.path, item_id = excluded.item_id, updated_at = excluded.updated_at
+            """,
+            [(owner, _cache_key(path), path, item_id, now) for path, item_id in entries],
+        )
+        conn.commit()
+        conn.close()
+
+    def invalidate(self, drive_owner: str, folder_path: str) -> int:
+        """Entfernt den Pfad und alle Unterordner aus dem Cache"""
+        owner = drive_owner.lower()
+        key = _cache_key(normalize_folder_path(folder_path))
+        prefix = key + "/"
+        for cached in [k for k in self._memory if k[0] == owner and (k[1] == key or k[1].startswith(prefix))]:
+            del self._memory[cached]
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.execute(
+            """
+            DELETE FROM onedrive_folders
+            WHERE drive_owner = ? AND (path_key = ? OR substr(path_key, 1, ?) = ?)
+            """,
+            (owner, key, len(prefix), prefix),
+        )
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        self.stats["invalidations"] += 1
+        logger.info(f"🗑️ Folder cache invalidated: {folder_path} ({removed} entries)")
+        return removed
+
+    # ---------------------------------------------------------------- resolve
+    async def resolve(self, drive_owner: str, folder_path: str, access_token: str) -> str:
+        """
+        Liefert die Drive-Item-ID des Ordners und legt fehlende Segmente an.
+
+        Raises:
+            FolderResolveError: Graph lehnt Abfrage/Anlage ab
+        """
+        path = normalize_folder_path(folder_path)
+        if not path:
+            raise FolderResolveError("Empty folder path")
+
+        item_id = self.get_cached(drive_owner, path)
+        if item_id:
+            self.stats["hits"] += 1
+            return item_id
+
+        key = (drive_owner.lower(), _cache_key(path))
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            # eigener Client: der Task überlebt ggf. den Aufrufer, der ihn gestartet hat
+            task = asyncio.ensure_future(self._resolve_uncached(drive_owner, path, access_token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: Abbruch eines Wartenden bricht die Anlage für die anderen nicht ab
+        return await asyncio.shield(task)
+
+    async def find(self, drive_owner: str, folder_path: str, access_token: str) -> Optional[str]:
+        """Item-ID eines vorhandenen Ordners (Cache, sonst ein GET) - legt nichts an"""
+        path = normalize_folder_path(folder_path)
+        item_id = self.get_cached(drive_owner, path)
+        if item_id:
+            self.stats["hits"] += 1
+            return item_id
+        headers = {"Authorization": f"Bearer {access_token}"}
+        async with httpx.AsyncClient(timeout=GRAPH_TIMEOUT_SECONDS) as client:
+            item_id = await self._get_item_id(client, _drive_url(drive_owner), path, headers)
+        if item_id:
+            self._remember(drive_owner, [(path, item_id)])
+        return item_id
+
+    async def _resolve_uncached(self, drive_owner: str, path: str, access_token: str,
+                                client: Optional[httpx.AsyncClient] = None) -> str:
+        if client is None:
+            async with httpx.AsyncClient(timeout=GRAPH_TIMEOUT_SECONDS) as own_client:
+                return await self._resolve_uncached(drive_owner, path, access_token, own_client)
+
+        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+        drive_url = _drive_url(drive_owner)
+
+        # 1) Meist existiert der Ordner bereits (anderer Prozess, manuell angelegt)
+        item_id = await self._get_item_id(client, drive_url, path, headers)
+        if item_id:
+            self._remember(drive_owner, [(path, item_id)])
+            return item_id
+
+        # 2) Tiefsten bekannten Vorfahren suchen, Rest von oben nach unten anlegen
+        segments = path.split("/")
+        depth, parent_id = 0, None
+        for i in range(len(segments) - 1, 0, -1):
+            parent_id = self.get_cached(drive_owner, "/".join(segments[:i]))
+            if parent_id:
+                depth = i
+                break
+
+        created: List[Tuple[str, str]] = []
+        for i in range(depth, len(segments)):
+            sub_path = "/".join(segments[:i + 1])
+            parent_id = await self._create_child(client, drive_url, parent_id, segments[i], sub_path, headers)
+            if parent_id is None:
+                break
+            created.append((sub_path, parent_id))
+
+        if parent_id is None:
+            # gecachter Vorfahr existiert nicht mehr → invalidieren und vom Root neu auflösen
+            self.invalidate(drive_owner, "/".join(segments[:depth]))
+            return await self._resolve_uncached(drive_owner, path, access_token, client)
+
+        self._remember(drive_owner, created)
+        logger.info(f"📂 Folder resolved: {path} ({len(segments) - depth} segment(s) checked/created)")
+        return parent_id
+
+    async def _get_item_id(self, client: httpx.AsyncClient, drive_url: str, path: str,
+                           headers: Dict[str, str]) -> Optional[str]:
+        self.stats["graph_calls"] += 1
+        response = await client.get(f"{drive_url}/root:/{quote(path)}", headers=headers)
+        if response.status_code == 200:
+            return response.json().get("id")
+        if response.status_code == 404:
+            return None
+        raise FolderResolveError(f"Folder lookup failed for {path}: {response.status_code} - {response.text[:200]}")
+
+    async def _create_child(self, client: httpx.AsyncClient, drive_url: str, parent_id: Optional[str],
+                            name: str, sub_path: str, headers: Dict[str, str]) -> Optional[str]:
+        """Legt einen Ordner an; None wenn der Eltern-Ordner (gecachte ID) nicht mehr existiert"""
+        url = f"{drive_url}/items/{parent_id}/children" if parent_id else f"{drive_url}/root/children"
+        payload = {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+        self.stats["graph_calls"] += 1
+        response = await client.post(url, headers=headers, json=payload)
+
+        if response.status_code in (200, 201):
+            self.stats["created"] += 1
+            logger.info(f"✅ Folder created: {sub_path}")
+            return response.json().get("id")
+        if response.status_code == 409:
+            # existiert bereits (z.B. parallel von anderem Worker angelegt)
+            item_id = await self._get_item_id(client, drive_url, sub_path, headers)
+            if item_id:
+                return item_id
+        if response.status_code == 404 and parent_id:
+            return None
+        raise FolderResolveError(f"Folder creation failed for {sub_path}: {response.status_code} - {response.text[:200]}")
+
+    # ----------------------------------------------------------------- upload
+    async def upload_file(self, drive_owner: str, folder_path: str, filename: str, content: bytes,
+                          access_token: str, timeout: float = 60.0) -> httpx.Response:
+        """
+        Lädt eine Datei in den (gecachten) Ordner hoch.
+
+        Bei 404 (Ordner-ID veraltet) wird der Pfad invalidiert, neu aufgelöst
+        und der Upload einmal wiederholt.
+        """
+        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/octet-stream"}
+        drive_url = _drive_url(drive_owner)
+
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            for attempt in range(2):
+                folder_id = await self.resolve(drive_owner, folder_path, access_token)
+                response = await client.put(
+                    f"{drive_url}/items/{folder_id}:/{quote(filename)}:/content",
+                    headers=headers,
+                    content=content,
+                )
+                if response.status_code != 404 or attempt:
+                    return response
+                logger.warning(f"⚠️ Cached folder id for {folder_path} is stale (404) - re-resolving")
+                self.invalidate(drive_owner, folder_path)
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = sqlite3.connect(self.db_path)
+        cached = conn.execute("SELECT COUNT(*) FROM onedrive_folders").fetchone()[0]
+        conn.close()
+        return {**self.stats, "cached_folders": cached, "memory_entries": len(self._memory)}
+
+
+# Globale Instanz (Singleton-Pattern)
+_folder_resolver: Optional[FolderResolver] = None
+
+
+def get_folder_resolver() -> FolderResolver:
+    """Gibt die globale FolderResolver Instanz zurück"""
+    global _folder_resolver
+    if _folder_resolver is None:
+        _folder_resolver = FolderResolver()
+    return _folder_resolver
@@ -1,9 +1,10 @@
 """
 Generate OneDrive Sharing Links via Microsoft Graph API
 """
-import httpx
 from typing import Optional
 
+from modules.msgraph.sharing_links import get_sharing_link_registry
+
 async def generate_onedrive_sharing_link(
     user_email: str,
     file_id: str,
@@ -13,6 +14,7 @@ async def generate_onedrive_sharing_link(
 ) -> Optional[str]:
     """
     Generates a sharing link for an OneDrive file using Microsoft Graph API.
+    Existing links for the same file and scope are reused (SharingLinkRegistry).
     
     Args:
         user_email: Email of the OneDrive owner
@@ -24,37 +26,8 @@ async def generate_onedrive_sharing_link(
     Returns:
         The sharing link URL or None if failed
     """
-    
-    url = f"https://graph.microsoft.com/v1.0/users/{user_email}/drive/items/{file_id}/createLink"
-    
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "type": link_type,
-        "scope": scope
-    }
-    
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            
-            if response.status_code in [200, 201]:
-                data = response.json()
-                share_link = data.get("link", {}).get("webUrl")
-                
-                if share_link:
-                    return share_link
-                else:
-                    print(f"⚠️ No webUrl in response: {data}")
-                    return None
-            else:
-                print(f"❌ Sharing link creation failed: {response.status_code}")
-                print(f"   Response: {response.text[:500]}")
-                return None
-                
+        return await get_sharing_link_registry().get_link(user_email, file_id, access_token, link_type, scope)
     except Exception as e:
         print(f"❌ Exception creating sharing link: {e}")
         return None
@@ -0,0 +1,434 @@
+"""
+Lokaler Graph-Ersatz - Microsoft Graph Mail-Endpunkte für Tests
+
+Kleiner HTTP-Server (eigener Thread) mit genau den Endpunkten, die die
+Email-Ingestion (change_notifications.py) und process_email_background
+brauchen - Subscriptions, Notifications und Delta-Sync lassen sich so ohne
+Tenant und ohne öffentliche URL testen:
+
+- POST/PATCH/DELETE /subscriptions inkl. Validierungs-Handshake gegen die
+  notificationUrl (validationToken muss als text/plain zurückkommen)
+- GET /users/{postfach}/mailFolders/{ordner}/messages/delta: Seiten per
+  Prefer: odata.maxpagesize, @odata.nextLink / @odata.deltaLink,
+  $filter=receivedDateTime ge ..., geänderte und gelöschte (@removed) Emails
+- GET /users/{postfach}/messages/{id}[?$expand=attachments] und
+  .../attachments/{id}/$value
+- deliver(): Email ablegen und Change Notifications an alle passenden
+  Subscriptions senden; lifecycle() sendet Lifecycle-Events
+- throttle(): die nächsten Requests mit 429 + Retry-After beantworten,
+  expire_delta_tokens(): alle Delta-Tokens ungültig (410 syncStateNotFound)
+
+Verwendung:
+    standin = GraphStandIn().start()
+    ingestion = GraphIngestion(base_url=standin.base_url, ...)
+
+    # oder als eigener Prozess (GRAPH_BASE_URL=http://127.0.0.1:8765/v1.0)
+    python -m modules.msgraph.graph_standin --port 8765
+"""
+import argparse
+import base64
+import json
+import logging
+import re
+import threading
+import urllib.request
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "/v1.0"
+DEFAULT_PAGE_SIZE = 10
+RESOURCE_PATTERN = re.compile(r"^/?users/([^/]+)/mailFolders(?:\('([^']+)'\)|/([^/]+))/messages$", re.IGNORECASE)
+FILTER_PATTERN = re.compile(r"receivedDateTime\s+ge\s+(\S+)", re.IGNORECASE)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _graph_time(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class GraphStandIn:
+    """🧪 In-Memory Postfächer + Subscriptions hinter einem lokalen HTTP-Server"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, page_size: int = DEFAULT_PAGE_SIZE):
+        self.host = host
+        self.port = port
+        self.page_size = page_size
+        self.tenant_id = str(uuid.uuid4())
+        self.requests: List[Tuple[str, str]] = []
+        self.notifications_sent = 0
+        self._lock = threading.RLock()
+        self._seq = 0
+        # (postfach, ordner) → message_id → Email (inkl. _seq der letzten Änderung)
+        self._folders: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        self._subscriptions: Dict[str, Dict[str, Any]] = {}
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        self._throttle = 0
+        self._throttle_retry_after = 1
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------ lifecycle
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}{API_VERSION}"
+
+    def start(self) -> "GraphStandIn":
+        handler = type("GraphStandInHandler", (_Handler,), {"standin": self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="graph-standin", daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Graph stand-in listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # ------------------------------------------------------------- mailboxes
+    def add_message(self, mailbox: str, folder: str = "inbox", subject: str = "Test", sender: str = "kunde@example.com",
+                    body: str = "", attachments: Optional[List[Dict[str, Any]]] = None,
+                    received: Optional[datetime] = None, **fields: Any) -> Dict[str, Any]:
+        """
+        Legt eine Email ab (ohne Notification)
+
+        attachments: [{"name": "r.pdf", "content": b"...", "contentType": "application/pdf"}]
+        """
+        message_id = f"AAMk{uuid.uuid4().hex}"
+        message = {
+            "id": message_id,
+            "subject": subject,
+            "from": {"emailAddress": {"address": sender, "name": sender.split("@")[0]}},
+            "toRecipients": [{"emailAddress": {"address": mailbox}}],
+            "receivedDateTime": _graph_time(received or _now()),
+            "hasAttachments": bool(attachments),
+            "isDraft": False,
+            "importance": "normal",
+            "bodyPreview": body[:255],
+            "body": {"contentType": "html", "content": body},
+            "attachments": [
+                {
+                    "@odata.type": "#microsoft.graph.fileAttachment",
+                    "id": f"att-{index}",
+                    "name": attachment["name"],
+                    "contentType": attachment.get("contentType", "application/octet-stream"),
+                    "size": len(attachment["content"]),
+                    "contentBytes": base64.b64encode(attachment["content"]).decode(),
+                }
+                for index, attachment in enumerate(attachments or [])
+            ],
+            **fields,
+        }
+        with self._lock:
+            self._store(mailbox, folder, message)
+        return message
+
+    def update_message(self, mailbox: str, message_id: str, **fields: Any):
+        """Ändert eine Email (z.B. isRead) → erscheint erneut im Delta"""
+        with self._lock:
+            key, message = self._find(mailbox, message_id)
+            message.update(fields)
+            self._store(*key, message)
+
+    def remove_message(self, mailbox: str, message_id: str):
+        """Löscht eine Email → @removed im nächsten Delta"""
+        with self._lock:
+            key, message = self._find(mailbox, message_id)
+            self._store(*key, {"id": message_id, "@removed": {"reason": "deleted"}})
+
+    def _store(self, mailbox: str, folder: str, message: Dict[str, Any]):
+        self._seq += 1
+        message["_seq"] = self._seq
+        self._folders.setdefault((mailbox.lower(), folder.lower()), {})[message["id"]] = message
+
+    def _find(self, mailbox: str, message_id: str) -> Tuple[Tuple[str, str], Dict[str, Any]]:
+        for key, messages in self._folders.items():
+            if key[0] == mailbox.lower() and message_id in messages and "@removed" not in messages[message_id]:
+                return key, messages[message_id]
+        raise KeyError(message_id)
+
+    # --------------------------------------------------------- notifications
+    def deliver(self, mailbox: str, folder: str = "inbox", **message_fields: Any) -> Dict[str, Any]:
+        """Email ablegen + Change Notification an passende Subscriptions (blockierend)"""
+        message = self.add_message(mailbox, folder, **message_fields)
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions.values() if s["_target"] == (mailbox.lower(), folder.lower())]
+        for subscription in subscriptions:
+            self._post(subscription["notificationUrl"], {"value": [{
+                "subscriptionId": subscription["id"],
+                "subscriptionExpirationDateTime": subscription["expirationDateTime"],
+                "clientState": subscription.get("clientState"),
+                "changeType": "created",
+                "resource": f"Users/{mailbox}/Messages/{message['id']}",
+                "tenantId": self.tenant_id,
+                "resourceData": {
+                    "@odata.type": "#Microsoft.Graph.Message",
+                    "@odata.id": f"Users/{mailbox}/Messages/{message['id']}",
+                    "id": message["id"],
+                },
+            }]})
+        return message
+
+    def lifecycle(self, subscription_id: str, event: str):
+        """Lifecycle-Event (reauthorizationRequired | subscriptionRemoved | missed) senden"""
+        with self._lock:
+            subscription = self._subscriptions[subscription_id]
+            if event == "subscriptionRemoved":
+                self._subscriptions.pop(subscription_id)
+        self._post(subscription.get("lifecycleNotificationUrl") or subscription["notificationUrl"], {"value": [{
+            "subscriptionId": subscription_id,
+            "subscriptionExpirationDateTime": subscription["expirationDateTime"],
+            "clientState": subscription.get("clientState"),
+            "lifecycleEvent": event,
+            "tenantId": self.tenant_id,
+        }]})
+
+    def _post(self, url: str, payload: Dict[str, Any]) -> int:
+        request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            self.notifications_sent += 1
+            return response.status
+
+    def _validate_endpoint(self, url: str) -> bool:
+        """Wie Graph: POST ?validationToken=... muss den Token als text/plain zurückgeben"""
+        token = f"Validation: {uuid.uuid4()}"
+        separator = "&" if "?" in url else "?"
+        request = urllib.request.Request(f"{url}{separator}validationToken={quote(token)}", data=b"", method="POST",
+                                         headers={"Content-Type": "text/plain"})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status == 200 and response.read().decode() == token
+        except OSError as e:
+            logger.warning(f"⚠️ Graph stand-in validation of {url} failed: {e}")
+            return False
+
+    # --------------------------------------------------------- test helpers
+    @property
+    def subscriptions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{k: v for k, v in s.items() if not k.startswith("_")} for s in self._subscriptions.values()]
+
+    def expire_subscriptions(self):
+        """Alle Subscriptions serverseitig entfernen (wie nach Ablauf)"""
+        with self._lock:
+            self._subscriptions.clear()
+
+    def expire_delta_tokens(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def throttle(self, count: int, retry_after: int = 1):
+        with self._lock:
+            self._throttle = count
+            self._throttle_retry_after = retry_after
+
+    # -------------------------------------------------------------- routing
+    def handle(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+               body: Optional[Dict[str, Any]]) -> Tuple[int, Any, Dict[str, str]]:
+        self.requests.append((method, path))
+        with self._lock:
+            if self._throttle > 0:
+                self._throttle -= 1
+                return 429, _error("TooManyRequests", "Application is over its MailboxConcurrency limit."), \
+                    {"Retry-After": str(self._throttle_retry_after)}
+        if not headers.get("authorization", "").startswith("Bearer "):
+            return 401, _error("InvalidAuthenticationToken", "Access token is empty."), {}
+
+        if path == "/subscriptions" and method == "POST":
+            return self._create_subscription(body or {})
+        if path.startswith("/subscriptions/"):
+            return self._subscription(method, path.rsplit("/", 1)[1], body or {})
+
+        match = re.match(r"^/users/([^/]+)/mailFolders/([^/]+)/messages/delta$", path, re.IGNORECASE)
+        if match and method == "GET":
+            return self._delta(match.group(1).lower(), match.group(2).lower(), query, headers)
+
+        match = re.match(r"^/users/([^/]+)/messages/([^/]+)(/attachments/([^/]+)/\$value)?$", path, re.IGNORECASE)
+        if match and method == "GET":
+            return self._message(match.group(1), match.group(2), match.group(4), query)
+
+        return 404, _error("ResourceNotFound", f"{method} {path}"), {}
+
+    def _create_subscription(self, body: Dict[str, Any]) -> Tuple[int, Any, Dict[str, str]]:
+        match = RESOURCE_PATTERN.match(body.get("resource", ""))
+        if not match or not body.get("notificationUrl") or not body.get("expirationDateTime"):
+            return 400, _error("InvalidRequest", "resource, notificationUrl and expirationDateTime are required"), {}
+        for url in filter(None, (body.get("notificationUrl"), body.get("lifecycleNotificationUrl"))):
+            if not self._validate_endpoint(url):
+                return 400, _error("ValidationError", f"Subscription validation request failed for {url}"), {}
+
+        subscription = {
+            **body,
+            "id": str(uuid.uuid4()),
+            "applicationId": "graph-standin",
+            "_target": (match.group(1).lower(), (match.group(2) or match.group(3)).lower()),
+        }
+        with self._lock:
+            self._subscriptions[subscription["id"]] = subscription
+        return 201, {k: v for k, v in subscription.items() if not k.startswith("_")}, {}
+
+    def _subscription(self, method: str, subscription_id: str, body: Dict[str, Any]) -> Tuple[int, Any, Dict[str, str]]:
+        with self._lock:
+            subscription = self._subscriptions.get(subscription_id)
+            if subscription is None:
+                return 404, _error("ResourceNotFound", f"Subscription {subscription_id} not found"), {}
+            if method == "DELETE":
+                self._subscriptions.pop(subscription_id)
+                return 204, None, {}
+            if method == "PATCH":
+                subscription["expirationDateTime"] = body.get("expirationDateTime", subscription["expirationDateTime"])
+            return 200, {k: v for k, v in subscription.items() if not k.startswith("_")}, {}
+
+    def _delta(self, mailbox: str, folder: str, query: Dict[str, str],
+               headers: Dict[str, str]) -> Tuple[int, Any, Dict[str, str]]:
+        """Seiten über alle Änderungen nach after_seq; Runde endet mit deltaLink"""
+        match = re.search(r"odata\.maxpagesize=(\d+)", headers.get("prefer", ""))
+        page_size = int(match.group(1)) if match else self.page_size
+
+        with self._lock:
+            token = query.get("$deltatoken") or query.get("$skiptoken")
+            if token:
+                state = self._tokens.get(token)
+                if state is None or state["target"] != (mailbox, folder):
+                    return 410, _error("SyncStateNotFound", "The sync state generation is not found."), {}
+                state = dict(state, offset=0) if "$deltatoken" in query else dict(state)
+            else:
+                since = FILTER_PATTERN.search(query.get("$filter", ""))
+                state = {"target": (mailbox, folder), "after": 0, "offset": 0,
+                         "since": _parse_time(since.group(1).strip("'")) if since else None}
+            if state["offset"] == 0:
+                state["until"] = self._seq
+
+            changes = sorted(
+                (m for m in self._folders.get((mailbox, folder), {}).values()
+                 if state["after"] < m["_seq"] <= state["until"]
+                 and ("@removed" in m or state["since"] is None or _parse_time(m["receivedDateTime"]) >= state["since"])),
+                key=lambda m: m["_seq"],
+            )
+            page = changes[state["offset"]:state["offset"] + page_size]
+            select = [field for field in query.get("$select", "").split(",") if field]
+            value = [_project(m, select) for m in page]
+
+            url = f"{self.base_url}/users/{quote(mailbox)}/mailFolders/{folder}/messages/delta"
+            if state["offset"] + page_size < len(changes):
+                skip = uuid.uuid4().hex
+                self._tokens[skip] = dict(state, offset=state["offset"] + page_size)
+                return 200, {"value": value, "@odata.nextLink": f"{url}?$skiptoken={skip}"}, {}
+
+            delta = uuid.uuid4().hex
+            self._tokens[delta] = {"target": (mailbox, folder), "after": state["until"], "offset": 0,
+                                   "since": state["since"], "until": state["until"]}
+            return 200, {"value": value, "@odata.deltaLink": f"{url}?$deltatoken={delta}"}, {}
+
+    def _message(self, mailbox: str, message_id: str, attachment_id: Optional[str],
+                 query: Dict[str, str]) -> Tuple[int, Any, Dict[str, str]]:
+        with self._lock:
+            try:
+                _, message = self._find(mailbox, message_id)
+            except KeyError:
+                return 404, _error("ErrorItemNotFound", "The specified object was not found in the store."), {}
+        if attachment_id is not None:
+            for attachment in message["attachments"]:
+                if attachment["id"] == attachment_id:
+                    return 200, base64.b64decode(attachment["contentBytes"]), {"Content-Type": attachment["contentType"]}
+            return 404, _error("ErrorItemNotFound", attachment_id), {}
+        result = _project(message, [])
+        if "attachments" not in query.get("$expand", ""):
+            result.pop("attachments", None)
+        return 200, result, {}
+
+
+def _error(code: str, message: str) -> Dict[str, Any]:
+    return {"error": {"code": code, "message": message}}
+
+
+def _project(message: Dict[str, Any], select: List[str]) -> Dict[str, Any]:
+    """$select (id und @removed immer) ohne interne Felder"""
+    return {
+        k: v for k, v in message.items()
+        if not k.startswith("_") and (not select or k in select or k in ("id", "@removed"))
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    standin: GraphStandIn
+
+    def _dispatch(self, method: str):
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        if path.startswith(API_VERSION):
+            path = path[len(API_VERSION):]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            body = None
+
+        status, payload, headers = self.standin.handle(
+            method, path, query, {k.lower(): v for k, v in self.headers.items()}, body
+        )
+        data = payload if isinstance(payload, bytes) else (json.dumps(payload).encode() if payload is not None else b"")
+        self.send_response(status)
+        if not isinstance(payload, bytes) and payload is not None:
+            self.send_header("Content-Type", "application/json")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        logger.debug(f"graph-standin: {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler Microsoft Graph Ersatz für die Email-Ingestion")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mailbox", default="mj@cdtechnologies.de")
+    parser.add_argument("--seed", type=int, default=0, help="Anzahl Beispiel-Emails im Posteingang")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    standin = GraphStandIn(args.host, args.port).start()
+    for index in range(args.seed):
+        standin.add_message(args.mailbox, subject=f"Beispiel {index + 1}", received=_now() - timedelta(minutes=index))
+    print(f"GRAPH_BASE_URL={standin.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        standin.stop()
+
+
+if __name__ == "__main__":
+    main()
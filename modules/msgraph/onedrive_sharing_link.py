@@ -1,7 +1,7 @@
 """
 Generate sharing links for OneDrive files using Microsoft Graph API
 """
-import httpx
+from modules.msgraph.sharing_links import get_sharing_link_registry
 from modules.utils.debug_log import debug_log
 
 async def generate_onedrive_sharing_link(
@@ -13,6 +13,7 @@ async def generate_onedrive_sharing_link(
 ) -> dict:
     """
     Generiert einen Sharing Link für eine OneDrive-Datei
+    (vorhandene Links für Datei + Scope werden wiederverwendet)
     
     Args:
         user_email: Email des Users (z.B. mj@cdtechnologies.de)
@@ -22,50 +23,24 @@ async def generate_onedrive_sharing_link(
         scope: "organization" (nur org), "anonymous" (öffentlich), "users" (specific users)
     
     Returns:
-        dict: {"webUrl": "https://...", "link_id": "..."}
+        dict: {"webUrl": "https://...", "type": "...", "scope": "..."}
     """
     try:
-        # Microsoft Graph API: Create Sharing Link
-        # https://learn.microsoft.com/en-us/graph/api/driveitem-createlink
-        url = f"https://graph.microsoft.com/v1.0/users/{user_email}/drive/items/{file_id}/createLink"
+        debug_log(f"🔗 Sharing link for file: {file_id} (Type: {link_type}, Scope: {scope})")
+        sharing_link = await get_sharing_link_registry().get_link(user_email, file_id, access_token, link_type, scope)
         
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "type": link_type,  # "view" or "edit"
-            "scope": scope      # "anonymous", "organization", "users"
+        if sharing_link:
+            debug_log(f"✅ Sharing link ready: {sharing_link[:80]}...")
+            return {
+                "webUrl": sharing_link,
+                "type": link_type,
+                "scope": scope
+            }
+        debug_log(f"❌ Failed to create sharing link for file: {file_id}")
+        return {
+            "error": "createLink failed",
+            "details": file_id
         }
-        
-        debug_log(f"🔗 Creating sharing link for file: {file_id}")
-        debug_log(f"   Type: {link_type}, Scope: {scope}")
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            
-            if response.status_code in [200, 201]:
-                data = response.json()
-                sharing_link = data.get("link", {}).get("webUrl", "")
-                link_id = data.get("id", "")
-                
-                debug_log(f"✅ Sharing link created: {sharing_link[:80]}...")
-                
-                return {
-                    "webUrl": sharing_link,
-                    "link_id": link_id,
-                    "type": link_type,
-                    "scope": scope
-                }
-            else:
-                error_text = response.text if response.text else "No error message"
-                debug_log(f"❌ Failed to create sharing link: {response.status_code}")
-                debug_log(f"   Response: {error_text[:500]}")
-                return {
-                    "error": f"HTTP {response.status_code}",
-                    "details": error_text[:500]
-                }
                 
     except Exception as e:
         debug_log(f"❌ Exception creating sharing link: {e}")
@@ -0,0 +1,343 @@
+"""
+OneDrive Sharing Link Registry - ein Link pro Drive-Item und Scope
+
+Bisher wurde für jedes Dokument in einer Notification ein neuer Sharing Link
+per createLink angelegt - auch für Duplikate (gleicher Pfad → gleiche Item-ID)
+und erneut gesendete Notifications. Die Registry merkt sich die Links je
+(Drive-Besitzer, Item-ID, Link-Typ, Scope) im Speicher und in SQLite, in der
+gleichen Datenbank wie processed_documents:
+
+- vorhandener Link → kein Graph Call
+- fehlende Links mehrerer Dokumente werden gesammelt über Graph $batch
+  angelegt (bis zu 20 createLink pro Batch, Batches parallel)
+- gleichzeitige Anfragen für dasselbe Item teilen sich einen Task
+- Metadaten der Drive-Items (Name, Pfad, webUrl, Größe, eTag) aus der
+  Upload-Antwort werden mitgespeichert
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from modules.msgraph.folder_resolver import DRIVE_ME, GRAPH_BASE_URL, GRAPH_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SHARING_LINK_DB_PATH = os.getenv("SHARING_LINK_DB_PATH") or os.getenv("DATABASE_PATH", "./email_data.db")
+GRAPH_BATCH_SIZE = 20
+
+DEFAULT_LINK_TYPE = "view"
+DEFAULT_LINK_SCOPE = "organization"
+
+LinkKey = Tuple[str, str, str, str]
+
+
+def _item_path(drive_owner: str, item_id: str) -> str:
+    """Relativer Graph-Pfad (für $batch ohne Host und Version)"""
+    drive = "/me/drive" if drive_owner == DRIVE_ME else f"/users/{drive_owner}/drive"
+    return f"{drive}/items/{item_id}"
+
+
+class SharingLinkRegistry:
+    """🔗 Drive-Item → Sharing Link mit Speicher- und SQLite-Cache"""
+
+    def __init__(self, db_path: str = SHARING_LINK_DB_PATH):
+        self.db_path = db_path
+        self._memory: Dict[LinkKey, str] = {}
+        self._inflight: Dict[LinkKey, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "created": 0, "failed": 0, "graph_batches": 0, "coalesced": 0}
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS onedrive_sharing_links (
+                drive_owner TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                link_type TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                web_url TEXT NOT NULL,
+                link_id TEXT,
+                created_at TEXT,
+                PRIMARY KEY (drive_owner, item_id, link_type, scope)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS onedrive_drive_items (
+                drive_owner TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                name TEXT,
+                path TEXT,
+                web_url TEXT,
+                size INTEGER,
+                etag TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (drive_owner, item_id)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _key(drive_owner: str, item_id: str, link_type: str, scope: str) -> LinkKey:
+        return (drive_owner.lower(), item_id, link_type, scope)
+
+    # ------------------------------------------------------------------ cache
+    def get_cached(self, drive_owner: str, item_id: str, link_type: str = DEFAULT_LINK_TYPE,
+                   scope: str = DEFAULT_LINK_SCOPE) -> Optional[str]:
+        """Link aus Speicher oder SQLite (ohne Graph Call)"""
+        key = self._key(drive_owner, item_id, link_type, scope)
+        link = self._memory.get(key)
+        if link:
+            return link
+
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            """
+            SELECT web_url FROM onedrive_sharing_links
+            WHERE drive_owner = ? AND item_id = ? AND link_type = ? AND scope = ?
+            """,
+            key,
+        ).fetchone()
+        conn.close()
+        if row:
+            self._memory[key] = row[0]
+            return row[0]
+        return None
+
+    def _remember(self, entries: List[Tuple[LinkKey, str, Optional[str]]]):
+        """entries: [(key, web_url, link_id)]"""
+        if not entries:
+            return
+        now = datetime.now().isoformat()
+        for key, web_url, _ in entries:
+            self._memory[key] = web_url
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO onedrive_sharing_links
+                (drive_owner, item_id, link_type, scope, web_url, link_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(*key, web_url, link_id, now) for key, web_url, link_id in entries],
+        )
+        conn.commit()
+        conn.close()
+
+    def remember_item(self, drive_owner: str, item: Dict[str, Any], path: Optional[str] = None):
+        """Speichert die Metadaten eines Drive-Items (z.B. aus der Upload-Antwort)"""
+        if not item.get("id"):
+            return
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO onedrive_drive_items
+                (drive_owner, item_id, name, path, web_url, size, etag, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                drive_owner.lower(), item["id"], item.get("name"), path, item.get("webUrl"),
+                item.get("size"), item.get("eTag"), datetime.now().isoformat(),
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+    def get_item(self, drive_owner: str, item_id: str) -> Optional[Dict[str, Any]]:
+        """Gespeicherte Metadaten eines Drive-Items"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute(
+            "SELECT * FROM onedrive_drive_items WHERE drive_owner = ? AND item_id = ?",
+            (drive_owner.lower(), item_id),
+        ).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def invalidate(self, drive_owner: str, item_id: str) -> int:
+        """Entfernt alle Links eines Items (z.B. Datei gelöscht oder Link widerrufen)"""
+        owner = drive_owner.lower()
+        for key in [k for k in self._memory if k[0] == owner and k[1] == item_id]:
+            del self._memory[key]
+        conn = sqlite3.connect(self.db_path)
+        removed = conn.execute(
+            "DELETE FROM onedrive_sharing_links WHERE drive_owner = ? AND item_id = ?", (owner, item_id)
+        ).rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+    # ---------------------------------------------------------------- resolve
+    async def get_link(self, drive_owner: str, item_id: str, access_token: str,
+                       link_type: str = DEFAULT_LINK_TYPE, scope: str = DEFAULT_LINK_SCOPE) -> Optional[str]:
+        """Vorhandenen Link liefern oder einen neuen anlegen (None wenn Graph ablehnt)"""
+        links = await self.get_links(drive_owner, [item_id], access_token, link_type, scope)
+        return links.get(item_id)
+
+    async def get_links(self, drive_owner: str, item_ids: Iterable[str], access_token: str,
+                        link_type: str = DEFAULT_LINK_TYPE, scope: str = DEFAULT_LINK_SCOPE) -> Dict[str, str]:
+        """
+        Links für mehrere Items; fehlende werden gesammelt per $batch angelegt.
+
+        Returns:
+            {item_id: web_url} - Items ohne Link (Graph-Fehler) fehlen
+        """
+        links: Dict[str, str] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing: List[str] = []
+
+        for item_id in dict.fromkeys(i for i in item_ids if i):
+            cached = self.get_cached(drive_owner, item_id, link_type, scope)
+            if cached:
+                self.stats["hits"] += 1
+                links[item_id] = cached
+                continue
+            key = self._key(drive_owner, item_id, link_type, scope)
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+            else:
+                self.stats["misses"] += 1
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                missing.append(item_id)
+            waiting[item_id] = future
+
+        if missing:
+            created: Dict[str, str] = {}
+            try:
+                created = await self._create_links(drive_owner, missing, access_token, link_type, scope)
+            finally:
+                for item_id in missing:
+                    future = self._inflight.pop(self._key(drive_owner, item_id, link_type, scope))
+                    if not future.done():
+                        future.set_result(created.get(item_id))
+
+        for item_id, future in waiting.items():
+            link = await asyncio.shield(future)
+            if link:
+                links[item_id] = link
+        return links
+
+    async def _create_links(self, drive_owner: str, item_ids: List[str], access_token: str,
+                            link_type: str, scope: str) -> Dict[str, str]:
+        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+        chunks = [item_ids[i:i + GRAPH_BATCH_SIZE] for i in range(0, len(item_ids), GRAPH_BATCH_SIZE)]
+
+        async with httpx.AsyncClient(timeout=GRAPH_TIMEOUT_SECONDS) as client:
+            results = await asyncio.gather(
+                *(self._create_batch(client, headers, drive_owner, chunk, link_type, scope) for chunk in chunks),
+                return_exceptions=True,
+            )
+
+        created: Dict[str, str] = {}
+        entries: List[Tuple[LinkKey, str, Optional[str]]] = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"⚠️ Sharing link batch failed ({len(chunk)} items): {result}")
+                self.stats["failed"] += len(chunk)
+                continue
+            for item_id, (web_url, link_id) in result.items():
+                created[item_id] = web_url
+                entries.append((self._key(drive_owner, item_id, link_type, scope), web_url, link_id))
+            self.stats["failed"] += len(chunk) - len(result)
+
+        self._remember(entries)
+        self.stats["created"] += len(entries)
+        if entries:
+            logger.info(f"🔗 {len(entries)} sharing link(s) created in {len(chunks)} batch(es)")
+        return created
+
+    async def _create_batch(self, client: httpx.AsyncClient, headers: Dict[str, str], drive_owner: str,
+                            item_ids: List[str], link_type: str, scope: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Ein $batch Request mit createLink je Item → {item_id: (web_url, link_id)}"""
+        requests = [
+            {
+                "id": str(index),
+                "method": "POST",
+                "url": f"{_item_path(drive_owner, item_id)}/createLink",
+                "headers": {"Content-Type": "application/json"},
+                "body": {"type": link_type, "scope": scope},
+            }
+            for index, item_id in enumerate(item_ids)
+        ]
+        self.stats["graph_batches"] += 1
+        response = await client.post(f"{GRAPH_BASE_URL}/$batch", headers=headers, json={"requests": requests})
+        response.raise_for_status()
+
+        links: Dict[str, Tuple[str, Optional[str]]] = {}
+        for entry in response.json().get("responses", []):
+            try:
+                item_id = item_ids[int(entry.get("id"))]
+            except (TypeError, ValueError, IndexError):
+                continue
+            body = entry.get("body") or {}
+            web_url = (body.get("link") or {}).get("webUrl")
+            if entry.get("status") in (200, 201) and web_url:
+                links[item_id] = (web_url, body.get("id"))
+            else:
+                logger.warning(f"⚠️ createLink failed for {item_id}: {entry.get('status')} - {str(body)[:200]}")
+        return links
+
+    # ------------------------------------------------------------ attachments
+    async def fill_attachment_links(self, drive_owner: str, attachments: List[Dict[str, Any]], token_provider,
+                                    link_type: str = DEFAULT_LINK_TYPE, scope: str = DEFAULT_LINK_SCOPE) -> int:
+        """
+        Ergänzt fehlende onedrive_sharing_link Einträge in Anhangs-Ergebnissen.
+
+        token_provider wird nur aufgerufen, wenn tatsächlich Links fehlen.
+
+        Returns:
+            Anzahl ergänzter Links
+        """
+        pending = [
+            att for att in attachments
+            if att.get("onedrive_file_id")
+            and (not att.get("onedrive_sharing_link") or att.get("onedrive_sharing_link") == att.get("onedrive_web_url"))
+        ]
+        if not pending:
+            return 0
+
+        links = {}
+        uncached = []
+        for att in pending:
+            cached = self.get_cached(drive_owner, att["onedrive_file_id"], link_type, scope)
+            if cached:
+                links[att["onedrive_file_id"]] = cached
+            else:
+                uncached.append(att["onedrive_file_id"])
+        if uncached:
+            access_token = await token_provider()
+            if access_token:
+                links.update(await self.get_links(drive_owner, uncached, access_token, link_type, scope))
+
+        filled = 0
+        for att in pending:
+            link = links.get(att["onedrive_file_id"])
+            if link:
+                att["onedrive_sharing_link"] = link
+                filled += 1
+        return filled
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = sqlite3.connect(self.db_path)
+        links = conn.execute("SELECT COUNT(*) FROM onedrive_sharing_links").fetchone()[0]
+        items = conn.execute("SELECT COUNT(*) FROM onedrive_drive_items").fetchone()[0]
+        conn.close()
+        return {**self.stats, "cached_links": links, "cached_items": items, "memory_entries": len(self._memory)}
+
+
+# Globale Instanz (Singleton-Pattern)
+_sharing_link_registry: Optional[SharingLinkRegistry] = None
+
+
+def get_sharing_link_registry() -> SharingLinkRegistry:
+    """Gibt die globale SharingLinkRegistry Instanz zurück"""
+    global _sharing_link_registry
+    if _sharing_link_registry is None:
+        _sharing_link_registry = SharingLinkRegistry()
+    return _sharing_link_registry
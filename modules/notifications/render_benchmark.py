@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+⏱️ Notification Renderer Benchmark
+===================================
+
+Misst die Render-Zeit des NotificationRenderer für die drei typischen
+Benachrichtigungen:
+- WEG A (unbekannter Kontakt, Email)
+- WEG B (bekannter Kontakt mit Opportunity)
+- Call (Sipgate/FrontDesk Anruf mit Aufgaben)
+
+Die Buttons haben feste URLs, damit nur das Rendering gemessen wird und
+keine Button-Tokens in der Tracking-DB angelegt werden.
+
+Usage:
+    python -m modules.notifications.render_benchmark --iterations 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List
+
+from modules.notifications.renderer import render_notification_html
+
+BASE_URL = "https://benchmark.local"
+
+
+def _button(action: str, label: str, description: str = "") -> Dict[str, Any]:
+    return {
+        "action": action,
+        "label": label,
+        "description": description,
+        "url": f"{BASE_URL}/api/action/{action}",
+    }
+
+
+WEG_A_PAYLOAD: Dict[str, Any] = {
+    "notification_type": "unknown_contact_action_required",
+    "message_type": "email",
+    "sender": "anfrage@beispiel-bau.de",
+    "sender_name": "Beispiel Bau GmbH",
+    "subject": "Preisanfrage Dachsanierung",
+    "body_preview": "Guten Tag,\nwir benötigen ein Angebot für die Sanierung von 180 m² Dachfläche.\nMit freundlichen Grüßen",
+    "ai_analysis": {
+        "intent": {"primary": "Preisanfrage", "confidence": 0.91},
+        "sentiment": "neutral",
+        "key_topics": ["Dach", "Sanierung", "Angebot"],
+        "urgency": "high",
+        "urgency_reason": "Kunde erwartet Rückmeldung diese Woche",
+    },
+    "attachment_results": [
+        {
+            "filename": "Grundriss.pdf",
+            "size": 245760,
+            "document_type": "plan",
+            "ocr_route": "pdfco",
+            "onedrive_sharing_link": "https://onedrive.example/grundriss",
+        }
+    ],
+    "action_options": [
+        _button("create_contact", "👤 Kontakt anlegen", "Neuen Kunden in WeClapp anlegen"),
+        _button("create_supplier", "🏭 Lieferant anlegen"),
+        _button("mark_private", "🔒 Privat"),
+        _button("mark_spam", "🚫 Spam"),
+        _button("data_good", "✅ Daten korrekt"),
+        _button("report_issue", "🐛 Problem melden"),
+    ],
+}
+
+WEG_B_PAYLOAD: Dict[str, Any] = {
+    "notification_type": "known_contact_enhanced",
+    "message_type": "email",
+    "sender": "max@mustermann.de",
+    "subject": "Re: Angebot 2025-104",
+    "summary": "Kunde bestätigt Termin für Aufmaß und fragt nach Lieferzeit.",
+    "contact_match": {"contact_name": "Max Mustermann", "company": "Mustermann GmbH", "contact_id": "48213"},
+    "opportunity_id": 1733,
+    "opportunity_stage": "Angebot",
+    "opportunity_probability": 60,
+    "invoice_number": "RE-2025-101",
+    "tasks_generated": [
+        {"title": "Aufmaß-Termin bestätigen", "priority": "high", "deadline_hours": 24},
+        {"title": "Lieferzeit beim Lieferanten anfragen", "priority": "medium"},
+    ],
+    "action_options": [
+        _button("schedule_appointment", "📅 Termin planen"),
+        _button("create_quote", "💰 Angebot erstellen"),
+        _button("view_in_crm", "🔗 In WeClapp öffnen"),
+        _button("complete_task", "✔️ Erledigt"),
+    ],
+}
+
+CALL_PAYLOAD: Dict[str, Any] = {
+    "notification_type": "known_contact_enhanced",
+    "message_type": "call",
+    "channel": "call",
+    "sender": "+4915112345678",
+    "subject": "Anruf von +4915112345678",
+    "body_preview": "Kunde ruft wegen Fensteraustausch an, 6 Fenster, Termin gewünscht.",
+    "contact_match": {"contact_name": "Erika Beispiel", "contact_id": "51877"},
+    "contact_prefill": {"phone": "+4915112345678", "project_type": "Fenster"},
+    "tasks_generated": [{"title": "Rückruf mit Terminvorschlag", "priority": "urgent", "deadline_hours": 2}],
+    "action_options": [
+        _button("call_customer", "📞 Zurückrufen"),
+        _button("schedule_appointment", "📅 Termin planen"),
+        _button("urgent_response", "⚡ Dringend"),
+    ],
+}
+
+SCENARIOS = {
+    "weg_a": WEG_A_PAYLOAD,
+    "weg_b": WEG_B_PAYLOAD,
+    "call": CALL_PAYLOAD,
+}
+
+
+def benchmark_scenario(payload: Dict[str, Any], iterations: int) -> Dict[str, float]:
+    """Rendert eine Payload ``iterations`` mal und liefert Timing-Kennzahlen in ms."""
+
+    timings: List[float] = []
+    html_size = 0
+    for index in range(iterations):
+        start = time.perf_counter()
+        html_body = render_notification_html(
+            notification_data=payload,
+            base_url=BASE_URL,
+            communication_uuid=f"bench-{index}",
+            email_message_id=f"<bench-{index}@local>",
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        html_size = len(html_body)
+
+    timings.sort()
+    p95_index = min(len(timings) - 1, int(len(timings) * 0.95))
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[p95_index],
+        "renders_per_sec": 1000 / statistics.mean(timings),
+        "html_bytes": html_size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Notification renderer benchmark")
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"⏱️ NOTIFICATION RENDER BENCHMARK ({args.iterations} Iterationen)")
+    print("=" * 70)
+
+    for name, payload in SCENARIOS.items():
+        result = benchmark_scenario(payload, args.iterations)
+        print(
+            f"{name:<6} mean={result['mean_ms']:.3f}ms p50={result['p50_ms']:.3f}ms "
+            f"p95={result['p95_ms']:.3f}ms {result['renders_per_sec']:.0f}/s "
+            f"({result['html_bytes']} bytes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
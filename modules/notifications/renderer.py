@@ -5,7 +5,8 @@ from __future__ import annotations
 import html
 import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import pytz
 
@@ -60,6 +61,65 @@ def format_size(size: Optional[int]) -> str:
     return f"{int(size)} B"
 
 
+# ------------------------------------------------------------- static template
+# Everything that does not depend on the notification is compiled exactly once at
+# import time. ``render`` only fills the per-notification slots into a list buffer.
+_TEMPLATE_CSS = """    body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: #F5F7FA; margin: 0; padding: 20px; color: #2C3E50; }
+    .container { max-width: 720px; margin: 0 auto; background: #FFFFFF; border-radius: 18px; box-shadow: 0 12px 35px rgba(31, 45, 61, 0.08); overflow: hidden; }
+    .header { background: linear-gradient(135deg, #485563 0%, #29323C 100%); padding: 32px; color: white; text-align: center; }
+    .header h2 { margin: 0 0 10px 0; font-size: 24px; letter-spacing: 0.5px; }
+    .header p { margin: 0; font-size: 14px; opacity: 0.8; }
+    .badge { display: inline-block; margin-left: 8px; padding: 4px 10px; border-radius: 999px; font-size: 12px; font-weight: 600; }
+    .content { padding: 28px 32px 34px 32px; }
+    .section { margin-bottom: 24px; border-radius: 12px; padding: 20px; background: #F9FAFB; border: 1px solid #E5E9F2; }
+    .section h3 { margin-top: 0; font-size: 18px; display: flex; align-items: center; gap: 8px; color: #1F2D3D; }
+    .summary-main { font-weight: 600; margin-bottom: 12px; }
+    .message-preview { background: #FFFFFF; border: 1px solid #E5E9F2; border-radius: 10px; padding: 16px; font-size: 14px; color: #34495E; }
+    .summary-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 10px 18px; margin: 0; padding: 0; list-style: none; }
+    .summary-grid dt { font-weight: 600; font-size: 13px; color: #5C7080; }
+    .summary-grid dd { margin: 0; font-size: 14px; color: #1F2D3D; }
+    .task-list { list-style: none; padding-left: 0; margin: 0; }
+    .task-list li { margin-bottom: 10px; font-size: 14px; line-height: 1.5; }
+    .task-meta { display: inline-block; font-size: 12px; color: #7F8C8D; margin-left: 8px; }
+    .attachments ul, .links ul { list-style: none; padding: 0; margin: 0; }
+    .attachments li, .links li { padding: 10px 0; border-bottom: 1px solid #E5E9F2; font-size: 14px; }
+    .attachments li:last-child, .links li:last-child { border-bottom: none; }
+    .attachment-meta { display: block; font-size: 12px; color: #7F8C8D; margin-left: 22px; line-height: 1.4; }
+    .buttons { display: flex; flex-direction: column; gap: 14px; }
+    .button-wrapper { text-align: center; }
+    .button { display: inline-block; padding: 13px 28px; border-radius: 30px; font-weight: 600; text-decoration: none; color: white; transition: transform 0.2s ease, box-shadow 0.2s ease; box-shadow: 0 6px 18px rgba(41, 128, 185, 0.15); }
+    .button:hover { transform: translateY(-2px); box-shadow: 0 10px 24px rgba(41, 128, 185, 0.25); }
+    .button-desc { margin: 8px 0 0 0; font-size: 12px; color: #5C7080; }
+    .btn-primary { background: linear-gradient(135deg, #3498DB 0%, #2980B9 100%); }
+    .btn-success { background: linear-gradient(135deg, #2ECC71 0%, #27AE60 100%); }
+    .btn-warning { background: linear-gradient(135deg, #F39C12 0%, #D35400 100%); }
+    .btn-secondary { background: linear-gradient(135deg, #95A5A6 0%, #7F8C8D 100%); }
+    .btn-info { background: linear-gradient(135deg, #74B9FF 0%, #0984E3 100%); }
+    .btn-create { background: linear-gradient(135deg, #52C234 0%, #047857 100%); }
+    .btn-supplier { background: linear-gradient(135deg, #FD79A8 0%, #E84393 100%); }
+    .btn-private { background: linear-gradient(135deg, #A29BFE 0%, #6C5CE7 100%); }
+    .btn-spam { background: linear-gradient(135deg, #FF7675 0%, #D63031 100%); }
+    .footer { background: #F1F3F6; padding: 18px 32px; font-size: 12px; color: #60718B; border-top: 1px solid #E5E9F2; }
+    .footer p { margin: 4px 0; }
+"""
+
+
+def _compile_document_skeleton() -> Tuple[str, str, str, str]:
+    """Split the static HTML skeleton into the fragments surrounding the dynamic slots."""
+
+    prefix = (
+        "\n<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<style>\n{_TEMPLATE_CSS}</style>\n</head>\n<body>\n<div class=\"container\">\n"
+    )
+    content_open = "\n<div class=\"content\">\n"
+    content_close = "\n</div>\n"
+    suffix = "\n</div>\n</body>\n</html>\n"
+    return prefix, content_open, content_close, suffix
+
+
+_DOCUMENT_PREFIX, _CONTENT_OPEN, _CONTENT_CLOSE, _DOCUMENT_SUFFIX = _compile_document_skeleton()
+
+
 class NotificationRenderer:
     """Render unified notification HTML for WEG A/B workflows."""
 
@@ -145,13 +205,13 @@ class NotificationRenderer:
         self.probability = self.data.get("opportunity_probability")
 
         self.urgency = self._determine_urgency()
-        self.summary_text = self._resolve_summary()
         self.body_preview = str(
             self.data.get("body_preview")
             or self.data.get("content_preview")
             or self.data.get("body_plain")
             or ""
         )
+        self.summary_text = self._resolve_summary()
 
         self.tasks_generated = self.data.get("tasks_generated") or []
         self.action_options = self.data.get("action_options") or []
@@ -174,6 +234,8 @@ class NotificationRenderer:
         self.received_time = self.data.get("received_time") or self.data.get("timestamp")
         self.subject = self.data.get("subject", "")
 
+        self._action_config_cache: Dict[str, Dict[str, Any]] = {}
+
     # ------------------------------------------------------------------ helpers
     def _extract_intelligence(self) -> Dict[str, Any]:
         candidate = self.data.get("intelligence_analysis")
@@ -303,27 +365,31 @@ class NotificationRenderer:
         links: List[Dict[str, str]] = []
         seen = set()
 
-        for result in self.attachments:
-            link = result.get("onedrive_sharing_link") or result.get("onedrive_web_url")
+        def add(link: Optional[str], filename: Optional[str], item_id: Optional[str]) -> None:
             if not link:
-                continue
-            key = (link, result.get("filename"))
+                return
+            # Gleiches Drive-Item (z.B. doppelt angehängtes Dokument) nur einmal verlinken
+            key = item_id or (link, filename)
             if key in seen:
-                continue
+                return
             seen.add(key)
-            links.append({"filename": result.get("filename") or "Datei", "link": link})
+            links.append({"filename": filename or "Datei", "link": link})
+
+        for result in self.attachments:
+            add(
+                result.get("onedrive_sharing_link") or result.get("onedrive_web_url"),
+                result.get("filename"),
+                result.get("onedrive_file_id"),
+            )
 
         for info in self.onedrive_links:
             if not isinstance(info, dict):
                 continue
-            link = info.get("sharing_link") or info.get("web_url") or info.get("link")
-            if not link:
-                continue
-            key = (link, info.get("filename"))
-            if key in seen:
-                continue
-            seen.add(key)
-            links.append({"filename": info.get("filename") or "Datei", "link": link})
+            add(
+                info.get("sharing_link") or info.get("web_url") or info.get("link"),
+                info.get("filename"),
+                info.get("item_id"),
+            )
 
         return links
 
@@ -357,66 +423,12 @@ class NotificationRenderer:
             )
         )
 
-        content_html = "\n".join(sections)
-        header_html = self._build_header_html()
-        footer_html = self._build_footer_html()
-
-        return f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8">
-<style>
-    body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: #F5F7FA; margin: 0; padding: 20px; color: #2C3E50; }}
-    .container {{ max-width: 720px; margin: 0 auto; background: #FFFFFF; border-radius: 18px; box-shadow: 0 12px 35px rgba(31, 45, 61, 0.08); overflow: hidden; }}
-    .header {{ background: linear-gradient(135deg, #485563 0%, #29323C 100%); padding: 32px; color: white; text-align: center; }}
-    .header h2 {{ margin: 0 0 10px 0; font-size: 24px; letter-spacing: 0.5px; }}
-    .header p {{ margin: 0; font-size: 14px; opacity: 0.8; }}
-    .badge {{ display: inline-block; margin-left: 8px; padding: 4px 10px; border-radius: 999px; font-size: 12px; font-weight: 600; }}
-    .content {{ padding: 28px 32px 34px 32px; }}
-    .section {{ margin-bottom: 24px; border-radius: 12px; padding: 20px; background: #F9FAFB; border: 1px solid #E5E9F2; }}
-    .section h3 {{ margin-top: 0; font-size: 18px; display: flex; align-items: center; gap: 8px; color: #1F2D3D; }}
-    .summary-main {{ font-weight: 600; margin-bottom: 12px; }}
-    .message-preview {{ background: #FFFFFF; border: 1px solid #E5E9F2; border-radius: 10px; padding: 16px; font-size: 14px; color: #34495E; }}
-    .summary-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 10px 18px; margin: 0; padding: 0; list-style: none; }}
-    .summary-grid dt {{ font-weight: 600; font-size: 13px; color: #5C7080; }}
-    .summary-grid dd {{ margin: 0; font-size: 14px; color: #1F2D3D; }}
-    .task-list {{ list-style: none; padding-left: 0; margin: 0; }}
-    .task-list li {{ margin-bottom: 10px; font-size: 14px; line-height: 1.5; }}
-    .task-meta {{ display: inline-block; font-size: 12px; color: #7F8C8D; margin-left: 8px; }}
-    .attachments ul, .links ul {{ list-style: none; padding: 0; margin: 0; }}
-    .attachments li, .links li {{ padding: 10px 0; border-bottom: 1px solid #E5E9F2; font-size: 14px; }}
-    .attachments li:last-child, .links li:last-child {{ border-bottom: none; }}
-    .attachment-meta {{ display: block; font-size: 12px; color: #7F8C8D; margin-left: 22px; line-height: 1.4; }}
-    .buttons {{ display: flex; flex-direction: column; gap: 14px; }}
-    .button-wrapper {{ text-align: center; }}
-    .button {{ display: inline-block; padding: 13px 28px; border-radius: 30px; font-weight: 600; text-decoration: none; color: white; transition: transform 0.2s ease, box-shadow 0.2s ease; box-shadow: 0 6px 18px rgba(41, 128, 185, 0.15); }}
-    .button:hover {{ transform: translateY(-2px); box-shadow: 0 10px 24px rgba(41, 128, 185, 0.25); }}
-    .button-desc {{ margin: 8px 0 0 0; font-size: 12px; color: #5C7080; }}
-    .btn-primary {{ background: linear-gradient(135deg, #3498DB 0%, #2980B9 100%); }}
-    .btn-success {{ background: linear-gradient(135deg, #2ECC71 0%, #27AE60 100%); }}
-    .btn-warning {{ background: linear-gradient(135deg, #F39C12 0%, #D35400 100%); }}
-    .btn-secondary {{ background: linear-gradient(135deg, #95A5A6 0%, #7F8C8D 100%); }}
-    .btn-info {{ background: linear-gradient(135deg, #74B9FF 0%, #0984E3 100%); }}
-    .btn-create {{ background: linear-gradient(135deg, #52C234 0%, #047857 100%); }}
-    .btn-supplier {{ background: linear-gradient(135deg, #FD79A8 0%, #E84393 100%); }}
-    .btn-private {{ background: linear-gradient(135deg, #A29BFE 0%, #6C5CE7 100%); }}
-    .btn-spam {{ background: linear-gradient(135deg, #FF7675 0%, #D63031 100%); }}
-    .footer {{ background: #F1F3F6; padding: 18px 32px; font-size: 12px; color: #60718B; border-top: 1px solid #E5E9F2; }}
-    .footer p {{ margin: 4px 0; }}
-</style>
-</head>
-<body>
-<div class="container">
-{header_html}
-<div class="content">
-{content_html}
-</div>
-{footer_html}
-</div>
-</body>
-</html>
-"""
+        buffer: List[str] = [_DOCUMENT_PREFIX, self._build_header_html(), _CONTENT_OPEN]
+        buffer.append("\n".join(sections))
+        buffer.append(_CONTENT_CLOSE)
+        buffer.append(self._build_footer_html())
+        buffer.append(_DOCUMENT_SUFFIX)
+        return "".join(buffer)
 
     def _build_header_html(self) -> str:
         icon = "📧" if self.channel == "email" else "📞" if self.channel == "call" else "💬" if self.channel == "whatsapp" else "🆕"
@@ -674,7 +686,7 @@ class NotificationRenderer:
         label = option.get("label") or option.get("title") or action
         description = option.get("description") or ""
         color_key = option.get("color") or action
-        css_class = self.BUTTON_CLASS_MAP.get(color_key, self.BUTTON_CLASS_MAP.get(action, "btn-primary"))
+        css_class, anchor_tail = self._button_style(str(color_key), str(action))
         url = option.get("url")
 
         if not url:
@@ -691,12 +703,44 @@ class NotificationRenderer:
 
         return (
             "<div class='button-wrapper'>"
-            f"<a href='{url}' class='button {css_class}' target='_blank'>{escape_braces(label)}</a>"
+            f"<a href='{url}{anchor_tail}{escape_braces(label)}</a>"
             f"<p class='button-desc'>{escape_braces(description)}</p>"
             "</div>"
         )
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _button_style(color_key: str, action: str) -> Tuple[str, str]:
+        """Resolve CSS class and static anchor markup once per color/action pair."""
+
+        class_map = NotificationRenderer.BUTTON_CLASS_MAP
+        css_class = class_map.get(color_key, class_map.get(action, "btn-primary"))
+        return css_class, f"' class='button {css_class}' target='_blank'>"
+
     def _build_action_config(self, option: Dict[str, Any], description: str) -> Dict[str, Any]:
+        action = option.get("action") or option.get("action_type")
+        config = dict(self._action_config_for(action))
+        config["description"] = description
+
+        option_config = option.get("config")
+        if isinstance(option_config, dict):
+            config.update(option_config)
+
+        for key in ("intelligence_metadata", "metadata"):
+            meta = option.get(key)
+            if isinstance(meta, dict):
+                config.setdefault("intelligence_metadata", meta)
+
+        return compact_dict(config)
+
+    def _action_config_for(self, action: Optional[str]) -> Dict[str, Any]:
+        """Notification-wide part of the button config, memoized per action type."""
+
+        cache_key = action or ""
+        cached = self._action_config_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         config: Dict[str, Any] = {}
         if self.is_known_contact:
             config.update(
@@ -705,7 +749,7 @@ class NotificationRenderer:
                     "contact_name": self.contact_match.get("contact_name"),
                     "opportunity_id": self.opportunity_id,
                     "opportunity_stage": self.opportunity_stage,
-                    "description": description,
+                    "description": None,
                     "channel": self.channel,
                 }
             )
@@ -716,7 +760,7 @@ class NotificationRenderer:
                     "email_id": self.data.get("email_id") or self.data.get("message_id"),
                     "subject": self.subject,
                     "body_preview": self.body_preview,
-                    "description": description,
+                    "description": None,
                     "channel": self.channel,
                 }
             )
@@ -730,7 +774,6 @@ class NotificationRenderer:
             config.setdefault("intelligence_analysis", self.intelligence)
 
         # Enrich for specific actions
-        action = option.get("action") or option.get("action_type")
         if not self.is_known_contact and action == "create_contact":
             notes = self.data.get("message_preview") or self.body_preview
             config.update(
@@ -759,16 +802,8 @@ class NotificationRenderer:
                 }
             )
 
-        option_config = option.get("config")
-        if isinstance(option_config, dict):
-            config.update(option_config)
-
-        for key in ("intelligence_metadata", "metadata"):
-            meta = option.get(key)
-            if isinstance(meta, dict):
-                config.setdefault("intelligence_metadata", meta)
-
-        return compact_dict(config)
+        self._action_config_cache[cache_key] = config
+        return config
 
     def _build_footer_html(self) -> str:
         details = [
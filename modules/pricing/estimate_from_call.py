@@ -450,7 +450,7 @@ def calculate_estimate_from_transcript(transcript: str, caller_info: Optional[Di
     🎯 HAUPT-FUNKTION: Berechnet Richtpreis aus Call Transcript
     
     Args:
-        transcript: Call transcript text
+        transcript: Call transcript text or normalized CallTranscript
         caller_info: Optional dict with caller details (name, company, etc.)
     
     Returns:
@@ -466,6 +466,9 @@ def calculate_estimate_from_transcript(transcript: str, caller_info: Optional[Di
     
     logger.info("💰 Starting estimate calculation from transcript...")
     
+    # Normalisiertes CallTranscript (modules.speech.call_transcript) oder String
+    transcript = getattr(transcript, "text", transcript)
+    
     if not transcript or len(transcript) < 20:
         logger.warning("⚠️ Transcript too short for estimate")
         return ProjectEstimate(found=False, notes="Transcript zu kurz für Kalkulation")
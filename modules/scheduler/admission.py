@@ -0,0 +1,312 @@
+"""
+Admission Control - begrenzte Nebenläufigkeit & Backpressure für Webhooks
+
+Jeder Webhook (Email, Anruf, FrontDesk, WhatsApp) holt vor der eigentlichen
+Verarbeitung (GPT, OCR, LangGraph Workflow) ein Ticket seines Kanals:
+
+- Pro Kanal ein Concurrency-Pool plus eine begrenzte Warteschlange
+- Zusätzlich ein globales Limit über alle Kanäle; freie Plätze gehen
+  nach Priorität (Anrufe vor WhatsApp vor Bulk-Email), innerhalb einer
+  Priorität nach Ankunft
+- Ist die Warteschlange eines Kanals voll, wird sofort abgelehnt
+  (AdmissionRejected → HTTP 429 mit Retry-After) statt Speicher und
+  OpenAI Rate Limits zu erschöpfen
+
+Email antwortet Zapier sofort: das Ticket wird im Request vergeben
+(Ablehnung noch möglich) und erst im Background-Task betreten
+(``spawn_with_ticket`` gibt es auch zurück, wenn der Task nie startet).
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Coroutine, Deque, Dict, List, Optional
+
+from modules.scheduler.job_scheduler import get_task_registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_TOTAL_CONCURRENCY = int(os.getenv("ADMISSION_TOTAL_CONCURRENCY", "6"))
+WAIT_SAMPLES = 200
+DEFAULT_SERVICE_SECONDS = 10.0
+MAX_RETRY_AFTER_SECONDS = 300
+
+# Kanäle
+CHANNEL_CALL = "call"
+CHANNEL_WHATSAPP = "whatsapp"
+CHANNEL_EMAIL = "email"
+
+# Priorität: kleiner = wichtiger
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+
+@dataclass
+class ChannelPolicy:
+    """Pool-Größe, Warteschlangen-Länge und Standard-Priorität eines Kanals"""
+    concurrency: int
+    queue_limit: int
+    priority: int
+
+
+def _policy_from_env(channel: str, concurrency: int, queue_limit: int, priority: int) -> ChannelPolicy:
+    prefix = f"ADMISSION_{channel.upper()}"
+    return ChannelPolicy(
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+        queue_limit=int(os.getenv(f"{prefix}_QUEUE", str(queue_limit))),
+        priority=priority,
+    )
+
+
+# Email + WhatsApp zusammen < globales Limit → für Anrufe bleibt immer ein Platz frei
+DEFAULT_POLICIES = {
+    CHANNEL_CALL: _policy_from_env(CHANNEL_CALL, 3, 20, PRIORITY_URGENT),
+    CHANNEL_WHATSAPP: _policy_from_env(CHANNEL_WHATSAPP, 2, 20, PRIORITY_NORMAL),
+    CHANNEL_EMAIL: _policy_from_env(CHANNEL_EMAIL, 3, 50, PRIORITY_BULK),
+}
+
+
+class AdmissionRejected(Exception):
+    """Warteschlange des Kanals ist voll - Aufrufer soll später erneut senden"""
+
+    def __init__(self, channel: str, retry_after: int, queued: int):
+        super().__init__(f"Admission queue for '{channel}' is full ({queued} waiting)")
+        self.channel = channel
+        self.retry_after = retry_after
+        self.queued = queued
+
+
+class _ChannelState:
+    def __init__(self, policy: ChannelPolicy):
+        self.policy = policy
+        self.running = 0
+        self.pending = 0  # vergeben, aber noch nicht gestartet (wartend oder Task noch nicht betreten)
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.service_seconds = DEFAULT_SERVICE_SECONDS  # EWMA der Laufzeit
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.max_wait = 0.0
+
+
+class AdmissionTicket:
+    """Platz in der Warteschlange eines Kanals; ``async with ticket`` wartet auf einen Slot"""
+
+    def __init__(self, controller: "AdmissionController", channel: str, priority: int, seq: int):
+        self.controller = controller
+        self.channel = channel
+        self.priority = priority
+        self.seq = seq
+        self.admitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.queued = True  # zählt in pending, bis gestartet oder zurückgegeben
+        self._future: Optional[asyncio.Future] = None
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        await self.controller._acquire(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.controller._release(self)
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """Führt ``coro`` innerhalb des Slots aus (für Background-Tasks)"""
+        try:
+            async with self:
+                return await coro
+        finally:
+            coro.close()  # nie gestartete Coroutine (Abbruch beim Warten) sauber schließen
+
+    def discard(self):
+        """Ticket zurückgeben, ohne es zu betreten (z.B. Fehler beim Spawnen); mehrfach aufrufbar"""
+        self.controller._discard(self)
+
+
+def spawn_with_ticket(ticket: Any, coro: Coroutine[Any, Any, Any], name: Optional[str] = None) -> asyncio.Task:
+    """
+    Startet ``ticket.run(coro)`` als Background-Task der TaskRegistry.
+
+    Wird der Task abgebrochen, bevor er läuft, oder schlägt das Spawnen fehl,
+    gibt ``ticket.discard()`` den Platz in der Warteschlange zurück und
+    ``coro`` wird geschlossen (keine "never awaited" Warnung).
+    Funktioniert für jedes Ticket mit ``run``/``discard`` (auch MailboxTicket).
+    """
+    wrapped = ticket.run(coro)
+    try:
+        task = get_task_registry().spawn(wrapped, name=name)
+    except BaseException:
+        wrapped.close()
+        coro.close()
+        ticket.discard()
+        raise
+
+    def _on_done(_task: asyncio.Task):
+        coro.close()
+        ticket.discard()
+
+    task.add_done_callback(_on_done)
+    return task
+
+
+class AdmissionController:
+    """🚦 Per-Kanal Pools mit globalem Limit, Prioritäts-Warteschlange und Load Shedding"""
+
+    def __init__(self, policies: Optional[Dict[str, ChannelPolicy]] = None,
+                 total_concurrency: int = ADMISSION_TOTAL_CONCURRENCY):
+        self.total_concurrency = total_concurrency
+        self._channels = {name: _ChannelState(policy) for name, policy in (policies or DEFAULT_POLICIES).items()}
+        self._waiting: List[AdmissionTicket] = []
+        self._running = 0
+        self._seq = 0
+
+    def admit(self, channel: str, priority: Optional[int] = None) -> AdmissionTicket:
+        """
+        Vergibt synchron ein Ticket oder lehnt ab.
+
+        Raises:
+            AdmissionRejected: Warteschlange des Kanals voll
+        """
+        state = self._channels[channel]
+        if state.pending >= state.policy.queue_limit:
+            state.rejected += 1
+            retry_after = self._retry_after(state)
+            logger.warning(f"🚦 Admission rejected for {channel}: {state.pending} queued, {state.running} running (retry after {retry_after}s)")
+            raise AdmissionRejected(channel, retry_after, state.pending)
+
+        self._seq += 1
+        state.pending += 1
+        state.admitted += 1
+        return AdmissionTicket(self, channel, state.policy.priority if priority is None else priority, self._seq)
+
+    def set_concurrency(self, channel: str, concurrency: int):
+        """
+        Passt den Pool eines Kanals an (Email = Summe der Postfach-Pools).
+        Das globale Limit wächst um dieselbe Differenz, damit der für Anrufe
+        reservierte Platz erhalten bleibt.
+        """
+        state = self._channels[channel]
+        delta = concurrency - state.policy.concurrency
+        if not delta:
+            return
+        state.policy = replace(state.policy, concurrency=concurrency,
+                               queue_limit=max(state.policy.queue_limit, concurrency))
+        self.total_concurrency = max(1, self.total_concurrency + delta)
+        logger.info(f"🚦 Admission pool for {channel}: {concurrency} (total {self.total_concurrency})")
+        self._dispatch()
+
+    def get_channel_service_seconds(self, channel: str) -> float:
+        """Geglättete Laufzeit eines Tickets (für Retry-After vorgelagerter Warteschlangen)"""
+        return self._channels[channel].service_seconds
+
+    def _retry_after(self, state: _ChannelState) -> int:
+        backlog = (state.pending + state.running) / max(1, state.policy.concurrency)
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(backlog * state.service_seconds)))
+
+    def _can_start(self, ticket: AdmissionTicket) -> bool:
+        state = self._channels[ticket.channel]
+        return self._running < self.total_concurrency and state.running < state.policy.concurrency
+
+    def _leave_queue(self, ticket: AdmissionTicket):
+        if ticket.queued:
+            ticket.queued = False
+            self._channels[ticket.channel].pending -= 1
+
+    def _start(self, ticket: AdmissionTicket):
+        state = self._channels[ticket.channel]
+        self._leave_queue(ticket)
+        state.running += 1
+        self._running += 1
+        ticket.started_at = time.monotonic()
+        wait = ticket.started_at - ticket.admitted_at
+        state.waits.append(wait)
+        state.max_wait = max(state.max_wait, wait)
+
+    async def _acquire(self, ticket: AdmissionTicket):
+        # Sofort starten nur, wenn kein gleich- oder höher priorisiertes Ticket wartet,
+        # das ebenfalls starten könnte
+        blocked = any(
+            (other.priority, other.seq) < (ticket.priority, ticket.seq) and self._can_start(other)
+            for other in self._waiting
+        )
+        if not blocked and self._can_start(ticket):
+            self._start(ticket)
+            return
+
+        ticket._future = asyncio.get_running_loop().create_future()
+        self._waiting.append(ticket)
+        self._waiting.sort(key=lambda t: (t.priority, t.seq))
+        try:
+            await ticket._future
+        except asyncio.CancelledError:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._leave_queue(ticket)
+            elif ticket.started_at is not None:
+                # Slot wurde im selben Moment vergeben → sofort wieder freigeben
+                self._release(ticket)
+            raise
+
+    def _release(self, ticket: AdmissionTicket):
+        state = self._channels[ticket.channel]
+        state.running -= 1
+        state.completed += 1
+        self._running -= 1
+        duration = time.monotonic() - (ticket.started_at or ticket.admitted_at)
+        state.service_seconds = 0.8 * state.service_seconds + 0.2 * duration
+        self._dispatch()
+
+    def _discard(self, ticket: AdmissionTicket):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+        self._leave_queue(ticket)
+
+    def _dispatch(self):
+        for ticket in list(self._waiting):
+            if self._running >= self.total_concurrency:
+                break
+            if self._can_start(ticket) and not ticket._future.done():
+                self._waiting.remove(ticket)
+                self._start(ticket)
+                ticket._future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        channels = {}
+        for name, state in self._channels.items():
+            waits = sorted(state.waits)
+            channels[name] = {
+                "running": state.running,
+                "queued": state.pending,
+                "waiting": sum(1 for t in self._waiting if t.channel == name),
+                "concurrency": state.policy.concurrency,
+                "queue_limit": state.policy.queue_limit,
+                "priority": state.policy.priority,
+                "admitted": state.admitted,
+                "rejected": state.rejected,
+                "completed": state.completed,
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p95_wait_ms": round(waits[math.ceil(0.95 * len(waits)) - 1] * 1000, 1) if waits else 0.0,
+                "max_wait_ms": round(state.max_wait * 1000, 1),
+                "avg_service_seconds": round(state.service_seconds, 2),
+            }
+        return {
+            "running": self._running,
+            "total_concurrency": self.total_concurrency,
+            "waiting": len(self._waiting),
+            "channels": channels,
+        }
+
+
+# Globale Instanz (Singleton-Pattern)
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Gibt die globale AdmissionController Instanz zurück"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
@@ -0,0 +1,595 @@
+"""
+Job Scheduler - periodische Jobs, Task Queue Worker & Task Registry
+
+Läuft im FastAPI lifespan des Orchestrators:
+- Cron-Jobs (Minute/Stunde/Tag/Monat/Wochentag, Europe/Berlin), z.B. tägliche
+  Umsatzabgleich-Alerts, WeClapp DB Refresh, Auto-Matching, Fahrtenbuch Sync
+- Leader Lock pro Job (SQLite Lease) → bei mehreren Workern/Replicas auf
+  demselben Volume läuft ein Job nur einmal; der Cron-Slot wird zusammen mit
+  der Lease verbucht, ein bereits gelaufener Slot wird übersprungen
+- Worker für task_queue (EmailTrackingDB.queue_task), Tasks werden atomar
+  geclaimt und nach max_attempts als failed markiert; abgebrochene Tasks
+  gehen zurück auf pending, hängende running-Tasks werden periodisch requeued
+- TaskRegistry: hält Referenzen auf Background-Tasks (statt fire-and-forget
+  asyncio.create_task) und wartet beim Shutdown auf laufende Tasks
+- last_run / next_run jedes Jobs wird persistiert; ein während eines
+  Restarts verpasster Lauf wird beim Start nachgeholt
+"""
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_DB_PATH = os.getenv("SCHEDULER_DB_PATH", "/tmp/email_tracking.db")
+SCHEDULER_TIMEZONE = pytz.timezone("Europe/Berlin")
+TASK_POLL_INTERVAL_SECONDS = float(os.getenv("TASK_POLL_INTERVAL_SECONDS", "30"))
+MAX_SCHEDULER_SLEEP_SECONDS = 30.0
+DEFAULT_LEASE_SECONDS = 600
+STALE_REQUEUE_INTERVAL_SECONDS = float(os.getenv("STALE_REQUEUE_INTERVAL_SECONDS", "300"))
+
+
+# ===============================
+# CRON SCHEDULE
+# ===============================
+
+class CronSchedule:
+    """
+    Cron-Ausdruck mit 5 Feldern: Minute Stunde Tag Monat Wochentag
+
+    Unterstützt *, Listen (1,15), Bereiche (1-5) und Schritte (*/15, 8-18/2).
+    Wochentag 0 (oder 7) = Sonntag. Sind Tag UND Wochentag eingeschränkt,
+    reicht wie bei cron einer der beiden.
+    """
+
+    FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+
+        parsed = [self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {0 if day == 7 else day for day in weekdays}
+        self.days_restricted = fields[2] != "*"
+        self.weekdays_restricted = fields[4] != "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values: Set[int] = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                step = int(step_str)
+                if step < 1:
+                    raise ValueError(f"Invalid cron step: '{field}'")
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start_str, end_str = part.split("-", 1)
+                start, end = int(start_str), int(end_str)
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field out of range: '{field}'")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Nächster Zeitpunkt (minutengenau) strikt nach ``moment``"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit_year = candidate.year + 5
+
+        while candidate.year <= limit_year:
+            if candidate.month not in self.months:
+                year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+
+        raise ValueError(f"Cron expression never matches: '{self.expression}'")
+
+
+# ===============================
+# TASK REGISTRY
+# ===============================
+
+class TaskRegistry:
+    """Hält Referenzen auf Background-Tasks und beendet sie geordnet"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"spawned": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    def spawn(self, coro: Awaitable[Any], name: Optional[str] = None) -> asyncio.Task:
+        """Startet einen Background-Task (Ersatz für fire-and-forget asyncio.create_task)"""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        self.stats["spawned"] += 1
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            self.stats["cancelled"] += 1
+            return
+        error = task.exception()
+        if error is not None:
+            self.stats["failed"] += 1
+            logger.error(f"❌ Background task '{task.get_name()}' failed: {error!r}")
+        else:
+            self.stats["completed"] += 1
+
+    @property
+    def active_count(self) -> int:
+        return len(self._tasks)
+
+    async def shutdown(self, timeout: float = 25.0):
+        """Wartet bis ``timeout`` auf laufende Tasks, bricht den Rest ab"""
+        if not self._tasks:
+            return
+        logger.info(f"⏳ Waiting for {len(self._tasks)} background task(s) to finish...")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"⚠️ Cancelled {len(pending)} background task(s) on shutdown")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "active": len(self._tasks),
+            "active_names": sorted(task.get_name() for task in self._tasks)[:20],
+        }
+
+
+# ===============================
+# LEADER LOCK
+# ===============================
+
+class LeaderLock:
+    """
+    Lease-basierter Lock pro Job in SQLite.
+
+    Wer die Lease hält, führt den Job aus; abgelaufene Leases (abgestürzter
+    Worker) können übernommen werden.
+    """
+
+    def __init__(self, db_path: str = SCHEDULER_DB_PATH, owner_id: Optional[str] = None):
+        self.db_path = db_path
+        self.owner_id = owner_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, name: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM scheduler_leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != self.owner_id and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("""
+                INSERT INTO scheduler_leases (name, owner, acquired_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    owner = excluded.owner, acquired_at = excluded.acquired_at, expires_at = excluded.expires_at
+            """, (name, self.owner_id, now, now + lease_seconds))
+            conn.execute("COMMIT")
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Leader lock '{name}' not acquired: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def claim_slot(self, name: str, slot: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> str:
+        """
+        Lease holen und Cron-Slot in derselben Transaktion (BEGIN IMMEDIATE) verbuchen.
+
+        Returns:
+            "acquired", "locked" (anderer Worker hält die Lease) oder
+            "done" (Slot lief bereits, z.B. auf einem anderen Worker)
+        """
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM scheduler_leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != self.owner_id and row[1] > now:
+                conn.execute("ROLLBACK")
+                return "locked"
+            done = conn.execute("SELECT last_slot FROM scheduler_slots WHERE name = ?", (name,)).fetchone()
+            if done is not None and done[0] >= slot:
+                conn.execute("ROLLBACK")
+                return "done"
+            conn.execute("""
+                INSERT INTO scheduler_leases (name, owner, acquired_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    owner = excluded.owner, acquired_at = excluded.acquired_at, expires_at = excluded.expires_at
+            """, (name, self.owner_id, now, now + lease_seconds))
+            conn.execute("""
+                INSERT INTO scheduler_slots (name, last_slot, claimed_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET last_slot = excluded.last_slot, claimed_at = excluded.claimed_at
+            """, (name, slot, now))
+            conn.execute("COMMIT")
+            return "acquired"
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ Leader lock '{name}' not acquired: {e}")
+            return "locked"
+        finally:
+            conn.close()
+
+    def release(self, name: str):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            conn.execute("DELETE FROM scheduler_leases WHERE name = ? AND owner = ?", (name, self.owner_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# ===============================
+# JOB SCHEDULER
+# ===============================
+
+@dataclass
+class ScheduledJob:
+    """Ein periodischer Job"""
+    name: str
+    schedule: CronSchedule
+    func: Callable[[], Awaitable[Any]]
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
+    next_run: Optional[datetime] = None
+    running: bool = False
+
+
+TaskHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobScheduler:
+    """In-Process Scheduler für Cron-Jobs und die task_queue"""
+
+    def __init__(
+        self,
+        db_path: str = SCHEDULER_DB_PATH,
+        registry: Optional[TaskRegistry] = None,
+        task_poll_interval: float = TASK_POLL_INTERVAL_SECONDS,
+    ):
+        self.db_path = db_path
+        self.registry = registry or TaskRegistry()
+        self.task_poll_interval = task_poll_interval
+        self.lock = LeaderLock(db_path)
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.task_source = None
+        self.task_handlers: Dict[str, TaskHandler] = {}
+        self.default_task_handler: Optional[TaskHandler] = None
+        self._loops: List[asyncio.Task] = []
+        self.stats = {"job_runs": 0, "job_failures": 0, "jobs_skipped_not_leader": 0,
+                      "jobs_skipped_slot_done": 0, "tasks_processed": 0, "tasks_failed": 0}
+
+    # ------------------------------------------------------------------ setup
+    def add_job(self, name: str, cron: str, func: Callable[[], Awaitable[Any]],
+                lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        """Registriert einen Cron-Job (vor start())"""
+        self.jobs[name] = ScheduledJob(name=name, schedule=CronSchedule(cron), func=func, lease_seconds=lease_seconds)
+
+    def set_task_source(self, task_source, handlers: Optional[Dict[str, TaskHandler]] = None,
+                        default_handler: Optional[TaskHandler] = None):
+        """
+        Aktiviert den task_queue Worker.
+
+        Args:
+            task_source: Objekt mit get_pending_tasks / claim_task / update_task_status
+                         (EmailTrackingDB)
+            handlers: task_type → async handler(task)
+            default_handler: Handler für Task-Typen ohne eigenen Handler
+        """
+        self.task_source = task_source
+        self.task_handlers.update(handlers or {})
+        self.default_task_handler = default_handler
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scheduler_jobs (
+                name TEXT PRIMARY KEY,
+                cron TEXT NOT NULL,
+                last_run_at TEXT,
+                last_status TEXT,
+                last_error TEXT,
+                last_duration_ms INTEGER,
+                next_run_at TEXT,
+                run_count INTEGER DEFAULT 0,
+                updated_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS scheduler_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS scheduler_slots (
+                name TEXT PRIMARY KEY,
+                last_slot TEXT NOT NULL,
+                claimed_at REAL NOT NULL
+            );
+        """)
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def now() -> datetime:
+        """Aktuelle Zeit Europe/Berlin (naiv, für Cron-Vergleiche)"""
+        return datetime.now(SCHEDULER_TIMEZONE).replace(tzinfo=None)
+
+    # ------------------------------------------------------------------ lifecycle
+    @property
+    def running(self) -> bool:
+        return any(not loop.done() for loop in self._loops)
+
+    async def start(self):
+        """Startet Job-Loop und Task-Queue-Worker (aus dem FastAPI lifespan)"""
+        if self.running:
+            return
+        self._init_schema()
+
+        conn = sqlite3.connect(self.db_path)
+        persisted = dict(conn.execute("SELECT name, next_run_at FROM scheduler_jobs").fetchall())
+        conn.close()
+
+        now = self.now()
+        for job in self.jobs.values():
+            next_run_at = persisted.get(job.name)
+            # verpasster Lauf (Restart/Deploy) → sofort nachholen
+            job.next_run = datetime.fromisoformat(next_run_at) if next_run_at else job.schedule.next_after(now)
+            self._save_state(job, next_run_only=True)
+
+        self._loops = [asyncio.create_task(self._job_loop(), name="scheduler-jobs")]
+        if self.task_source is not None:
+            if hasattr(self.task_source, "requeue_stale_tasks"):
+                self.task_source.requeue_stale_tasks()
+            self._loops.append(asyncio.create_task(self._task_queue_loop(), name="scheduler-task-queue"))
+
+        logger.info(f"⏰ Scheduler started: {len(self.jobs)} job(s), task queue worker "
+                    f"{'on' if self.task_source is not None else 'off'}")
+
+    async def stop(self, timeout: float = 25.0):
+        """Stoppt die Loops und wartet auf laufende Jobs/Tasks"""
+        for loop in self._loops:
+            loop.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+        await self.registry.shutdown(timeout=timeout)
+        logger.info("⏰ Scheduler stopped")
+
+    # ------------------------------------------------------------------ jobs
+    async def _job_loop(self):
+        while True:
+            now = self.now()
+            for job in self.jobs.values():
+                if not job.running and job.next_run is not None and job.next_run <= now:
+                    job.running = True
+                    self.registry.spawn(self._execute_job(job), name=f"job:{job.name}")
+
+            upcoming = [job.next_run for job in self.jobs.values() if job.next_run is not None and not job.running]
+            sleep_seconds = MAX_SCHEDULER_SLEEP_SECONDS
+            if upcoming:
+                sleep_seconds = min(sleep_seconds, max(1.0, (min(upcoming) - now).total_seconds()))
+            await asyncio.sleep(sleep_seconds)
+
+    async def _execute_job(self, job: ScheduledJob, manual: bool = False) -> Dict[str, Any]:
+        try:
+            if manual or job.next_run is None:
+                claim = "acquired" if self.lock.acquire(job.name, job.lease_seconds) else "locked"
+            else:
+                # Slot wird mit der Lease verbucht → derselbe Cron-Slot läuft nie zweimal
+                claim = self.lock.claim_slot(job.name, job.next_run.isoformat(), job.lease_seconds)
+            if claim != "acquired":
+                if claim == "done":
+                    self.stats["jobs_skipped_slot_done"] += 1
+                    logger.info(f"⏭️ Job '{job.name}' skipped - slot {job.next_run.isoformat()} already ran")
+                else:
+                    self.stats["jobs_skipped_not_leader"] += 1
+                    logger.info(f"⏭️ Job '{job.name}' skipped - running on another worker")
+                if not manual:
+                    job.next_run = job.schedule.next_after(self.now())
+                    self._save_state(job, next_run_only=True)
+                return {"job": job.name, "status": "skipped_slot_done" if claim == "done" else "skipped_not_leader"}
+
+            started_at = self.now()
+            start = time.perf_counter()
+            status, error = "success", None
+            logger.info(f"⏰ Running job '{job.name}'")
+            try:
+                await job.func()
+            except Exception as e:
+                status, error = "error", str(e)
+                self.stats["job_failures"] += 1
+                logger.error(f"❌ Job '{job.name}' failed: {e}")
+            finally:
+                self.lock.release(job.name)
+
+            self.stats["job_runs"] += 1
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            if not manual:
+                job.next_run = job.schedule.next_after(self.now())
+            self._save_state(job, last_run_at=started_at, status=status, error=error, duration_ms=duration_ms)
+            return {"job": job.name, "status": status, "error": error, "duration_ms": duration_ms}
+        finally:
+            job.running = False
+
+    async def run_job_now(self, name: str) -> Dict[str, Any]:
+        """Führt einen Job sofort aus (manueller Trigger), next_run bleibt unverändert"""
+        job = self.jobs.get(name)
+        if job is None:
+            raise KeyError(name)
+        if job.running:
+            return {"job": name, "status": "already_running"}
+        job.running = True
+        return await self._execute_job(job, manual=True)
+
+    def _save_state(self, job: ScheduledJob, next_run_only: bool = False, last_run_at: Optional[datetime] = None,
+                    status: Optional[str] = None, error: Optional[str] = None, duration_ms: Optional[int] = None):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            next_run_at = job.next_run.isoformat() if job.next_run else None
+            if next_run_only:
+                conn.execute("""
+                    INSERT INTO scheduler_jobs (name, cron, next_run_at, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET cron = excluded.cron, next_run_at = excluded.next_run_at,
+                                                    updated_at = excluded.updated_at
+                """, (job.name, job.schedule.expression, next_run_at, datetime.now().isoformat()))
+            else:
+                conn.execute("""
+                    UPDATE scheduler_jobs
+                    SET last_run_at = ?, last_status = ?, last_error = ?, last_duration_ms = ?,
+                        next_run_at = ?, run_count = run_count + 1, updated_at = ?
+                    WHERE name = ?
+                """, (last_run_at.isoformat() if last_run_at else None, status, error, duration_ms,
+                      next_run_at, datetime.now().isoformat(), job.name))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Could not persist scheduler state for '{job.name}': {e}")
+
+    # ------------------------------------------------------------------ task queue
+    async def _task_queue_loop(self):
+        loop = asyncio.get_running_loop()
+        last_requeue = time.monotonic()
+        while True:
+            try:
+                if (hasattr(self.task_source, "requeue_stale_tasks")
+                        and time.monotonic() - last_requeue >= STALE_REQUEUE_INTERVAL_SECONDS):
+                    last_requeue = time.monotonic()
+                    requeued = await loop.run_in_executor(None, self.task_source.requeue_stale_tasks)
+                    if requeued:
+                        logger.warning(f"⚠️ Requeued {requeued} stale task(s)")
+                tasks = await loop.run_in_executor(None, self.task_source.get_pending_tasks)
+                for task in tasks:
+                    claimed = await loop.run_in_executor(None, self.task_source.claim_task, task["task_uuid"])
+                    if claimed:
+                        self.registry.spawn(self._execute_task(task), name=f"task:{task['task_type']}:{task['task_uuid'][:8]}")
+            except Exception as e:
+                logger.error(f"❌ Task queue poll failed: {e}")
+            await asyncio.sleep(self.task_poll_interval)
+
+    async def _execute_task(self, task: Dict[str, Any]):
+        loop = asyncio.get_running_loop()
+        task_uuid = task["task_uuid"]
+        handler = self.task_handlers.get(task["task_type"], self.default_task_handler)
+        if handler is None:
+            self.stats["tasks_failed"] += 1
+            await loop.run_in_executor(None, self.task_source.update_task_status, task_uuid, "failed",
+                                       f"No handler for task type '{task['task_type']}'")
+            return
+
+        try:
+            await handler(task)
+            self.stats["tasks_processed"] += 1
+            await loop.run_in_executor(None, self.task_source.update_task_status, task_uuid, "completed")
+            logger.info(f"✅ Task {task_uuid} ({task['task_type']}) completed")
+        except asyncio.CancelledError:
+            # Shutdown/Abbruch: Task nicht in running hängen lassen, sondern wieder einreihen
+            self._requeue_cancelled_task(task_uuid)
+            logger.warning(f"⚠️ Task {task_uuid} ({task['task_type']}) cancelled - requeued")
+            raise
+        except Exception as e:
+            self.stats["tasks_failed"] += 1
+            retry = task.get("attempts", 0) + 1 < task.get("max_attempts", 3)
+            await loop.run_in_executor(None, self.task_source.update_task_status, task_uuid,
+                                       "pending" if retry else "failed", str(e))
+            logger.error(f"❌ Task {task_uuid} ({task['task_type']}) failed{' - will retry' if retry else ''}: {e}")
+
+    def _requeue_cancelled_task(self, task_uuid: str):
+        """Synchron, da der Event Loop beim Shutdown evtl. keine Executor-Jobs mehr annimmt"""
+        try:
+            if hasattr(self.task_source, "release_task"):
+                self.task_source.release_task(task_uuid)
+            else:
+                self.task_source.update_task_status(task_uuid, "pending", "cancelled")
+        except Exception as e:
+            logger.error(f"❌ Could not requeue cancelled task {task_uuid}: {e}")
+
+    # ------------------------------------------------------------------ status
+    def get_stats(self) -> Dict[str, Any]:
+        """Jobs (inkl. persistiertem Status), Registry und Queue-Statistiken"""
+        persisted: Dict[str, Dict[str, Any]] = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            persisted = {row["name"]: dict(row) for row in conn.execute("SELECT * FROM scheduler_jobs")}
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+        return {
+            **self.stats,
+            "running": self.running,
+            "owner_id": self.lock.owner_id,
+            "jobs": {
+                name: {
+                    "cron": job.schedule.expression,
+                    "running": job.running,
+                    "next_run_at": job.next_run.isoformat() if job.next_run else None,
+                    "last_run_at": persisted.get(name, {}).get("last_run_at"),
+                    "last_status": persisted.get(name, {}).get("last_status"),
+                    "last_error": persisted.get(name, {}).get("last_error"),
+                    "last_duration_ms": persisted.get(name, {}).get("last_duration_ms"),
+                    "run_count": persisted.get(name, {}).get("run_count", 0),
+                }
+                for name, job in self.jobs.items()
+            },
+            "background_tasks": self.registry.get_stats(),
+        }
+
+
+# Globale Instanzen (Singleton-Pattern)
+_task_registry_instance = None
+_scheduler_instance = None
+
+def get_task_registry() -> TaskRegistry:
+    """Holt globale TaskRegistry Instanz"""
+    global _task_registry_instance
+    if _task_registry_instance is None:
+        _task_registry_instance = TaskRegistry()
+    return _task_registry_instance
+
+
+def get_job_scheduler() -> JobScheduler:
+    """Holt globale JobScheduler Instanz"""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = JobScheduler(registry=get_task_registry())
+    return _scheduler_instance
@@ -0,0 +1,405 @@
+"""
+Mailbox Registry - mehrere Postfächer mit eigenen Pools & fairer Verteilung
+
+Alle Postfächer (persönlich, info@, buchhaltung@, ...) laufen durch denselben
+Orchestrator. Damit ein volles Buchhaltungs-Postfach den Vertrieb nicht
+aushungert, bekommt jedes Postfach:
+
+- einen eigenen Worker-Pool (concurrency) und eine eigene, begrenzte
+  Warteschlange; ist sie voll → AdmissionRejected (429) nur für dieses Postfach
+- freie Plätze werden per gewichtetem Round Robin zwischen den Postfächern
+  vergeben (weight = Plätze pro Runde), innerhalb eines Postfachs nach
+  Priorität und Ankunft
+- ein eigenes Graph-Budget: Microsoft drosselt pro Postfach (gleichzeitige
+  Requests, Requests pro 10 Minuten, Retry-After nach 429/503)
+
+Die Summe der Postfach-Pools ist der Email-Pool der Admission Control; der
+Email-Durchsatz wächst also mit der Anzahl der Postfächer, Anrufe behalten
+ihren Vorrang.
+
+Konfiguration:
+    MAILBOXES="mj@cdtechnologies.de:personal,info@cdtechnologies.de:sales,buchhaltung@cdtechnologies.de:accounting"
+    MAILBOX_OVERRIDES='{"buchhaltung@cdtechnologies.de": {"concurrency": 3, "weight": 1}}'
+Unbekannte Postfächer aus Webhooks teilen sich ein gemeinsames "auto"-Postfach
+(ein Pool, eine Warteschlange) - beliebige Adressen im Payload können weder
+Postfächer anlegen noch den Email-Pool der Admission Control vergrößern.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Deque, Dict, List, Optional
+
+from modules.scheduler.admission import (
+    CHANNEL_EMAIL,
+    PRIORITY_BULK,
+    AdmissionController,
+    AdmissionRejected,
+    get_admission_controller,
+)
+
+logger = logging.getLogger(__name__)
+
+MAILBOXES = os.getenv("MAILBOXES", "mj@cdtechnologies.de:personal")
+MAILBOX_OVERRIDES = os.getenv("MAILBOX_OVERRIDES", "")
+MAILBOX_SEARCH = os.getenv("MAILBOX_SEARCH", "mj@cundd.net")
+MAILBOX_CONCURRENCY = int(os.getenv("MAILBOX_CONCURRENCY", "2"))
+MAILBOX_QUEUE = int(os.getenv("MAILBOX_QUEUE", "50"))
+MAILBOX_WEIGHT = int(os.getenv("MAILBOX_WEIGHT", "1"))
+AUTO_MAILBOX = "auto"
+
+# Exchange Online: 4 gleichzeitige Requests und 10.000 Requests / 10 min pro App und Postfach
+GRAPH_MAILBOX_CONCURRENCY = int(os.getenv("GRAPH_MAILBOX_CONCURRENCY", "4"))
+GRAPH_MAILBOX_REQUESTS_PER_WINDOW = int(os.getenv("GRAPH_MAILBOX_REQUESTS_PER_WINDOW", "10000"))
+GRAPH_WINDOW_SECONDS = 600.0
+GRAPH_DEFAULT_RETRY_AFTER = 30.0
+WAIT_SAMPLES = 200
+
+
+class GraphBudget:
+    """Graph-Drosselung eines Postfachs: Parallelität, 10-Minuten-Fenster, Retry-After"""
+
+    def __init__(self, address: str, concurrency: int = GRAPH_MAILBOX_CONCURRENCY,
+                 requests_per_window: int = GRAPH_MAILBOX_REQUESTS_PER_WINDOW):
+        self.address = address
+        self.concurrency = concurrency
+        self.requests_per_window = requests_per_window
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self._window: Deque[float] = deque()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {"requests": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    def _trim(self, now: float):
+        while self._window and self._window[0] <= now - GRAPH_WINDOW_SECONDS:
+            self._window.popleft()
+
+    @asynccontextmanager
+    async def request(self) -> AsyncIterator[None]:
+        """Wartet auf Budget für einen Graph-Request dieses Postfachs"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        started = time.monotonic()
+        async with self._semaphore:
+            while True:
+                now = time.monotonic()
+                self._trim(now)
+                delay = self.blocked_until - now
+                if len(self._window) >= self.requests_per_window:
+                    delay = max(delay, self._window[0] + GRAPH_WINDOW_SECONDS - now)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            self._window.append(time.monotonic())
+            self.stats["requests"] += 1
+            self.stats["waited_seconds"] += time.monotonic() - started
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def record_response(self, response: Any):
+        """429/503 von Graph → Postfach bis Retry-After pausieren"""
+        if getattr(response, "status_code", None) not in (429, 503):
+            return
+        try:
+            retry_after = float(response.headers.get("Retry-After", GRAPH_DEFAULT_RETRY_AFTER))
+        except (TypeError, ValueError):
+            retry_after = GRAPH_DEFAULT_RETRY_AFTER
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.stats["throttled"] += 1
+        logger.warning(f"🐢 Graph throttled mailbox {self.address}: pausing {retry_after:.0f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._trim(now)
+        return {
+            **self.stats,
+            "waited_seconds": round(self.stats["waited_seconds"], 1),
+            "in_flight": self.in_flight,
+            "window_used": len(self._window),
+            "window_limit": self.requests_per_window,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - now), 1),
+        }
+
+
+class Mailbox:
+    """Ein Postfach mit eigenem Pool, Warteschlange und Graph-Budget"""
+
+    def __init__(self, address: str, role: str = "personal", concurrency: int = MAILBOX_CONCURRENCY,
+                 queue_limit: int = MAILBOX_QUEUE, weight: int = MAILBOX_WEIGHT):
+        self.address = address
+        self.role = role
+        self.concurrency = max(1, concurrency)
+        self.queue_limit = queue_limit
+        self.weight = max(1, weight)
+        self.credit = self.weight
+        self.graph = GraphBudget(address)
+        self.running = 0
+        self.pending = 0  # vergeben, aber noch nicht gestartet
+        self.waiting: List["MailboxTicket"] = []
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+
+class MailboxTicket:
+    """Platz in der Warteschlange eines Postfachs; ``run`` wartet auf Postfach- und Email-Slot"""
+
+    def __init__(self, registry: "MailboxRegistry", mailbox: Mailbox, priority: int, admission_priority: Optional[int], seq: int):
+        self.registry = registry
+        self.mailbox = mailbox
+        self.priority = priority
+        self.admission_priority = admission_priority
+        self.seq = seq
+        self.admitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.queued = True  # zählt in Mailbox.pending, bis gestartet oder zurückgegeben
+        self._future: Optional[asyncio.Future] = None
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """Führt ``coro`` im Pool des Postfachs und mit Admission-Ticket (Kanal Email) aus"""
+        try:
+            await self.registry._acquire(self)
+            try:
+                ticket = self.registry.admission.admit(CHANNEL_EMAIL, priority=self.admission_priority)
+                return await ticket.run(coro)
+            finally:
+                self.registry._release(self)
+        finally:
+            coro.close()  # nie gestartete Coroutine (Abbruch beim Warten) sauber schließen
+
+    def discard(self):
+        """Ticket zurückgeben, ohne es zu betreten (Task nie gestartet / Spawn-Fehler); mehrfach aufrufbar"""
+        self.registry._discard(self)
+
+
+class MailboxRegistry:
+    """📬 Postfächer mit eigenen Pools, gewichtetem Round Robin und Graph-Budget"""
+
+    def __init__(self, mailboxes: Optional[List[Mailbox]] = None, admission: Optional[AdmissionController] = None,
+                 total_concurrency: Optional[int] = None):
+        self.admission = admission or get_admission_controller()
+        self._fixed_total = total_concurrency
+        self._mailboxes: Dict[str, Mailbox] = {}
+        self._order: List[str] = []
+        self._cursor = 0
+        self._running = 0
+        self._seq = 0
+        self.total_concurrency = 0
+        for mailbox in mailboxes if mailboxes is not None else mailboxes_from_env():
+            self._add(mailbox)
+        self._resize()
+
+    # ------------------------------------------------------------- registry
+    def _add(self, mailbox: Mailbox):
+        self._mailboxes[mailbox.address] = mailbox
+        self._order.append(mailbox.address)
+
+    def _resize(self):
+        """Email-Pool der Admission Control = Summe der konfigurierten Postfach-Pools"""
+        self.total_concurrency = self._fixed_total or sum(
+            m.concurrency for m in self._mailboxes.values() if m.role != "auto"
+        )
+        self.admission.set_concurrency(CHANNEL_EMAIL, self.total_concurrency)
+
+    def get(self, address: Optional[str]) -> Mailbox:
+        """Postfach zur Adresse; unbekannte Adressen landen im gemeinsamen "auto"-Postfach"""
+        key = (address or self.primary).strip().lower()
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes.get(AUTO_MAILBOX)
+            if mailbox is None:
+                # teilt sich den vorhandenen Email-Pool, vergrößert ihn nicht
+                mailbox = Mailbox(AUTO_MAILBOX, role="auto")
+                self._add(mailbox)
+            logger.debug(f"📬 Unknown mailbox {key} → shared '{AUTO_MAILBOX}' pool")
+        return mailbox
+
+    @property
+    def primary(self) -> str:
+        """Erstes konfiguriertes Postfach (Standard für Aufrufe ohne Postfach)"""
+        return self._order[0]
+
+    @property
+    def addresses(self) -> List[str]:
+        return list(self._order)
+
+    @property
+    def configured_addresses(self) -> List[str]:
+        """Postfächer aus MAILBOXES (ohne das gemeinsame "auto"-Postfach)"""
+        return [address for address in self._order if self._mailboxes[address].role != "auto"]
+
+    def search_mailboxes(self) -> List[str]:
+        """Postfächer für die Graph-Suche (MAILBOX_SEARCH)"""
+        return [address.strip().lower() for address in MAILBOX_SEARCH.split(",") if address.strip()]
+
+    def graph_budget(self, address: Optional[str]) -> GraphBudget:
+        return self.get(address).graph
+
+    # ------------------------------------------------------------ admission
+    def admit(self, address: Optional[str], priority: Optional[int] = None) -> MailboxTicket:
+        """
+        Vergibt synchron ein Ticket in der Warteschlange des Postfachs.
+
+        Raises:
+            AdmissionRejected: Warteschlange dieses Postfachs voll
+        """
+        mailbox = self.get(address)
+        if mailbox.pending >= mailbox.queue_limit:
+            mailbox.rejected += 1
+            retry_after = self._retry_after(mailbox)
+            logger.warning(f"🚦 Mailbox {mailbox.address} queue full: {mailbox.pending} queued, {mailbox.running} running (retry after {retry_after}s)")
+            raise AdmissionRejected(f"{CHANNEL_EMAIL}:{mailbox.address}", retry_after, mailbox.pending)
+
+        self._seq += 1
+        mailbox.pending += 1
+        mailbox.admitted += 1
+        return MailboxTicket(self, mailbox, PRIORITY_BULK if priority is None else priority, priority, self._seq)
+
+    def _retry_after(self, mailbox: Mailbox) -> int:
+        service_seconds = self.admission.get_channel_service_seconds(CHANNEL_EMAIL)
+        backlog = (mailbox.pending + mailbox.running) / mailbox.concurrency
+        return max(1, min(300, math.ceil(backlog * service_seconds)))
+
+    def _can_start(self, mailbox: Mailbox) -> bool:
+        return self._running < self.total_concurrency and mailbox.running < mailbox.concurrency
+
+    def _leave_queue(self, ticket: MailboxTicket):
+        if ticket.queued:
+            ticket.queued = False
+            ticket.mailbox.pending -= 1
+
+    def _start(self, ticket: MailboxTicket):
+        mailbox = ticket.mailbox
+        self._leave_queue(ticket)
+        mailbox.running += 1
+        self._running += 1
+        ticket.started_at = time.monotonic()
+        mailbox.waits.append(ticket.started_at - ticket.admitted_at)
+
+    async def _acquire(self, ticket: MailboxTicket):
+        mailbox = ticket.mailbox
+        # Freier Platz und niemand im selben Postfach vor uns → sofort starten;
+        # wartende andere Postfächer sind dann durch ihren eigenen Pool begrenzt
+        if not mailbox.waiting and self._can_start(mailbox):
+            self._start(ticket)
+            return
+
+        ticket._future = asyncio.get_running_loop().create_future()
+        mailbox.waiting.append(ticket)
+        mailbox.waiting.sort(key=lambda t: (t.priority, t.seq))
+        try:
+            await ticket._future
+        except asyncio.CancelledError:
+            if ticket in mailbox.waiting:
+                mailbox.waiting.remove(ticket)
+                self._leave_queue(ticket)
+            elif ticket.started_at is not None:
+                self._release(ticket)
+            raise
+
+    def _release(self, ticket: MailboxTicket):
+        mailbox = ticket.mailbox
+        mailbox.running -= 1
+        mailbox.completed += 1
+        self._running -= 1
+        self._dispatch()
+
+    def _discard(self, ticket: MailboxTicket):
+        if ticket in ticket.mailbox.waiting:
+            ticket.mailbox.waiting.remove(ticket)
+        self._leave_queue(ticket)
+
+    def _next_mailbox(self) -> Optional[Mailbox]:
+        """Gewichtetes Round Robin: pro Runde bis zu ``weight`` Starts je Postfach"""
+        count = len(self._order)
+        for _ in range(count + 1):
+            mailbox = self._mailboxes[self._order[self._cursor % count]]
+            if mailbox.credit > 0 and mailbox.waiting and self._can_start(mailbox):
+                mailbox.credit -= 1
+                return mailbox
+            self._cursor = (self._cursor + 1) % count
+            upcoming = self._mailboxes[self._order[self._cursor]]
+            upcoming.credit = upcoming.weight
+        return None
+
+    def _dispatch(self):
+        while self._running < self.total_concurrency:
+            mailbox = self._next_mailbox()
+            if mailbox is None:
+                break
+            ticket = mailbox.waiting.pop(0)
+            self._start(ticket)
+            ticket._future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        mailboxes = {}
+        for address in self._order:
+            mailbox = self._mailboxes[address]
+            waits = sorted(mailbox.waits)
+            mailboxes[address] = {
+                "role": mailbox.role,
+                "running": mailbox.running,
+                "queued": mailbox.pending,
+                "waiting": len(mailbox.waiting),
+                "concurrency": mailbox.concurrency,
+                "queue_limit": mailbox.queue_limit,
+                "weight": mailbox.weight,
+                "admitted": mailbox.admitted,
+                "rejected": mailbox.rejected,
+                "completed": mailbox.completed,
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p95_wait_ms": round(waits[math.ceil(0.95 * len(waits)) - 1] * 1000, 1) if waits else 0.0,
+                "graph": mailbox.graph.get_stats(),
+            }
+        return {
+            "running": self._running,
+            "total_concurrency": self.total_concurrency,
+            "mailboxes": mailboxes,
+        }
+
+
+def mailboxes_from_env() -> List[Mailbox]:
+    """MAILBOXES (adresse[:rolle], kommagetrennt) + MAILBOX_OVERRIDES (JSON)"""
+    try:
+        overrides = {key.lower(): value for key, value in json.loads(MAILBOX_OVERRIDES).items()} if MAILBOX_OVERRIDES else {}
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"⚠️ Invalid MAILBOX_OVERRIDES ignored: {e}")
+        overrides = {}
+
+    mailboxes = []
+    for entry in MAILBOXES.split(","):
+        address, _, role = entry.strip().partition(":")
+        address = address.strip().lower()
+        if not address:
+            continue
+        options = overrides.get(address, {})
+        mailboxes.append(Mailbox(
+            address,
+            role=role.strip() or "personal",
+            concurrency=int(options.get("concurrency", MAILBOX_CONCURRENCY)),
+            queue_limit=int(options.get("queue_limit", MAILBOX_QUEUE)),
+            weight=int(options.get("weight", MAILBOX_WEIGHT)),
+        ))
+    return mailboxes or [Mailbox("mj@cdtechnologies.de")]
+
+
+# Globale Instanz (Singleton-Pattern)
+_mailbox_registry: Optional[MailboxRegistry] = None
+
+
+def get_mailbox_registry() -> MailboxRegistry:
+    """Gibt die globale MailboxRegistry Instanz zurück"""
+    global _mailbox_registry
+    if _mailbox_registry is None:
+        _mailbox_registry = MailboxRegistry()
+    return _mailbox_registry
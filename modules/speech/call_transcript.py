@@ -0,0 +1,330 @@
+"""
+Call Transcript Ingestion - Sipgate (v1 / neu) & FrontDesk
+
+Bringt Transkripte aller Call-Webhook-Quellen in EIN normalisiertes Objekt
+(CallTranscript), das an analyze_call_content und
+calculate_estimate_from_transcript übergeben wird.
+
+- FrontDesk liefert oft nur eine transcription_url → asynchroner Download über
+  einen geteilten httpx-Client, Segmente werden in einen begrenzten Buffer gestreamt
+- Jedes Transkript wird einmalig pro call_id in SQLite persistiert; Webhook-Retries
+  und Re-Analysen laden es lokal statt erneut herunterzuladen
+"""
+import json
+import logging
+import sqlite3
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_DB_PATH = "/tmp/call_transcripts.db"
+MAX_TRANSCRIPT_CHARS = 200_000
+MAX_DOWNLOAD_BYTES = 5 * 1024 * 1024
+FETCH_TIMEOUT_SECONDS = 30.0
+
+
+@dataclass
+class TranscriptSegment:
+    """Ein Sprecher-Abschnitt des Transkripts"""
+    speaker: str
+    text: str
+    start: Optional[float] = None
+
+
+@dataclass
+class CallTranscript:
+    """Normalisiertes Transkript eines Anrufs (quellenunabhängig)"""
+    call_id: str
+    source: str
+    summary: str = ""
+    segments: List[TranscriptSegment] = field(default_factory=list)
+    plain_text: str = ""
+    key_points: List[str] = field(default_factory=list)
+    topics: List[str] = field(default_factory=list)
+    caller_name: str = ""
+    company_name: str = ""
+    caller_request: str = ""
+    transcription_url: str = ""
+    recording_url: str = ""
+    truncated: bool = False
+
+    @property
+    def text(self) -> str:
+        """Gesprächstext (Zusammenfassung + Sprecher-Segmente bzw. Fließtext)"""
+        if self.segments:
+            parts = []
+            if self.summary:
+                parts.append(f"📋 Zusammenfassung:\n{self.summary}")
+            parts.append("\n\n📝 Transkript:")
+            parts.extend(f"\nSprecher {segment.speaker}: {segment.text}" for segment in self.segments)
+            return "\n".join(parts)
+        if self.plain_text:
+            return self.plain_text
+        return f"📋 Zusammenfassung:\n{self.summary}" if self.summary else ""
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.segments or self.plain_text or self.summary)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CallTranscript":
+        payload = dict(data)
+        payload["segments"] = [TranscriptSegment(**segment) for segment in payload.get("segments") or []]
+        known = set(cls.__dataclass_fields__)
+        return cls(**{key: value for key, value in payload.items() if key in known})
+
+
+class SegmentBuffer:
+    """Begrenzter Buffer für gestreamte Segmente (schützt vor übergroßen Transkripten)"""
+
+    def __init__(self, max_chars: int = MAX_TRANSCRIPT_CHARS):
+        self.max_chars = max_chars
+        self.segments: List[TranscriptSegment] = []
+        self.size = 0
+        self.truncated = False
+
+    def add(self, speaker: Any, text: Any, start: Any = None) -> bool:
+        """Fügt ein Segment hinzu; False wenn der Buffer voll ist"""
+        if self.truncated:
+            return False
+        text = str(text or "").strip()
+        if not text:
+            return True
+        remaining = self.max_chars - self.size
+        if len(text) > remaining:
+            text = text[:remaining]
+            self.truncated = True
+        try:
+            start = float(start) if start is not None else None
+        except (TypeError, ValueError):
+            start = None
+        self.segments.append(TranscriptSegment(speaker=str(speaker if speaker is not None else "?"), text=text, start=start))
+        self.size += len(text)
+        return not self.truncated
+
+
+def _segments_from_json(document: Any, buffer: SegmentBuffer) -> str:
+    """Extrahiert Segmente aus einem Transkript-JSON; gibt ggf. Fließtext zurück"""
+    if isinstance(document, list):
+        items = document
+    elif isinstance(document, dict):
+        for key in ("transcriptions", "segments", "utterances", "results"):
+            if isinstance(document.get(key), list):
+                items = document[key]
+                break
+        else:
+            return str(document.get("transcription") or document.get("transcript") or document.get("text") or "")
+    else:
+        return ""
+
+    for item in items:
+        if isinstance(item, dict):
+            keep_going = buffer.add(
+                item.get("speaker", item.get("channel", "?")),
+                item.get("text") or item.get("transcript") or item.get("content"),
+                item.get("start", item.get("startTime")),
+            )
+        else:
+            keep_going = buffer.add("?", item)
+        if not keep_going:
+            break
+    return ""
+
+
+# ===============================
+# SHARED HTTP CLIENT
+# ===============================
+
+_shared_client: Optional[httpx.AsyncClient] = None
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Geteilter httpx-Client für Transkript-Downloads (Connection Reuse)"""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = httpx.AsyncClient(timeout=FETCH_TIMEOUT_SECONDS, follow_redirects=True)
+    return _shared_client
+
+
+async def close_shared_client():
+    """Schließt den geteilten Client (aus dem FastAPI lifespan)"""
+    global _shared_client
+    if _shared_client is not None and not _shared_client.is_closed:
+        await _shared_client.aclose()
+    _shared_client = None
+
+
+async def fetch_transcript(url: str, max_chars: int = MAX_TRANSCRIPT_CHARS) -> Dict[str, Any]:
+    """
+    Lädt ein Transkript von ``url`` gestreamt herunter.
+
+    Text/JSON-Lines werden zeilenweise in den Buffer gestreamt; JSON-Dokumente
+    werden bis MAX_DOWNLOAD_BYTES gesammelt und dann in Segmente zerlegt.
+
+    Returns:
+        {"segments": [...], "plain_text": str, "truncated": bool}
+    """
+    buffer = SegmentBuffer(max_chars)
+    plain_lines: List[str] = []
+    plain_size = 0
+    raw = bytearray()
+
+    client = get_shared_client()
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+        is_json_document = "json" in content_type and "jsonl" not in content_type and "ndjson" not in content_type
+
+        if is_json_document:
+            async for chunk in response.aiter_bytes():
+                raw.extend(chunk)
+                if len(raw) > MAX_DOWNLOAD_BYTES:
+                    raise ValueError(f"Transcript exceeds {MAX_DOWNLOAD_BYTES} bytes: {url}")
+        else:
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        if not buffer.add(item.get("speaker", "?"), item.get("text") or item.get("transcript"), item.get("start")):
+                            break
+                        continue
+                if plain_size + len(line) > max_chars:
+                    plain_lines.append(line[:max_chars - plain_size])
+                    buffer.truncated = True
+                    break
+                plain_lines.append(line)
+                plain_size += len(line) + 1
+
+    plain_text = "\n".join(plain_lines)
+    if raw:
+        plain_text = _segments_from_json(json.loads(raw.decode("utf-8")), buffer)[:max_chars]
+
+    return {"segments": buffer.segments, "plain_text": plain_text, "truncated": buffer.truncated}
+
+
+# ===============================
+# PERSISTENZ (pro call_id)
+# ===============================
+
+class TranscriptStore:
+    """Persistiert normalisierte Transkripte pro call_id"""
+
+    def __init__(self, db_path: str = TRANSCRIPT_DB_PATH):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS call_transcripts (
+                call_id TEXT PRIMARY KEY,
+                source TEXT,
+                transcript_json TEXT NOT NULL,
+                text_length INTEGER,
+                fetched_from TEXT,
+                created_at TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def get(self, call_id: str) -> Optional[CallTranscript]:
+        if not call_id:
+            return None
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("SELECT transcript_json FROM call_transcripts WHERE call_id = ?", (call_id,)).fetchone()
+        conn.close()
+        return CallTranscript.from_dict(json.loads(row[0])) if row else None
+
+    def save(self, transcript: CallTranscript) -> bool:
+        if not transcript.call_id:
+            return False
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT OR IGNORE INTO call_transcripts
+            (call_id, source, transcript_json, text_length, fetched_from, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (transcript.call_id, transcript.source, json.dumps(transcript.to_dict(), ensure_ascii=False),
+              len(transcript.text), transcript.transcription_url or None, datetime.now().isoformat()))
+        conn.commit()
+        conn.close()
+        return True
+
+
+_transcript_store_instance = None
+
+def get_transcript_store() -> TranscriptStore:
+    """Holt globale TranscriptStore Instanz"""
+    global _transcript_store_instance
+    if _transcript_store_instance is None:
+        _transcript_store_instance = TranscriptStore()
+    return _transcript_store_instance
+
+
+async def ingest_call_transcript(
+    call_id: str,
+    source: str,
+    summary: str = "",
+    segments: Optional[List[Dict[str, Any]]] = None,
+    plain_text: str = "",
+    transcription_url: str = "",
+    recording_url: str = "",
+    **metadata: Any,
+) -> CallTranscript:
+    """
+    Baut das normalisierte Transkript für einen Anruf.
+
+    Reihenfolge: persistiertes Transkript (call_id) → Inline-Daten aus dem
+    Webhook → Download der transcription_url. Das Ergebnis wird persistiert.
+    """
+    store = get_transcript_store()
+    cached = store.get(call_id)
+    if cached is not None:
+        logger.info(f"♻️ Transcript for call {call_id} loaded from store ({len(cached.text)} chars)")
+        return cached
+
+    buffer = SegmentBuffer()
+    for item in segments or []:
+        if isinstance(item, dict) and not buffer.add(item.get("speaker", "?"), item.get("text"), item.get("start")):
+            break
+
+    transcript = CallTranscript(
+        call_id=call_id or "",
+        source=source,
+        summary=summary or "",
+        segments=buffer.segments,
+        plain_text=(plain_text or "")[:MAX_TRANSCRIPT_CHARS],
+        transcription_url=transcription_url or "",
+        recording_url=recording_url or "",
+        truncated=buffer.truncated,
+        **{key: value for key, value in metadata.items() if key in CallTranscript.__dataclass_fields__},
+    )
+
+    if not transcript.segments and not transcript.plain_text and transcription_url:
+        try:
+            fetched = await fetch_transcript(transcription_url)
+            transcript.segments = fetched["segments"]
+            transcript.plain_text = fetched["plain_text"]
+            transcript.truncated = fetched["truncated"]
+            logger.info(f"📥 Transcript fetched for call {call_id}: {len(transcript.text)} chars"
+                        f"{' (truncated)' if transcript.truncated else ''}")
+        except Exception as e:
+            logger.error(f"❌ Transcript download failed for call {call_id}: {e}")
+            return transcript  # nicht persistieren → nächster Retry versucht erneut
+
+    if call_id and not transcript.is_empty:
+        try:
+            store.save(transcript)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not persist transcript for call {call_id}: {e}")
+
+    return transcript
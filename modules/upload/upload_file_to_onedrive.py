@@ -1,4 +1,6 @@
-import requests
+import httpx
+
+from modules.msgraph.folder_resolver import FolderResolveError, get_folder_resolver
 from modules.utils.debug_log import debug_log
 
 async def upload_file_to_onedrive(user_mail: str, folder_path: str, filename: str, file_bytes: bytes, access_token_onedrive: str, timeout: int = 30) -> str:
@@ -21,24 +23,13 @@ async def upload_file_to_onedrive(user_mail: str, folder_path: str, filename: st
     debug_log(f"📄 Dateiname: {filename}")
     debug_log(f"📦 Dateigröße: {len(file_bytes)} Bytes")
 
-    # Basis-URL der Microsoft Graph API
-    base_url = f"https://graph.microsoft.com/v1.0/users/{user_mail}/drive/root:/{folder_path}"
-    debug_log(f"🌐 Basis-URL: {base_url}")
-
-    # Endpunkt für den Datei-Upload
-    upload_url = f"{base_url}/{filename}:/content"
-    debug_log(f"🌐 Generierte Upload-URL: {upload_url}")
-
-    headers = {
-        "Authorization": f"Bearer {access_token_onedrive}",
-        "Content-Type": "application/octet-stream"  # für binäre Daten
-    }
-
     try:
-        # Upload der Datei
+        # Upload per Ordner-ID aus dem Folder-Cache (fehlende Ordner werden einmalig angelegt)
         debug_log(f"⬆️ Lade Datei hoch: {filename} -> {folder_path}")
-        response = requests.put(upload_url, headers=headers, data=file_bytes, timeout=timeout)
-        
+        response = await get_folder_resolver().upload_file(
+            user_mail, folder_path, filename, file_bytes, access_token_onedrive, timeout=timeout
+        )
+
         # Überprüfen des Erfolgs des Uploads
         if response.status_code in [200, 201]:  # Akzeptiere sowohl 200 als auch 201
             response_data = response.json()
@@ -54,12 +45,12 @@ async def upload_file_to_onedrive(user_mail: str, folder_path: str, filename: st
             debug_log(f"❌ Fehler beim Hochladen der Datei {filename}. Status-Code: {response.status_code}, Antwort: {response.text}")
             return None
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         debug_log(f"❌ Fehler: Timeout beim Hochladen der Datei {filename}.")
         return None
-    except requests.exceptions.ConnectionError as e:
+    except httpx.ConnectError as e:
         debug_log(f"❌ Verbindungsfehler beim Hochladen der Datei {filename}: {e}")
         return None
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, FolderResolveError) as e:
         debug_log(f"❌ Fehler beim Hochladen der Datei {filename}: {e}")
-        return None
\ No newline at end of file
+        return None
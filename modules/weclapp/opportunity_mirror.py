@@ -0,0 +1,312 @@
+"""
+WeClapp Opportunity Mirror - lokale Kopie der Verkaufschancen
+
+WEG B (bekannter Kontakt) und die Smart-Action-Generierung haben pro Email/Anruf
+synchron /opportunity?partyId-eq=… bei WeClapp abgefragt. Der Mirror hält alle
+Opportunities in SQLite (Indizes auf Party/Kontakt + Status) und wird vom
+Scheduler inkrementell über den lastModifiedDate-Watermark aktualisiert:
+
+- inkrementell: lastModifiedDate-ge=<Watermark>, sortiert nach lastModifiedDate,
+  Keyset-Paging (Cursor = größtes lastModifiedDate der Seite) - Änderungen
+  während des Syncs verschieben keine Seiten
+- voll (nachts): zusätzlich werden lokal Opportunities entfernt, die WeClapp
+  nicht mehr liefert - nur wenn der Lauf nicht am Seitenlimit abgebrochen ist
+
+Pro Lauf wird der Sync-Lag festgehalten (Zeit zwischen Änderung in WeClapp
+und Ankunft im Mirror) sowie das Alter des letzten erfolgreichen Syncs.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from modules.weclapp.weclapp_client import extract_result, get_weclapp_client
+
+logger = logging.getLogger(__name__)
+
+OPPORTUNITY_MIRROR_DB_PATH = os.getenv("OPPORTUNITY_MIRROR_DB_PATH", "/tmp/weclapp_opportunities.db")
+SYNC_PAGE_SIZE = 100
+SYNC_MAX_PAGES = 500
+
+
+def _stage_name(opportunity: Dict[str, Any]) -> Optional[str]:
+    """salesStage ist je nach API-Version String oder Objekt"""
+    stage = opportunity.get("salesStage") or opportunity.get("opportunityStage")
+    if isinstance(stage, dict):
+        return stage.get("name") or stage.get("id")
+    return stage
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class OpportunityMirror:
+    """🪞 Lokaler WeClapp Opportunity Store mit Watermark-Sync"""
+
+    def __init__(self, db_path: str = OPPORTUNITY_MIRROR_DB_PATH):
+        self.db_path = db_path
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS weclapp_opportunities (
+                id TEXT PRIMARY KEY,
+                party_id TEXT,
+                contact_id TEXT,
+                opportunity_number TEXT,
+                name TEXT,
+                sales_stage TEXT,
+                status TEXT,
+                probability INTEGER,
+                amount REAL,
+                last_modified_date INTEGER,
+                raw_data TEXT,
+                synced_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_weclapp_opp_party_status
+                ON weclapp_opportunities(party_id, status, last_modified_date);
+            CREATE INDEX IF NOT EXISTS idx_weclapp_opp_contact
+                ON weclapp_opportunities(contact_id, last_modified_date);
+            CREATE INDEX IF NOT EXISTS idx_weclapp_opp_status
+                ON weclapp_opportunities(status);
+
+            CREATE TABLE IF NOT EXISTS opportunity_sync_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                watermark INTEGER NOT NULL DEFAULT 0,
+                last_sync_at TEXT,
+                last_success_at TEXT,
+                last_full_sync_at TEXT,
+                last_duration_ms REAL,
+                last_fetched INTEGER,
+                last_max_lag_seconds REAL,
+                last_avg_lag_seconds REAL,
+                last_error TEXT
+            );
+            INSERT OR IGNORE INTO opportunity_sync_state (id) VALUES (1);
+        """)
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------ write
+    def upsert(self, opportunities: List[Dict[str, Any]], synced_at: Optional[str] = None) -> int:
+        """Übernimmt WeClapp Opportunity-Objekte (Sync oder Write-Through nach PUT)"""
+        synced_at = synced_at or datetime.now().isoformat()
+        rows = [
+            (
+                str(opp["id"]),
+                str(opp["partyId"]) if opp.get("partyId") else None,
+                str(opp["contactId"]) if opp.get("contactId") else None,
+                opp.get("opportunityNumber"),
+                opp.get("name"),
+                _stage_name(opp),
+                opp.get("status"),
+                _as_int(opp.get("probability")),
+                opp.get("amount") if opp.get("amount") is not None else opp.get("revenue"),
+                _as_int(opp.get("lastModifiedDate")),
+                json.dumps(opp, ensure_ascii=False),
+                synced_at,
+            )
+            for opp in opportunities
+            if isinstance(opp, dict) and opp.get("id")
+        ]
+        if not rows:
+            return 0
+
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany("""
+            INSERT INTO weclapp_opportunities (
+                id, party_id, contact_id, opportunity_number, name, sales_stage, status,
+                probability, amount, last_modified_date, raw_data, synced_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                party_id = excluded.party_id,
+                contact_id = excluded.contact_id,
+                opportunity_number = excluded.opportunity_number,
+                name = excluded.name,
+                sales_stage = excluded.sales_stage,
+                status = excluded.status,
+                probability = excluded.probability,
+                amount = excluded.amount,
+                last_modified_date = excluded.last_modified_date,
+                raw_data = excluded.raw_data,
+                synced_at = excluded.synced_at
+        """, rows)
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+    # ------------------------------------------------------------------ sync
+    async def sync(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Holt alle seit dem Watermark geänderten Opportunities.
+
+        Args:
+            full: Watermark ignorieren und lokal entfernte Opportunities löschen
+
+        Returns:
+            {"fetched": int, "watermark": int, "max_lag_seconds": float, ...}
+        """
+        client = get_weclapp_client()
+        if not client.configured:
+            logger.info("⏭️ Opportunity mirror sync skipped - WeClapp token not configured")
+            return {"fetched": 0, "skipped": True}
+
+        state = self._get_state()
+        started_at = datetime.now()
+        run_stamp = started_at.isoformat()
+        start = time.perf_counter()
+        watermark = 0 if full else state["watermark"]
+        cursor, page, fetched = watermark, 1, 0
+        truncated = False
+        lags: List[float] = []
+
+        try:
+            for _ in range(SYNC_MAX_PAGES):
+                items = extract_result(await client.get(
+                    "opportunity",
+                    params={
+                        "lastModifiedDate-ge": cursor,
+                        "sort": "lastModifiedDate",
+                        "pageSize": SYNC_PAGE_SIZE,
+                        "page": page,
+                    },
+                ))
+
+                self.upsert(items, synced_at=run_stamp)
+                fetched += len(items)
+                # Lag nur für echte Änderungen seit dem letzten Lauf (Voll-Sync: Bestand)
+                now_ms = time.time() * 1000
+                for item in items:
+                    modified = _as_int(item.get("lastModifiedDate"))
+                    if modified and modified > watermark and not full:
+                        lags.append(max(0.0, (now_ms - modified) / 1000))
+
+                if len(items) < SYNC_PAGE_SIZE:
+                    break
+                page_max = max((_as_int(item.get("lastModifiedDate")) or 0) for item in items)
+                if page_max > cursor:
+                    cursor, page = page_max, 1
+                else:
+                    # ganze Seite mit identischem Zeitstempel → klassisch weiterblättern
+                    page += 1
+            else:
+                # Seitenlimit erreicht → Bestand unvollständig, Rest holt der nächste Lauf ab Watermark
+                truncated = True
+        except Exception as e:
+            self._save_state(last_sync_at=run_stamp, last_error=str(e))
+            logger.error(f"❌ Opportunity mirror sync failed: {e}")
+            raise
+
+        conn = sqlite3.connect(self.db_path)
+        new_watermark = conn.execute("SELECT MAX(last_modified_date) FROM weclapp_opportunities").fetchone()[0] or watermark
+        removed = 0
+        if truncated:
+            logger.warning(f"⚠️ Opportunity mirror sync stopped after {SYNC_MAX_PAGES} pages ({fetched} fetched)"
+                           f"{' - skipping removal of missing opportunities' if full else ''}")
+        elif full:
+            removed = conn.execute(
+                "DELETE FROM weclapp_opportunities WHERE synced_at < ? OR synced_at IS NULL", (run_stamp,)
+            ).rowcount
+            conn.commit()
+        conn.close()
+
+        result = {
+            "fetched": fetched,
+            "removed": removed,
+            "watermark": new_watermark,
+            "full": full,
+            "truncated": truncated,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "max_lag_seconds": round(max(lags), 1) if lags else None,
+            "avg_lag_seconds": round(sum(lags) / len(lags), 1) if lags else None,
+        }
+        self._save_state(
+            watermark=new_watermark,
+            last_sync_at=run_stamp,
+            last_success_at=datetime.now().isoformat(),
+            last_duration_ms=result["duration_ms"],
+            last_fetched=fetched,
+            last_max_lag_seconds=result["max_lag_seconds"],
+            last_avg_lag_seconds=result["avg_lag_seconds"],
+            last_error=f"truncated after {SYNC_MAX_PAGES} pages" if truncated else None,
+            **({"last_full_sync_at": run_stamp} if full and not truncated else {}),
+        )
+        logger.info(f"🪞 Opportunity mirror {'full ' if full else ''}sync: {fetched} fetched, {removed} removed, watermark={new_watermark}")
+        return result
+
+    def _get_state(self) -> Dict[str, Any]:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM opportunity_sync_state WHERE id = 1").fetchone()
+        conn.close()
+        return dict(row)
+
+    def _save_state(self, **values: Any):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(f"UPDATE opportunity_sync_state SET {assignments} WHERE id = 1", list(values.values()))
+        conn.commit()
+        conn.close()
+
+    # ------------------------------------------------------------------ read
+    def is_ready(self) -> bool:
+        """True sobald mindestens ein Sync erfolgreich war"""
+        return self._get_state()["last_success_at"] is not None
+
+    def get_open_opportunity(self, party_id: Any) -> Optional[Dict[str, Any]]:
+        """Zuletzt geänderte offene Opportunity einer Party (WeClapp-Objekt wie von der API)"""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("""
+            SELECT raw_data FROM weclapp_opportunities
+            WHERE party_id = ? AND status = 'OPEN'
+            ORDER BY last_modified_date DESC
+            LIMIT 1
+        """, (str(party_id),)).fetchone()
+        conn.close()
+        return json.loads(row[0]) if row else None
+
+    def get_recent_opportunities(self, contact_id: Any, limit: int = 5) -> List[Dict[str, Any]]:
+        """Letzte Opportunities einer Party bzw. eines Kontakts, neueste zuerst"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("""
+            SELECT raw_data FROM weclapp_opportunities
+            WHERE party_id = ? OR contact_id = ?
+            ORDER BY last_modified_date DESC
+            LIMIT ?
+        """, (str(contact_id), str(contact_id), limit)).fetchall()
+        conn.close()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        state = self._get_state()
+        conn = sqlite3.connect(self.db_path)
+        total, open_count = conn.execute(
+            "SELECT COUNT(*), SUM(CASE WHEN status = 'OPEN' THEN 1 ELSE 0 END) FROM weclapp_opportunities"
+        ).fetchone()
+        conn.close()
+
+        staleness = None
+        if state["last_success_at"]:
+            staleness = round((datetime.now() - datetime.fromisoformat(state["last_success_at"])).total_seconds(), 1)
+        state.pop("id", None)
+        return {**state, "opportunities": total, "open": open_count or 0, "staleness_seconds": staleness}
+
+
+# Globale Instanz (Singleton-Pattern)
+_opportunity_mirror: Optional[OpportunityMirror] = None
+
+
+def get_opportunity_mirror() -> OpportunityMirror:
+    """Gibt die globale OpportunityMirror Instanz zurück"""
+    global _opportunity_mirror
+    if _opportunity_mirror is None:
+        _opportunity_mirror = OpportunityMirror()
+    return _opportunity_mirror
@@ -0,0 +1,276 @@
+"""
+WeClapp Phone Index - E.164 normalisierte Telefonnummern aus der Sync-DB
+
+Call-Webhooks liefern Nummern in unterschiedlichen Formaten (Sipgate v1,
+neues Sipgate-Format, FrontDesk), in WeClapp stehen sie als "0721 …",
+"+49 721 …" oder "0049721…". Der Index normalisiert alle Nummern aus
+/tmp/weclapp_sync.db (parties + leads) nach E.164 und beantwortet
+- exakte Lookups (dict, O(1))
+- Prefix-Lookups (sortierte Liste + bisect, z.B. Firmen-Durchwahlen)
+lokal ohne WeClapp HTTP-Call.
+
+Refresh ist inkrementell: unveränderte DB-Datei → kein Rebuild; bei
+geänderter Datei werden nur Zeilen mit geändertem Fingerprint neu normalisiert.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WECLAPP_SYNC_DB_PATH = "/tmp/weclapp_sync.db"
+DEFAULT_COUNTRY_CODE = "49"
+REFRESH_CHECK_INTERVAL_SECONDS = 60
+
+# Zusätzliche Telefon-Felder im raw_data JSON der Sync-DB
+RAW_PHONE_FIELDS = ("phone", "mobilePhone", "mobilePhone1", "mobilePhone2", "phoneHome", "directPhone", "fax")
+
+_TRUNK_ZERO = re.compile(r"\(0\)")
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone_e164(raw: Optional[str], default_country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Normalisiert eine Telefonnummer nach E.164 ("+49721123456").
+
+    Unterstützt: "+49 (0) 721 …", "0049721…", "0721…", "49721…" (Sipgate ohne +).
+    Gibt None zurück, wenn die Nummer keine Vorwahl enthält oder unplausibel ist.
+    """
+    if not raw:
+        return None
+    value = _TRUNK_ZERO.sub("", str(raw).strip())
+    has_plus = value.startswith("+")
+    digits = _NON_DIGITS.sub("", value)
+    if not digits:
+        return None
+
+    if has_plus:
+        e164_digits = digits
+    elif digits.startswith("00"):
+        e164_digits = digits[2:]
+    elif digits.startswith("0"):
+        e164_digits = default_country_code + digits[1:]
+    elif digits.startswith(default_country_code) and len(digits) >= 11:
+        e164_digits = digits
+    else:
+        return None
+
+    # E.164: max. 15 Ziffern, kürzer als 8 ist keine vollständige Nummer
+    if len(e164_digits) < 8 or len(e164_digits) > 15 or e164_digits.startswith("0"):
+        return None
+    return f"+{e164_digits}"
+
+
+def looks_like_phone(identifier: Optional[str]) -> bool:
+    """True wenn der Identifier eine Telefonnummer (und keine Email) ist"""
+    if not identifier or "@" in identifier:
+        return False
+    return normalize_phone_e164(identifier) is not None
+
+
+class PhoneIndex:
+    """In-Memory E.164 Index über parties/leads der WeClapp Sync-DB"""
+
+    def __init__(self, db_path: str = WECLAPP_SYNC_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._by_number: Dict[str, List[Dict]] = {}
+        self._sorted_numbers: List[str] = []
+        self._rows: Dict[Tuple[str, str], Tuple[str, List[str], Dict]] = {}
+        self._file_signature: Optional[Tuple[float, int]] = None
+        self._last_check = 0.0
+        self._refresh_future: Optional[asyncio.Future] = None
+        self.stats = {"refreshes": 0, "rows_changed": 0, "numbers": 0, "last_refresh_ms": 0.0}
+
+    # ------------------------------------------------------------------ refresh
+    def _current_signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.db_path)
+            return stat.st_mtime, stat.st_size
+        except OSError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Aktualisiert den Index, wenn sich die Sync-DB geändert hat.
+
+        Returns:
+            True wenn der Index neu aufgebaut wurde
+        """
+        signature = self._current_signature()
+        self._last_check = time.monotonic()
+        if signature is None:
+            return False
+        if not force and signature == self._file_signature:
+            return False
+
+        start = time.perf_counter()
+        try:
+            current_rows = self._read_rows()
+        except Exception as e:
+            logger.error(f"❌ Phone index refresh failed: {e}")
+            return False
+
+        with self._lock:
+            changed = 0
+            rows = dict(self._rows)
+            for key in set(rows) - set(current_rows):
+                del rows[key]
+                changed += 1
+            for key, (fingerprint, raw_numbers, entry) in current_rows.items():
+                existing = rows.get(key)
+                if existing is not None and existing[0] == fingerprint:
+                    continue
+                numbers = sorted({n for n in (normalize_phone_e164(r) for r in raw_numbers) if n})
+                rows[key] = (fingerprint, numbers, entry)
+                changed += 1
+
+            if changed or not self._by_number:
+                by_number: Dict[str, List[Dict]] = {}
+                for _, numbers, entry in rows.values():
+                    for number in numbers:
+                        by_number.setdefault(number, []).append(entry)
+                self._by_number = by_number
+                self._sorted_numbers = sorted(by_number)
+
+            self._rows = rows
+            self._file_signature = signature
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats.update({
+            "refreshes": self.stats["refreshes"] + 1,
+            "rows_changed": changed,
+            "numbers": len(self._sorted_numbers),
+            "last_refresh_ms": round(elapsed_ms, 2),
+        })
+        logger.info(f"📇 Phone index refreshed: {len(self._sorted_numbers)} numbers, {changed} rows changed ({elapsed_ms:.1f}ms)")
+        return True
+
+    def _read_rows(self) -> Dict[Tuple[str, str], Tuple[str, List[str], Dict]]:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            cursor = conn.cursor()
+            rows: Dict[Tuple[str, str], Tuple[str, List[str], Dict]] = {}
+
+            party_columns = self._columns(cursor, "parties")
+            if party_columns:
+                raw_col = ", raw_data" if "raw_data" in party_columns else ", NULL"
+                cursor.execute(f"SELECT id, name, phone, customerNumber, partyType{raw_col} FROM parties")
+                for party_id, name, phone, customer_number, party_type, raw_data in cursor.fetchall():
+                    entry = {
+                        "entity_type": "party",
+                        "contact_id": str(party_id),
+                        "contact_name": name,
+                        "company": name if (party_type or "").upper() == "ORGANIZATION" else None,
+                        "customer_number": customer_number,
+                        "phone": phone,
+                    }
+                    fingerprint = f"{phone}|{name}|{hash(raw_data)}"
+                    rows[("party", str(party_id))] = (fingerprint, self._raw_numbers(phone, raw_data), entry)
+
+            lead_columns = self._columns(cursor, "leads")
+            if lead_columns:
+                raw_col = ", raw_data" if "raw_data" in lead_columns else ", NULL"
+                cursor.execute(f"SELECT id, firstName, lastName, phone, company{raw_col} FROM leads")
+                for lead_id, first_name, last_name, phone, company, raw_data in cursor.fetchall():
+                    name = f"{first_name or ''} {last_name or ''}".strip()
+                    entry = {
+                        "entity_type": "lead",
+                        "contact_id": str(lead_id),
+                        "contact_name": name or company,
+                        "company": company,
+                        "customer_number": None,
+                        "phone": phone,
+                    }
+                    fingerprint = f"{phone}|{name}|{company}|{hash(raw_data)}"
+                    rows[("lead", str(lead_id))] = (fingerprint, self._raw_numbers(phone, raw_data), entry)
+
+            return rows
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [col[1] for col in cursor.fetchall()]
+
+    @staticmethod
+    def _raw_numbers(phone: Optional[str], raw_data: Optional[str]) -> List[str]:
+        numbers = [phone] if phone else []
+        if raw_data:
+            try:
+                data = json.loads(raw_data)
+            except (TypeError, ValueError):
+                data = None
+            if isinstance(data, dict):
+                numbers.extend(str(data[field]) for field in RAW_PHONE_FIELDS if data.get(field))
+        return numbers
+
+    def _maybe_refresh(self):
+        """Refresh-Check höchstens alle 60s; im Event Loop im Executor (Lookup nutzt bis dahin den alten Stand)"""
+        if time.monotonic() - self._last_check < REFRESH_CHECK_INTERVAL_SECONDS:
+            return
+        self._last_check = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.refresh()
+            return
+        if self._refresh_future is None or self._refresh_future.done():
+            self._refresh_future = loop.run_in_executor(None, self.refresh)
+
+    # ------------------------------------------------------------------ lookups
+    def lookup_exact(self, raw_number: str) -> List[Dict]:
+        """Alle Kontakte mit exakt dieser (normalisierten) Nummer"""
+        self._maybe_refresh()
+        number = normalize_phone_e164(raw_number)
+        if not number:
+            return []
+        return list(self._by_number.get(number, []))
+
+    def lookup_prefix(self, prefix: str, limit: int = 10) -> List[Tuple[str, Dict]]:
+        """Kontakte deren E.164-Nummer mit ``prefix`` beginnt (z.B. "+49721")"""
+        self._maybe_refresh()
+        if not prefix.startswith("+"):
+            prefix = normalize_phone_e164(prefix) or ""
+        if not prefix:
+            return []
+
+        numbers = self._sorted_numbers
+        by_number = self._by_number
+        results: List[Tuple[str, Dict]] = []
+        index = bisect.bisect_left(numbers, prefix)
+        while index < len(numbers) and numbers[index].startswith(prefix) and len(results) < limit:
+            for entry in by_number.get(numbers[index], []):
+                results.append((numbers[index], entry))
+            index += 1
+        return results[:limit]
+
+    def lookup_similar(self, raw_number: str, strip_digits: int = 3, limit: int = 5) -> List[Tuple[str, Dict]]:
+        """Nummern mit gleichem Stamm (gleiche Firma, andere Durchwahl)"""
+        number = normalize_phone_e164(raw_number)
+        if not number or len(number) <= strip_digits + 6:
+            return []
+        matches = self.lookup_prefix(number[:-strip_digits], limit=limit + 1)
+        return [(n, entry) for n, entry in matches if n != number][:limit]
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "db_path": self.db_path, "loaded": bool(self._file_signature)}
+
+
+# Globale Instanz (Singleton-Pattern)
+_phone_index_instance = None
+
+def get_phone_index() -> PhoneIndex:
+    """Holt globale PhoneIndex Instanz"""
+    global _phone_index_instance
+    if _phone_index_instance is None:
+        _phone_index_instance = PhoneIndex()
+    return _phone_index_instance
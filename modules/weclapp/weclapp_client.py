@@ -0,0 +1,441 @@
+"""
+WeClapp API Client - ein gemeinsamer async Client für alle WeClapp Calls
+
+Bisher hat jede Stelle (weclapp_lookup, AddressMatcher, Opportunity Handler,
+Rechnungsabgleich, Fahrtenbuch-API, Orchestrator) eigene Header, eigenes
+Paging und eigenes Fehlerhandling gebaut - teils mit blockierendem requests
+mitten im Event Loop. Der Client bündelt das:
+
+- eine gemeinsame httpx.AsyncClient Session (Keep-Alive) je Event Loop
+- transparentes Paging über page/pageSize (iterate_pages / list)
+- Feld-Projektion über properties= (nur die benötigten Felder übertragen)
+- Token-Bucket Rate Limit passend zum Tenant-Kontingent
+  (WECLAPP_RATE_LIMIT_PER_SECOND / WECLAPP_RATE_LIMIT_BURST), 429/5xx werden
+  mit Backoff wiederholt (Retry-After wird respektiert); POST/PATCH nur bei
+  429 oder Verbindungsfehlern (Request nie angekommen) - kein doppeltes Anlegen
+- parallele Fallback-Abfragen (first_result): alle Varianten laufen
+  gleichzeitig, gewonnen hat die erste nicht-leere in der angegebenen Reihenfolge
+- Latenz je Endpoint (Prometheus + get_stats() für /status)
+
+Synchroner Code nutzt run_sync(): die Coroutine läuft auf einem eigenen
+Hintergrund-Loop, damit auch dort die Session wiederverwendet wird.
+"""
+import asyncio
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, AsyncIterator, Coroutine, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import httpx
+
+from modules.monitoring.metrics import WECLAPP_REQUEST_DURATION
+
+logger = logging.getLogger(__name__)
+
+WECLAPP_RATE_LIMIT_PER_SECOND = float(os.getenv("WECLAPP_RATE_LIMIT_PER_SECOND", "5"))
+WECLAPP_RATE_LIMIT_BURST = int(os.getenv("WECLAPP_RATE_LIMIT_BURST", "10"))
+WECLAPP_TIMEOUT_SECONDS = float(os.getenv("WECLAPP_TIMEOUT_SECONDS", "15"))
+WECLAPP_MAX_RETRIES = int(os.getenv("WECLAPP_MAX_RETRIES", "3"))
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGES = 500
+LATENCY_WINDOW = 500
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# POST/PATCH sind nicht idempotent: nur wiederholen, wenn der Request sicher nicht verarbeitet wurde
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+NON_IDEMPOTENT_RETRY_STATUS_CODES = {429}
+NON_IDEMPOTENT_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+_ID_SEGMENT = re.compile(r"^\d+$")
+
+
+class WeClappError(Exception):
+    """WeClapp hat mit einem Fehlerstatus geantwortet"""
+
+    def __init__(self, status_code: int, message: str, body: str = ""):
+        super().__init__(f"WeClapp {status_code}: {message}")
+        self.status_code = status_code
+        self.body = body
+
+
+def resolve_weclapp_credentials() -> Tuple[str, str]:
+    """Base URL (mit abschließendem Slash) und Token aus der Umgebung"""
+    base_url = os.getenv("WECLAPP_BASE_URL") or ""
+    token = os.getenv("WECLAPP_API_TOKEN") or os.getenv("WECLAPP_API_KEY") or ""
+
+    if base_url:
+        base_url = f"{base_url.rstrip('/')}/"
+    else:
+        # Ohne explizite Base URL aus Domain/Tenant ableiten
+        domain = (
+            os.getenv("WECLAPP_DOMAIN")
+            or os.getenv("WECLAPP_TENANT")
+            or "cundd"
+        )
+        base_url = f"https://{domain}.weclapp.com/webapp/api/v1/"
+
+    return base_url, token
+
+
+def endpoint_label(path: str) -> str:
+    """Endpoint für Metriken - IDs werden zu {id} zusammengefasst"""
+    segments = [segment for segment in path.strip("/").split("/") if segment]
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in segments) or "/"
+
+
+def extract_result(data: Any) -> List[Dict[str, Any]]:
+    """Ergebnisliste aus einer WeClapp Antwort (result / result.entities / Liste)"""
+    if isinstance(data, dict):
+        result = data.get("result")
+        if isinstance(result, list):
+            return result
+        if isinstance(result, dict) and isinstance(result.get("entities"), list):
+            return result["entities"]
+        if isinstance(data.get("entities"), list):
+            return data["entities"]
+        return []
+    if isinstance(data, list):
+        return data
+    return []
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-Rank Perzentil"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class TokenBucket:
+    """
+    Token-Bucket Rate Limit (threadsicher, über mehrere Event Loops hinweg).
+
+    Jeder Aufruf reserviert sofort ein Token; ist der Bucket leer, wartet der
+    Aufrufer genau bis zu dem Zeitpunkt, an dem sein Token nachgefüllt ist.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = max(rate_per_second, 0.001)
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def reserve(self) -> float:
+        """Reserviert ein Token und liefert die nötige Wartezeit in Sekunden"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if delay > 0:
+                self.waits += 1
+                self.wait_seconds += delay
+            return delay
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class WeClappClient:
+    """🔌 Gemeinsamer async WeClapp Client"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        rate_per_second: float = WECLAPP_RATE_LIMIT_PER_SECOND,
+        burst: int = WECLAPP_RATE_LIMIT_BURST,
+        timeout_seconds: float = WECLAPP_TIMEOUT_SECONDS,
+        max_retries: int = WECLAPP_MAX_RETRIES,
+    ):
+        env_base_url, env_token = resolve_weclapp_credentials()
+        self.base_url = f"{(base_url or env_base_url).rstrip('/')}/"
+        self.token = token if token is not None else env_token
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.limiter = TokenBucket(rate_per_second, burst)
+
+        # httpx Sessions sind an ihren Event Loop gebunden → eine Session je Loop
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._sessions_lock = threading.Lock()
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_lock = threading.Lock()
+
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "retries": 0, "pages": 0, "fallback_queries": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token)
+
+    # ------------------------------------------------------------------ session
+    def _session(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.get(loop)
+            if session is None or session.is_closed:
+                session = httpx.AsyncClient(
+                    timeout=self.timeout_seconds,
+                    headers={"AuthenticationToken": self.token, "Accept": "application/json"},
+                )
+                self._sessions[loop] = session
+            return session
+
+    async def aclose(self):
+        """Schließt die Session des aktuellen Event Loops (FastAPI lifespan)"""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.pop(loop, None)
+        if session is not None and not session.is_closed:
+            await session.aclose()
+
+    def url(self, path: str, api_version: Optional[str] = None) -> str:
+        """Vollständige URL; api_version="v2" tauscht die Version der Base URL"""
+        base = self.base_url
+        if api_version:
+            base = re.sub(r"/v\d+/$", f"/{api_version}/", base)
+        return f"{base}{path.lstrip('/')}"
+
+    # ------------------------------------------------------------------ requests
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        properties: Optional[Union[str, Sequence[str]]] = None,
+        api_version: Optional[str] = None,
+    ) -> Any:
+        """
+        Ein WeClapp Request mit Rate Limit, Retry und Latenz-Messung.
+
+        Returns:
+            Die JSON-Antwort (None bei leerem Body)
+
+        Raises:
+            WeClappError: Fehlerstatus (nach Retries) oder Token fehlt
+        """
+        if not self.configured:
+            raise WeClappError(401, "WeClapp API token not configured")
+
+        query = dict(params or {})
+        if properties:
+            query["properties"] = properties if isinstance(properties, str) else ",".join(properties)
+
+        method = method.upper()
+        endpoint = endpoint_label(path)
+        url = self.url(path, api_version)
+        session = self._session()
+        idempotent = method in IDEMPOTENT_METHODS
+        retry_status_codes = RETRY_STATUS_CODES if idempotent else NON_IDEMPOTENT_RETRY_STATUS_CODES
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = await session.request(method, url, params=query or None, json=json)
+            except httpx.TransportError as e:
+                self._record(endpoint, method, time.perf_counter() - start, error=True)
+                if attempt >= self.max_retries or not (idempotent or isinstance(e, NON_IDEMPOTENT_RETRY_ERRORS)):
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                logger.warning(f"⚠️ WeClapp {method} {endpoint} transport error ({e}), retry {attempt + 1}")
+                continue
+
+            failed = response.status_code >= 400
+            self._record(endpoint, method, time.perf_counter() - start, error=failed)
+
+            if response.status_code in retry_status_codes and attempt < self.max_retries:
+                self.stats["retries"] += 1
+                delay = self._retry_after(response) or self._backoff(attempt)
+                logger.warning(f"⚠️ WeClapp {method} {endpoint} → {response.status_code}, retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if failed:
+                raise WeClappError(response.status_code, f"{method} {endpoint}", response.text[:500])
+            if not response.content:
+                return None
+            return response.json()
+
+        raise WeClappError(0, f"{method} {endpoint}: retries exhausted")
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        return await self.request("GET", path, params=params, **kwargs)
+
+    async def post(self, path: str, json: Any, **kwargs: Any) -> Any:
+        return await self.request("POST", path, json=json, **kwargs)
+
+    async def put(self, path: str, json: Any, **kwargs: Any) -> Any:
+        return await self.request("PUT", path, json=json, **kwargs)
+
+    async def iterate_pages(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        properties: Optional[Union[str, Sequence[str]]] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_pages: int = MAX_PAGES,
+        **kwargs: Any,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Liefert Seite für Seite (page/pageSize), bis eine Seite nicht mehr voll ist"""
+        query = dict(params or {})
+        for page in range(1, max_pages + 1):
+            query.update({"page": page, "pageSize": page_size})
+            items = extract_result(await self.get(path, params=query, properties=properties, **kwargs))
+            self.stats["pages"] += 1
+            if items:
+                yield items
+            if len(items) < page_size:
+                return
+        logger.warning(f"⚠️ WeClapp {endpoint_label(path)}: paging stopped after {max_pages} pages")
+
+    async def list(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        properties: Optional[Union[str, Sequence[str]]] = None,
+        limit: Optional[int] = None,
+        page_size: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Alle Treffer einer Abfrage (über alle Seiten), höchstens limit Stück.
+
+        Mit limit ≤ 100 reicht eine Seite in genau dieser Größe.
+        """
+        size = page_size or (min(limit, DEFAULT_PAGE_SIZE) if limit else DEFAULT_PAGE_SIZE)
+        results: List[Dict[str, Any]] = []
+        async for items in self.iterate_pages(path, params, properties, page_size=size, **kwargs):
+            results.extend(items)
+            if limit and len(results) >= limit:
+                return results[:limit]
+        return results
+
+    async def first_result(
+        self,
+        path: str,
+        param_options: Iterable[Dict[str, Any]],
+        properties: Optional[Union[str, Sequence[str]]] = None,
+        limit: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fallback-Abfragen parallel statt nacheinander.
+
+        Alle Varianten starten gleichzeitig; zurückgegeben wird das Ergebnis
+        der ersten nicht-leeren Variante (in der angegebenen Reihenfolge).
+        Sobald es feststeht, werden die übrigen Abfragen abgebrochen.
+        Fehlgeschlagene Varianten zählen als leer.
+        """
+        options = [dict(option) for option in param_options]
+        if not options:
+            return []
+        self.stats["fallback_queries"] += len(options)
+
+        async def _run(option: Dict[str, Any]) -> List[Dict[str, Any]]:
+            try:
+                return await self.list(path, option, properties=properties, limit=limit, **kwargs)
+            except Exception as e:
+                logger.warning(f"⚠️ WeClapp fallback query {option} failed: {e}")
+                return []
+
+        tasks = [asyncio.create_task(_run(option)) for option in options]
+        try:
+            for task in tasks:
+                result = await task
+                if result:
+                    return result
+            return []
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    # ------------------------------------------------------------------ sync
+    def run_sync(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Führt eine Client-Coroutine aus synchronem Code aus.
+
+        Läuft auf einem eigenen Hintergrund-Loop (auch wenn der Aufrufer selbst
+        in einem Event Loop steckt) - die Session bleibt so über Aufrufe erhalten.
+        """
+        with self._sync_lock:
+            if self._sync_loop is None or self._sync_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="weclapp-client-sync", daemon=True).start()
+                self._sync_loop = loop
+        future = asyncio.run_coroutine_threadsafe(coro, self._sync_loop)
+        return future.result(timeout)
+
+    # ------------------------------------------------------------------ stats
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        try:
+            return min(float(response.headers.get("Retry-After", "")), 60.0)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
+
+    def _record(self, endpoint: str, method: str, duration: float, error: bool = False):
+        WECLAPP_REQUEST_DURATION.observe(duration, endpoint=endpoint, method=method)
+        key = (method, endpoint)
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            if error:
+                self.stats["errors"] += 1
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(duration)
+            counts = self._counts.setdefault(key, {"requests": 0, "errors": 0})
+            counts["requests"] += 1
+            counts["errors"] += int(error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Request-Zähler, Rate-Limit-Wartezeiten und Latenz je Endpoint"""
+        with self._stats_lock:
+            endpoints = {}
+            for (method, endpoint), values in sorted(self._latencies.items()):
+                ordered = sorted(values)
+                endpoints[f"{method} {endpoint}"] = {
+                    **self._counts[(method, endpoint)],
+                    "p50_ms": round(_percentile(ordered, 0.50) * 1000, 1),
+                    "p95_ms": round(_percentile(ordered, 0.95) * 1000, 1),
+                    "max_ms": round(ordered[-1] * 1000, 1),
+                }
+        return {
+            **self.stats,
+            "configured": self.configured,
+            "rate_limit_per_second": self.limiter.rate,
+            "rate_limit_burst": self.limiter.capacity,
+            "rate_limit_waits": self.limiter.waits,
+            "rate_limit_wait_seconds": round(self.limiter.wait_seconds, 2),
+            "endpoints": endpoints,
+        }
+
+
+# Globale Instanz (Singleton-Pattern)
+_weclapp_client: Optional[WeClappClient] = None
+
+
+def get_weclapp_client() -> WeClappClient:
+    """Gibt die globale WeClappClient Instanz zurück"""
+    global _weclapp_client
+    if _weclapp_client is None:
+        _weclapp_client = WeClappClient()
+    return _weclapp_client
@@ -1,10 +1,12 @@
-import os
 import re
-from typing import Iterable, Tuple
-
-import requests
+from typing import Any, Dict, Iterable, List
 
 from modules.utils.debug_log import debug_log
+from modules.weclapp.weclapp_client import (
+    WeClappError,
+    get_weclapp_client,
+    resolve_weclapp_credentials,
+)
 
 
 def _extract_entities(data, entity_type="contact") -> Iterable:
@@ -41,117 +43,71 @@ def _extract_entities(data, entity_type="contact") -> Iterable:
     return entities
 
 
-def _resolve_weclapp_credentials() -> Tuple[str, str]:
-    """Return base URL (with trailing slash) and token from env."""
+# Kompatibilität: Credentials kommen jetzt aus dem gemeinsamen Client
+_resolve_weclapp_credentials = resolve_weclapp_credentials
 
-    base_url = os.getenv("WECLAPP_BASE_URL") or ""
-    token = os.getenv("WECLAPP_API_TOKEN") or ""
 
-    if base_url:
-        base_url = f"{base_url.rstrip('/')}/"
-    else:
-        # Fall back to domain-based configuration if explicit base URL is missing.
-        domain = (
-            os.getenv("WECLAPP_DOMAIN")
-            or os.getenv("WECLAPP_TENANT")
-            or "cundd"
-        )
-        base_url = f"https://{domain}.weclapp.com/webapp/api/v1/"
+def _wild(value: str) -> str:
+    # WeClapp expects asterisks for wildcard matches (per API docs).
+    return f"*{value}*"
 
-    return base_url, token
 
+def _contact_fallback_params(search_term: str) -> List[Dict[str, Any]]:
+    """-like Varianten für /contact (WeClapp ignoriert `term` dort oft)"""
+    parts = [p.strip() for p in re.split(r'[\s,]+', search_term) if p.strip()]
 
-def search_weclapp_entity(entity, search_term, page_size=5):
+    if len(parts) >= 2:
+        return [
+            {"lastName-like": _wild(parts[0]), "firstName-like": _wild(parts[1])},
+            {"lastName-like": _wild(parts[1]), "firstName-like": _wild(parts[0])},
+        ]
+    if len(parts) == 1:
+        wildcard = _wild(parts[0])
+        return [
+            {"lastName-like": wildcard},
+            {"firstName-like": wildcard},
+            {"personCompany-like": wildcard},
+        ]
+    return []
+
+
+async def search_weclapp_entity_async(entity, search_term, page_size=5):
     """Allgemeine Suchfunktion für WeClapp-Entities (contact, customer, opportunity)."""
 
-    base_url, token = _resolve_weclapp_credentials()
-    if not token or not base_url:
+    client = get_weclapp_client()
+    if not client.configured:
         debug_log("❌ WeClapp API Token oder Base URL fehlen!")
         return []
 
-    url = f"{base_url}{entity}"
-    headers = {"AuthenticationToken": token}
-
-    # Contacts need a smarter lookup because WeClapp ignores `term` on /contact.
-    if entity == "contact" and search_term:
-        default_params = {"term": search_term, "pageSize": page_size}
-        try:
-            debug_log(f"🔎 Suche {entity} | params={default_params} | base='{base_url}'")
-            response = requests.get(url, headers=headers, params=default_params)
-            response.raise_for_status()
-            data = response.json()
-            entities = list(_extract_entities(data, entity))
-            if entities:
-                debug_log(f"📬 WeClapp Antwort (term) | Treffer: {len(entities)}")
-                return entities[:page_size]
-        except Exception as exc:
-            debug_log(f"⚠️ Standardsuche fehlgeschlagen ({entity}): {exc}")
-
-        parts = [p.strip() for p in re.split(r'[\s,]+', search_term) if p.strip()]
-
-        def _wild(value: str) -> str:
-            # WeClapp expects asterisks for wildcard matches (per API docs).
-            return f"*{value}*"
-
-        if len(parts) >= 2:
-            params_options = [
-                {"lastName-like": _wild(parts[0]), "firstName-like": _wild(parts[1]), "pageSize": page_size},
-                {"lastName-like": _wild(parts[1]), "firstName-like": _wild(parts[0]), "pageSize": page_size},
-            ]
-        elif len(parts) == 1:
-            wildcard = _wild(parts[0])
-            params_options = [
-                {"lastName-like": wildcard, "pageSize": page_size},
-                {"firstName-like": wildcard, "pageSize": page_size},
-                {"personCompany-like": wildcard, "pageSize": page_size},
-            ]
-        else:
-            params_options = [default_params]
-
-        all_entities = []
-        seen_ids = set()
-
-        for params in params_options:
-            debug_log(f"🔎 Suche {entity} | params={params} | base='{base_url}'")
-            try:
-                response = requests.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                data = response.json()
-                entities = list(_extract_entities(data, entity))
-
-                for contact in entities:
-                    contact_id = contact.get("id") if isinstance(contact, dict) else None
-                    if contact_id and contact_id not in seen_ids:
-                        seen_ids.add(contact_id)
-                        all_entities.append(contact)
-
-                if len(all_entities) >= page_size:
-                    break
-
-            except Exception as exc:
-                debug_log(f"⚠️ Teilsuche fehlgeschlagen: {exc}")
-                continue
-
-        debug_log(f"📬 WeClapp Combined Results | Treffer: {len(all_entities)} aus {len(params_options)} Queries")
-        return all_entities[:page_size]
-
-    params = {"term": search_term, "pageSize": page_size}
-
     try:
         debug_log(f"🔎 Suche {entity} mit Suchbegriff: '{search_term}'...")
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        return list(_extract_entities(data, entity))
-    except requests.exceptions.HTTPError as exc:
-        resp = exc.response
-        status_code = resp.status_code if resp is not None else "unknown"
-        body_preview = resp.text[:200] if resp is not None and resp.text else ""
-        debug_log(f"❌ Fehler bei WeClapp-Suche ({entity}): {status_code} - {body_preview}")
-        return []
+        entities = list(_extract_entities(
+            await client.list(entity, {"term": search_term}, limit=page_size), entity
+        ))
+        if entities or entity != "contact" or not search_term:
+            debug_log(f"📬 WeClapp Antwort (term) | Treffer: {len(entities)}")
+            return entities[:page_size]
+    except WeClappError as exc:
+        debug_log(f"❌ Fehler bei WeClapp-Suche ({entity}): {exc.status_code} - {exc.body[:200]}")
+        if entity != "contact":
+            return []
     except Exception as exc:  # pragma: no cover - defensive logging
         debug_log(f"❌ Fehler bei WeClapp-Suche ({entity}): {exc}")
-        return []
+        if entity != "contact":
+            return []
+
+    # Contacts: Namensvarianten parallel abfragen, die erste mit Treffern gewinnt
+    params_options = _contact_fallback_params(search_term)
+    entities = list(_extract_entities(
+        await client.first_result(entity, params_options, limit=page_size), entity
+    ))
+    debug_log(f"📬 WeClapp Fallback Results | Treffer: {len(entities)} aus {len(params_options)} Queries")
+    return entities[:page_size]
+
+
+def search_weclapp_entity(entity, search_term, page_size=5):
+    """Synchrone Variante von search_weclapp_entity_async (gemeinsamer Client)."""
+    return get_weclapp_client().run_sync(search_weclapp_entity_async(entity, search_term, page_size))
 
 def lookup_contact_priority(email=None, telefon=None, adresse=None, name=None):
     """
@@ -0,0 +1,365 @@
+"""
+Zapier Notification Dispatcher - gebündelter Versand an Catch-Hooks
+
+Statt pro verarbeiteter Email/Anruf sofort einen HTTP-Call an Zapier zu
+schicken, laufen Notifications über eine asynchrone Outbound-Queue:
+- Fast Lane: urgent/high Notifications (und Anrufe) gehen sofort raus
+- Normale Notifications werden pro Empfänger über ein Zeitfenster gesammelt
+  und als EIN Request mit allen Einträgen (notifications) gesendet
+- Digest-Modus (optional): low-Priority Notifications eines Fensters werden
+  zu EINER Zapier-Notification (eine Email) zusammengefasst (spart Zapier Tasks)
+- Retry bei 429/5xx mit exponentiellem Backoff (Retry-After wird respektiert)
+- Rate Limit pro Hook-URL (Sliding Window)
+"""
+import asyncio
+import html
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+ZAPIER_WEBHOOK_URL = os.getenv("ZAPIER_WEBHOOK_URL", "https://hooks.zapier.com/hooks/catch/17762912/u5ilur9/")
+
+FAST_LANE_PRIORITIES = {"urgent", "high", "critical"}
+DIGEST_PRIORITIES = {"low"}
+PRIORITY_ALIASES = {"hoch": "high", "mittel": "medium", "niedrig": "low", "normal": "medium"}
+RECIPIENT_FIELDS = ("to", "recipients", "recipient_email", "responsible_employee")
+HTML_BODY_PATTERN = re.compile(r"<body[^>]*>(.*?)</body\s*>", re.IGNORECASE | re.DOTALL)
+HTML_DOCUMENT_PATTERN = re.compile(r"<\s*(!doctype|html|head)\b", re.IGNORECASE)
+
+
+def classify_priority(payload: Dict[str, Any], message_type: Optional[str] = None) -> str:
+    """Ermittelt die Versand-Priorität einer Notification (urgent/high/medium/low)"""
+    if (message_type or payload.get("message_type")) == "call":
+        return "urgent"
+
+    candidates = [payload.get("priority")]
+    ai_analysis = payload.get("ai_analysis")
+    if isinstance(ai_analysis, dict):
+        urgency = ai_analysis.get("urgency")
+        if isinstance(urgency, dict):
+            urgency = urgency.get("level")
+        candidates.append(urgency)
+
+    for candidate in candidates:
+        if isinstance(candidate, str) and candidate.strip():
+            level = candidate.strip().lower()
+            return PRIORITY_ALIASES.get(level, level)
+    return "medium"
+
+
+def recipient_key(payload: Dict[str, Any]) -> str:
+    """Gruppierungs-Schlüssel für Batches (Empfänger der Notification)"""
+    recipients = payload.get("recipients")
+    if isinstance(recipients, (list, tuple)):
+        return ",".join(sorted(str(r) for r in recipients))
+    return str(payload.get("to") or payload.get("recipient_email") or "default")
+
+
+class HookRateLimiter:
+    """Sliding-Window Rate Limit pro Hook-URL"""
+
+    def __init__(self, max_requests: int, period_seconds: float):
+        self.max_requests = max_requests
+        self.period_seconds = period_seconds
+        self._sent: Dict[str, Deque[float]] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, hook_url: str):
+        """Wartet bis für die Hook-URL wieder ein Request erlaubt ist"""
+        while True:
+            # Wartezeit unter dem Lock berechnen, aber außerhalb schlafen:
+            # ein gedrosselter Hook blockiert sonst alle anderen
+            async with self._lock:
+                window = self._sent.setdefault(hook_url, deque())
+                now = time.monotonic()
+                while window and now - window[0] >= self.period_seconds:
+                    window.popleft()
+                if len(window) < self.max_requests:
+                    window.append(now)
+                    return
+                delay = self.period_seconds - (now - window[0])
+            await asyncio.sleep(delay)
+
+
+class NotificationDispatcher:
+    """Asynchrone Outbound-Queue für Zapier Notifications"""
+
+    def __init__(
+        self,
+        webhook_url: str = ZAPIER_WEBHOOK_URL,
+        batch_window_seconds: float = float(os.getenv("NOTIFICATION_BATCH_WINDOW_SECONDS", "30")),
+        max_batch_size: int = int(os.getenv("NOTIFICATION_MAX_BATCH_SIZE", "20")),
+        digest_mode: bool = os.getenv("NOTIFICATION_DIGEST_MODE", "false").lower() == "true",
+        max_retries: int = 4,
+        backoff_base_seconds: float = 1.0,
+        rate_limit_requests: int = int(os.getenv("ZAPIER_RATE_LIMIT_PER_MINUTE", "60")),
+        rate_limit_period_seconds: float = 60.0,
+        request_timeout_seconds: float = 10.0,
+    ):
+        self.webhook_url = webhook_url
+        self.batch_window_seconds = batch_window_seconds
+        self.max_batch_size = max_batch_size
+        self.digest_mode = digest_mode
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.request_timeout_seconds = request_timeout_seconds
+        self.rate_limiter = HookRateLimiter(rate_limit_requests, rate_limit_period_seconds)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pending: Dict[Tuple[str, str], List[Tuple[float, Dict[str, Any], str]]] = {}
+
+        self.stats = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "fast_lane": 0,
+            "batches": 0,
+            "batch_items": 0,
+            "digests": 0,
+            "digest_items": 0,
+        }
+
+    # ------------------------------------------------------------------ lifecycle
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """Startet den Queue-Worker (aus dem FastAPI lifespan)"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._session = aiohttp.ClientSession()
+        self._worker = asyncio.create_task(self._run(), name="zapier-notification-dispatcher")
+        logger.info(
+            f"📬 Notification dispatcher started (window={self.batch_window_seconds}s, "
+            f"digest={'on' if self.digest_mode else 'off'})"
+        )
+
+    async def stop(self):
+        """Stoppt den Worker und versendet alle noch offenen Notifications"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._queue is not None:
+            while not self._queue.empty():
+                await self._handle(*self._queue.get_nowait())
+        await self._flush(force=True)
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        logger.info("📭 Notification dispatcher stopped")
+
+    # ------------------------------------------------------------------ public API
+    async def dispatch(self, payload: Dict[str, Any], priority: Optional[str] = None) -> bool:
+        """
+        Übergibt eine Notification an den Dispatcher.
+
+        Returns:
+            True wenn gesendet (Fast Lane) bzw. eingereiht (Queue), sonst False
+        """
+        priority = priority or classify_priority(payload)
+
+        if priority in FAST_LANE_PRIORITIES or not self.running:
+            if priority in FAST_LANE_PRIORITIES:
+                self.stats["fast_lane"] += 1
+            return await self._post_with_retry(payload)
+
+        await self._queue.put((time.monotonic(), payload, priority))
+        self.stats["queued"] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aktuelle Dispatcher-Statistiken"""
+        return {
+            **self.stats,
+            "running": self.running,
+            "queue_size": self._queue.qsize() if self._queue is not None else 0,
+            "pending_batches": len(self._pending),
+            "pending_items": sum(len(items) for items in self._pending.values()),
+            "digest_mode": self.digest_mode,
+        }
+
+    # ------------------------------------------------------------------ worker
+    async def _handle(self, enqueued_at: float, payload: Dict[str, Any], priority: str):
+        """Notification dem Fenster ihres Empfängers zuordnen (Batch oder Digest)"""
+        lane = "digest" if self.digest_mode and priority in DIGEST_PRIORITIES else "batch"
+        self._pending.setdefault((recipient_key(payload), lane), []).append((enqueued_at, payload, priority))
+
+    async def _run(self):
+        while True:
+            timeout = self._next_deadline()
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                await self._handle(*item)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"❌ Notification dispatcher flush error: {e}")
+
+    def _next_deadline(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        oldest = min(items[0][0] for items in self._pending.values())
+        return max(0.0, oldest + self.batch_window_seconds - time.monotonic())
+
+    async def _flush(self, force: bool = False):
+        now = time.monotonic()
+        ready = [
+            key for key, items in self._pending.items()
+            if force
+            or len(items) >= self.max_batch_size
+            or now - items[0][0] >= self.batch_window_seconds
+        ]
+        for key in ready:
+            _, lane = key
+            payloads = [payload for _, payload, _ in self._pending.pop(key)]
+            if len(payloads) == 1:
+                await self._post_with_retry(payloads[0])
+            elif lane == "digest":
+                await self._post_with_retry(self._build_digest(payloads))
+                self.stats["digests"] += 1
+                self.stats["digest_items"] += len(payloads)
+            else:
+                await self._post_with_retry(self._build_batch(payloads))
+                self.stats["batches"] += 1
+                self.stats["batch_items"] += len(payloads)
+
+    @staticmethod
+    def _build_batch(payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """EIN Request mit allen Notifications eines Empfängers (Zapier: Line Items)"""
+        batch = {
+            "notification_type": "batch",
+            "batch_size": len(payloads),
+            "notifications": payloads,
+        }
+        for key in RECIPIENT_FIELDS:
+            if key in payloads[0]:
+                batch[key] = payloads[0][key]
+        return batch
+
+    @staticmethod
+    def _body_fragment(payload: Dict[str, Any]) -> str:
+        """Inhalt von <body> einer vollständigen HTML-Mail, sonst Fragment bzw. Summary"""
+        html_body = payload.get("html_body") or ""
+        match = HTML_BODY_PATTERN.search(html_body)
+        if match:
+            return match.group(1).strip()
+        if html_body and not HTML_DOCUMENT_PATTERN.search(html_body):
+            return html_body
+        return f"<p>{html.escape(str(payload.get('summary') or ''))}</p>"
+
+    @classmethod
+    def _build_digest(cls, payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Fasst mehrere low-Priority Notifications zu einer Zapier-Notification zusammen"""
+        first = payloads[0]
+        subject = f"📬 C&D AI Digest: {len(payloads)} Benachrichtigungen"
+        sections = []
+        items = []
+        for payload in payloads:
+            item_subject = payload.get("subject") or payload.get("notification_subject") or "Benachrichtigung"
+            sections.append(
+                f"<section><h3>{html.escape(str(item_subject))}</h3>{cls._body_fragment(payload)}</section>"
+            )
+            items.append({
+                "subject": item_subject,
+                "notification_type": payload.get("notification_type"),
+                "summary": payload.get("summary"),
+                "timestamp": payload.get("timestamp"),
+            })
+
+        digest = {
+            "notification_type": "digest",
+            "subject": subject,
+            "notification_subject": subject,
+            "email_subject": subject,
+            "outlook_subject": subject,
+            "priority": "low",
+            "html_body": (
+                f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body>"
+                f"<h2>{html.escape(subject)}</h2>{'<hr>'.join(sections)}</body></html>"
+            ),
+            "summary": f"{len(payloads)} Benachrichtigungen zusammengefasst",
+            "digest_items": items,
+        }
+        for key in RECIPIENT_FIELDS:
+            if key in first:
+                digest[key] = first[key]
+        return digest
+
+    # ------------------------------------------------------------------ transport
+    async def _post_with_retry(self, payload: Dict[str, Any]) -> bool:
+        """POST an den Hook mit Retry bei 429/5xx und Netzwerkfehlern"""
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(self.webhook_url)
+            retry_after = None
+            try:
+                status, retry_after = await self._post(payload)
+                if 200 <= status < 300:
+                    self.stats["sent"] += 1
+                    return True
+                if status != 429 and status < 500:
+                    logger.warning(f"⚠️ Zapier notification rejected - Status: {status}")
+                    self.stats["failed"] += 1
+                    return False
+                logger.warning(f"⚠️ Zapier notification status {status} (attempt {attempt + 1})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"⚠️ Zapier notification error (attempt {attempt + 1}): {e}")
+
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                delay = retry_after if retry_after is not None else self.backoff_base_seconds * (2 ** attempt)
+                await asyncio.sleep(delay + random.uniform(0, self.backoff_base_seconds / 2))
+
+        logger.error("❌ Zapier notification failed after retries")
+        self.stats["failed"] += 1
+        return False
+
+    async def _post(self, payload: Dict[str, Any]) -> Tuple[int, Optional[float]]:
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout_seconds)
+        if self._session is None or self._session.closed:
+            async with aiohttp.ClientSession() as session:
+                return await self._post_with_session(session, payload, timeout)
+        return await self._post_with_session(self._session, payload, timeout)
+
+    async def _post_with_session(self, session: aiohttp.ClientSession, payload: Dict[str, Any],
+                                 timeout: aiohttp.ClientTimeout) -> Tuple[int, Optional[float]]:
+        async with session.post(self.webhook_url, json=payload, timeout=timeout) as response:
+            retry_after = None
+            header = response.headers.get("Retry-After")
+            if header:
+                try:
+                    retry_after = float(header)
+                except ValueError:
+                    retry_after = None
+            return response.status, retry_after
+
+
+# Globale Instanz (Singleton-Pattern)
+_dispatcher_instance = None
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    """Holt globale NotificationDispatcher Instanz"""
+    global _dispatcher_instance
+    if _dispatcher_instance is None:
+        _dispatcher_instance = NotificationDispatcher()
+    return _dispatcher_instance
@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+"""
+⏱️ Pipeline Replay Benchmark
+=============================
+
+Spielt Email- und Anruf-Payloads offline durch die echten Pipelines
+(process_email_background bzw. POST /webhook/ai-call über die ASGI-App) -
+ohne Railway, ohne echte externe Dienste:
+
+- Graph (Token, Mail, Anhänge, OneDrive inkl. WEClapp Sync-DB Download),
+  WeClapp, PDF.co, OpenAI und Zapier werden von lokalen Stand-ins in einem
+  Hintergrund-Thread beantwortet; httpx, aiohttp und requests werden dafür
+  auf 127.0.0.1 umgeleitet
+- Latenz je Dienst (inkl. Jitter) und Fehlerquote (503) sind konfigurierbar
+- Payloads: aufgezeichnete JSONL-Dateien (--payloads) und/oder die Szenarien
+  aus test_suite/ (test_email_scenarios, test_call_scenarios_live)
+
+Ausgabe: Durchsatz, Latenz-Perzentile je Kanal, Speicher-Höchststand (RSS,
+optional tracemalloc) und die Aufteilung je Stage aus dem Tracing. Die
+Ergebnisse werden als JSON gespeichert und können mit --compare gegen einen
+früheren Lauf verglichen werden (Exit-Code 1 bei Regression).
+
+JSONL-Format (eine Zeile pro Payload):
+    {"channel": "email", "payload": {...Zapier Webhook...}, "message": {...Graph Message...}}
+    {"channel": "call", "payload": {...Sipgate/FrontDesk Webhook...}}
+Rohe Webhook-Payloads ohne Hülle werden am Aufbau erkannt; andere Zeilen
+werden übersprungen.
+
+Hinweise:
+- Datenbanken mit konfigurierbarem Pfad landen in einem Temp-Verzeichnis;
+  fest verdrahtete Pfade unter /tmp (z.B. /tmp/weclapp_sync.db) werden wie
+  im Betrieb verwendet
+- Anrufe laufen durch die Admission Control (ADMISSION_CALL_CONCURRENCY /
+  ADMISSION_CALL_QUEUE) - bei hoher --concurrency sind 429 zu erwarten
+
+Usage:
+    python pipeline_replay_benchmark.py --emails 40 --calls 20 --concurrency 8
+    python pipeline_replay_benchmark.py --payloads recorded.jsonl --latency openai=1500,graph=120 --error-rate pdfco=0.1
+    python pipeline_replay_benchmark.py --latency-scale 0.1 --compare benchmark_results/baseline.json
+"""
+
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import math
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+
+DEFAULT_RESULTS_DIR = os.path.join(ROOT_DIR, "benchmark_results")
+DEFAULT_USER_EMAIL = "mj@cdtechnologies.de"
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "orchestrator.bench"}
+
+# Typische Latenzen der echten Dienste (ms)
+DEFAULT_LATENCY_MS = {
+    "graph": 120.0,
+    "graph_auth": 80.0,
+    "weclapp": 150.0,
+    "pdfco": 900.0,
+    "openai": 1500.0,
+    "zapier": 200.0,
+    "http": 50.0,
+}
+
+# Kleinstmögliches gültiges PDF für Anhänge / OneDrive Downloads
+MINIMAL_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 200 200]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+OCR_TEXT = (
+    "Rechnung RE-2025-{n:05d}\nMusterbau GmbH\nRechnungsdatum: 01.10.2025\n"
+    "Leistung: Dachreparatur\nNetto: 1.000,00 EUR\nMwSt 19%: 190,00 EUR\nGesamt: 1.190,00 EUR\n"
+    "IBAN: DE89370400440532013000\n"
+)
+
+KNOWN_CONTACTS = [
+    {"id": "1001", "name": "Musterbau GmbH", "email": "einkauf@musterbau.de", "phone": "+4930123456"},
+    {"id": "1002", "name": "Dachdecker Weber", "email": "info@dach-weber.de", "phone": "+4940987654"},
+    {"id": "1003", "name": "Holzhandel Becker KG", "email": "rechnung@holz-becker.de", "phone": "+498912345678"},
+]
+UNKNOWN_SENDER = "max.mustermann.test2025@gmail.com"
+
+
+# ===============================
+# PAYLOADS
+# ===============================
+
+@dataclass
+class ReplayItem:
+    """Ein abzuspielender Webhook"""
+    channel: str  # "email" | "call"
+    payload: Dict[str, Any]
+    message: Optional[Dict[str, Any]] = None  # Graph Message für Emails
+    label: str = ""
+
+
+def graph_message(message_id: str, sender: str, subject: str, body: str,
+                  attachments: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Graph API Message inkl. $expand=attachments"""
+    return {
+        "id": message_id,
+        "subject": subject,
+        "from": {"emailAddress": {"address": sender, "name": sender.split("@")[0]}},
+        "toRecipients": [{"emailAddress": {"address": DEFAULT_USER_EMAIL}}],
+        "receivedDateTime": datetime.utcnow().isoformat() + "Z",
+        "body": {"contentType": "text", "content": body},
+        "bodyPreview": body[:255],
+        "hasAttachments": bool(attachments),
+        "attachments": attachments or [],
+    }
+
+
+def pdf_attachment(name: str) -> Dict[str, Any]:
+    return {
+        "@odata.type": "#microsoft.graph.fileAttachment",
+        "id": uuid.uuid4().hex,
+        "name": name,
+        "contentType": "application/pdf",
+        "size": len(MINIMAL_PDF),
+        "contentBytes": base64.b64encode(MINIMAL_PDF).decode(),
+    }
+
+
+def classify_record(record: Dict[str, Any]) -> Optional[ReplayItem]:
+    """Aufgezeichnete Zeile → ReplayItem (None wenn kein Webhook-Payload)"""
+    if isinstance(record.get("payload"), dict) and record.get("channel") in ("email", "call"):
+        item = ReplayItem(record["channel"], record["payload"], record.get("message"), record.get("label", "recorded"))
+    elif ("call" in record and "assist" in record) or any(key in record for key in ("callHeadline", "recording_url", "transcription_url")):
+        item = ReplayItem("call", record, label="recorded")
+    elif record.get("message_id") or (record.get("id") and (record.get("subject") or record.get("user_email"))):
+        item = ReplayItem("email", record, label="recorded")
+    else:
+        return None
+
+    if item.channel == "email":
+        payload = dict(item.payload)
+        payload["message_id"] = payload.get("message_id") or payload.get("id") or uuid.uuid4().hex
+        payload.setdefault("user_email", DEFAULT_USER_EMAIL)
+        item.payload = payload
+        if item.message is None:
+            item.message = graph_message(
+                payload["message_id"],
+                payload.get("from") or UNKNOWN_SENDER,
+                payload.get("subject") or "",
+                payload.get("body") or payload.get("body_preview") or "",
+            )
+    return item
+
+
+def load_recorded_payloads(paths: List[str]) -> Tuple[List[ReplayItem], int]:
+    """Liest JSONL-Dateien; liefert (Items, Anzahl übersprungener Zeilen)"""
+    items: List[ReplayItem] = []
+    skipped = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    item = classify_record(json.loads(line))
+                except (json.JSONDecodeError, AttributeError):
+                    item = None
+                if item is None:
+                    skipped += 1
+                else:
+                    items.append(item)
+    return items, skipped
+
+
+def build_email_scenarios(count: int, rng: random.Random) -> List[ReplayItem]:
+    """Emails je Szenario aus test_suite/test_email_scenarios (Betreff-Keywords, PDF ja/nein)"""
+    from test_suite.test_email_scenarios import SCENARIO_CONFIGS
+
+    with open(os.path.join(ROOT_DIR, "test_suite", "email1_preisanfrage.txt"), encoding="utf-8") as handle:
+        inquiry_body = handle.read().split("\n\n", 1)[-1]
+
+    scenarios = list(SCENARIO_CONFIGS.items())
+    items = []
+    for n in range(count):
+        scenario, config = scenarios[n % len(scenarios)]
+        message_id = f"bench-{scenario}-{n}-{uuid.uuid4().hex[:8]}"
+        sender = rng.choice(KNOWN_CONTACTS)["email"] if n % 2 == 0 else UNKNOWN_SENDER
+        keyword = rng.choice(config.get("keywords") or [scenario])
+        subject = f"{keyword.title()} {n:04d}"
+        body = inquiry_body if scenario in ("offer", "general") else f"Anbei {keyword} Nr. {n:04d}.\n\nMit freundlichen Grüßen"
+        attachments = [pdf_attachment(f"{scenario}_{n:04d}.pdf")] if config.get("has_pdf") else []
+        hint = config.get("expected_document_type")
+        items.append(ReplayItem(
+            "email",
+            {
+                "message_id": message_id,
+                "user_email": DEFAULT_USER_EMAIL,
+                "from": sender,
+                "subject": subject,
+                "document_type_hint": hint if hint in ("invoice", "offer", "order_confirmation", "delivery_note", "general") else None,
+                "priority": "medium",
+            },
+            graph_message(message_id, sender, subject, body, attachments),
+            label=f"email:{scenario}",
+        ))
+    return items
+
+
+def build_call_scenarios(count: int, rng: random.Random) -> List[ReplayItem]:
+    """Anrufe aus test_suite/test_call_scenarios_live (Sipgate Assist bekannt/unbekannt, FrontDesk)"""
+    from test_suite.test_call_scenarios_live import (
+        KNOWN_CONTACT,
+        UNKNOWN_CONTACT,
+        create_frontdesk_payload,
+        create_sipgate_assist_payload,
+    )
+
+    items = []
+    for n in range(count):
+        call_id = f"bench-call-{n}-{uuid.uuid4().hex[:8]}"
+        kind = n % 3
+        if kind == 2:
+            payload = create_frontdesk_payload(from_number=KNOWN_CONTACT["phone"], duration_seconds=rng.randint(60, 900))
+            payload["call_id"] = call_id
+            label = "call:frontdesk"
+        else:
+            number = (KNOWN_CONTACT if kind == 0 else UNKNOWN_CONTACT)["phone"]
+            duration = rng.randint(60, 900)
+            # duration_seconds=0: die Vorlage addiert die Dauer auf die Sekunde (ValueError ab 60s)
+            payload = create_sipgate_assist_payload(from_number=number, duration_seconds=0)
+            payload["call"].update({"id": call_id, "duration": duration * 1000})
+            label = "call:known" if kind == 0 else "call:unknown"
+        items.append(ReplayItem("call", payload, label=label))
+    return items
+
+
+def build_weclapp_fixture_db(path: str) -> bytes:
+    """WEClapp Sync-DB (parties/leads) mit den bekannten Kontakten - wird per OneDrive-Stub ausgeliefert"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS parties (id TEXT PRIMARY KEY, name TEXT, email TEXT, phone TEXT,
+                                            customerNumber TEXT, partyType TEXT);
+        CREATE TABLE IF NOT EXISTS leads (id TEXT PRIMARY KEY, firstName TEXT, lastName TEXT, email TEXT,
+                                          phone TEXT, company TEXT, leadStatus TEXT);
+    """)
+    conn.executemany(
+        "INSERT OR REPLACE INTO parties VALUES (?, ?, ?, ?, ?, 'ORGANIZATION')",
+        [(c["id"], c["name"], c["email"], c["phone"], f"K{c['id']}") for c in KNOWN_CONTACTS],
+    )
+    conn.commit()
+    conn.close()
+    with open(path, "rb") as handle:
+        return handle.read()
+
+
+# ===============================
+# LOKALE STAND-INS
+# ===============================
+
+@dataclass
+class StubConfig:
+    latency_ms: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LATENCY_MS))
+    latency_scale: float = 1.0
+    jitter: float = 0.2
+    error_rate: Dict[str, float] = field(default_factory=dict)
+    seed: int = 42
+
+
+class StubServices:
+    """Beantwortet Graph/WeClapp/PDF.co/OpenAI/Zapier Requests in einem eigenen Thread"""
+
+    def __init__(self, config: StubConfig, messages: Dict[str, Dict[str, Any]], weclapp_db: bytes):
+        from modules.monitoring.tracing import service_for_host
+
+        self.config = config
+        self.messages = messages
+        self.weclapp_db = weclapp_db
+        self.service_for_host = service_for_host
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._ocr_counter = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> str:
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, content_type, payload = stubs.respond(self.command, self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="bench-stubs", daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+
+    def respond(self, method: str, raw_path: str, body: bytes) -> Tuple[int, str, bytes]:
+        # Pfad: /<original host>/<original path>?<query>
+        host, _, rest = raw_path.lstrip("/").partition("/")
+        parts = urlsplit("/" + rest)
+        path, query = unquote(parts.path), parse_qs(parts.query)
+        service = self.service_for_host(host)
+
+        with self._lock:
+            stats = self.stats.setdefault(service, {"requests": 0, "injected_errors": 0})
+            stats["requests"] += 1
+            base = self.config.latency_ms.get(service, self.config.latency_ms.get("http", 0.0))
+            delay = max(0.0, self._rng.gauss(base, base * self.config.jitter)) * self.config.latency_scale / 1000
+            fail = self._rng.random() < self.config.error_rate.get(service, self.config.error_rate.get("*", 0.0))
+            if fail:
+                stats["injected_errors"] += 1
+        time.sleep(delay)
+        if fail:
+            return self._json(503, {"error": "injected", "service": service})
+
+        handler = getattr(self, f"_{service}", None)
+        return handler(method, path, query, body) if handler else self._json(200, {})
+
+    @staticmethod
+    def _json(status: int, data: Any) -> Tuple[int, str, bytes]:
+        return status, "application/json", json.dumps(data, ensure_ascii=False).encode()
+
+    def _graph_auth(self, method, path, query, body):
+        return self._json(200, {"access_token": "bench-token", "token_type": "Bearer", "expires_in": 3600})
+
+    def _graph(self, method, path, query, body):
+        if path.endswith("/$value"):
+            return 200, "application/pdf", MINIMAL_PDF
+        if ":/content" in path or path.endswith("/content"):
+            if method == "GET":
+                return (200, "application/octet-stream", self.weclapp_db) if ".db" in path else (200, "application/pdf", MINIMAL_PDF)
+            item_id = uuid.uuid4().hex
+            return self._json(201, {"id": item_id, "name": path.rsplit("/", 1)[-1], "webUrl": f"https://onedrive.bench/{item_id}"})
+        if path.endswith("/createLink"):
+            return self._json(200, {"link": {"webUrl": f"https://onedrive.bench/share/{uuid.uuid4().hex}"}})
+        if path.endswith("/$batch"):
+            requests_ = json.loads(body or b"{}").get("requests", [])
+            return self._json(200, {"responses": [
+                {"id": r.get("id"), "status": 200, "body": {"link": {"webUrl": f"https://onedrive.bench/share/{uuid.uuid4().hex}"}}}
+                for r in requests_
+            ]})
+        if "/messages/" in path:
+            message_id = path.split("/messages/", 1)[1].split("/", 1)[0]
+            message = self.messages.get(message_id) or graph_message(message_id, UNKNOWN_SENDER, "", "")
+            if path.endswith("/attachments"):
+                return self._json(200, {"value": message.get("attachments", [])})
+            return self._json(200, message)
+        if method == "GET":
+            return self._json(200, {"value": []})
+        return 202, "application/json", b""
+
+    def _weclapp(self, method, path, query, body):
+        if method in ("POST", "PUT"):
+            try:
+                data = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                data = {}
+            return self._json(201 if method == "POST" else 200, {**data, "id": data.get("id") or uuid.uuid4().hex[:10]})
+        if path.endswith("/count"):
+            return self._json(200, {"result": 0})
+        lookup = {value for key, values in query.items() if key.endswith("-eq") for value in values}
+        matches = [
+            {"id": c["id"], "firstName": "", "lastName": c["name"], "email": c["email"], "phone": c["phone"],
+             "company": {"name": c["name"]}, "partyType": "ORGANIZATION", "customerNumber": f"K{c['id']}"}
+            for c in KNOWN_CONTACTS if c["email"] in lookup or c["phone"] in lookup
+        ]
+        return self._json(200, {"result": matches if ("/party" in path or "/contact" in path or "/customer" in path) else []})
+
+    def _pdfco(self, method, path, query, body):
+        if path.endswith("/file/upload"):
+            return self._json(200, {"url": f"https://pdfco.bench/{uuid.uuid4().hex}.pdf", "error": False, "status": 200})
+        with self._lock:
+            self._ocr_counter += 1
+            text = OCR_TEXT.format(n=self._ocr_counter)
+        if path.endswith("/convert/to/text"):
+            return 200, "text/plain; charset=utf-8", text.encode()
+        return self._json(200, {"error": False, "status": 200, "body": text, "url": f"https://pdfco.bench/{uuid.uuid4().hex}.json"})
+
+    def _openai(self, method, path, query, body):
+        if "/audio/" in path:
+            return self._json(200, {"text": "Hallo, ich hätte gerne ein Angebot für einen Dachausbau."})
+        prompt = body.decode("utf-8", errors="ignore").lower()
+        document_type = "invoice" if "rechnung" in prompt or "invoice" in prompt else "offer" if "angebot" in prompt else "general"
+        content = {
+            "dokumenttyp": {"invoice": "Rechnung", "offer": "Angebot"}.get(document_type, "Anfrage"),
+            "document_type": document_type,
+            "kategorie": "information",
+            "zusammenfassung": "Benchmark-Antwort",
+            "summary": "Benchmark-Antwort",
+            "prioritaet": "mittel",
+            "priority": "medium",
+            "intent": "information",
+            "sentiment": "neutral",
+            "relevant": True,
+            "confidence": 0.9,
+            "tasks": [],
+            "aufgaben": [],
+            "date": None,
+            "time": None,
+        }
+        prompt_tokens = max(1, len(prompt) // 4)
+        return self._json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4-bench",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 120, "total_tokens": prompt_tokens + 120},
+        })
+
+    def _zapier(self, method, path, query, body):
+        return self._json(200, {"status": "success", "id": uuid.uuid4().hex})
+
+
+def _redirect(url: Any, base_url: str) -> Optional[str]:
+    """https://host/path?q → <stubs>/host/path?q (None für lokale Ziele)"""
+    parts = urlsplit(str(url))
+    if not parts.hostname or parts.hostname in LOCAL_HOSTS:
+        return None
+    target = f"{base_url}/{parts.hostname}{parts.path or '/'}"
+    return f"{target}?{parts.query}" if parts.query else target
+
+
+def install_redirects(base_url: str):
+    """
+    Leitet httpx, aiohttp und requests auf die Stand-ins um.
+
+    Muss vor dem Import des Orchestrators laufen: die Tracing-Instrumentierung
+    legt sich dann außen herum und sieht weiterhin die Original-URL (Dienstname).
+    """
+    import httpx
+
+    original_async_send = httpx.AsyncClient.send
+    original_send = httpx.Client.send
+
+    def _rewrite(request):
+        target = _redirect(request.url, base_url)
+        if target:
+            request.url = httpx.URL(target)
+            request.headers["Host"] = request.url.netloc.decode()
+
+    @functools.wraps(original_async_send)
+    async def async_send(self, request, *args, **kwargs):
+        _rewrite(request)
+        return await original_async_send(self, request, *args, **kwargs)
+
+    @functools.wraps(original_send)
+    def send(self, request, *args, **kwargs):
+        _rewrite(request)
+        return original_send(self, request, *args, **kwargs)
+
+    httpx.AsyncClient.send = async_send
+    httpx.Client.send = send
+
+    try:
+        import aiohttp
+
+        original_request = aiohttp.ClientSession._request
+
+        @functools.wraps(original_request)
+        async def aiohttp_request(self, method, str_or_url, *args, **kwargs):
+            return await original_request(self, method, _redirect(str_or_url, base_url) or str_or_url, *args, **kwargs)
+
+        aiohttp.ClientSession._request = aiohttp_request
+    except ImportError:
+        pass
+
+    import requests
+
+    original_session_request = requests.Session.request
+
+    @functools.wraps(original_session_request)
+    def session_request(self, method, url, *args, **kwargs):
+        return original_session_request(self, method, _redirect(url, base_url) or url, *args, **kwargs)
+
+    requests.Session.request = session_request
+
+
+def prepare_environment(workdir: str):
+    """Zugangsdaten (Dummy) und konfigurierbare DB-Pfade vor dem Orchestrator-Import setzen"""
+    defaults = {
+        "OPENAI_API_KEY": "bench-openai-key",
+        "WECLAPP_API_TOKEN": "bench-weclapp-token",
+        "WECLAPP_API_KEY": "bench-weclapp-token",
+        "WECLAPP_DOMAIN": "bench",
+        "PDFCO_API_KEY": "bench-pdfco-key",
+        "APIFY_TOKEN": "bench-apify-token",
+        "GRAPH_TENANT_ID_MAIL": "bench-tenant",
+        "GRAPH_CLIENT_ID_MAIL": "bench-client",
+        "GRAPH_CLIENT_SECRET_MAIL": "bench-secret",
+        "GRAPH_TENANT_ID_ONEDRIVE": "bench-tenant",
+        "GRAPH_CLIENT_ID_ONEDRIVE": "bench-client",
+        "GRAPH_CLIENT_SECRET_ONEDRIVE": "bench-secret",
+        "DATABASE_PATH": os.path.join(workdir, "invoices.db"),
+        "SALES_PIPELINE_DB_PATH": os.path.join(workdir, "sales_pipeline.db"),
+        "SCHEDULER_DB_PATH": os.path.join(workdir, "scheduler.db"),
+        "OPPORTUNITY_MIRROR_DB_PATH": os.path.join(workdir, "opportunities.db"),
+        "TRACE_DB_PATH": os.path.join(workdir, "traces.db"),
+        "TRACE_RING_SIZE": "500000",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+# ===============================
+# BENCHMARK
+# ===============================
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def latency_summary(values_ms: List[float]) -> Dict[str, float]:
+    values = sorted(values_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 1) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 1),
+        "p95_ms": round(percentile(values, 0.95), 1),
+        "p99_ms": round(percentile(values, 0.99), 1),
+        "max_ms": round(values[-1], 1) if values else 0.0,
+    }
+
+
+def rss_mb() -> float:
+    """Höchststand Resident Set Size des Prozesses (Linux: KB, macOS: Bytes)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+async def replay(items: List[ReplayItem], concurrency: int, orchestrator_module) -> List[Dict[str, Any]]:
+    """Spielt alle Items mit begrenzter Parallelität ab"""
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=orchestrator_module.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://orchestrator.bench", timeout=600) as client:
+        async def run_one(item: ReplayItem) -> Dict[str, Any]:
+            async with semaphore:
+                started = time.perf_counter()
+                status, error = "ok", None
+                try:
+                    if item.channel == "email":
+                        payload = dict(item.payload)
+                        await orchestrator_module.process_email_background(
+                            payload, payload["message_id"], payload.get("user_email") or DEFAULT_USER_EMAIL,
+                            document_type_hint=payload.get("document_type_hint"),
+                            priority=payload.get("priority", "medium"),
+                        )
+                    else:
+                        response = await client.post("/webhook/ai-call", json=item.payload)
+                        status = str(response.status_code)
+                        if response.status_code >= 400:
+                            error = f"HTTP {response.status_code}"
+                except Exception as e:
+                    status, error = "exception", f"{type(e).__name__}: {e}"
+                return {
+                    "channel": item.channel,
+                    "label": item.label,
+                    "latency_ms": (time.perf_counter() - started) * 1000,
+                    "status": status,
+                    "error": error,
+                }
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    prepare_environment(workdir)
+
+    items: List[ReplayItem] = []
+    skipped = 0
+    if args.payloads:
+        items, skipped = load_recorded_payloads(args.payloads)
+    if not args.payloads or args.with_scenarios:
+        items += build_email_scenarios(args.emails, rng) + build_call_scenarios(args.calls, rng)
+    if args.channels:
+        items = [item for item in items if item.channel in args.channels]
+    if args.repeat > 1:
+        items = [item for _ in range(args.repeat) for item in items]
+    rng.shuffle(items)
+    if not items:
+        raise SystemExit("❌ Keine Payloads zum Abspielen")
+
+    stubs = StubServices(
+        StubConfig(
+            latency_ms={**DEFAULT_LATENCY_MS, **args.latency},
+            latency_scale=args.latency_scale,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        ),
+        messages={item.payload["message_id"]: item.message for item in items if item.channel == "email" and item.message},
+        weclapp_db=build_weclapp_fixture_db(os.path.join(workdir, "weclapp_fixture.db")),
+    )
+    base_url = stubs.start()
+    install_redirects(base_url)
+
+    print(f"📦 {len(items)} payloads ({sum(i.channel == 'email' for i in items)} email, "
+          f"{sum(i.channel == 'call' for i in items)} call), {skipped} skipped lines")
+    print("⏳ Importing orchestrator...")
+    import production_langgraph_orchestrator as orchestrator_module
+    from modules.monitoring.tracing import get_tracer
+
+    rss_before = rss_mb()
+    if args.warmup:
+        print(f"🔥 Warmup: {args.warmup} payloads")
+        asyncio.run(replay(items[:args.warmup], args.concurrency, orchestrator_module))
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    print(f"🚀 Replaying {len(items)} payloads with concurrency {args.concurrency}...")
+    measure_started = time.time()
+    started = time.perf_counter()
+    results = asyncio.run(replay(items, args.concurrency, orchestrator_module))
+    elapsed = time.perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+    stubs.stop()
+
+    # Stages nur aus dem gemessenen Lauf (ohne Warmup)
+    window = time.time() - measure_started + 1
+    stages = get_tracer().get_stage_latencies(window_seconds=window, source="memory")["stages"]
+
+    channels: Dict[str, Any] = {}
+    for channel in sorted({r["channel"] for r in results}):
+        rows = [r for r in results if r["channel"] == channel]
+        channels[channel] = {
+            **latency_summary([r["latency_ms"] for r in rows]),
+            "errors": sum(1 for r in rows if r["error"]),
+            "statuses": {status: sum(1 for r in rows if r["status"] == status) for status in sorted({r["status"] for r in rows})},
+        }
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "concurrency": args.concurrency,
+            "payloads": len(items),
+            "skipped_lines": skipped,
+            "latency_ms": {**DEFAULT_LATENCY_MS, **args.latency},
+            "latency_scale": args.latency_scale,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "seed": args.seed,
+            "warmup": args.warmup,
+        },
+        "summary": {
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+            "errors": sum(1 for r in results if r["error"]),
+            **latency_summary([r["latency_ms"] for r in results]),
+        },
+        "channels": channels,
+        "memory": {
+            "rss_before_mb": rss_before,
+            "rss_peak_mb": rss_mb(),
+            "tracemalloc_peak_mb": round(traced_peak / (1024 * 1024), 1) if traced_peak is not None else None,
+        },
+        "stages": stages,
+        "stubs": stubs.stats,
+        "sample_errors": [r["error"] for r in results if r["error"]][:10],
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ===============================
+# AUSGABE & VERGLEICH
+# ===============================
+
+def print_report(result: Dict[str, Any]):
+    summary = result["summary"]
+    print("\n" + "=" * 72)
+    print(f"⏱️  {summary['count']} payloads in {summary['elapsed_seconds']}s → {summary['throughput_per_second']}/s "
+          f"({summary['errors']} errors)")
+    print(f"   Latenz: p50 {summary['p50_ms']} ms | p95 {summary['p95_ms']} ms | p99 {summary['p99_ms']} ms | max {summary['max_ms']} ms")
+    for channel, stats in result["channels"].items():
+        print(f"   {channel:<6} n={stats['count']:<5} p50 {stats['p50_ms']:>9} | p95 {stats['p95_ms']:>9} | "
+              f"p99 {stats['p99_ms']:>9} ms  status={stats['statuses']}")
+    memory = result["memory"]
+    print(f"💾 RSS {memory['rss_before_mb']} → {memory['rss_peak_mb']} MB (peak)"
+          + (f", tracemalloc peak {memory['tracemalloc_peak_mb']} MB" if memory["tracemalloc_peak_mb"] is not None else ""))
+
+    print(f"\n{'Stage':<36}{'n':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'err':>6}")
+    for name, stage in sorted(result["stages"].items(), key=lambda kv: -kv[1]["p95_ms"]):
+        print(f"{name:<36}{stage['count']:>7}{stage['p50_ms']:>10}{stage['p95_ms']:>10}{stage['p99_ms']:>10}{stage['errors']:>6}")
+    print("=" * 72)
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    """Druckt Abweichungen zur Baseline; False bei Regression über max_regression"""
+    def delta(new: float, old: float) -> float:
+        return (new - old) / old if old else 0.0
+
+    print(f"\n📊 Vergleich mit Baseline {baseline.get('timestamp')} (commit {baseline.get('git_commit')})")
+    regressions = []
+    checks = [("throughput_per_second", -1), ("p50_ms", 1), ("p95_ms", 1), ("p99_ms", 1)]
+    for key, direction in checks:
+        new, old = current["summary"][key], baseline["summary"].get(key, 0.0)
+        change = delta(new, old)
+        flag = "🔴" if change * direction > max_regression else "🟢"
+        print(f"   {flag} {key:<24} {old:>10} → {new:>10} ({change:+.1%})")
+        if change * direction > max_regression:
+            regressions.append(key)
+
+    for name, stage in sorted(current["stages"].items()):
+        old_stage = baseline.get("stages", {}).get(name)
+        if not old_stage:
+            continue
+        change = delta(stage["p95_ms"], old_stage["p95_ms"])
+        if abs(change) > max_regression:
+            print(f"   {'🔴' if change > 0 else '🟢'} stage {name:<30} p95 {old_stage['p95_ms']} → {stage['p95_ms']} ms ({change:+.1%})")
+
+    if regressions:
+        print(f"❌ Regression > {max_regression:.0%}: {', '.join(regressions)}")
+    return not regressions
+
+
+def parse_service_map(value: str) -> Dict[str, float]:
+    """'openai=1500,graph=120' → {"openai": 1500.0, "graph": 120.0}; eine Zahl gilt für alle Dienste ('*')"""
+    result: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        if "=" in part:
+            name, number = part.split("=", 1)
+            result[name.strip()] = float(number)
+        else:
+            result["*"] = float(part)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline replay benchmark for the email and call pipelines")
+    parser.add_argument("--payloads", nargs="*", default=[], help="JSONL files with recorded webhook payloads")
+    parser.add_argument("--with-scenarios", action="store_true", help="add test_suite scenarios to recorded payloads")
+    parser.add_argument("--emails", type=int, default=30, help="number of generated email scenarios")
+    parser.add_argument("--calls", type=int, default=15, help="number of generated call scenarios")
+    parser.add_argument("--channels", nargs="*", choices=["email", "call"], help="only replay these channels")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the payload set N times")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3, help="payloads replayed before measuring")
+    parser.add_argument("--latency", type=parse_service_map, default={}, help="per-service latency in ms, e.g. openai=1500,graph=120")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply all stub latencies (0.1 = 10x faster)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative stddev of stub latency")
+    parser.add_argument("--error-rate", type=parse_service_map, default={}, help="per-service 503 rate, e.g. pdfco=0.1 or 0.05 for all")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tracemalloc", action="store_true", help="also track Python allocation peak (slower)")
+    parser.add_argument("--output", help="result JSON path (default benchmark_results/pipeline_replay_<ts>.json)")
+    parser.add_argument("--compare", help="baseline result JSON for regression comparison")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="allowed relative regression for --compare")
+    args = parser.parse_args()
+
+    result = run_benchmark(args)
+    print_report(result)
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"pipeline_replay_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(result, handle, indent=2, ensure_ascii=False)
+    print(f"💾 Results saved: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if not compare_results(result, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -60,26 +60,18 @@ from langchain_core.output_parsers import JsonOutputParser
 
 # FastAPI Production Server
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import Response as FastAPIResponse, JSONResponse, HTMLResponse
+from fastapi.responses import Response as FastAPIResponse, JSONResponse, HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 # HTTP Client für API Calls
-import aiohttp
 import httpx
 import logging
 
 # SQLite Database für Contact Cache
 import sqlite3
 import asyncio
-from asyncio import Semaphore
-
-# 🔒 Global request limiter to prevent memory overload
-# Max 3 concurrent heavy operations (GPT-4, PDF processing, etc.)
-REQUEST_SEMAPHORE = Semaphore(3)
-active_requests = 0
 from contextlib import asynccontextmanager
-import requests
 
 # 💰 Richtpreis-Berechnung für Anrufe
 from modules.pricing.estimate_from_call import (
@@ -89,6 +81,43 @@ from modules.pricing.estimate_from_call import (
 )
 
 from modules.notifications.renderer import render_notification_html
+from modules.auth.button_tokens import collect_buttons
+from modules.zapier.notification_dispatcher import classify_priority, get_notification_dispatcher
+from modules.weclapp.phone_index import get_phone_index, looks_like_phone, normalize_phone_e164
+from modules.weclapp.opportunity_mirror import get_opportunity_mirror
+from modules.weclapp.weclapp_client import WeClappError, get_weclapp_client
+from modules.msgraph.folder_resolver import GRAPH_BASE_URL, get_folder_resolver
+from modules.msgraph.change_notifications import get_graph_ingestion
+from modules.msgraph.sharing_links import get_sharing_link_registry
+from modules.database.db_snapshots import get_snapshot_manager
+from modules.speech.call_transcript import CallTranscript, close_shared_client, ingest_call_transcript
+from modules.scheduler.job_scheduler import get_job_scheduler, get_task_registry
+from modules.scheduler.mailboxes import get_mailbox_registry
+from modules.scheduler.admission import (
+    CHANNEL_CALL,
+    CHANNEL_WHATSAPP,
+    PRIORITY_NORMAL,
+    AdmissionRejected,
+    get_admission_controller,
+    spawn_with_ticket,
+)
+from modules.monitoring.tracing import (
+    annotate_trace,
+    get_tracer,
+    instrument_http_clients,
+    start_trace,
+    trace_node,
+    traced,
+)
+from modules.monitoring.metrics import (
+    CONTACT_LOOKUPS,
+    DUPLICATE_CHECKS,
+    OCR_DURATION,
+    WEBHOOK_DURATION,
+    WEBHOOK_REQUESTS,
+    get_metrics_registry,
+    render_metrics,
+)
 
 # 📂 Apify Module Imports - Ordnerstruktur & Dokumenten-Klassifikation
 from modules.filegen.folder_logic import generate_folder_and_filenames
@@ -96,14 +125,39 @@ from modules.gpt.classify_document_with_gpt import classify_document_with_gpt
 
 # 🗄️ Email Tracking Database - Duplikatprüfung
 from modules.database.email_tracking_db import get_email_tracking_db, EmailTrackingDB
+from modules.database.schema_migrations import EMAIL_DATA_MIGRATIONS, get_migration_status, run_migrations
+from modules.database.duplicate_index import (
+    KIND_DOCUMENT_HASH, KIND_DOCUMENT_MESSAGE, KIND_HEURISTIC, KIND_ONEDRIVE_PATH, heuristic_key,
+)
+from modules.database.weclapp_fallback import get_weclapp_fallback_db
+from modules.database.email_search_index import EMAIL_BODY_MAX_CHARS, get_email_search_index
 
 # 💰 Umsatzabgleich System
 from modules.database.umsatzabgleich import UmsatzabgleichEngine
-from modules.database.invoice_monitoring import InvoiceMonitoringDB
+from modules.database.invoice_monitoring import InvoiceMonitoringDB, invoice_db as invoice_monitoring_db
+
+# 📸 Dashboard-Statistiken aus Snapshots
+from modules.database.stats_snapshots import (
+    SOURCE_INVOICES,
+    SOURCE_MONITORING,
+    SOURCE_PAYMENTS,
+    SOURCE_PIPELINE,
+    cached_statistics,
+    get_stats_snapshot_cache,
+)
 
 # ☁️ OneDrive Upload
 from modules.upload.upload_file_to_onedrive import upload_file_to_onedrive
 
+# 🔌 WeClapp Feld-Projektion (properties=) - nur was Lookup/Fuzzy-Matching lesen
+WECLAPP_CONTACT_PROPERTIES = ("id", "firstName", "lastName", "company", "customerId", "phone", "email")
+WECLAPP_OPPORTUNITY_PROPERTIES = ("id", "opportunityNumber", "name", "opportunityStage", "amount", "probability")
+
+# ☁️ Besitzer des OneDrive, in das die Dokumentablage hochlädt
+ONEDRIVE_DOCUMENT_OWNER = os.getenv("ONEDRIVE_DOCUMENT_OWNER", "mj@cdtechnologies.de")
+# ☁️ OneDrive, in dem der weclapp-sql-sync Actor die WEClapp DB ablegt
+WECLAPP_DB_ONEDRIVE_OWNER = os.getenv("WECLAPP_DB_ONEDRIVE_OWNER", ONEDRIVE_DOCUMENT_OWNER)
+
 # INLINE Graph API Functions (Railway deployment workaround)
 async def get_graph_token_mail():
     """Holt das Zugriffstoken von Microsoft Graph für Mail."""
@@ -175,15 +229,19 @@ async def get_graph_token_onedrive():
 
 async def fetch_email_details_with_attachments(user_email, message_id, access_token):
     """Ruft die E-Mail-Daten und Anhänge von Microsoft Graph ab."""
-    email_url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}?$expand=attachments"
+    email_url = f"{GRAPH_BASE_URL}/users/{user_email}/messages/{message_id}?$expand=attachments"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Accept": "application/json"
     }
     
     logger.info(f"🔍 Loading email: user={user_email}, message={message_id[:20]}...")
+    graph_budget = get_mailbox_registry().graph_budget(user_email)
     try:
-        response = requests.get(email_url, headers=headers)
+        async with graph_budget.request():
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.get(email_url, headers=headers)
+        graph_budget.record_response(response)
         if response.status_code == 200:
             email_data = response.json()
             logger.info(f"✅ Email loaded: Subject='{email_data.get('subject', 'no subject')}', From='{email_data.get('from', {}).get('emailAddress', {}).get('address', 'unknown')}'")
@@ -209,6 +267,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 🔭 Externe HTTP-Calls (Graph, WeClapp, PDF.co, OpenAI, Zapier) als Tracing-Spans
+instrument_http_clients()
+
 # ===============================
 # ZAPIER NOTIFICATION FUNCTIONS
 # ===============================
@@ -231,32 +292,35 @@ def generate_notification_html(notification_data: Dict[str, Any]) -> str:
     payload = dict(notification_data)
     payload.setdefault("communication_uuid", communication_uuid)
     payload.setdefault("email_message_id", email_message_id)
-    payload.setdefault("channel", payload.get("message_type"))
     payload.setdefault("recipient_email", recipient_email)
     payload.setdefault("subject", subject)
     payload["rendered_at"] = now_berlin().isoformat()
 
+    # Buttons beim Rendern sammeln → Communication, Buttons & Inhalt in einer Transaktion
+    with collect_buttons() as buttons:
+        html_body = render_notification_html(
+            notification_data=payload,
+            base_url=base_url,
+            communication_uuid=communication_uuid,
+            email_message_id=email_message_id,
+        )
+
     try:
-        register_communication = getattr(tracking_db, "register_communication", None)
-        if callable(register_communication):
-            register_communication(
-                communication_uuid=communication_uuid,
-                email_message_id=email_message_id,
-                notification_type=notification_type,
-                sent_via="zapier",
-                recipient_email=recipient_email,
-                subject=subject,
-            )
+        registered = tracking_db.register_communication_with_buttons(
+            communication_uuid=communication_uuid,
+            email_message_id=email_message_id,
+            notification_type=notification_type,
+            sent_via="zapier",
+            recipient_email=recipient_email,
+            subject=subject,
+            buttons=buttons,
+            html_content=html_body,
+        )
+        if not registered:
+            logger.warning("Failed to record notification communication (%d buttons)", len(buttons))
     except Exception as exc:
         logger.warning("Failed to record notification communication: %s", exc)
 
-    html_body = render_notification_html(
-        notification_data=payload,
-        base_url=base_url,
-        communication_uuid=communication_uuid,
-        email_message_id=email_message_id,
-    )
-
     logger.info("Rendered notification (type=%s, uuid=%s)", notification_type, communication_uuid[:8])
     return html_body
 
@@ -269,11 +333,17 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
     ENHANCED: Spezielle Behandlung für unbekannte Kontakte
     """
     
-    ZAPIER_WEBHOOK_URL = "https://hooks.zapier.com/hooks/catch/17762912/u5ilur9/"
-    
     contact_match = processing_result.get("contact_match", {})
     contact_found = contact_match.get("found", False)
     
+    # 🔗 Fehlende Sharing Links der Anhänge gesammelt ergänzen (Registry + Graph $batch)
+    try:
+        await get_sharing_link_registry().fill_attachment_links(
+            ONEDRIVE_DOCUMENT_OWNER, processing_result.get("attachment_results") or [], get_graph_token_mail
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Sharing link registry error: {e}")
+    
     # 🆕 ENHANCED: Unknown Contact Notification (Zapier-compatible format)
     if not contact_found:
         # Check for potential matches from fuzzy search
@@ -419,7 +489,8 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 {
                     "filename": att.get("filename"),
                     "sharing_link": att.get("onedrive_sharing_link"),
-                    "web_url": att.get("onedrive_web_url")
+                    "web_url": att.get("onedrive_web_url"),
+                    "item_id": att.get("onedrive_file_id")
                 }
                 for att in processing_result.get("attachment_results", [])
                 if att.get("onedrive_sharing_link") or att.get("onedrive_web_url")
@@ -469,8 +540,11 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
         opportunity_stage = None
         opportunity_id = None
         contact_id = contact_match.get("contact_id")
+        # Leads (z.B. aus dem Phone Index) haben keine Party → eigene URL, keine Opportunities
+        is_lead = contact_match.get("contact_type") == "lead"
+        contact_url = f"https://cundd.weclapp.com/#/{'lead' if is_lead else 'party'}/show/{contact_id}"
         
-        if contact_id:
+        if contact_id and not is_lead:
             try:
                 from modules.crm.opportunity_status_handler import get_opportunity_by_contact
                 opportunity_data = get_opportunity_by_contact(contact_id)
@@ -510,7 +584,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "📅 TERMIN VEREINBAREN",
                 "description": "Terminvorschläge an Kunde senden und Aufmaß planen",
                 "color": "primary",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
         
         if not smart_actions and intent in ["quote_request", "price_inquiry", "preisanfrage", "angebot"]:
@@ -519,7 +593,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "💰 ANGEBOT ERSTELLEN",
                 "description": "Angebot in WeClapp erstellen und an Kunden senden",
                 "color": "success",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
         
         if not smart_actions and intent in ["question", "clarification", "nachfrage", "rückfrage"]:
@@ -528,7 +602,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "📞 KUNDE ANRUFEN",
                 "description": "Rückruf planen um Fragen zu klären",
                 "color": "info",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
         
         if not smart_actions and intent in ["order", "bestellung", "auftrag"]:
@@ -539,7 +613,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "✅ AUFTRAG ANLEGEN",
                 "description": "Kundenauftrag in WeClapp erstellen",
                 "color": "create",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
             
             smart_actions.append({
@@ -547,7 +621,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "📦 LIEFERANT BESTELLEN",
                 "description": "Material beim Lieferanten bestellen",
                 "color": "info",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
             
             smart_actions.append({
@@ -555,7 +629,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "📄 AB VERSENDEN",
                 "description": "Auftragsbestätigung an Kunden senden",
                 "color": "primary",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
             
             smart_actions.append({
@@ -563,7 +637,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "💶 ANZAHLUNGSRECHNUNG",
                 "description": "Anzahlungsrechnung erstellen (30-50%)",
                 "color": "success",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
             
             smart_actions.append({
@@ -571,7 +645,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "🔧 MONTAGE TERMINIEREN",
                 "description": "Montagetermin mit Kunde vereinbaren",
                 "color": "warning",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
         
         # Urgency-based action (zusätzlich zu stage/intent actions)
@@ -581,12 +655,12 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": "⚡ DRINGEND BEARBEITEN",
                 "description": "Hohe Priorität - Sofortige Bearbeitung erforderlich",
                 "color": "warning",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
         
         # Default: "IN CRM ÖFFNEN" nur hinzufügen wenn nicht schon vorhanden
         if not any(a.get("action") == "view_in_crm" for a in smart_actions):
-            opp_url = f"https://cundd.weclapp.com/#/salesOrder/show/{opportunity_id}" if opportunity_id else f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+            opp_url = f"https://cundd.weclapp.com/#/salesOrder/show/{opportunity_id}" if opportunity_id else contact_url
             smart_actions.append({
                 "action": "view_in_crm",
                 "label": "📋 IN CRM ÖFFNEN",
@@ -602,7 +676,7 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 "label": f"✓ {task.get('title', 'Task')}",
                 "description": task.get('description', ''),
                 "color": "secondary",
-                "url": f"https://cundd.weclapp.com/#/party/show/{contact_match.get('contact_id')}"
+                "url": contact_url
             })
         
         # Add feedback options
@@ -649,7 +723,8 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
                 {
                     "filename": att.get("filename"),
                     "sharing_link": att.get("onedrive_sharing_link"),
-                    "web_url": att.get("onedrive_web_url")
+                    "web_url": att.get("onedrive_web_url"),
+                    "item_id": att.get("onedrive_file_id")
                 }
                 for att in processing_result.get("attachment_results", [])
                 if att.get("onedrive_sharing_link") or att.get("onedrive_web_url")
@@ -689,18 +764,14 @@ async def send_final_notification(processing_result: Dict[str, Any], message_typ
         logger.info(f"🔍 DEBUG action_options count: {len(notification_data.get('action_options', []))}")
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                ZAPIER_WEBHOOK_URL,
-                json=notification_data,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"✅ Zapier notification sent successfully for {message_type}")
-                    return True
-                else:
-                    logger.warning(f"⚠️ Zapier notification failed - Status: {response.status}")
-                    return False
+        # 📬 Versand über Dispatcher: Anrufe/urgent sofort, Rest gebündelt pro Empfänger
+        priority = classify_priority(notification_data, message_type)
+        dispatched = await get_notification_dispatcher().dispatch(notification_data, priority=priority)
+        if dispatched:
+            logger.info(f"✅ Zapier notification dispatched for {message_type} (priority={priority})")
+        else:
+            logger.warning(f"⚠️ Zapier notification failed for {message_type}")
+        return dispatched
                     
     except Exception as e:
         logger.error(f"❌ Zapier notification error: {e}")
@@ -745,8 +816,6 @@ async def send_umsatzabgleich_notification(
     - Tägliche/Wöchentliche Reports
     """
     
-    ZAPIER_WEBHOOK_URL = "https://hooks.zapier.com/hooks/catch/17762912/u5ilur9/"
-    
     if not recipients:
         recipients = [
             "markus.cuntz@gmail.com",
@@ -831,18 +900,13 @@ async def send_umsatzabgleich_notification(
     }
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                ZAPIER_WEBHOOK_URL,
-                json=notification_data,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status == 200:
-                    logger.info(f"✅ Umsatzabgleich notification sent: {report_type}")
-                    return True
-                else:
-                    logger.warning(f"⚠️ Umsatzabgleich notification failed - Status: {response.status}")
-                    return False
+        # 🚨 critical → Fast Lane, daily → low (Digest-fähig)
+        dispatched = await get_notification_dispatcher().dispatch(notification_data, priority=priority)
+        if dispatched:
+            logger.info(f"✅ Umsatzabgleich notification dispatched: {report_type}")
+        else:
+            logger.warning(f"⚠️ Umsatzabgleich notification failed: {report_type}")
+        return dispatched
                     
     except Exception as e:
         logger.error(f"❌ Umsatzabgleich notification error: {e}")
@@ -914,81 +978,12 @@ def initialize_contact_cache():
     
     Nutzt die existierende email_data.db die von weclapp-sql-sync-production Actor gefüllt wird.
     MASTER PLAN: Erste Anlaufstelle vor WeClapp API Call!
-    """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS email_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        subject TEXT,
-        sender TEXT,
-        recipient TEXT,
-        received_date TEXT,
-        ocr_text TEXT,
-        gpt_result TEXT,
-        weclapp_contact_id TEXT,
-        weclapp_customer_id TEXT,
-        weclapp_opportunity_id TEXT,
-        current_stage TEXT,
-        gpt_status_suggestion TEXT,
-        status_deviation BOOLEAN,
-        remarks TEXT
-    )
-    """)
-    
-    # 🔧 MIGRATION: Add new columns if they don't exist (for old databases)
-    try:
-        # Check if message_type column exists
-        cursor.execute("PRAGMA table_info(email_data)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if "message_type" not in columns:
-            logger.info("🔧 MIGRATION: Adding new columns to email_data table...")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN message_type TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN direction TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN workflow_path TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN ai_intent TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN ai_urgency TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN ai_sentiment TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN attachments_count INTEGER DEFAULT 0")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN processing_timestamp TEXT")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN processing_duration_ms INTEGER")
-            cursor.execute("ALTER TABLE email_data ADD COLUMN price_estimate_json TEXT")
-            conn.commit()
-            logger.info("✅ MIGRATION: New columns added successfully")
-    except Exception as e:
-        logger.warning(f"⚠️ Migration warning (likely already applied): {e}")
-    
-    # Index für schnelle Email-Lookups
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_sender ON email_data(sender)
-    """)
     
-    # Create email_attachments table (for attachment tracking)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS email_attachments (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        email_message_id TEXT NOT NULL,
-        filename TEXT NOT NULL,
-        content_type TEXT,
-        size_bytes INTEGER,
-        file_hash TEXT,
-        ocr_text TEXT,
-        ocr_route TEXT,
-        onedrive_path TEXT,
-        onedrive_link TEXT,
-        processed_date TEXT NOT NULL
-    )
-    """)
-    
-    cursor.execute("""
-    CREATE INDEX IF NOT EXISTS idx_email_message_id ON email_attachments(email_message_id)
-    """)
-    
-    conn.commit()
-    conn.close()
-    logger.info("✅ Email Database initialized (email_data.db + email_attachments)")
+    Schema (email_data, email_attachments, FTS-Index, processed_documents, Indizes)
+    kommt aus den versionierten Migrationen in modules/database/schema_migrations.py.
+    """
+    status = run_migrations(DB_PATH, EMAIL_DATA_MIGRATIONS, component="email_data")
+    logger.info(f"✅ Email Database initialized (email_data.db schema v{status['version']})")
 
 
 async def lookup_contact_in_cache(email: str) -> Optional[Dict[str, Any]]:
@@ -1007,7 +1002,9 @@ async def lookup_contact_in_cache(email: str) -> Optional[Dict[str, Any]]:
         
         if result:
             logger.info(f"✅ CACHE HIT (email_data) for {email} - Contact ID: {result['weclapp_contact_id']}")
+            CONTACT_LOOKUPS.inc(tier="email_data", result="hit")
             return result
+        CONTACT_LOOKUPS.inc(tier="email_data", result="miss")
         
         # STEP 1b: Check WEClapp Sync DB (from Apify actor)
         logger.info(f"🔍 Checking WEClapp Sync DB for {email}...")
@@ -1019,6 +1016,7 @@ async def lookup_contact_in_cache(email: str) -> Optional[Dict[str, Any]]:
         
         if weclapp_contact:
             logger.info(f"✅ WECLAPP SYNC DB HIT for {email} - {weclapp_contact.get('name', 'Unknown')}")
+            CONTACT_LOOKUPS.inc(tier="weclapp_sync_db", result="hit")
             
             # Convert to expected format
             result = {
@@ -1036,6 +1034,7 @@ async def lookup_contact_in_cache(email: str) -> Optional[Dict[str, Any]]:
             return result
         
         logger.info(f"⚠️ CACHE MISS (all sources) for {email} - Will query WeClapp API")
+        CONTACT_LOOKUPS.inc(tier="weclapp_sync_db", result="miss")
         return None
             
     except Exception as e:
@@ -1114,6 +1113,14 @@ def _sync_cache_contact(email: str, weclapp_data: Dict[str, Any]):
 # DUPLIKATSPRÜFUNG & DOKUMENT-TRACKING
 # ===============================
 
+DOCUMENT_DUPLICATE_REASONS = {
+    KIND_DOCUMENT_MESSAGE: "message_id_match",
+    KIND_DOCUMENT_HASH: "document_hash_match",
+    KIND_ONEDRIVE_PATH: "onedrive_path_match",
+    KIND_HEURISTIC: "heuristic_match_24h",
+}
+
+
 async def check_document_duplicate(
     message_id: str = None,
     sender: str = None,
@@ -1152,11 +1159,13 @@ async def check_document_duplicate(
             logger.warning(f"⚠️ DUPLICATE: {result['duplicate_reason']}")
         else:
             logger.info(f"✅ No duplicate found - proceeding with processing")
+        DUPLICATE_CHECKS.inc(outcome=result.get("duplicate_reason") or "unique")
         
         return result
         
     except Exception as e:
         logger.error(f"❌ Duplicate check error: {e}")
+        DUPLICATE_CHECKS.inc(outcome="error")
         # Bei Fehler: Kein Duplikat annehmen (lieber verarbeiten)
         return {"is_duplicate": False, "error": str(e)}
 
@@ -1169,95 +1178,47 @@ def _check_duplicate_sync(
     document_hash: str,
     onedrive_path: str
 ) -> Dict[str, Any]:
-    """Synchronous duplicate check (runs in executor)"""
+    """
+    Synchronous duplicate check (runs in executor)
+    
+    Alle vier Kriterien laufen über den Duplicate Index: Bloom-Filter negativ →
+    kein SQLite, sonst eine Abfrage auf duplicate_keys; erst der bestätigte
+    Treffer (in Prioritätsreihenfolge) lädt den Datensatz aus processed_documents.
+    """
+    keys = [
+        (KIND_DOCUMENT_MESSAGE, message_id),
+        (KIND_DOCUMENT_HASH, document_hash),
+        (KIND_ONEDRIVE_PATH, onedrive_path),
+    ]
+    if sender and subject and attachment_filename:
+        keys.append((KIND_HEURISTIC, heuristic_key(sender, subject, attachment_filename)))
+    
+    matches = get_email_tracking_db().duplicate_index.check(keys, window_hours=24)
+    if not matches:
+        return {"is_duplicate": False}
+    
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     try:
-        # PRÜFUNG 1: message_id (100% sicher - Microsoft Graph ID)
-        if message_id:
-            cursor.execute("""
-            SELECT id, processing_timestamp, onedrive_link
-            FROM processed_documents
-            WHERE message_id = ?
-            LIMIT 1
-            """, (message_id,))
-            
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "is_duplicate": True,
-                    "duplicate_reason": "message_id_match",
-                    "original_record_id": row[0],
-                    "original_timestamp": row[1],
-                    "onedrive_link": row[2]
-                }
-        
-        # PRÜFUNG 2: document_hash (sehr sicher - SHA256 des PDFs)
-        if document_hash:
-            cursor.execute("""
-            SELECT id, processing_timestamp, onedrive_link
-            FROM processed_documents
-            WHERE document_hash = ?
-            LIMIT 1
-            """, (document_hash,))
-            
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "is_duplicate": True,
-                    "duplicate_reason": "document_hash_match",
-                    "original_record_id": row[0],
-                    "original_timestamp": row[1],
-                    "onedrive_link": row[2]
-                }
-        
-        # PRÜFUNG 3: onedrive_path (wenn bereits hochgeladen)
-        if onedrive_path:
-            cursor.execute("""
-            SELECT id, processing_timestamp, onedrive_link
-            FROM processed_documents
-            WHERE onedrive_path = ?
-            LIMIT 1
-            """, (onedrive_path,))
-            
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "is_duplicate": True,
-                    "duplicate_reason": "onedrive_path_match",
-                    "original_record_id": row[0],
-                    "original_timestamp": row[1],
-                    "onedrive_link": row[2]
-                }
+        match = matches[0]
+        cursor.execute("""
+        SELECT id, processing_timestamp, onedrive_link
+        FROM processed_documents
+        WHERE id = ?
+        """, (match["ref"],))
         
-        # PRÜFUNG 4: Heuristisch (sender + subject + filename + 24h)
-        if sender and subject and attachment_filename:
-            # Zeitfenster: 24 Stunden
-            time_24h_ago = (datetime.now(BERLIN_TZ) - timedelta(hours=24)).isoformat()
-            
-            cursor.execute("""
-            SELECT id, processing_timestamp, onedrive_link
-            FROM processed_documents
-            WHERE sender = ?
-              AND subject = ?
-              AND attachment_filename = ?
-              AND processing_timestamp > ?
-            LIMIT 1
-            """, (sender, subject, attachment_filename, time_24h_ago))
-            
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "is_duplicate": True,
-                    "duplicate_reason": "heuristic_match_24h",
-                    "original_record_id": row[0],
-                    "original_timestamp": row[1],
-                    "onedrive_link": row[2]
-                }
+        row = cursor.fetchone()
+        if not row:
+            return {"is_duplicate": False}
         
-        # KEIN DUPLIKAT GEFUNDEN
-        return {"is_duplicate": False}
+        return {
+            "is_duplicate": True,
+            "duplicate_reason": DOCUMENT_DUPLICATE_REASONS[match["kind"]],
+            "original_record_id": row[0],
+            "original_timestamp": row[1],
+            "onedrive_link": row[2]
+        }
         
     finally:
         conn.close()
@@ -1286,42 +1247,7 @@ def _save_processed_document_sync(
     cursor = conn.cursor()
     
     try:
-        # Tabelle erstellen falls nicht vorhanden
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS processed_documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            message_id TEXT UNIQUE,
-            sender TEXT,
-            subject TEXT,
-            attachment_filename TEXT,
-            document_hash TEXT UNIQUE,
-            document_type TEXT,
-            onedrive_path TEXT UNIQUE,
-            onedrive_link TEXT,
-            ordnerstruktur TEXT,
-            kunde TEXT,
-            lieferant TEXT,
-            summe TEXT,
-            processing_timestamp TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        
-        # CREATE INDEX wenn nicht vorhanden
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_message_id ON processed_documents(message_id)
-        """)
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_document_hash ON processed_documents(document_hash)
-        """)
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_onedrive_path ON processed_documents(onedrive_path)
-        """)
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_sender_subject_filename ON processed_documents(sender, subject, attachment_filename)
-        """)
-        
-        # INSERT
+        # INSERT (Tabelle + Indizes legt die Migration "processed_documents" beim Start an)
         cursor.execute("""
         INSERT INTO processed_documents (
             message_id, sender, subject, attachment_filename, document_hash,
@@ -1337,6 +1263,24 @@ def _save_processed_document_sync(
         record_id = cursor.lastrowid
         conn.commit()
         
+        # Dokument ist gespeichert - ein Fehler im Index darf das nicht mehr zurückdrehen
+        duplicate_index = get_email_tracking_db().duplicate_index
+        try:
+            duplicate_index.record([
+                (KIND_DOCUMENT_MESSAGE, message_id, str(record_id)),
+                (KIND_DOCUMENT_HASH, document_hash, str(record_id)),
+                (KIND_ONEDRIVE_PATH, onedrive_path, str(record_id)),
+                (KIND_HEURISTIC, heuristic_key(sender, subject, attachment_filename)
+                 if sender and subject and attachment_filename else None, str(record_id)),
+            ])
+        except Exception as index_error:
+            logger.warning(f"⚠️ Duplicate index record failed for document {record_id}: {index_error} - syncing from processed_documents")
+            try:
+                duplicate_index.sync_documents()
+            except Exception as sync_error:
+                # Watermark bleibt stehen → nächster rebuild() holt das Dokument nach
+                logger.error(f"❌ Duplicate index sync failed: {sync_error}")
+        
         logger.info(f"✅ Saved processed document: ID={record_id}, Type={document_type}, Path={onedrive_path}")
         return record_id
         
@@ -1400,6 +1344,7 @@ class ContactMatch:
     confidence: float = 0.0
     source: Optional[str] = None  # "cache", "weclapp", "apify", "manual"
     cache_hits: int = 0  # How many times this contact was found in cache
+    contact_type: Optional[str] = None  # "party" | "lead" (contact_id ist dann eine Lead-ID)
 
 @dataclass
 class AITask:
@@ -1423,7 +1368,7 @@ async def download_weclapp_db_from_onedrive(access_token_onedrive: str) -> Optio
     """
     logger.info("📥 Downloading WEClapp Sync DB from OneDrive...")
     
-    user_email = "mj@cdtechnologies.de"
+    user_email = WECLAPP_DB_ONEDRIVE_OWNER
     local_path = "/tmp/weclapp_sync.db"
     
     # Try multiple possible OneDrive locations
@@ -1441,7 +1386,7 @@ async def download_weclapp_db_from_onedrive(access_token_onedrive: str) -> Optio
     for try_path in possible_paths:
         logger.info(f"🔍 Trying OneDrive path: {try_path}")
         
-        download_url = f"https://graph.microsoft.com/v1.0/users/{user_email}/drive/root:{try_path}:/content"
+        download_url = f"{GRAPH_BASE_URL}/users/{user_email}/drive/root:{try_path}:/content"
         
         headers = {"Authorization": f"Bearer {access_token_onedrive}"}
         
@@ -1578,6 +1523,7 @@ async def ensure_weclapp_db_available() -> bool:
         if file_age_seconds < 3600:  # 1 hour
             logger.info(f"✅ WEClapp DB available (age: {file_age_seconds/60:.1f} min)")
             WECLAPP_DB_DOWNLOADED = True
+            await asyncio.get_event_loop().run_in_executor(None, get_phone_index().refresh)
             return True
         else:
             logger.info(f"🔄 WEClapp DB outdated (age: {file_age_seconds/3600:.1f} hours), re-downloading...")
@@ -1594,6 +1540,13 @@ async def ensure_weclapp_db_available() -> bool:
         if downloaded_path:
             WECLAPP_DB_DOWNLOADED = True
             logger.info("✅ WEClapp Sync DB successfully downloaded and ready")
+            await asyncio.get_event_loop().run_in_executor(None, get_phone_index().refresh)
+            try:
+                report = await asyncio.to_thread(get_weclapp_fallback_db().migrate, downloaded_path)
+                if not report.get("success"):
+                    logger.warning(f"⚠️ WEClapp Fallback refresh failed: {report.get('error')}")
+            except Exception as e:
+                logger.warning(f"⚠️ WEClapp Fallback refresh error: {e}")
             return True
         else:
             logger.warning("⚠️ WEClapp Sync DB download failed")
@@ -1673,12 +1626,13 @@ def _save_to_db_sync(processing_result, message_type, from_contact, content, fin
             subject, sender, recipient, received_date, gpt_result,
             message_type, direction, workflow_path,
             ai_intent, ai_urgency, ai_sentiment,
-            attachments_count, processing_timestamp
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            attachments_count, processing_timestamp,
+            message_id, body_text
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             ai_analysis.get("email_subject", content[:200]),
             from_contact,
-            "mj@cdtechnologies.de",
+            additional_data.get("mailbox") or get_mailbox_registry().primary,
             now_berlin().isoformat(),
             json.dumps(ai_analysis, ensure_ascii=False),
             message_type,
@@ -1688,7 +1642,9 @@ def _save_to_db_sync(processing_result, message_type, from_contact, content, fin
             ai_analysis.get("urgency"),
             ai_analysis.get("sentiment"),
             processing_result.get("attachments_count", 0),
-            now_berlin().isoformat()
+            now_berlin().isoformat(),
+            message_id or None,
+            (content or "")[:EMAIL_BODY_MAX_CHARS]
         ))
         
         email_id = cursor.lastrowid
@@ -1783,12 +1739,12 @@ class ProductionAIOrchestrator:
         workflow = StateGraph(CommunicationState)
         
         # Define workflow nodes
-        workflow.add_node("contact_lookup", self._contact_lookup_node)
-        workflow.add_node("ai_analysis", self._ai_analysis_node)
-        workflow.add_node("workflow_routing", self._workflow_routing_node)
-        workflow.add_node("weg_a_unknown_contact", self._weg_a_unknown_contact_node)
-        workflow.add_node("weg_b_known_contact", self._weg_b_known_contact_node)
-        workflow.add_node("finalize_processing", self._finalize_processing_node)
+        workflow.add_node("contact_lookup", trace_node("contact_lookup", self._contact_lookup_node))
+        workflow.add_node("ai_analysis", trace_node("ai_analysis", self._ai_analysis_node))
+        workflow.add_node("workflow_routing", trace_node("workflow_routing", self._workflow_routing_node))
+        workflow.add_node("weg_a_unknown_contact", trace_node("weg_a_unknown_contact", self._weg_a_unknown_contact_node))
+        workflow.add_node("weg_b_known_contact", trace_node("weg_b_known_contact", self._weg_b_known_contact_node))
+        workflow.add_node("finalize_processing", trace_node("finalize_processing", self._finalize_processing_node))
         
         # Define workflow edges
         workflow.set_entry_point("contact_lookup")
@@ -1856,7 +1812,8 @@ class ProductionAIOrchestrator:
                 "contact_name": getattr(contact_match, "contact_name", None),
                 "company": getattr(contact_match, "company", None),
                 "confidence": getattr(contact_match, "confidence", 0.0),
-                "source": getattr(contact_match, "source", "unknown")
+                "source": getattr(contact_match, "source", "unknown"),
+                "contact_type": getattr(contact_match, "contact_type", None)
             }
             
             logger.info(f"✅ Contact match result: {contact_match.found} ({contact_match.source})")
@@ -2043,6 +2000,15 @@ class ProductionAIOrchestrator:
         
         return state
     
+    def _call_transcript(self, state: CommunicationState):
+        """Normalisiertes CallTranscript aus dem State (Fallback: content-String)"""
+        transcript_data = (state.get("additional_data") or {}).get("call_transcript")
+        if isinstance(transcript_data, dict):
+            transcript = CallTranscript.from_dict(transcript_data)
+            if not transcript.is_empty:
+                return transcript
+        return state.get('content', '')
+    
     def _route_workflow_condition(self, state: CommunicationState) -> str:
         """Conditional edge function for workflow routing"""
         return state["workflow_path"]
@@ -2060,7 +2026,7 @@ class ProductionAIOrchestrator:
                     
                     # Run estimate calculation
                     estimate = calculate_estimate_from_transcript(
-                        transcript=state.get('content', ''),
+                        transcript=self._call_transcript(state),
                         caller_info={
                             "name": None,  # Unknown contact
                             "company": None
@@ -2242,86 +2208,95 @@ class ProductionAIOrchestrator:
                 cache_hits=cached_contact.get("cache_hits", 0)
             )
         
+        # STEP 1b: Phone → lokaler E.164 Index aus WeClapp Sync-DB (kein HTTP)
+        phone_e164 = normalize_phone_e164(contact_identifier) if looks_like_phone(contact_identifier) else None
+        if phone_e164:
+            indexed = get_phone_index().lookup_exact(phone_e164)
+            CONTACT_LOOKUPS.inc(tier="phone_index", result="hit" if indexed else "miss")
+            if indexed:
+                # Party vor Lead: nur Party-IDs taugen als contact_id für Opportunities/Links
+                entry = next((e for e in indexed if e["entity_type"] == "party"), indexed[0])
+                logger.info(f"📇 Phone index match: {phone_e164} → {entry.get('contact_name')} ({entry['entity_type']} {entry['contact_id']})")
+                return ContactMatch(
+                    found=True,
+                    contact_id=entry["contact_id"],
+                    contact_name=entry.get("contact_name"),
+                    company=entry.get("company"),
+                    confidence=1.0,
+                    source="phone_index",
+                    contact_type=entry["entity_type"]
+                )
+        
         # STEP 2: Cache Miss - Query WeClapp API
         if not self.weclapp_api_token:
             logger.warning("⚠️ WeClapp API token not configured")
+            CONTACT_LOOKUPS.inc(tier="weclapp_api", result="unavailable")
             return ContactMatch(found=False, source="weclapp_unavailable")
         
         try:
             logger.info(f"🔎 Cache Miss - Querying WeClapp for: {contact_identifier}")
             
             # WeClapp API Call with EMAIL FILTER for exact match
-            headers = {
-                "AuthenticationToken": self.weclapp_api_token,
-                "Accept": "application/json"
-            }
-            
             # Determine if contact_identifier is EMAIL or PHONE
-            is_phone = contact_identifier.startswith("+") or contact_identifier.isdigit()
+            is_phone = bool(phone_e164) or contact_identifier.startswith("+") or contact_identifier.isdigit()
             
             # Filter by exact email or phone match using WeClapp API
             if is_phone:
-                # Phone number search (try multiple formats)
+                # Phone number search (E.164 normalized when possible)
                 search_params = {
-                    "phone-eq": contact_identifier,
+                    "phone-eq": phone_e164 or contact_identifier,
                     "serializationConfiguration": "IGNORE_EMPTY",
-                    "pageSize": 5  # Get multiple results for phone (may match different formats)
                 }
+                limit = 5  # Get multiple results for phone (may match different formats)
                 logger.info(f"🔍 Searching by PHONE: {contact_identifier}")
             else:
                 # Email search
                 search_params = {
                     "email-eq": contact_identifier.lower(),
                     "serializationConfiguration": "IGNORE_EMPTY",
-                    "pageSize": 1  # Only need 1 result for exact match
                 }
+                limit = 1  # Only need 1 result for exact match
                 logger.info(f"🔍 Searching by EMAIL: {contact_identifier}")
             
-            url = f"https://{self.weclapp_domain}.weclapp.com/webapp/api/v1/contact"
-            logger.info(f"📞 WeClapp URL: {url} with filter: {search_params}")
+            logger.info(f"📞 WeClapp contact filter: {search_params}")
+            contacts = await get_weclapp_client().list(
+                "contact", search_params, properties=WECLAPP_CONTACT_PROPERTIES, limit=limit
+            )
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=search_params) as response:
-                    logger.info(f"📬 WeClapp Response Status: {response.status}")
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        contacts = data.get("result", [])
-                        
-                        if len(contacts) > 0:
-                            # Exact match found via WeClapp email filter
-                            contact = contacts[0]
-                            contact_name = f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip()
-                            company_name = contact.get("company", {}).get("name") if contact.get("company") else None
-                            
-                            logger.info(f"✅ EXACT MATCH FOUND in WeClapp: {contact_name} (ID: {contact.get('id')})")
-                            
-                            # STEP 3: Cache the result for future lookups
-                            await cache_contact(contact_identifier, {
-                                "weclapp_contact_id": str(contact.get("id")),
-                                "weclapp_customer_id": str(contact.get("customerId")) if contact.get("customerId") else None,
-                                "contact_name": contact_name,
-                                "company_name": company_name,
-                                "phone": contact.get("phone")
-                            })
-                            
-                            return ContactMatch(
-                                found=True,
-                                contact_id=str(contact.get("id")),
-                                contact_name=contact_name,
-                                company=company_name,
-                                confidence=1.0,
-                                source="weclapp"
-                            )
-                        else:
-                            logger.warning(f"❌ No match found in WeClapp for: {contact_identifier}")
-                    else:
-                        logger.error(f"❌ WeClapp API returned status {response.status}")
+            if len(contacts) > 0:
+                # Exact match found via WeClapp email filter
+                contact = contacts[0]
+                contact_name = f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip()
+                company_name = contact.get("company", {}).get("name") if isinstance(contact.get("company"), dict) else contact.get("company")
+                
+                logger.info(f"✅ EXACT MATCH FOUND in WeClapp: {contact_name} (ID: {contact.get('id')})")
+                
+                # STEP 3: Cache the result for future lookups
+                await cache_contact(contact_identifier, {
+                    "weclapp_contact_id": str(contact.get("id")),
+                    "weclapp_customer_id": str(contact.get("customerId")) if contact.get("customerId") else None,
+                    "contact_name": contact_name,
+                    "company_name": company_name,
+                    "phone": contact.get("phone")
+                })
+                
+                CONTACT_LOOKUPS.inc(tier="weclapp_api", result="hit")
+                return ContactMatch(
+                    found=True,
+                    contact_id=str(contact.get("id")),
+                    contact_name=contact_name,
+                    company=company_name,
+                    confidence=1.0,
+                    source="weclapp"
+                )
             
+            logger.warning(f"❌ No match found in WeClapp for: {contact_identifier}")
+            CONTACT_LOOKUPS.inc(tier="weclapp_api", result="miss")
             return ContactMatch(found=False, source="weclapp")
             
         except Exception as e:
             logger.error(f"❌ WeClapp search exception: {e}")
+            CONTACT_LOOKUPS.inc(tier="weclapp_api", result="error")
             return ContactMatch(found=False, source="weclapp_error")
     
     async def _search_apify_contact(self, contact_identifier: str) -> ContactMatch:
@@ -2344,74 +2319,85 @@ class ProductionAIOrchestrator:
         
         potential_matches = []
         
+        # 0. LOKALER PHONE INDEX (gleicher Nummernstamm, andere Durchwahl)
+        if looks_like_phone(contact_identifier):
+            similar = get_phone_index().lookup_similar(contact_identifier)
+            for number, entry in similar:
+                potential_matches.append({
+                    "match_type": "phone_prefix",
+                    "confidence": 0.7,
+                    "contact_id": entry["contact_id"],
+                    "contact_type": entry["entity_type"],
+                    "contact_name": entry.get("contact_name") or "",
+                    "company": entry.get("company"),
+                    "existing_identifier": number,
+                    "reason": f"Ähnliche Nummer ({number})"
+                })
+            if potential_matches:
+                logger.info(f"📇 Fuzzy via phone index: {len(potential_matches)} matches")
+                return potential_matches[:3]
+        
         if not self.weclapp_api_token:
             return potential_matches
         
         try:
-            headers = {
-                "AuthenticationToken": self.weclapp_api_token,
-                "Accept": "application/json"
-            }
+            client = get_weclapp_client()
             
             # 1. DOMAIN-SUCHE (Email)
             if "@" in contact_identifier:
                 domain = contact_identifier.split("@")[1]
                 logger.info(f"🔍 Fuzzy: domain @{domain}")
                 
-                url = f"https://{self.weclapp_domain}.weclapp.com/webapp/api/v1/party"
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=headers, params={"email-like": f"%@{domain}", "pageSize": 5}) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            for contact in data.get("result", []):
-                                if contact.get("email", "").lower() != contact_identifier.lower():
-                                    # Safely extract company name (can be string or dict)
-                                    company_data = contact.get("company")
-                                    company_name = None
-                                    if isinstance(company_data, dict):
-                                        company_name = company_data.get("name")
-                                    elif isinstance(company_data, str):
-                                        company_name = company_data
-                                    
-                                    potential_matches.append({
-                                        "match_type": "domain",
-                                        "confidence": 0.8,
-                                        "contact_id": str(contact.get("id")),
-                                        "contact_name": f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip(),
-                                        "company": company_name,
-                                        "existing_identifier": contact.get("email"),
-                                        "reason": f"Gleiche Firma (@{domain})"
-                                    })
+                parties = await client.list(
+                    "party", {"email-like": f"%@{domain}"}, properties=WECLAPP_CONTACT_PROPERTIES, limit=5
+                )
+                for contact in parties:
+                    if contact.get("email", "").lower() != contact_identifier.lower():
+                        # Safely extract company name (can be string or dict)
+                        company_data = contact.get("company")
+                        company_name = None
+                        if isinstance(company_data, dict):
+                            company_name = company_data.get("name")
+                        elif isinstance(company_data, str):
+                            company_name = company_data
+                        
+                        potential_matches.append({
+                            "match_type": "domain",
+                            "confidence": 0.8,
+                            "contact_id": str(contact.get("id")),
+                            "contact_name": f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip(),
+                            "company": company_name,
+                            "existing_identifier": contact.get("email"),
+                            "reason": f"Gleiche Firma (@{domain})"
+                        })
             
             # 2. TELEFON-PREFIX
             elif contact_identifier.startswith("+") and len(contact_identifier) >= 8:
-                prefix = contact_identifier[:8]
+                prefix = (normalize_phone_e164(contact_identifier) or contact_identifier)[:8]
                 logger.info(f"🔍 Fuzzy: phone {prefix}*")
                 
-                url = f"https://{self.weclapp_domain}.weclapp.com/webapp/api/v1/party"
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=headers, params={"phone-like": f"{prefix}%", "pageSize": 5}) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            for contact in data.get("result", []):
-                                if contact.get("phone") and contact.get("phone") != contact_identifier:
-                                    # Safely extract company name (can be string or dict)
-                                    company_data = contact.get("company")
-                                    company_name = None
-                                    if isinstance(company_data, dict):
-                                        company_name = company_data.get("name")
-                                    elif isinstance(company_data, str):
-                                        company_name = company_data
-                                    
-                                    potential_matches.append({
-                                        "match_type": "phone_prefix",
-                                        "confidence": 0.7,
-                                        "contact_id": str(contact.get("id")),
-                                        "contact_name": f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip(),
-                                        "company": company_name,
-                                        "existing_identifier": contact.get("phone"),
-                                        "reason": f"Ähnliche Nummer ({contact.get('phone')})"
-                                    })
+                parties = await client.list(
+                    "party", {"phone-like": f"{prefix}%"}, properties=WECLAPP_CONTACT_PROPERTIES, limit=5
+                )
+                for contact in parties:
+                    if contact.get("phone") and contact.get("phone") != contact_identifier:
+                        # Safely extract company name (can be string or dict)
+                        company_data = contact.get("company")
+                        company_name = None
+                        if isinstance(company_data, dict):
+                            company_name = company_data.get("name")
+                        elif isinstance(company_data, str):
+                            company_name = company_data
+                        
+                        potential_matches.append({
+                            "match_type": "phone_prefix",
+                            "confidence": 0.7,
+                            "contact_id": str(contact.get("id")),
+                            "contact_name": f"{contact.get('firstName', '')} {contact.get('lastName', '')}".strip(),
+                            "company": company_name,
+                            "existing_identifier": contact.get("phone"),
+                            "reason": f"Ähnliche Nummer ({contact.get('phone')})"
+                        })
             
             # Limit to top 3
             potential_matches = sorted(potential_matches, key=lambda x: x["confidence"], reverse=True)[:3]
@@ -2563,7 +2549,7 @@ class ProductionAIOrchestrator:
                     
                     logger.info(f"🎯 Analyzing call transcript for tasks/appointments...")
                     call_analysis = await analyze_call_content(
-                        transcription=state.get('content', ''),
+                        transcription=self._call_transcript(state),
                         contact_name=contact_name,
                         duration_seconds=call_duration
                     )
@@ -2619,7 +2605,7 @@ class ProductionAIOrchestrator:
                     
                     # Run estimate calculation
                     estimate = calculate_estimate_from_transcript(
-                        transcript=state.get('content', ''),
+                        transcript=self._call_transcript(state),
                         caller_info={
                             "name": contact_match.get("name") if contact_match else None,
                             "company": contact_match.get("company") if contact_match else None
@@ -2704,26 +2690,15 @@ class ProductionAIOrchestrator:
                 "eventDate": int(now_berlin().timestamp() * 1000)  # Unix timestamp in milliseconds
             }
             
-            headers = {
-                "AuthenticationToken": self.weclapp_api_token,
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            
-            url = f"https://{self.weclapp_domain}.weclapp.com/webapp/api/v1/crmEvent"
-            
             logger.info(f"📤 Creating WeClapp crmEvent: {subject}")
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=crm_event_data) as response:
-                    if response.status == 201:
-                        crm_event = await response.json()
-                        logger.info(f"✅ WeClapp crmEvent created: ID {crm_event.get('id')}")
-                        return crm_event
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ WeClapp crmEvent creation failed: {response.status} - {error_text}")
-                        return None
+            try:
+                crm_event = await get_weclapp_client().post("crmEvent", json=crm_event_data)
+            except WeClappError as e:
+                logger.error(f"❌ WeClapp crmEvent creation failed: {e.status_code} - {e.body}")
+                return None
+            logger.info(f"✅ WeClapp crmEvent created: ID {crm_event.get('id')}")
+            return crm_event
         
         except Exception as e:
             logger.error(f"❌ WeClapp Communication Log error: {str(e)}")
@@ -2850,6 +2825,7 @@ Antworten Sie mit den erforderlichen Kontakt-Details oder markieren Sie als "Pri
     # MAIN PROCESSING METHOD
     # ===============================
     
+    @traced("workflow", channel_param="message_type")
     async def process_communication(self, 
                                   message_type: str,
                                   from_contact: str,
@@ -2858,6 +2834,8 @@ Antworten Sie mit den erforderlichen Kontakt-Details oder markieren Sie als "Pri
         """Main processing method - executes the LangGraph workflow"""
         
         logger.info(f"🚀 Processing {message_type} from {from_contact}")
+        if additional_data:
+            annotate_trace(additional_data.get("message_id") or additional_data.get("call_id") or additional_data.get("id"))
         
         # Initialize state
         initial_state = CommunicationState(
@@ -3048,7 +3026,8 @@ Antworten Sie mit den erforderlichen Kontakt-Details oder markieren Sie als "Pri
                 # Try to get recent opportunities or projects
                 try:
                     # Check for recent opportunities in WeClapp
-                    recent_projects = await self._get_recent_opportunities(contact_match.contact_id)
+                    recent_projects = await self._get_recent_opportunities(contact_match.contact_id) \
+                        if contact_match.contact_type != "lead" else []
                     
                     if recent_projects:
                         prompts.append("📋 Aktuelle Projekte:")
@@ -3120,40 +3099,37 @@ Antworten Sie mit den erforderlichen Kontakt-Details oder markieren Sie als "Pri
             return "💬 Standard-Gesprächsführung: Höflich nachfragen, Bedarf ermitteln, Kontaktdaten erfassen."
 
     async def _get_recent_opportunities(self, contact_id: str) -> List[Dict]:
-        """Get recent opportunities for a contact from WeClapp"""
+        """Get recent opportunities for a contact from WeClapp (lokaler Mirror, API nur beim Kaltstart)"""
+        try:
+            mirror = get_opportunity_mirror()
+            if mirror.is_ready():
+                return [{
+                    "title": (opp.get("opportunityNumber") or "") + " - " + (opp.get("name") or "Unbenannt"),
+                    "status": (opp.get("opportunityStage") or {}).get("name") or opp.get("salesStage") or "Unbekannt",
+                    "amount": opp.get("amount"),
+                    "probability": opp.get("probability")
+                } for opp in mirror.get_recent_opportunities(contact_id, limit=5)]
+        except Exception as e:
+            logger.warning(f"⚠️ Opportunity mirror unavailable, falling back to WeClapp API: {e}")
+        
         try:
-            weclapp_token = os.getenv("WECLAPP_API_TOKEN")
-            if not weclapp_token:
+            client = get_weclapp_client()
+            if not client.configured:
                 return []
             
-            headers = {
-                "Authorization": f"Bearer {weclapp_token}",
-                "Content-Type": "application/json"
-            }
-            
             # Query WeClapp for opportunities
-            async with aiohttp.ClientSession() as session:
-                url = "https://cundd.weclapp.com/webapp/api/v1/opportunity"
-                params = {
-                    "contactId-eq": contact_id,
-                    "pageSize": 5,
-                    "orderBy": "lastModifiedDate",
-                    "orderDirection": "desc"
-                }
-                
-                async with session.get(url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        opportunities = data.get("result", [])
-                        
-                        return [{
-                            "title": opp.get("opportunityNumber", "") + " - " + (opp.get("name", "") or "Unbenannt"),
-                            "status": opp.get("opportunityStage", {}).get("name", "Unbekannt"),
-                            "amount": opp.get("amount"),
-                            "probability": opp.get("probability")
-                        } for opp in opportunities]
-                    
-            return []
+            opportunities = await client.list("opportunity", {
+                "contactId-eq": contact_id,
+                "orderBy": "lastModifiedDate",
+                "orderDirection": "desc"
+            }, properties=WECLAPP_OPPORTUNITY_PROPERTIES, limit=5)
+            
+            return [{
+                "title": opp.get("opportunityNumber", "") + " - " + (opp.get("name", "") or "Unbenannt"),
+                "status": opp.get("opportunityStage", {}).get("name", "Unbekannt"),
+                "amount": opp.get("amount"),
+                "probability": opp.get("probability")
+            } for opp in opportunities]
         except Exception as e:
             logger.error(f"❌ Error fetching opportunities: {e}")
             return []
@@ -3175,12 +3151,129 @@ from intelligent_invoice_integration import (
     initialize_invoice_database
 )
 
+# ===============================
+# ⏰ SCHEDULED JOBS & TASK QUEUE
+# ===============================
+
+async def refresh_weclapp_db_job():
+    """Erzwingt den Alters-Check der WEClapp Sync-DB (Download wenn > 1h alt)"""
+    global WECLAPP_DB_DOWNLOADED
+    WECLAPP_DB_DOWNLOADED = False
+    if not await ensure_weclapp_db_available():
+        raise RuntimeError("WEClapp Sync DB not available")
+
+
+async def auto_match_job():
+    """Automatischer Abgleich Bankumsätze ↔ Rechnungen (Payment Tracking + Invoice DB)"""
+    from modules.database.payment_matching import auto_match_all_transactions
+    from intelligent_invoice_integration import match_bank_transactions
+    
+    stats = await asyncio.get_event_loop().run_in_executor(None, auto_match_all_transactions)
+    matches = await match_bank_transactions()
+    logger.info(f"🎯 Auto-match job: payment tracking {stats}, invoice DB {len(matches)} matches")
+
+
+async def fahrtenbuch_sync_job():
+    """PAJ GPS Routen der letzten 2 Tage ins Fahrtenbuch übernehmen"""
+    from modules.fahrtenbuch.trip_sync import sync_paj_trips
+    await sync_paj_trips(days_back=2)
+
+
+async def trace_retention_job():
+    """Alte Tracing-Spans aus SQLite entfernen"""
+    get_tracer().purge()
+
+
+async def opportunity_mirror_sync_job():
+    """Inkrementeller Sync des lokalen Opportunity Mirrors (lastModifiedDate-Watermark)"""
+    await get_opportunity_mirror().sync()
+
+
+async def opportunity_mirror_full_sync_job():
+    """Voller Abgleich des Opportunity Mirrors inkl. in WeClapp gelöschter Opportunities"""
+    await get_opportunity_mirror().sync(full=True)
+
+
+async def action_button_sweeper_job():
+    """Abgelaufene Action Buttons deaktivieren und nach action_buttons_archive verschieben"""
+    result = await asyncio.to_thread(get_email_tracking_db().sweep_expired_buttons)
+    logger.info(f"🧹 Action button sweep: {result['deactivated']} deactivated, {result['archived']} archived")
+
+
+async def db_snapshot_job():
+    """Snapshots der /tmp Datenbanken in den persistenten Store (unveränderte werden übersprungen)"""
+    results = await get_snapshot_manager().snapshot_all()
+    saved = [r["name"] for r in results if r["status"] == "saved"]
+    if saved:
+        logger.info(f"💾 DB snapshots saved: {saved}")
+
+
+async def graph_subscriptions_job():
+    """Graph Subscriptions der Postfächer anlegen bzw. vor Ablauf verlängern"""
+    await get_graph_ingestion().ensure_subscriptions()
+
+
+async def graph_delta_sync_job():
+    """Sicherheitsnetz: Delta-Sync aller Postfächer, falls Notifications verloren gingen"""
+    await get_graph_ingestion().sync_all()
+
+
+# name → (cron Europe/Berlin, job)
+SCHEDULED_JOBS = {
+    "umsatzabgleich_alerts": (os.getenv("CRON_UMSATZABGLEICH_ALERTS", "0 7 * * *"), check_and_send_umsatzabgleich_alerts),
+    "weclapp_db_refresh": (os.getenv("CRON_WECLAPP_DB_REFRESH", "5 * * * *"), refresh_weclapp_db_job),
+    "auto_match": (os.getenv("CRON_AUTO_MATCH", "*/30 6-22 * * *"), auto_match_job),
+    "fahrtenbuch_sync": (os.getenv("CRON_FAHRTENBUCH_SYNC", "30 */2 * * *"), fahrtenbuch_sync_job),
+    "opportunity_mirror_sync": (os.getenv("CRON_OPPORTUNITY_MIRROR_SYNC", "*/5 * * * *"), opportunity_mirror_sync_job),
+    "opportunity_mirror_full_sync": (os.getenv("CRON_OPPORTUNITY_MIRROR_FULL_SYNC", "20 3 * * *"), opportunity_mirror_full_sync_job),
+    "trace_retention": (os.getenv("CRON_TRACE_RETENTION", "40 3 * * *"), trace_retention_job),
+    "action_button_sweeper": (os.getenv("CRON_ACTION_BUTTON_SWEEPER", "50 * * * *"), action_button_sweeper_job),
+    "db_snapshots": (os.getenv("CRON_DB_SNAPSHOTS", "*/15 * * * *"), db_snapshot_job),
+    "graph_subscriptions": (os.getenv("CRON_GRAPH_SUBSCRIPTIONS", "10 * * * *"), graph_subscriptions_job),
+    "graph_delta_sync": (os.getenv("CRON_GRAPH_DELTA_SYNC", "*/15 * * * *"), graph_delta_sync_job),
+}
+
+
+async def execute_queued_task(task: Dict[str, Any]):
+    """
+    📋 Default-Handler für fällige task_queue Einträge (z.B. aus handle_assign_task):
+    Erinnerung an den zugewiesenen Mitarbeiter über den Notification Dispatcher
+    """
+    task_data = task.get("task_data") or {}
+    assign_to = task_data.get("assign_to") or "mj@cdtechnologies.de"
+    subject = f"📋 Aufgabe fällig: {task['task_type']}"
+    
+    dispatched = await get_notification_dispatcher().dispatch({
+        "notification_type": "task_reminder",
+        "subject": subject,
+        "notification_subject": subject,
+        "email_subject": subject,
+        "priority": "high" if task.get("priority", 5) >= 8 else "medium",
+        "to": assign_to,
+        "responsible_employee": assign_to,
+        "summary": f"Aufgabe '{task['task_type']}' ist seit {task['execute_after']} fällig",
+        "email_message_id": task.get("email_message_id"),
+        "task_uuid": task["task_uuid"],
+        "task_data": task_data,
+        "timestamp": now_berlin().isoformat()
+    })
+    if not dispatched:
+        raise RuntimeError("Task reminder notification could not be sent")
+
+
 # FastAPI App with startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for FastAPI application"""
     # STARTUP
     logger.info("🚀 Starting AI Communication Orchestrator...")
+    
+    # /tmp Datenbanken aus dem letzten Snapshot wiederherstellen (parallel, vor dem ersten Request)
+    try:
+        await get_snapshot_manager().restore_all()
+    except Exception as e:
+        logger.error(f"❌ Snapshot restore error: {e}")
+    
     logger.info("📥 Downloading WEClapp Sync Database from OneDrive...")
     
     try:
@@ -3200,12 +3293,70 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Invoice database initialization error: {e}")
     
+    # Postfächer registrieren (Email-Pool der Admission Control = Summe der Postfach-Pools)
+    mailbox_registry = get_mailbox_registry()
+    logger.info(f"📬 Mailboxes: {', '.join(mailbox_registry.addresses)} (email pool {mailbox_registry.total_concurrency})")
+    
+    # Start Zapier notification dispatcher (batching, retries, rate limit)
+    try:
+        await get_notification_dispatcher().start()
+    except Exception as e:
+        logger.error(f"❌ Notification dispatcher start error: {e}")
+    
+    # Start scheduler (cron jobs + task_queue worker)
+    try:
+        scheduler = get_job_scheduler()
+        for job_name, (cron, job) in SCHEDULED_JOBS.items():
+            scheduler.add_job(job_name, cron, job)
+        scheduler.set_task_source(get_email_tracking_db(), default_handler=execute_queued_task)
+        await scheduler.start()
+    except Exception as e:
+        logger.error(f"❌ Scheduler start error: {e}")
+    
+    # Native Email-Ingestion (Graph Subscriptions + Delta): verpasste Emails seit dem letzten Lauf nachholen
+    graph_ingestion = get_graph_ingestion()
+    graph_ingestion.configure(
+        token_provider=get_graph_token_mail,
+        dispatch=ingest_graph_message,
+        notification_url=f"{get_orchestrator_base_url()}/webhook/graph/notifications",
+        lifecycle_url=f"{get_orchestrator_base_url()}/webhook/graph/lifecycle",
+    )
+    if graph_ingestion.enabled:
+        logger.info(f"📡 Graph ingestion enabled: {', '.join(graph_ingestion.registry.configured_addresses)}")
+        get_task_registry().spawn(graph_ingestion.sync_all(), name="graph-delta:startup")
+        get_task_registry().spawn(graph_ingestion.ensure_subscriptions(), name="graph-subscriptions:startup")
+    
     logger.info("✅ AI Communication Orchestrator ready!")
     
     yield  # Server is running
     
     # SHUTDOWN
     logger.info("👋 Shutting down AI Communication Orchestrator...")
+    
+    # Keine neuen Delta-Syncs mehr anstoßen
+    await get_graph_ingestion().stop()
+    
+    # Stop scheduler, wait for running jobs and background email tasks
+    try:
+        await get_job_scheduler().stop()
+    except Exception as e:
+        logger.error(f"❌ Scheduler stop error: {e}")
+    
+    # Flush pending notifications before exit
+    try:
+        await get_notification_dispatcher().stop()
+    except Exception as e:
+        logger.error(f"❌ Notification dispatcher stop error: {e}")
+    
+    # Letzter Snapshot vor dem Redeploy (nur geänderte Datenbanken)
+    try:
+        await get_snapshot_manager().snapshot_all()
+    except Exception as e:
+        logger.error(f"❌ Shutdown snapshot error: {e}")
+    
+    await close_shared_client()
+    await get_weclapp_client().aclose()
+    get_tracer().flush()
 
 app = FastAPI(
     title="AI Communication Orchestrator",
@@ -3223,6 +3374,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Webhook path → Kanal für Metriken
+WEBHOOK_METRIC_CHANNELS = {
+    "/webhook/ai-email": "email",
+    "/webhook/ai-email/incoming": "email",
+    "/webhook/ai-email/outgoing": "email_outgoing",
+    "/webhook/ai-call": "call",
+    "/webhook/frontdesk": "frontdesk",
+    "/webhook/ai-whatsapp": "whatsapp",
+    "/webhook/graph/notifications": "email_graph",
+}
+
+@app.middleware("http")
+async def webhook_metrics_middleware(request: Request, call_next):
+    """📈 Webhook-Requests je Kanal/Status und Antwortzeit"""
+    channel = WEBHOOK_METRIC_CHANNELS.get(request.url.path.rstrip("/"))
+    if channel is None:
+        return await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        WEBHOOK_REQUESTS.inc(channel=channel, status=status)
+        WEBHOOK_DURATION.observe(time.perf_counter() - started, channel=channel)
+
 # Include Intelligent Invoice Management Router
 app.include_router(invoice_router)
 
@@ -3240,6 +3418,7 @@ async def root():
             "/webhook/ai-email (deprecated - use /incoming or /outgoing)",
             "/webhook/ai-email/incoming",
             "/webhook/ai-email/outgoing",
+            "/webhook/graph/notifications (Graph change notifications)",
             "/webhook/ai-email/test (test with JSON attachments)",
             "/webhook/ai-call",
             "/webhook/frontdesk",
@@ -3368,6 +3547,84 @@ async def process_email_test(request: Request):
             content={"status": "error", "error": str(e), "test_mode": True}
         )
 
+def admission_rejected_response(e: AdmissionRejected) -> JSONResponse:
+    """🚦 Load Shedding: 429 mit Retry-After, damit Zapier/Sipgate später erneut zustellen"""
+    return JSONResponse(
+        status_code=429,
+        content={"status": "rejected", "reason": "overloaded", "channel": e.channel, "retry_after": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def admit_email(user_email: str, priority: str):
+    """
+    Email-Ticket in der Warteschlange des Postfachs (fair zwischen Postfächern);
+    dringende Emails vor Bulk, aber weiterhin hinter Anrufen
+    """
+    return get_mailbox_registry().admit(
+        user_email,
+        priority=PRIORITY_NORMAL if priority in ("high", "urgent") else None
+    )
+
+
+def ingest_graph_message(mailbox: str, direction: str, message: Dict[str, Any]):
+    """
+    📥 Neue Email aus dem Graph Delta-Sync → Warteschlange des Postfachs
+    (gleicher Weg wie der Zapier-Webhook; AdmissionRejected geht an den Sync zurück)
+    """
+    message_id = message["id"]
+    sender = (message.get("from") or {}).get("emailAddress") or {}
+    priority = "high" if message.get("importance") == "high" else "medium"
+    data = {
+        "message_id": message_id,
+        "user_email": mailbox,
+        "from": sender.get("address", ""),
+        "subject": message.get("subject") or "",
+        "received_date": message.get("receivedDateTime"),
+        "email_direction": direction,
+        "priority": priority,
+        "source": "graph_delta",
+    }
+    ticket = admit_email(mailbox, priority)
+    spawn_with_ticket(ticket, process_email_background(
+        data, message_id, mailbox,
+        priority=priority
+    ), name=f"email-{direction}:{message_id}")
+
+
+@app.post("/webhook/graph/notifications")
+async def graph_change_notifications(request: Request):
+    """
+    📡 MICROSOFT GRAPH CHANGE NOTIFICATIONS (neue Emails)
+    
+    - Subscription-Validierung: ?validationToken=... → Token als text/plain
+    - Notifications: clientState prüfen → Delta-Sync des Ordners anstoßen, sofort 202
+    """
+    validation_token = request.query_params.get("validationToken")
+    if validation_token is not None:
+        return PlainTextResponse(validation_token)
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"status": "error", "error": "invalid json"})
+    return JSONResponse(status_code=202, content=get_graph_ingestion().handle_notifications(payload))
+
+
+@app.post("/webhook/graph/lifecycle")
+async def graph_lifecycle_notifications(request: Request):
+    """📡 Graph Lifecycle Notifications (reauthorizationRequired, subscriptionRemoved, missed)"""
+    validation_token = request.query_params.get("validationToken")
+    if validation_token is not None:
+        return PlainTextResponse(validation_token)
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(status_code=400, content={"status": "error", "error": "invalid json"})
+    return JSONResponse(status_code=202, content=get_graph_ingestion().handle_lifecycle(payload))
+
+
 @app.post("/webhook/ai-email")
 @app.post("/webhook/ai-email/incoming")
 async def process_email_incoming(request: Request):
@@ -3387,51 +3644,46 @@ async def process_email_incoming(request: Request):
     }
     """
     
-    global active_requests
-    
-    # 🔒 Memory protection: Limit concurrent requests
-    async with REQUEST_SEMAPHORE:
-        active_requests += 1
-        logger.info(f"🔒 Processing email (active requests: {active_requests}/{REQUEST_SEMAPHORE._value + 1})")
+    try:
+        data = await request.json()
+        data["email_direction"] = "incoming"  # Mark as incoming
+        message_id = data.get("message_id") or data.get("id")
+        user_email = data.get("user_email") or data.get("mailbox") or data.get("recipient")
         
-        try:
-            data = await request.json()
-            data["email_direction"] = "incoming"  # Mark as incoming
-            message_id = data.get("message_id") or data.get("id")
-            user_email = data.get("user_email") or data.get("mailbox") or data.get("recipient")
-            
-            # 🎯 NEW: Extract document_type_hint from Zapier (Multi-Zap Strategy)
-            document_type_hint = data.get("document_type_hint")
-            priority = data.get("priority", "medium")
-            
-            # ⚡ IMMEDIATE RESPONSE - No logging before response!
-            # Fire-and-forget background task
-            import asyncio
-            asyncio.create_task(process_email_background(
-                data, message_id, user_email, 
-                document_type_hint=document_type_hint,
-                priority=priority
-            ))
-            
-            # Return immediately (< 1 second)
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "status": "accepted",
-                    "message_id": message_id,
-                    "direction": "incoming"
-                }
-            )
-            
-        except Exception as e:
-            # Even errors return fast
-            return JSONResponse(
-                status_code=200,
-                content={"status": "error", "error": str(e)}
-            )
-        finally:
-            active_requests -= 1
-            logger.info(f"🔓 Email processing complete (active requests: {active_requests})")
+        # 🎯 NEW: Extract document_type_hint from Zapier (Multi-Zap Strategy)
+        document_type_hint = data.get("document_type_hint")
+        priority = data.get("priority", "medium")
+        
+        # 🚦 Admission: Platz in der Warteschlange des Postfachs oder 429 (Zapier wiederholt später)
+        ticket = admit_email(user_email, priority)
+        
+        # ⚡ IMMEDIATE RESPONSE - No logging before response!
+        # Background task (tracked → graceful shutdown), startet sobald ein Slot frei ist
+        # (Ticket wird zurückgegeben, falls der Task nie startet)
+        spawn_with_ticket(ticket, process_email_background(
+            data, message_id, user_email, 
+            document_type_hint=document_type_hint,
+            priority=priority
+        ), name=f"email-incoming:{message_id}")
+        
+        # Return immediately (< 1 second)
+        return JSONResponse(
+            status_code=200,
+            content={
+                "status": "accepted",
+                "message_id": message_id,
+                "direction": "incoming"
+            }
+        )
+        
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except Exception as e:
+        # Even errors return fast
+        return JSONResponse(
+            status_code=200,
+            content={"status": "error", "error": str(e)}
+        )
 
 @app.post("/webhook/ai-email/outgoing")
 async def process_email_outgoing(request: Request):
@@ -3461,14 +3713,17 @@ async def process_email_outgoing(request: Request):
         document_type_hint = data.get("document_type_hint")
         priority = data.get("priority", "medium")
         
+        # 🚦 Admission: Platz in der Warteschlange des Postfachs oder 429
+        ticket = admit_email(user_email, priority)
+        
         # ⚡ IMMEDIATE RESPONSE - No logging before response!
-        # Fire-and-forget background task
-        import asyncio
-        asyncio.create_task(process_email_background(
+        # Background task (tracked → graceful shutdown), startet sobald ein Slot frei ist
+        # (Ticket wird zurückgegeben, falls der Task nie startet)
+        spawn_with_ticket(ticket, process_email_background(
             data, message_id, user_email,
             document_type_hint=document_type_hint,
             priority=priority
-        ))
+        ), name=f"email-outgoing:{message_id}")
         
         # Return immediately (< 1 second)
         return JSONResponse(
@@ -3480,6 +3735,8 @@ async def process_email_outgoing(request: Request):
             }
         )
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         # Even errors return fast
         return JSONResponse(
@@ -3487,6 +3744,7 @@ async def process_email_outgoing(request: Request):
             content={"status": "error", "error": str(e)}
         )
 
+@traced("attachments")
 async def process_attachments_intelligent(
     attachments: List[Dict],
     message_id: str,
@@ -3555,13 +3813,16 @@ async def process_attachments_intelligent(
                     continue
                 
                 # Download attachment bytes via Graph API
-                download_url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}/attachments/{att_id}/$value"
+                download_url = f"{GRAPH_BASE_URL}/users/{user_email}/messages/{message_id}/attachments/{att_id}/$value"
                 
+                graph_budget = get_mailbox_registry().graph_budget(user_email)
                 async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(
-                        download_url,
-                        headers={"Authorization": f"Bearer {access_token}"}
-                    )
+                    async with graph_budget.request():
+                        response = await client.get(
+                            download_url,
+                            headers={"Authorization": f"Bearer {access_token}"}
+                        )
+                    graph_budget.record_response(response)
                     
                     if response.status_code == 200:
                         file_bytes = response.content
@@ -3582,6 +3843,7 @@ async def process_attachments_intelligent(
                         }
                         
                         # Choose OCR route based on type
+                        ocr_started = time.perf_counter()
                         ocr_result = await process_attachment_ocr(
                             file_bytes=file_bytes,
                             filename=att_name,
@@ -3590,6 +3852,7 @@ async def process_attachments_intelligent(
                             email_data=email_data_dict,
                             attachment=attachment
                         )
+                        OCR_DURATION.observe(time.perf_counter() - ocr_started, route=ocr_result.get("route", "none"))
                         
                         results.append({
                             "filename": att_name,
@@ -3797,7 +4060,7 @@ async def process_attachment_ocr(
                                         # ✨ OneDrive Upload (Phase 1.4)
                                         try:
                                             # TEMP FIX: Use MAIL token for OneDrive (same tenant)
-                                            user_email = "mj@cdtechnologies.de"  # Use mj@ instead of info@
+                                            user_email = ONEDRIVE_DOCUMENT_OWNER  # Use mj@ instead of info@
                                             access_token = await get_graph_token_mail()  # Use mail token instead of onedrive
                                             
                                             if not access_token:
@@ -3808,159 +4071,149 @@ async def process_attachment_ocr(
                                                 
                                                 logger.info(f"☁️ Starting OneDrive upload to: {folder_path}/{target_filename}")
                                                 
-                                                # Upload URL für Microsoft Graph API
-                                                upload_url = f"https://graph.microsoft.com/v1.0/users/{user_email}/drive/root:/{folder_path}/{target_filename}:/content"
+                                                # Upload per Ordner-ID aus dem Folder-Cache (fehlende Ordner werden einmalig angelegt)
+                                                upload_response = await get_folder_resolver().upload_file(
+                                                    user_email, folder_path, target_filename, file_bytes, access_token
+                                                )
                                                 
-                                                headers = {
-                                                    "Authorization": f"Bearer {access_token}",
-                                                    "Content-Type": "application/octet-stream"
-                                                }
-                                                
-                                                # Upload mit httpx (async)
-                                                async with httpx.AsyncClient(timeout=60.0) as upload_client:
-                                                    upload_response = await upload_client.put(
-                                                        upload_url,
-                                                        headers=headers,
-                                                        content=file_bytes
+                                                if upload_response.status_code in [200, 201]:
+                                                    upload_data = upload_response.json()
+                                                    web_url = upload_data.get("webUrl", "")
+                                                    file_id = upload_data.get("id", "")
+                                                    
+                                                    result["onedrive_uploaded"] = True
+                                                    result["onedrive_path"] = f"{folder_path}/{target_filename}"
+                                                    result["onedrive_web_url"] = web_url
+                                                    result["onedrive_file_id"] = file_id
+                                                    get_sharing_link_registry().remember_item(
+                                                        user_email, upload_data, path=f"{folder_path}/{target_filename}"
                                                     )
                                                     
-                                                    if upload_response.status_code in [200, 201]:
-                                                        upload_data = upload_response.json()
-                                                        web_url = upload_data.get("webUrl", "")
-                                                        file_id = upload_data.get("id", "")
-                                                        
-                                                        result["onedrive_uploaded"] = True
-                                                        result["onedrive_path"] = f"{folder_path}/{target_filename}"
-                                                        result["onedrive_web_url"] = web_url
-                                                        result["onedrive_file_id"] = file_id
-                                                        
-                                                        logger.info(f"✅ OneDrive upload successful!")
-                                                        logger.info(f"   📂 Path: {folder_path}/{target_filename}")
-                                                        logger.info(f"   🔗 Web URL: {web_url[:80]}...")
+                                                    logger.info(f"✅ OneDrive upload successful!")
+                                                    logger.info(f"   📂 Path: {folder_path}/{target_filename}")
+                                                    logger.info(f"   🔗 Web URL: {web_url[:80]}...")
+                                                    
+                                                    # ✨ PHASE 2: Sharing link (vorhandener Link für dasselbe Item wird wiederverwendet)
+                                                    try:
+                                                        sharing_link = await get_sharing_link_registry().get_link(
+                                                            user_email,
+                                                            file_id,
+                                                            access_token,
+                                                            link_type="view",  # readonly
+                                                            scope="organization"  # nur innerhalb Organisation
+                                                        )
                                                         
-                                                        # ✨ PHASE 2: Generate sharing link
+                                                        if sharing_link:
+                                                            result["onedrive_sharing_link"] = sharing_link
+                                                            logger.info(f"   🔗 Sharing Link: {sharing_link[:80]}...")
+                                                        else:
+                                                            logger.warning("   ⚠️ Could not generate sharing link - using web URL")
+                                                            result["onedrive_sharing_link"] = web_url
+                                                    except Exception as sharing_error:
+                                                        logger.warning(f"   ⚠️ Sharing link exception: {sharing_error}")
+                                                        result["onedrive_sharing_link"] = web_url  # Fallback to web URL
+                                                    
+                                                    # ✨ PHASE 3: Save invoice to tracking database
+                                                    if result["structured"].get("document_type") in ["Rechnung", "Eingangsrechnung", "Ausgangsrechnung", "invoice"]:
                                                         try:
-                                                            from modules.msgraph.generate_onedrive_sharing_link import generate_onedrive_sharing_link
+                                                            from modules.database.invoice_tracking_db import save_invoice
                                                             
-                                                            sharing_link = await generate_onedrive_sharing_link(
-                                                                user_email=user_email,
-                                                                file_id=file_id,
-                                                                access_token=access_token,
-                                                                link_type="view",  # readonly
-                                                                scope="organization"  # nur innerhalb Organisation
-                                                            )
+                                                            invoice_data = {
+                                                                "invoice_number": result["structured"].get("invoice_number"),
+                                                                "invoice_date": result["structured"].get("invoice_date"),
+                                                                "due_date": result["structured"].get("due_date"),
+                                                                "amount_total": result["structured"].get("total_amount"),
+                                                                "amount_net": result["structured"].get("net_amount"),
+                                                                "amount_tax": result["structured"].get("tax_amount"),
+                                                                "vendor_name": result["structured"].get("vendor_name"),
+                                                                "customer_name": result["structured"].get("customer_name"),
+                                                                "direction": result["structured"].get("direction", "incoming"),
+                                                                "status": "open",
+                                                                "document_hash": result.get("document_hash"),
+                                                                "onedrive_path": f"{folder_path}/{target_filename}",
+                                                                "onedrive_link": result.get("onedrive_sharing_link"),
+                                                                "email_message_id": email_data.get("message_id") if email_data else None
+                                                            }
                                                             
-                                                            if sharing_link:
-                                                                result["onedrive_sharing_link"] = sharing_link
-                                                                logger.info(f"   🔗 Sharing Link: {sharing_link[:80]}...")
+                                                            # Nur speichern wenn Rechnungsnummer vorhanden
+                                                            if invoice_data["invoice_number"]:
+                                                                invoice_id = save_invoice(invoice_data)
+                                                                result["invoice_id"] = invoice_id
+                                                                logger.info(f"   💾 Invoice saved to DB: ID={invoice_id}")
                                                             else:
-                                                                logger.warning("   ⚠️ Could not generate sharing link - using web URL")
-                                                                result["onedrive_sharing_link"] = web_url
-                                                        except Exception as sharing_error:
-                                                            logger.warning(f"   ⚠️ Sharing link exception: {sharing_error}")
-                                                            result["onedrive_sharing_link"] = web_url  # Fallback to web URL
-                                                        
-                                                        # ✨ PHASE 3: Save invoice to tracking database
-                                                        if result["structured"].get("document_type") in ["Rechnung", "Eingangsrechnung", "Ausgangsrechnung", "invoice"]:
-                                                            try:
-                                                                from modules.database.invoice_tracking_db import save_invoice
-                                                                
-                                                                invoice_data = {
-                                                                    "invoice_number": result["structured"].get("invoice_number"),
-                                                                    "invoice_date": result["structured"].get("invoice_date"),
-                                                                    "due_date": result["structured"].get("due_date"),
-                                                                    "amount_total": result["structured"].get("total_amount"),
-                                                                    "amount_net": result["structured"].get("net_amount"),
-                                                                    "amount_tax": result["structured"].get("tax_amount"),
-                                                                    "vendor_name": result["structured"].get("vendor_name"),
-                                                                    "customer_name": result["structured"].get("customer_name"),
-                                                                    "direction": result["structured"].get("direction", "incoming"),
-                                                                    "status": "open",
-                                                                    "document_hash": result.get("document_hash"),
-                                                                    "onedrive_path": f"{folder_path}/{target_filename}",
-                                                                    "onedrive_link": result.get("onedrive_sharing_link"),
-                                                                    "email_message_id": email_data.get("message_id") if email_data else None
-                                                                }
-                                                                
-                                                                # Nur speichern wenn Rechnungsnummer vorhanden
-                                                                if invoice_data["invoice_number"]:
-                                                                    invoice_id = save_invoice(invoice_data)
-                                                                    result["invoice_id"] = invoice_id
-                                                                    logger.info(f"   💾 Invoice saved to DB: ID={invoice_id}")
-                                                                else:
-                                                                    logger.info("   ⚠️ No invoice number - skipping DB save")
-                                                            except Exception as db_error:
-                                                                logger.warning(f"   ⚠️ Invoice DB save failed: {db_error}")
-                                                        
-                                                        # ✨ PHASE 3.5: Create Sales Opportunity for Preisanfragen/Angebote
-                                                        doc_type = result["structured"].get("document_type", "").lower()
-                                                        if any(keyword in doc_type for keyword in ["preisanfrage", "angebot", "anfrage", "quote", "proposal", "inquiry"]):
-                                                            try:
-                                                                from modules.database.sales_pipeline_db import create_opportunity
-                                                                
-                                                                # Determine stage and probability based on document type
-                                                                if "angebot" in doc_type or "quote" in doc_type or "proposal" in doc_type:
-                                                                    stage = "proposal"
-                                                                    probability = 50
-                                                                elif "preisanfrage" in doc_type or "anfrage" in doc_type or "inquiry" in doc_type:
-                                                                    stage = "lead"
-                                                                    probability = 20
-                                                                else:
-                                                                    stage = "qualified"
-                                                                    probability = 30
-                                                                
-                                                                # Extract contact info from email or document
-                                                                contact_name = None
-                                                                contact_email = None
-                                                                company_name = None
-                                                                
-                                                                if email_data:
-                                                                    sender = email_data.get("sender", {})
-                                                                    contact_email = sender.get("emailAddress", {}).get("address")
-                                                                    contact_name = sender.get("emailAddress", {}).get("name")
-                                                                
-                                                                # Try to extract from GPT analysis
-                                                                if not contact_name:
-                                                                    contact_name = result["structured"].get("customer_name") or result["structured"].get("vendor_name")
-                                                                if not company_name:
-                                                                    company_name = result["structured"].get("customer_name") or result["structured"].get("vendor_name")
-                                                                
-                                                                # Extract value if available
-                                                                value = result["structured"].get("total_amount")
-                                                                if value:
-                                                                    try:
-                                                                        value = float(value)
-                                                                    except:
-                                                                        value = None
-                                                                
-                                                                # Create opportunity
-                                                                opportunity_data = {
-                                                                    "title": email_data.get("subject", "Unbekannte Anfrage") if email_data else "Unbekannte Anfrage",
-                                                                    "stage": stage,
-                                                                    "value": value,
-                                                                    "probability": probability,
-                                                                    "contact_name": contact_name,
-                                                                    "contact_email": contact_email,
-                                                                    "company_name": company_name,
-                                                                    "source": "email",
-                                                                    "description": result.get("text", "")[:500] if result.get("text") else None,
-                                                                    "email_message_id": email_data.get("message_id") if email_data else None,
-                                                                    "created_by": "ai-orchestrator"
-                                                                }
-                                                                
-                                                                opportunity_id = create_opportunity(opportunity_data)
-                                                                result["opportunity_id"] = opportunity_id
-                                                                logger.info(f"   💼 Opportunity created: ID={opportunity_id}, Stage={stage}")
-                                                                
-                                                            except Exception as opp_error:
-                                                                logger.warning(f"   ⚠️ Opportunity creation failed: {opp_error}")
-                                                        
-                                                        
-                                                    else:
-                                                        logger.warning(f"⚠️ OneDrive upload failed: {upload_response.status_code}")
-                                                        logger.warning(f"   Response: {upload_response.text[:500]}")
-                                                        result["onedrive_uploaded"] = False
-                                                        result["onedrive_error"] = f"HTTP {upload_response.status_code}"
+                                                                logger.info("   ⚠️ No invoice number - skipping DB save")
+                                                        except Exception as db_error:
+                                                            logger.warning(f"   ⚠️ Invoice DB save failed: {db_error}")
+                                                    
+                                                    # ✨ PHASE 3.5: Create Sales Opportunity for Preisanfragen/Angebote
+                                                    doc_type = result["structured"].get("document_type", "").lower()
+                                                    if any(keyword in doc_type for keyword in ["preisanfrage", "angebot", "anfrage", "quote", "proposal", "inquiry"]):
+                                                        try:
+                                                            from modules.database.sales_pipeline_db import create_opportunity
+                                                            
+                                                            # Determine stage and probability based on document type
+                                                            if "angebot" in doc_type or "quote" in doc_type or "proposal" in doc_type:
+                                                                stage = "proposal"
+                                                                probability = 50
+                                                            elif "preisanfrage" in doc_type or "anfrage" in doc_type or "inquiry" in doc_type:
+                                                                stage = "lead"
+                                                                probability = 20
+                                                            else:
+                                                                stage = "qualified"
+                                                                probability = 30
+                                                            
+                                                            # Extract contact info from email or document
+                                                            contact_name = None
+                                                            contact_email = None
+                                                            company_name = None
+                                                            
+                                                            if email_data:
+                                                                sender = email_data.get("sender", {})
+                                                                contact_email = sender.get("emailAddress", {}).get("address")
+                                                                contact_name = sender.get("emailAddress", {}).get("name")
+                                                            
+                                                            # Try to extract from GPT analysis
+                                                            if not contact_name:
+                                                                contact_name = result["structured"].get("customer_name") or result["structured"].get("vendor_name")
+                                                            if not company_name:
+                                                                company_name = result["structured"].get("customer_name") or result["structured"].get("vendor_name")
+                                                            
+                                                            # Extract value if available
+                                                            value = result["structured"].get("total_amount")
+                                                            if value:
+                                                                try:
+                                                                    value = float(value)
+                                                                except:
+                                                                    value = None
+                                                            
+                                                            # Create opportunity
+                                                            opportunity_data = {
+                                                                "title": email_data.get("subject", "Unbekannte Anfrage") if email_data else "Unbekannte Anfrage",
+                                                                "stage": stage,
+                                                                "value": value,
+                                                                "probability": probability,
+                                                                "contact_name": contact_name,
+                                                                "contact_email": contact_email,
+                                                                "company_name": company_name,
+                                                                "source": "email",
+                                                                "description": result.get("text", "")[:500] if result.get("text") else None,
+                                                                "email_message_id": email_data.get("message_id") if email_data else None,
+                                                                "created_by": "ai-orchestrator"
+                                                            }
+                                                            
+                                                            opportunity_id = create_opportunity(opportunity_data)
+                                                            result["opportunity_id"] = opportunity_id
+                                                            logger.info(f"   💼 Opportunity created: ID={opportunity_id}, Stage={stage}")
+                                                            
+                                                        except Exception as opp_error:
+                                                            logger.warning(f"   ⚠️ Opportunity creation failed: {opp_error}")
+                                                    
+                                                    
+                                                else:
+                                                    logger.warning(f"⚠️ OneDrive upload failed: {upload_response.status_code}")
+                                                    logger.warning(f"   Response: {upload_response.text[:500]}")
+                                                    result["onedrive_uploaded"] = False
+                                                    result["onedrive_error"] = f"HTTP {upload_response.status_code}"
                                         
                                         except Exception as upload_error:
                                             logger.error(f"❌ OneDrive upload exception: {upload_error}")
@@ -4050,6 +4303,7 @@ async def process_attachment_ocr(
     return result
 
 
+@traced("email_pipeline", channel="email", message_id_param="message_id")
 async def process_email_background(
     data: dict, 
     message_id: str, 
@@ -4063,7 +4317,7 @@ async def process_email_background(
     Args:
         data: Full webhook payload from Zapier
         message_id: Microsoft Graph API message ID
-        user_email: Mailbox email (mj@cdtechnologies.de)
+        user_email: Mailbox email (eines der Postfächer aus MAILBOXES)
         document_type_hint: Optional hint from Zapier (invoice|offer|order_confirmation|delivery_note|general)
         priority: Optional priority from Zapier (low|medium|high|urgent)
     """
@@ -4181,30 +4435,30 @@ async def process_email_background(
             tracking_db = get_email_tracking_db()
             processing_start_time = asyncio.get_event_loop().time()
             
-            # Check 1: Message ID bereits verarbeitet?
-            duplicate_by_id = tracking_db.check_duplicate_by_message_id(message_id)
-            if duplicate_by_id:
+            # Message ID + Content (24h) in einem Durchgang; Bloom-Filter negativ → kein SQLite
+            duplicate = tracking_db.check_email_duplicate(
+                message_id=message_id,
+                subject=subject,
+                body=body[:500],  # Nur erste 500 Zeichen
+                from_address=from_address,
+                hours_window=24
+            )
+            DUPLICATE_CHECKS.inc(outcome=f"{duplicate['match']}_match" if duplicate else "unique_message_id")
+            if duplicate and duplicate["match"] == "message_id":
                 logger.warning(f"⚠️ DUPLICATE by Message ID: {message_id}")
-                logger.warning(f"   Original: {duplicate_by_id['processed_date']}")
-                logger.warning(f"   Workflow: {duplicate_by_id['workflow_path']}")
-                logger.warning(f"   OneDrive: {duplicate_by_id['onedrive_link']}")
+                logger.warning(f"   Original: {duplicate['processed_date']}")
+                logger.warning(f"   Workflow: {duplicate['workflow_path']}")
+                logger.warning(f"   OneDrive: {duplicate['onedrive_link']}")
                 
                 # Send duplicate notification (optional)
                 logger.info("⏭️ Skipping duplicate email processing")
                 return  # Early exit!
             
-            # Check 2: Ähnlicher Content in letzten 24h?
-            duplicate_by_content = tracking_db.check_duplicate_by_content(
-                subject=subject,
-                body=body[:500],  # Nur erste 500 Zeichen
-                from_address=from_address,
-                hours_window=24
-            )
-            if duplicate_by_content:
+            if duplicate:
                 logger.warning(f"⚠️ DUPLICATE by Content: Similar email from {from_address}")
-                logger.warning(f"   Original Subject: {duplicate_by_content['subject']}")
-                logger.warning(f"   Original Date: {duplicate_by_content['processed_date']}")
-                logger.warning(f"   OneDrive: {duplicate_by_content['onedrive_link']}")
+                logger.warning(f"   Original Subject: {duplicate['subject']}")
+                logger.warning(f"   Original Date: {duplicate['processed_date']}")
+                logger.warning(f"   OneDrive: {duplicate['onedrive_link']}")
                 
                 # Save as duplicate reference
                 tracking_db.save_email(
@@ -4217,7 +4471,7 @@ async def process_email_background(
                     workflow_path="DUPLICATE",
                     ai_analysis={},
                     is_duplicate=True,
-                    duplicate_of=duplicate_by_content["message_id"]
+                    duplicate_of=duplicate["message_id"]
                 )
                 
                 logger.info("⏭️ Skipping duplicate email processing")
@@ -4240,29 +4494,25 @@ async def process_email_background(
                 )
                 logger.info(f"✅ Attachments processed: {len(attachment_results)} results")
                 
-                # 🔍 DUPLIKATPRÜFUNG FÜR ATTACHMENTS (File-Hash)
+                # 🔍 DUPLIKATPRÜFUNG FÜR ATTACHMENTS (File-Hash, alle Anhänge in einer Abfrage)
                 for att_result in attachment_results:
                     file_bytes = att_result.get("file_bytes")
-                    if file_bytes:
-                        # Berechne File-Hash
-                        file_hash = tracking_db.calculate_file_hash(file_bytes)
-                        att_result["file_hash"] = file_hash
+                    att_result["file_hash"] = tracking_db.calculate_file_hash(file_bytes) if file_bytes else ""
+                    att_result["is_duplicate"] = False
+                
+                duplicate_attachments = tracking_db.check_duplicate_attachments(
+                    [att_result["file_hash"] for att_result in attachment_results if att_result["file_hash"]]
+                )
+                for att_result in attachment_results:
+                    duplicate_att = duplicate_attachments.get(att_result["file_hash"])
+                    if duplicate_att:
+                        logger.warning(f"⚠️ DUPLICATE ATTACHMENT: {att_result.get('filename')}")
+                        logger.warning(f"   Original: {duplicate_att['filename']} from email '{duplicate_att['email_subject']}'")
+                        logger.warning(f"   Original Date: {duplicate_att['processed_date']}")
+                        logger.warning(f"   OneDrive: {duplicate_att['onedrive_link']}")
                         
-                        # Prüfe ob dieser File-Hash bereits existiert
-                        duplicate_att = tracking_db.check_duplicate_attachment(file_hash)
-                        if duplicate_att:
-                            logger.warning(f"⚠️ DUPLICATE ATTACHMENT: {att_result.get('filename')}")
-                            logger.warning(f"   Original: {duplicate_att['filename']} from email '{duplicate_att['email_subject']}'")
-                            logger.warning(f"   Original Date: {duplicate_att['processed_date']}")
-                            logger.warning(f"   OneDrive: {duplicate_att['onedrive_link']}")
-                            
-                            att_result["is_duplicate"] = True
-                            att_result["duplicate_info"] = duplicate_att
-                        else:
-                            att_result["is_duplicate"] = False
-                    else:
-                        att_result["file_hash"] = ""
-                        att_result["is_duplicate"] = False
+                        att_result["is_duplicate"] = True
+                        att_result["duplicate_info"] = duplicate_att
             
             # 📁 ORDNERSTRUKTUR GENERIEREN (BEFORE process_communication!)
             # We need folder structure BEFORE notification to include OneDrive links
@@ -4387,7 +4637,8 @@ async def process_email_background(
                     "attachments_count": len(attachments),
                     "attachment_results": attachment_results,  # OCR results + OneDrive links!
                     "document_type_hint": document_type_hint,  # 🎯 NEW: Pass hint to AI analysis
-                    "priority": priority  # 🎯 NEW: Pass priority
+                    "priority": priority,  # 🎯 NEW: Pass priority
+                    "mailbox": user_email
                 }
             )
             logger.info(f"✅ Email processing complete: {result.get('workflow_path', 'unknown')}")
@@ -4468,6 +4719,16 @@ async def process_email_background(
 
 @app.post("/webhook/ai-call")
 async def process_call(request: Request):
+    """🚦 Admission Control vor der Verarbeitung (429 + Retry-After bei voller Warteschlange)"""
+    try:
+        ticket = get_admission_controller().admit(CHANNEL_CALL)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    async with ticket:
+        with start_trace(CHANNEL_CALL, "webhook.ai_call"):
+            return await _process_call(request)
+
+async def _process_call(request: Request):
     """
     📞 SIPGATE CALL PROCESSING (SipGate Assist + FrontDesk)
     
@@ -4483,7 +4744,8 @@ async def process_call(request: Request):
     
     try:
         data = await request.json()
-        logger.info(f"📞 Call Webhook Payload: {json.dumps(data, ensure_ascii=False)[:1000]}")
+        logger.info(f"📞 Call Webhook received (keys: {', '.join(sorted(data.keys()))})")
+        logger.debug(f"📞 Call Webhook Payload: {json.dumps(data, ensure_ascii=False)[:1000]}")
         
         # 🔍 DETECT WEBHOOK SOURCE: SipGate Assist (v1 + NEW) vs FrontDesk
         is_sipgate_assist_v1 = "call" in data and "assist" in data
@@ -4604,28 +4866,18 @@ async def process_call(request: Request):
                 ""
             )
         
-        # Normalize phone format (remove spaces, dashes, brackets)
-        phone_normalized = external_number.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
+        # Normalize phone format (E.164, fallback: remove spaces, dashes, brackets)
+        phone_normalized = (
+            normalize_phone_e164(external_number)
+            or external_number.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
+        )
         
         # 🎯 EXTRACT TRANSCRIPTION (source-aware)
+        recording_url = ""
+        transcription_url = ""
         if is_sipgate_new:
             # NEW SIPGATE FORMAT: transcriptions array + summary at top level
-            call_transcript_parts = []
-            
-            # Add summary first
-            if summary_text:
-                call_transcript_parts.append(f"📋 Zusammenfassung:\n{summary_text}")
-            
-            # Add transcriptions
-            if transcriptions_data:
-                call_transcript_parts.append("\n\n📝 Transkript:")
-                for trans in transcriptions_data:
-                    speaker = trans.get("speaker", "?")
-                    text = trans.get("text", "")
-                    if text:
-                        call_transcript_parts.append(f"\nSprecher {speaker}: {text}")
-            
-            call_transcript = "\n".join(call_transcript_parts) if call_transcript_parts else ""
+            transcript_source = {"summary": summary_text, "segments": transcriptions_data}
             
             # Extract from channel
             channel_name = channel_data.get("name", "")
@@ -4641,7 +4893,7 @@ async def process_call(request: Request):
         elif is_sipgate_assist_v1:
             # V1 SIPGATE FORMAT
             # SipGate Assist: nested in assist.summary
-            call_transcript = summary_data.get("content", "")
+            transcript_source = {"plain_text": summary_data.get("content", "")}
             key_points = summary_data.get("keyPoints", [])
             topics = summary_data.get("topics", [])
             
@@ -4666,14 +4918,17 @@ async def process_call(request: Request):
                         elif "anliegen" in question or "anfrage" in question:
                             caller_request = answer
         else:
-            # FrontDesk: flat structure
-            call_transcript = (
-                call_data.get("transcription") or
-                call_data.get("transcript") or
-                call_data.get("text") or
-                call_data.get("content") or
-                ""
-            )
+            # FrontDesk: flat structure (Transkript inline oder nur als transcription_url)
+            transcript_source = {
+                "plain_text": (
+                    call_data.get("transcription") or
+                    call_data.get("transcript") or
+                    call_data.get("text") or
+                    call_data.get("content") or
+                    ""
+                )
+            }
+            transcription_url = call_data.get("transcription_url") or call_data.get("transcriptionUrl") or ""
             key_points = call_data.get("key_points", [])
             topics = call_data.get("topics", [])
             
@@ -4690,6 +4945,21 @@ async def process_call(request: Request):
                 ""
             )
         
+        # 📥 Normalisiertes Transkript (persistiert pro call_id, URL-Download nur einmal)
+        transcript = await ingest_call_transcript(
+            call_id=str(call_id or ""),
+            source="sipgate_new" if is_sipgate_new else "sipgate_v1" if is_sipgate_assist_v1 else "frontdesk" if is_frontdesk else "unknown",
+            transcription_url=transcription_url,
+            recording_url=recording_url,
+            key_points=key_points,
+            topics=topics,
+            caller_name=caller_name,
+            company_name=company_name,
+            caller_request=caller_request,
+            **transcript_source
+        )
+        call_transcript = transcript.text
+        
         # Legacy/additional fields
         if not is_sipgate_assist and recording_url:
             logger.info(f"🎙️ FrontDesk Recording: {recording_url}")
@@ -4773,7 +5043,9 @@ async def process_call(request: Request):
                 # AI/transcription data
                 "key_points": key_points,
                 "topics": topics,
-                "recording_url": recording_url if 'recording_url' in locals() else "",
+                "recording_url": recording_url,
+                "transcription_url": transcription_url,
+                "call_transcript": transcript.to_dict(),
                 # Legacy fields
                 "assigned_user": assigned_user,
                 "user_id": user_id,
@@ -4795,6 +5067,16 @@ async def process_call(request: Request):
 
 @app.post("/webhook/frontdesk")
 async def process_frontdesk(request: Request):
+    """🚦 Admission Control vor der Verarbeitung (429 + Retry-After bei voller Warteschlange)"""
+    try:
+        ticket = get_admission_controller().admit(CHANNEL_CALL)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    async with ticket:
+        with start_trace(CHANNEL_CALL, "webhook.frontdesk"):
+            return await _process_frontdesk(request)
+
+async def _process_frontdesk(request: Request):
     """
     🎙️ FRONTDESK CALL RECORDING & TRANSCRIPTION
     
@@ -4814,7 +5096,8 @@ async def process_frontdesk(request: Request):
     
     try:
         data = await request.json()
-        logger.info(f"🎙️ FrontDesk Webhook: {json.dumps(data, ensure_ascii=False)[:1000]}")
+        logger.info(f"🎙️ FrontDesk Webhook received (keys: {', '.join(sorted(data.keys()))})")
+        logger.debug(f"🎙️ FrontDesk Webhook: {json.dumps(data, ensure_ascii=False)[:1000]}")
         
         # 🔍 DETECT FORMAT: v1 Assist API vs Flat FrontDesk
         is_v1_assist = "call" in data and "assist" in data
@@ -4863,6 +5146,8 @@ async def process_frontdesk(request: Request):
                             company = answer
             
             recording_url = ""
+            transcription_url = ""
+            call_id = call_data.get("id", "")
             
         else:
             # Flat FrontDesk format (legacy)
@@ -4890,11 +5175,27 @@ async def process_frontdesk(request: Request):
             company = data.get("company", data.get("company_name", ""))
             duration = data.get("duration", data.get("call_duration", 0))
             recording_url = data.get("recording_url", data.get("audio_url", ""))
+            transcription_url = data.get("transcription_url", "")
+            call_id = data.get("call_id", data.get("id", ""))
             key_points = []
             topics = []
             call_direction = data.get("direction", "inbound")
             our_number = ""
         
+        # 📥 Normalisiertes Transkript (lädt transcription_url nur einmal pro call_id)
+        transcript = await ingest_call_transcript(
+            call_id=str(call_id or ""),
+            source="frontdesk_v1" if is_v1_assist else "frontdesk_flat",
+            plain_text=transcription,
+            transcription_url=transcription_url,
+            recording_url=recording_url,
+            key_points=key_points,
+            topics=topics,
+            caller_name=caller_name,
+            company_name=company
+        )
+        transcription = transcript.text
+        
         # Log extracted data
         logger.info(f"📞 FrontDesk Call: {phone_number}")
         logger.info(f"   Direction: {call_direction} | Duration: {duration}s")
@@ -4940,7 +5241,8 @@ async def process_frontdesk(request: Request):
                 "company_name": company,
                 "key_points": key_points,
                 "topics": topics,
-                "recording_url": recording_url
+                "recording_url": recording_url,
+                "call_transcript": transcript.to_dict()
             }
         )
         
@@ -5337,7 +5639,9 @@ async def execute_button_action(button_uuid: str, request: Request):
     try:
         # 1. Lookup Button Info aus Datenbank
         tracking_db = get_email_tracking_db()
-        button_info = tracking_db.get_button_info(button_uuid)
+        button_info = tracking_db.get_cached_button_info(button_uuid)
+        if button_info is None:
+            button_info = await asyncio.to_thread(tracking_db.get_button_info, button_uuid)
         
         if not button_info:
             logger.warning(f"⚠️ Button UUID not found: {button_uuid}")
@@ -5464,6 +5768,16 @@ async def execute_button_action(button_uuid: str, request: Request):
 
 @app.post("/webhook/ai-whatsapp")
 async def process_whatsapp(request: Request):
+    """🚦 Admission Control vor der Verarbeitung (429 + Retry-After bei voller Warteschlange)"""
+    try:
+        ticket = get_admission_controller().admit(CHANNEL_WHATSAPP)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    async with ticket:
+        with start_trace(CHANNEL_WHATSAPP, "webhook.ai_whatsapp"):
+            return await _process_whatsapp(request)
+
+async def _process_whatsapp(request: Request):
     """Process incoming WhatsApp message via webhook"""
     
     try:
@@ -5543,161 +5857,134 @@ async def handle_contact_action(request: Request):
         
         # ACTION 1: Kontakt im CRM anlegen
         if action == "create_contact":
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "AuthenticationToken": orchestrator.weclapp_api_token,
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                }
-                
-                # 🔧 Namen-Parsing: Versuche sender_name zu splitten oder nutze Placeholder
-                first_name = contact_data.get("first_name", "")
-                last_name = contact_data.get("last_name", "")
-                
-                # Fallback 1: sender_name aus DB (wenn vorhanden)
-                if not first_name and not last_name and sender_name:
-                    name_parts = sender_name.strip().split(maxsplit=1)
-                    first_name = name_parts[0] if len(name_parts) > 0 else "Unbekannt"
-                    last_name = name_parts[1] if len(name_parts) > 1 else "Kontakt"
-                
-                # 🎯 CHECK: Is contact_email actually a PHONE NUMBER?
-                is_phone = contact_email and (contact_email.startswith("+") or contact_email.replace(" ", "").isdigit())
-                
-                # Fallback 2: Phone Number → Generate dummy email + use number as name
-                if is_phone:
-                    phone_clean = contact_email.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-                    first_name = f"Tel {phone_clean}"
+            # 🔧 Namen-Parsing: Versuche sender_name zu splitten oder nutze Placeholder
+            first_name = contact_data.get("first_name", "")
+            last_name = contact_data.get("last_name", "")
+            
+            # Fallback 1: sender_name aus DB (wenn vorhanden)
+            if not first_name and not last_name and sender_name:
+                name_parts = sender_name.strip().split(maxsplit=1)
+                first_name = name_parts[0] if len(name_parts) > 0 else "Unbekannt"
+                last_name = name_parts[1] if len(name_parts) > 1 else "Kontakt"
+            
+            # 🎯 CHECK: Is contact_email actually a PHONE NUMBER?
+            is_phone = contact_email and (contact_email.startswith("+") or contact_email.replace(" ", "").isdigit())
+            
+            # Fallback 2: Phone Number → Generate dummy email + use number as name
+            if is_phone:
+                phone_clean = contact_email.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
+                first_name = f"Tel {phone_clean}"
+                last_name = "Kontakt"
+                # Generate dummy email: phone@noemail.local
+                dummy_email = f"{phone_clean}@noemail.local"
+                phone_number = phone_clean
+            elif not first_name and contact_email:
+                # Fallback 3: Email-Prefix als Vorname (z.B. "jaszczyk" → "Jaszczyk")
+                if "@" in contact_email:
+                    email_prefix = contact_email.split("@")[0]
+                    first_name = email_prefix.capitalize()
                     last_name = "Kontakt"
-                    # Generate dummy email: phone@noemail.local
-                    dummy_email = f"{phone_clean}@noemail.local"
-                    phone_number = phone_clean
-                elif not first_name and contact_email:
-                    # Fallback 3: Email-Prefix als Vorname (z.B. "jaszczyk" → "Jaszczyk")
-                    if "@" in contact_email:
-                        email_prefix = contact_email.split("@")[0]
-                        first_name = email_prefix.capitalize()
-                        last_name = "Kontakt"
-                        dummy_email = contact_email
-                        phone_number = ""
-                    else:
-                        # Invalid format - use placeholder
-                        first_name = "Unbekannt"
-                        last_name = "Kontakt"
-                        dummy_email = f"unknown{contact_email}@noemail.local"
-                        phone_number = ""
+                    dummy_email = contact_email
+                    phone_number = ""
                 else:
-                    # Fallback 4: Absolute Placeholders
-                    if not first_name:
-                        first_name = "Unbekannt"
-                        last_name = "Kontakt"
-                    dummy_email = contact_email if "@" in contact_email else f"unknown@noemail.local"
+                    # Invalid format - use placeholder
+                    first_name = "Unbekannt"
+                    last_name = "Kontakt"
+                    dummy_email = f"unknown{contact_email}@noemail.local"
                     phone_number = ""
-                
-                party_data = {
-                    "partyType": "PERSON",
-                    "email": dummy_email,  # Always valid email format!
-                    "firstName": first_name,
-                    "lastName": last_name,
-                    "company": contact_data.get("company", ""),
-                    "phone": phone_number or contact_data.get("phone", "") or (contact_email if is_phone else ""),
-                    "tags": ["AI_GENERATED", "UNKNOWN_CONTACT_CONVERTED"]
+            else:
+                # Fallback 4: Absolute Placeholders
+                if not first_name:
+                    first_name = "Unbekannt"
+                    last_name = "Kontakt"
+                dummy_email = contact_email if "@" in contact_email else f"unknown@noemail.local"
+                phone_number = ""
+            
+            party_data = {
+                "partyType": "PERSON",
+                "email": dummy_email,  # Always valid email format!
+                "firstName": first_name,
+                "lastName": last_name,
+                "company": contact_data.get("company", ""),
+                "phone": phone_number or contact_data.get("phone", "") or (contact_email if is_phone else ""),
+                "tags": ["AI_GENERATED", "UNKNOWN_CONTACT_CONVERTED"]
+            }
+            
+            try:
+                created_party = await get_weclapp_client().post("party", json=party_data, api_version="v2")
+                result = {
+                    "success": True,
+                    "action": "contact_created",
+                    "party_id": created_party.get("id"),
+                    "message": f"Kontakt {contact_email} erfolgreich angelegt"
                 }
-                
-                url = f"https://{orchestrator.weclapp_domain}.weclapp.com/webapp/api/v2/party"
-                
-                async with session.post(url, headers=headers, json=party_data) as response:
-                    if response.status == 201:
-                        created_party = await response.json()
-                        result = {
-                            "success": True,
-                            "action": "contact_created",
-                            "party_id": created_party.get("id"),
-                            "message": f"Kontakt {contact_email} erfolgreich angelegt"
-                        }
-                        logger.info(f"✅ Contact created: {created_party.get('id')}")
-                    else:
-                        result = {
-                            "success": False,
-                            "error": f"WeClapp API error: {response.status}"
-                        }
-        
+                logger.info(f"✅ Contact created: {created_party.get('id')}")
+            except WeClappError as e:
+                result = {
+                    "success": False,
+                    "error": f"WeClapp API error: {e.status_code}"
+                }
+    
         # ACTION 2: Als privat markieren
         elif action == "mark_private":
             # Erstelle CRM Event für Dokumentation
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "AuthenticationToken": orchestrator.weclapp_api_token,
-                    "Content-Type": "application/json"
-                }
-                
-                crm_event = {
-                    "type": "NOTE",
-                    "description": f"Kontakt als PRIVAT markiert: {contact_email}",
-                    "tags": ["PRIVATE_CONTACT"]
-                }
-                
-                url = f"https://{orchestrator.weclapp_domain}.weclapp.com/webapp/api/v2/crmEvent"
-                
-                async with session.post(url, headers=headers, json=crm_event) as response:
-                    result = {
-                        "success": response.status == 201,
-                        "action": "marked_private",
-                        "message": f"{contact_email} als privat markiert"
-                    }
-        
+            crm_event = {
+                "type": "NOTE",
+                "description": f"Kontakt als PRIVAT markiert: {contact_email}",
+                "tags": ["PRIVATE_CONTACT"]
+            }
+            
+            try:
+                await get_weclapp_client().post("crmEvent", json=crm_event, api_version="v2")
+                success = True
+            except WeClappError:
+                success = False
+            result = {
+                "success": success,
+                "action": "marked_private",
+                "message": f"{contact_email} als privat markiert"
+            }
+    
         # ACTION 3: Als Spam markieren
         elif action == "mark_spam":
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "AuthenticationToken": orchestrator.weclapp_api_token,
-                    "Content-Type": "application/json"
-                }
-                
-                crm_event = {
-                    "type": "NOTE",
-                    "description": f"Kontakt als SPAM markiert: {contact_email}",
-                    "tags": ["SPAM_CONTACT", "BLACKLIST"]
-                }
-                
-                url = f"https://{orchestrator.weclapp_domain}.weclapp.com/webapp/api/v2/crmEvent"
-                
-                async with session.post(url, headers=headers, json=crm_event) as response:
-                    result = {
-                        "success": response.status == 201,
-                        "action": "marked_spam",
-                        "message": f"{contact_email} als Spam markiert"
-                    }
-        
+            crm_event = {
+                "type": "NOTE",
+                "description": f"Kontakt als SPAM markiert: {contact_email}",
+                "tags": ["SPAM_CONTACT", "BLACKLIST"]
+            }
+            
+            try:
+                await get_weclapp_client().post("crmEvent", json=crm_event, api_version="v2")
+                success = True
+            except WeClappError:
+                success = False
+            result = {
+                "success": success,
+                "action": "marked_spam",
+                "message": f"{contact_email} als Spam markiert"
+            }
+    
         # ACTION 4: Weitere Informationen einholen
         elif action == "request_info":
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "AuthenticationToken": orchestrator.weclapp_api_token,
-                    "Content-Type": "application/json"
-                }
-                
-                task_data = {
-                    "title": f"Weitere Infos einholen: {contact_email}",
-                    "description": f"Kontakt {contact_email} - Zusätzliche Informationen anfordern vor CRM-Aufnahme",
-                    "status": "OPEN",
-                    "priority": "MEDIUM",
-                    "dueDate": (now_berlin() + timedelta(days=2)).isoformat()
+            task_data = {
+                "title": f"Weitere Infos einholen: {contact_email}",
+                "description": f"Kontakt {contact_email} - Zusätzliche Informationen anfordern vor CRM-Aufnahme",
+                "status": "OPEN",
+                "priority": "MEDIUM",
+                "dueDate": (now_berlin() + timedelta(days=2)).isoformat()
+            }
+            
+            try:
+                task = await get_weclapp_client().post("task", json=task_data, api_version="v2")
+                result = {
+                    "success": True,
+                    "action": "info_requested",
+                    "task_id": task.get("id"),
+                    "message": f"Follow-up Task erstellt für {contact_email}"
                 }
-                
-                url = f"https://{orchestrator.weclapp_domain}.weclapp.com/webapp/api/v2/task"
-                
-                async with session.post(url, headers=headers, json=task_data) as response:
-                    if response.status == 201:
-                        task = await response.json()
-                        result = {
-                            "success": True,
-                            "action": "info_requested",
-                            "task_id": task.get("id"),
-                            "message": f"Follow-up Task erstellt für {contact_email}"
-                        }
-                    else:
-                        result = {"success": False, "error": f"Task creation failed: {response.status}"}
-        
+            except WeClappError as e:
+                result = {"success": False, "error": f"Task creation failed: {e.status_code}"}
+    
         else:
             raise HTTPException(status_code=400, detail=f"Unknown action: {action}")
         
@@ -5722,6 +6009,22 @@ async def system_status():
             "weclapp_configured": bool(orchestrator.weclapp_api_token),
             "apify_configured": bool(orchestrator.apify_token)
         },
+        "notification_dispatcher": get_notification_dispatcher().get_stats(),
+        "phone_index": get_phone_index().get_stats(),
+        "scheduler": get_job_scheduler().get_stats(),
+        "admission": get_admission_controller().get_stats(),
+        "mailboxes": get_mailbox_registry().get_stats(),
+        "graph_ingestion": get_graph_ingestion().get_stats(),
+        "tracing": get_tracer().get_stats(),
+        "stats_snapshots": get_stats_snapshot_cache().get_stats(),
+        "opportunity_mirror": get_opportunity_mirror().get_stats(),
+        "onedrive_folders": get_folder_resolver().get_stats(),
+        "sharing_links": get_sharing_link_registry().get_stats(),
+        "duplicate_index": get_email_tracking_db().duplicate_index.get_stats(),
+        "schema": get_migration_status(),
+        "snapshots": get_snapshot_manager().get_stats(),
+        "weclapp_fallback": get_weclapp_fallback_db().last_migration,
+        "weclapp_api": get_weclapp_client().get_stats(),
         "workflow_nodes": [
             "contact_lookup",
             "ai_analysis", 
@@ -5732,6 +6035,100 @@ async def system_status():
         ]
     }
 
+def runtime_metric_families():
+    """📈 Beim Scrape: Zustand von Admission Pools, Background-Tasks, Dispatcher Queue und Caches"""
+    channels = get_admission_controller().get_stats()["channels"]
+    yield ("admission_running", "gauge", "Running jobs per admission channel",
+           [({"channel": name}, c["running"]) for name, c in channels.items()])
+    yield ("admission_queued", "gauge", "Admitted jobs waiting for a slot per channel",
+           [({"channel": name}, c["queued"]) for name, c in channels.items()])
+    yield ("admission_rejected_total", "counter", "Webhook requests shed with 429 per channel",
+           [({"channel": name}, c["rejected"]) for name, c in channels.items()])
+    yield ("admission_wait_p95_seconds", "gauge", "p95 admission wait over recent jobs per channel",
+           [({"channel": name}, c["p95_wait_ms"] / 1000) for name, c in channels.items()])
+    
+    yield ("background_tasks_active", "gauge", "Tracked background tasks currently running",
+           [({}, get_task_registry().active_count)])
+    
+    dispatcher = get_notification_dispatcher().get_stats()
+    yield ("notification_queue_size", "gauge", "Zapier notifications waiting in the dispatcher queue",
+           [({"state": "queued"}, dispatcher["queue_size"]), ({"state": "batched"}, dispatcher["pending_items"])])
+    
+    snapshots = get_stats_snapshot_cache().get_stats()
+    yield ("stats_snapshot_requests_total", "counter", "Dashboard statistics snapshot lookups",
+           [({"result": "hit"}, snapshots["hits"]), ({"result": "miss"}, snapshots["misses"])])
+    
+    mirror = get_opportunity_mirror().get_stats()
+    if mirror["staleness_seconds"] is not None:
+        yield ("opportunity_mirror_staleness_seconds", "gauge", "Seconds since the last successful opportunity sync",
+               [({}, mirror["staleness_seconds"])])
+
+    databases = get_snapshot_manager().get_stats()["databases"]
+    saved = {name: db for name, db in databases.items() if db.get("last_snapshot_ts")}
+    if saved:
+        yield ("db_snapshot_duration_seconds", "gauge", "Duration of the last snapshot per database",
+               [({"db": name}, db["duration_ms"] / 1000) for name, db in saved.items()])
+        yield ("db_snapshot_size_bytes", "gauge", "Size of the last snapshot per database",
+               [({"db": name, "kind": kind}, db[f"{kind}_bytes"]) for name, db in saved.items() for kind in ("size", "compressed")])
+        yield ("db_snapshot_age_seconds", "gauge", "Seconds since the last snapshot per database",
+               [({"db": name}, time.time() - db["last_snapshot_ts"]) for name, db in saved.items()])
+
+get_metrics_registry().add_collector("runtime", runtime_metric_families)
+
+@app.get("/metrics")
+async def metrics():
+    """📈 Prometheus Textformat (Counter, Gauges, Histogramme)"""
+    return FastAPIResponse(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/debug/traces")
+async def debug_traces(window: int = 3600, source: str = "memory", channel: Optional[str] = None, limit: int = 20):
+    """
+    🔭 Latenz je Stage (LangGraph Nodes, Pipelines, externe Calls) über die letzten ``window`` Sekunden
+
+    source=memory: Ringpuffer (letzte Spans), source=db: SQLite (längere Zeiträume)
+    """
+    if source not in ("memory", "db"):
+        raise HTTPException(status_code=400, detail="source must be 'memory' or 'db'")
+    tracer = get_tracer()
+    return {
+        **tracer.get_stage_latencies(window_seconds=window, source=source, channel=channel),
+        "recent_traces": tracer.get_recent_traces(limit=limit),
+    }
+
+@app.get("/debug/traces/{trace_id}")
+async def debug_trace_detail(trace_id: str):
+    """🔭 Alle Spans eines Traces (chronologisch)"""
+    spans = get_tracer().get_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Trace not found: {trace_id}")
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/admin/admission")
+async def admission_status():
+    """🚦 ADMIN: Live-Auslastung der Webhook-Pools (laufend, Warteschlange, Wartezeiten, Ablehnungen)"""
+    return get_admission_controller().get_stats()
+
+@app.get("/admin/snapshots")
+async def snapshot_status():
+    """💾 ADMIN: Store, letzte Snapshots (Dauer, Größe roh/komprimiert) und letzter Restore je Datenbank"""
+    return get_snapshot_manager().get_stats()
+
+@app.post("/admin/snapshots")
+async def create_snapshots(force: bool = False):
+    """💾 ADMIN: Snapshot aller Datenbanken sofort (force=true sichert auch unveränderte)"""
+    manager = get_snapshot_manager()
+    if not manager.enabled:
+        raise HTTPException(status_code=400, detail="SNAPSHOT_STORE is not configured")
+    return {"results": await manager.snapshot_all(force=force)}
+
+@app.post("/admin/scheduler/run/{job_name}")
+async def run_scheduled_job(job_name: str):
+    """⏰ ADMIN: Scheduler-Job sofort ausführen (next_run bleibt unverändert)"""
+    try:
+        return await get_job_scheduler().run_job_now(job_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_name}")
+
 @app.post("/admin/cache/reset")
 async def reset_contact_cache(request: Request):
     """🗑️ ADMIN: Reset Email Database Cache"""
@@ -5912,11 +6309,12 @@ async def get_payment_stats():
     try:
         from modules.database.payment_matching import get_payment_statistics
         
-        stats = get_payment_statistics()
+        stats, snapshot = cached_statistics("payment_statistics", get_payment_statistics, (SOURCE_PAYMENTS,))
         
         return {
             "status": "success",
-            "statistics": stats
+            "statistics": stats,
+            "snapshot": snapshot
         }
         
     except Exception as e:
@@ -5974,11 +6372,12 @@ async def get_invoice_statistics():
     try:
         from modules.database.invoice_tracking_db import get_invoice_statistics
         
-        stats = get_invoice_statistics()
+        stats, snapshot = cached_statistics("invoice_statistics", get_invoice_statistics, (SOURCE_INVOICES,))
         
         return {
             "status": "success",
-            "statistics": stats
+            "statistics": stats,
+            "snapshot": snapshot
         }
         
     except Exception as e:
@@ -5986,6 +6385,23 @@ async def get_invoice_statistics():
         raise HTTPException(status_code=500, detail=f"Statistics failed: {str(e)}")
 
 
+@app.get("/api/invoices/critical-points")
+async def get_invoice_critical_points():
+    """🔴 Kritische Punkte der Rechnungsüberwachung (Invoice Dashboard)"""
+    try:
+        critical, snapshot = cached_statistics(
+            "invoice_critical_points",
+            invoice_monitoring_db.get_critical_points,
+            (SOURCE_MONITORING,)
+        )
+        
+        return {**critical, "snapshot": snapshot}
+        
+    except Exception as e:
+        logger.error(f"❌ Critical points error: {e}")
+        raise HTTPException(status_code=500, detail=f"Critical points failed: {str(e)}")
+
+
 @app.get("/api/invoice/recent")
 async def get_recent_invoices(limit: int = 20):
     """Get recent invoices"""
@@ -6044,11 +6460,12 @@ async def get_opportunity_statistics():
     """
     try:
         from modules.database.sales_pipeline_db import get_pipeline_statistics
-        stats = get_pipeline_statistics()
+        stats, snapshot = cached_statistics("pipeline_statistics", get_pipeline_statistics, (SOURCE_PIPELINE,))
         
         return {
             "status": "success",
-            "statistics": stats
+            "statistics": stats,
+            "snapshot": snapshot
         }
         
     except Exception as e:
@@ -6375,13 +6792,14 @@ async def get_umsatzabgleich_statistics_endpoint():
     - Monthly trends
     """
     try:
-        engine = UmsatzabgleichEngine()
-        
         # Get statistics for last 30 days
         end_date = datetime.now()
         start_date = end_date - timedelta(days=30)
         
-        report = engine.get_umsatzabgleich_report(
+        report, snapshot = cached_statistics(
+            "umsatzabgleich_report",
+            lambda start, end: UmsatzabgleichEngine().get_umsatzabgleich_report(start, end),
+            (SOURCE_MONITORING,),
             start_date.strftime('%Y-%m-%d'),
             end_date.strftime('%Y-%m-%d')
         )
@@ -6394,12 +6812,13 @@ async def get_umsatzabgleich_statistics_endpoint():
             "variances": report.get("variances", {}),
             "transaction_count": len(report.get("bank_transactions", {}).get("transactions", [])),
             "invoice_count": len(report.get("invoice_data", {}).get("invoices", [])),
-            "last_updated": now_berlin().isoformat()
+            "last_updated": snapshot["computed_at"]
         }
         
         return {
             "status": "success",
-            "statistics": stats
+            "statistics": stats,
+            "snapshot": snapshot
         }
         
     except Exception as e:
@@ -6508,16 +6927,18 @@ async def add_opportunity_activity(opportunity_id: int, request: Request):
 
 
 @app.get("/api/opportunity/search")
-async def search_opportunities_endpoint(q: str):
+async def search_opportunities_endpoint(q: str, limit: int = 50, stage: Optional[str] = None):
     """
     Search Opportunities
     
     Query Parameters:
-    - q: Search query (searches title, company, contact)
+    - q: Search query (Prefix-Suche über title, company, contact, description, activities)
+    - limit: Max. Anzahl Ergebnisse
+    - stage: Optional nur eine Pipeline-Stage
     """
     try:
         from modules.database.sales_pipeline_db import search_opportunities
-        opportunities = search_opportunities(q)
+        opportunities = search_opportunities(q, limit=limit, stage=stage)
         
         return {
             "status": "success",
@@ -6528,6 +6949,38 @@ async def search_opportunities_endpoint(q: str):
         logger.error(f"❌ Search opportunities error: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+
+@app.get("/api/search")
+async def combined_search_endpoint(q: str, limit: int = 10, types: str = "opportunities,invoices,contacts"):
+    """
+    🔎 Kombinierte Suche über Opportunities, Rechnungen und Kontakte (FTS5, BM25)
+    
+    Query Parameters:
+    - q: Suchbegriffe (Prefix-Suche, OR/AND/NOT möglich)
+    - limit: Max. Ergebnisse je Typ
+    - types: Kommagetrennt, Default alle drei
+    """
+    from modules.database.crm_search_index import SEARCH_TYPES, search_all
+    
+    requested = [t.strip() for t in types.split(",") if t.strip()]
+    unknown = [t for t in requested if t not in SEARCH_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}")
+    
+    started = time.perf_counter()
+    try:
+        results = search_all(q, limit=limit, types=requested)
+    except Exception as e:
+        logger.error(f"❌ Combined search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    
+    return {
+        "query": q,
+        "counts": {search_type: len(hits) for search_type, hits in results.items()},
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results
+    }
+
 # ===============================
 # � SIMPLE EMPLOYEE AUTHENTICATION
 # ===============================
@@ -6675,6 +7128,7 @@ async def invoice_dashboard(token: str = None):
         <div class="header">
             <h1>📊 Invoice & Payment Dashboard</h1>
             <p>C&D Technologies - Rechnungsübersicht</p>
+            <p id="snapshot-info" style="font-size: 0.8rem; opacity: 0.8;">Stand: -</p>
         </div>
         
         <div class="container">
@@ -6797,6 +7251,13 @@ async def invoice_dashboard(token: str = None):
         </div>
         
         <script>
+            function showSnapshot(snapshot) {
+                if (!snapshot) return;
+                const computedAt = new Date(snapshot.computed_at).toLocaleTimeString('de-DE');
+                document.getElementById('snapshot-info').textContent =
+                    `Stand: ${computedAt} (vor ${Math.round(snapshot.age_seconds)}s)`;
+            }
+            
             async function loadInvoices() {
                 try {
                     await Promise.all([
@@ -6817,6 +7278,7 @@ async def invoice_dashboard(token: str = None):
                     const response = await fetch('/api/invoices/critical-points');
                     const data = await response.json();
                     
+                    showSnapshot(data.snapshot);
                     document.getElementById('pending-incoming').textContent = `€${data.open_incoming_total?.toLocaleString('de-DE') || '0,00'}`;
                     document.getElementById('pending-outgoing').textContent = `€${data.open_outgoing_total?.toLocaleString('de-DE') || '0,00'}`;
                     document.getElementById('cash-flow-balance').textContent = `€${data.cash_flow_balance?.toLocaleString('de-DE') || '0,00'}`;
@@ -6904,6 +7366,7 @@ async def sales_pipeline_dashboard(token: str = None):
         <div class="header">
             <h1>📈 Sales Pipeline Dashboard</h1>
             <p>C&D Technologies - Verkaufsprozess Übersicht</p>
+            <p id="snapshot-info" style="font-size: 0.8rem; opacity: 0.8;">Stand: -</p>
         </div>
         
         <div class="container">
@@ -6988,8 +7451,19 @@ async def sales_pipeline_dashboard(token: str = None):
         </div>
         
         <script>
+            function showSnapshot(snapshot) {
+                if (!snapshot) return;
+                const computedAt = new Date(snapshot.computed_at).toLocaleTimeString('de-DE');
+                document.getElementById('snapshot-info').textContent =
+                    `Stand: ${computedAt} (vor ${Math.round(snapshot.age_seconds)}s)`;
+            }
+            
             async function loadPipeline() {
                 try {
+                    const response = await fetch('/api/opportunity/statistics');
+                    const data = await response.json();
+                    showSnapshot(data.snapshot);
+                    
                     // Hier würden echte WeClapp API-Calls erfolgen für TODOs
                     await loadTodos();
                     console.log('📈 Sales pipeline data loaded');
@@ -7070,6 +7544,7 @@ async def umsatzabgleich_dashboard(token: str = None):
         <div class="header">
             <h1>💰 Umsatzabgleich Dashboard</h1>
             <p>Bank-Transaktionen vs. Rechnungen Reconciliation</p>
+            <p id="snapshot-info" style="font-size: 0.8rem; opacity: 0.8;">Stand: -</p>
         </div>
         
         <div class="container">
@@ -7176,6 +7651,13 @@ async def umsatzabgleich_dashboard(token: str = None):
             // Load initial data
             loadUmsatzabgleichData();
             
+            function showSnapshot(snapshot) {
+                if (!snapshot) return;
+                const computedAt = new Date(snapshot.computed_at).toLocaleTimeString('de-DE');
+                document.getElementById('snapshot-info').textContent =
+                    `Stand: ${computedAt} (vor ${Math.round(snapshot.age_seconds)}s)`;
+            }
+            
             async function loadUmsatzabgleichData() {
                 try {
                     const response = await fetch('/api/umsatzabgleich/statistics');
@@ -7183,6 +7665,7 @@ async def umsatzabgleich_dashboard(token: str = None):
                     
                     if (data.status === 'success') {
                         const stats = data.statistics;
+                        showSnapshot(data.snapshot);
                         
                         document.getElementById('matching-rate').textContent = 
                             (stats.matching_rate?.matching_percentage || 0).toFixed(1) + '%';
@@ -7474,7 +7957,8 @@ async def preview_email_batch(request: Request):
     """
     👀 PREVIEW: Zeigt welche E-Mails verarbeitet werden würden (ohne zu verarbeiten)
     
-    Query params: query, start_date, end_date, max_emails
+    Query params: query, start_date, end_date, max_emails, source (local|graph)
+    Standard ist der lokale FTS5 Index; Graph API nur als Fallback bzw. mit source=graph.
     """
     try:
         # Get params from request
@@ -7482,9 +7966,15 @@ async def preview_email_batch(request: Request):
         start_date = request.query_params.get("start_date", "2025-01-01")
         end_date = request.query_params.get("end_date", "2025-12-31")
         max_emails = int(request.query_params.get("max_emails", "100"))
+        source = request.query_params.get("source", "local")
         
-        # Search emails
-        search_result = await search_emails_internal(query, start_date, end_date, max_emails)
+        # Search emails (lokaler Index zuerst)
+        search_result = {"success": False}
+        if source == "local":
+            search_result = search_emails_local(query, start_date, end_date, max_emails)
+        if not search_result.get("success") or not search_result.get("emails"):
+            source = "graph"
+            search_result = await search_emails_internal(query, start_date, end_date, max_emails)
         
         if not search_result.get("success"):
             raise HTTPException(status_code=500, detail=search_result.get("error"))
@@ -7498,6 +7988,7 @@ async def preview_email_batch(request: Request):
         return {
             "status": "preview",
             "query": query,
+            "source": source,
             "date_range": {"start": start_date, "end": end_date},
             "summary": {
                 "total_found": len(emails),
@@ -7508,81 +7999,146 @@ async def preview_email_batch(request: Request):
             },
             "sample_emails": high_priority[:10]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Preview error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def search_emails_internal(query: str, start_date: str, end_date: str, limit: int = 100):
-    """Internal helper for email search with smart filtering"""
+@app.get("/api/emails/search")
+async def search_emails_endpoint(q: str, limit: int = 50, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """
+    🔎 Dashboard-Suche über gespeicherte Emails + Anhänge (lokaler FTS5 Index, BM25)
+    """
+    started = time.perf_counter()
+    search_result = search_emails_local(q, start_date, end_date, limit)
+    if not search_result.get("success"):
+        raise HTTPException(status_code=500, detail=search_result.get("error"))
+    
+    return {
+        "query": q,
+        "count": len(search_result["emails"]),
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": search_result["emails"]
+    }
+
+
+def _score_invoice_email(subject: str, sender: str, preview: str, has_attachments: bool) -> Dict[str, Any]:
+    """SMART SCORING: Rechnungs-Relevanz einer Email (Graph- und lokale Suche)"""
+    subject = (subject or "").lower()
+    sender = (sender or "").lower()
+    preview = (preview or "").lower()
+    score = 0
+    
+    # Strong invoice keywords (+3)
+    if any(kw in subject for kw in ["rechnung", "invoice", "faktura"]):
+        score += 3
+    
+    # Medium keywords (+2)
+    if any(kw in subject or kw in preview for kw in ["bezahlung", "payment", "betrag"]):
+        score += 2
+    
+    # Trusted senders (+2)
+    if any(domain in sender for domain in ["paypal.com", "stripe.com", "lexoffice.de"]):
+        score += 2
+    
+    # Has attachments (+1)
+    if has_attachments:
+        score += 1
+    
+    # Skip spam
+    skip_keywords = ["newsletter", "marketing", "unsubscribe"]
+    is_spam = any(kw in subject or kw in preview for kw in skip_keywords)
+    
+    auto_senders = ["noreply", "no-reply", "donotreply"]
+    is_auto = any(auto in sender for auto in auto_senders)
+    
+    recommendation = "PROCESS" if (score >= 3 and not is_spam and not is_auto) else "SKIP"
+    return {"invoice_score": score, "recommendation": recommendation}
+
+
+def search_emails_local(query: str, start_date: Optional[str], end_date: Optional[str], limit: int = 100):
+    """Email-Suche über den lokalen FTS5 Index (email_data.db) mit demselben Scoring wie die Graph-Suche"""
+    try:
+        hits = get_email_search_index(DB_PATH).search(query, start_date, end_date, limit)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Local email search failed: {e}")
+        return {"success": False, "error": str(e)}
+    
+    results = []
+    for hit in hits:
+        has_attachments = bool(hit["attachments_count"] or hit["attachments"])
+        results.append({
+            "id": hit["message_id"] or hit["id"],
+            "subject": hit["subject"],
+            "from": (hit["sender"] or "").lower(),
+            "received_date": hit["received_date"],
+            "has_attachments": has_attachments,
+            "snippet": hit["snippet"],
+            "matched_attachments": [a["filename"] for a in hit["attachments"]],
+            "rank": hit["rank"],
+            **_score_invoice_email(hit["subject"], hit["sender"], hit["preview"], has_attachments)
+        })
+    
+    return {"success": True, "emails": results}
+
+
+async def search_emails_internal(query: str, start_date: str, end_date: str, limit: int = 100,
+                                 mailboxes: Optional[List[str]] = None):
+    """Internal helper for email search with smart filtering (parallel über alle Such-Postfächer)"""
     try:
         from modules.auth.get_graph_token import get_graph_token
         
         access_token = await get_graph_token("mail")
-        user_email = "mj@cundd.net"
+        registry = get_mailbox_registry()
+        mailboxes = mailboxes or registry.search_mailboxes()
         
         # Build Graph API query
         filter_query = f"receivedDateTime ge {start_date}T00:00:00Z and receivedDateTime le {end_date}T23:59:59Z"
-        search_url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages?$filter={filter_query}&$search=\"{query}\"&$top={limit}&$select=id,subject,from,receivedDateTime,hasAttachments,bodyPreview"
-        
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
         
+        async def search_mailbox(client: httpx.AsyncClient, user_email: str):
+            search_url = f"{GRAPH_BASE_URL}/users/{user_email}/messages?$filter={filter_query}&$search=\"{query}\"&$top={limit}&$select=id,subject,from,receivedDateTime,hasAttachments,bodyPreview"
+            graph_budget = registry.graph_budget(user_email)
+            async with graph_budget.request():
+                response = await client.get(search_url, headers=headers)
+            graph_budget.record_response(response)
+            return user_email, response
+        
         async with httpx.AsyncClient() as client:
-            response = await client.get(search_url, headers=headers)
+            responses = await asyncio.gather(*(search_mailbox(client, mailbox) for mailbox in mailboxes))
         
-        if response.status_code != 200:
-            return {"success": False, "error": f"Graph API error: {response.status_code}"}
+        failed = [f"{mailbox}: {response.status_code}" for mailbox, response in responses if response.status_code != 200]
+        if len(failed) == len(responses):
+            return {"success": False, "error": f"Graph API error: {', '.join(failed)}"}
         
-        emails_data = response.json().get("value", [])
         results = []
-        
-        for email in emails_data:
-            subject = email.get("subject", "").lower()
-            sender = email.get("from", {}).get("emailAddress", {}).get("address", "").lower()
-            preview = email.get("bodyPreview", "").lower()
-            
-            # SMART SCORING
-            score = 0
-            
-            # Strong invoice keywords (+3)
-            if any(kw in subject for kw in ["rechnung", "invoice", "faktura"]):
-                score += 3
-            
-            # Medium keywords (+2)
-            if any(kw in subject or kw in preview for kw in ["bezahlung", "payment", "betrag"]):
-                score += 2
-            
-            # Trusted senders (+2)
-            if any(domain in sender for domain in ["paypal.com", "stripe.com", "lexoffice.de"]):
-                score += 2
-            
-            # Has attachments (+1)
-            if email.get("hasAttachments"):
-                score += 1
+        for user_email, response in responses:
+            if response.status_code != 200:
+                logger.warning(f"⚠️ Email search failed for {user_email}: {response.status_code}")
+                continue
             
-            # Skip spam
-            skip_keywords = ["newsletter", "marketing", "unsubscribe"]
-            is_spam = any(kw in subject or kw in preview for kw in skip_keywords)
-            
-            auto_senders = ["noreply", "no-reply", "donotreply"]
-            is_auto = any(auto in sender for auto in auto_senders)
-            
-            recommendation = "PROCESS" if (score >= 3 and not is_spam and not is_auto) else "SKIP"
-            
-            results.append({
-                "id": email.get("id"),
-                "subject": email.get("subject"),
-                "from": sender,
-                "received_date": email.get("receivedDateTime"),
-                "has_attachments": email.get("hasAttachments", False),
-                "invoice_score": score,
-                "recommendation": recommendation
-            })
+            for email in response.json().get("value", []):
+                sender = email.get("from", {}).get("emailAddress", {}).get("address", "").lower()
+                
+                results.append({
+                    "id": email.get("id"),
+                    "mailbox": user_email,
+                    "subject": email.get("subject"),
+                    "from": sender,
+                    "received_date": email.get("receivedDateTime"),
+                    "has_attachments": email.get("hasAttachments", False),
+                    **_score_invoice_email(
+                        email.get("subject", ""), sender, email.get("bodyPreview", ""), email.get("hasAttachments", False)
+                    )
+                })
         
-        return {"success": True, "emails": results}
+        results.sort(key=lambda email: email.get("received_date") or "", reverse=True)
+        return {"success": True, "emails": results[:limit]}
         
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+🧪 ADMISSION CONTROL TEST
+
+1. Background-Task wird vor dem Start abgebrochen → pending wird zurückgegeben
+2. Abbruch beim Warten auf einen Slot → pending genau einmal zurückgegeben
+3. Spawnen schlägt fehl → Ticket wird verworfen
+"""
+
+import asyncio
+import gc
+import sys
+import warnings
+
+from modules.scheduler.admission import (
+    CHANNEL_EMAIL,
+    AdmissionController,
+    ChannelPolicy,
+    spawn_with_ticket,
+)
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+def _controller() -> AdmissionController:
+    return AdmissionController({CHANNEL_EMAIL: ChannelPolicy(concurrency=1, queue_limit=5, priority=2)},
+                               total_concurrency=2)
+
+
+def _pending(controller: AdmissionController) -> int:
+    return controller.get_stats()["channels"][CHANNEL_EMAIL]["queued"]
+
+
+async def _process(done: list):
+    done.append(True)
+
+
+async def _cancel_before_start():
+    controller = _controller()
+    done = []
+    ticket = controller.admit(CHANNEL_EMAIL)
+    task = spawn_with_ticket(ticket, _process(done), name="email-test:cancelled")
+    task.cancel()  # vor dem ersten Schritt
+    await asyncio.gather(task, return_exceptions=True)
+    return _pending(controller), done
+
+
+def test_cancel_before_start_releases_pending():
+    """Test 1: Task nie gestartet → kein Leck in pending, keine Warnung"""
+    print_section("TEST 1: Abbruch vor dem Start")
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        pending, done = asyncio.run(_cancel_before_start())
+        gc.collect()
+    never_awaited = [w for w in caught if "never awaited" in str(w.message)]
+    print(f"  pending nach Abbruch: {pending} | ausgeführt: {bool(done)} | Warnungen: {len(never_awaited)}")
+
+    passed = pending == 0 and not done and not never_awaited
+    print(f"\n{'✅ Cancel Before Start Test PASSED' if passed else '❌ Cancel Before Start Test FAILED'}")
+    assert passed
+
+
+async def _cancel_while_waiting():
+    controller = _controller()
+    release = asyncio.Event()
+
+    async def blocking():
+        await release.wait()
+
+    first = spawn_with_ticket(controller.admit(CHANNEL_EMAIL), blocking(), name="email-test:first")
+    await asyncio.sleep(0.01)
+    second = spawn_with_ticket(controller.admit(CHANNEL_EMAIL), _process([]), name="email-test:second")
+    await asyncio.sleep(0.01)
+    waiting = controller.get_stats()["waiting"]
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    release.set()
+    await first
+    return waiting, _pending(controller), controller.get_stats()["running"]
+
+
+def test_cancel_while_waiting_counts_once():
+    """Test 2: Abbruch in der Warteschlange → pending nicht doppelt reduziert"""
+    print_section("TEST 2: Abbruch beim Warten")
+
+    waiting, pending, running = asyncio.run(_cancel_while_waiting())
+    print(f"  wartend vor Abbruch: {waiting} | pending danach: {pending} | running: {running}")
+
+    passed = waiting == 1 and pending == 0 and running == 0
+    print(f"\n{'✅ Cancel While Waiting Test PASSED' if passed else '❌ Cancel While Waiting Test FAILED'}")
+    assert passed
+
+
+def test_spawn_failure_discards_ticket():
+    """Test 3: create_task ohne Event Loop schlägt fehl → Ticket zurück"""
+    print_section("TEST 3: Spawn-Fehler")
+
+    controller = _controller()
+    ticket = controller.admit(CHANNEL_EMAIL)
+    raised = False
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            spawn_with_ticket(ticket, _process([]), name="email-test:no-loop")
+        except RuntimeError:
+            raised = True
+        gc.collect()
+    never_awaited = [w for w in caught if "never awaited" in str(w.message)]
+    print(f"  RuntimeError: {raised} | pending: {_pending(controller)} | Warnungen: {len(never_awaited)}")
+
+    passed = raised and _pending(controller) == 0 and not never_awaited
+    print(f"\n{'✅ Spawn Failure Test PASSED' if passed else '❌ Spawn Failure Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 ADMISSION CONTROL TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Abbruch vor dem Start", test_cancel_before_start_releases_pending),
+        ("Abbruch beim Warten", test_cancel_while_waiting_counts_once),
+        ("Spawn-Fehler", test_spawn_failure_discards_ticket),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
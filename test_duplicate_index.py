@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+🧪 DUPLICATE INDEX TEST
+
+1. Bloom-Filter: unbekannter Schlüssel ohne SQLite, bekannter wird bestätigt
+2. Zeitfenster: Content-Hash läuft ab, message_id bleibt dauerhaft
+3. Dritte Kopie verweist auf das erste Vorkommen (ref bleibt stehen)
+4. Erstbefüllung aus processed_emails und processed_documents
+5. Fehlende Dokument-Schlüssel werden beim nächsten rebuild() nachgezogen
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from modules.database.duplicate_index import (
+    KIND_CONTENT_HASH,
+    KIND_DOCUMENT_HASH,
+    KIND_DOCUMENT_MESSAGE,
+    KIND_HEURISTIC,
+    KIND_MESSAGE_ID,
+    KIND_ONEDRIVE_PATH,
+    DuplicateIndex,
+    heuristic_key,
+)
+from modules.database.schema_migrations import EMAIL_DATA_MIGRATIONS, run_migrations
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+def _create_processed_emails(db_path: str, emails):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE processed_emails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id TEXT NOT NULL UNIQUE,
+            user_email TEXT NOT NULL,
+            processed_date TEXT NOT NULL,
+            content_hash TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO processed_emails (message_id, user_email, processed_date, content_hash) VALUES (?, ?, ?, ?)",
+        emails,
+    )
+    conn.commit()
+    conn.close()
+
+
+def _create_documents(db_path: str, documents):
+    run_migrations(db_path, EMAIL_DATA_MIGRATIONS, component="email_data")
+    _insert_documents(db_path, documents)
+
+
+def _insert_documents(db_path: str, documents):
+    conn = sqlite3.connect(db_path)
+    conn.executemany("""
+        INSERT INTO processed_documents (
+            message_id, sender, subject, attachment_filename, document_hash, onedrive_path, processing_timestamp
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, documents)
+    conn.commit()
+    conn.close()
+
+
+def _document(n: int, timestamp: str = None):
+    return (f"<doc-{n}@test>", "lieferant@example.com", f"Rechnung {n}", f"RE-{n}.pdf",
+            f"hash-{n}", f"/Rechnungen/RE-{n}.pdf", timestamp or datetime.now().astimezone().isoformat())
+
+
+def _ref(index: DuplicateIndex, kind: str, key: str):
+    matches = index.check([(kind, key)], window_hours=24)
+    return matches[0]["ref"] if matches else None
+
+
+def test_bloom_negative_and_positive():
+    """Test 1: Bloom-Negativ ohne DB-Abfrage, Positiv wird per SQLite bestätigt"""
+    print_section("TEST 1: Bloom-Filter")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = DuplicateIndex(os.path.join(tmp_dir, "email_tracking.db"), document_db_path=None)
+        index.record([(KIND_MESSAGE_ID, "<known@test>", "<known@test>")])
+        unknown = index.check([(KIND_MESSAGE_ID, "<unknown@test>")])
+        known = index.check([(KIND_MESSAGE_ID, "<known@test>")])
+        stats = index.get_stats()
+
+    print(f"  unbekannt: {unknown} | bekannt: {[m['ref'] for m in known]}")
+    print(f"  bloom_negative={stats['bloom_negative']} confirmed={stats['confirmed']}")
+
+    passed = (unknown == [] and [m["ref"] for m in known] == ["<known@test>"]
+              and stats["bloom_negative"] == 1 and stats["confirmed"] == 1)
+    print(f"\n{'✅ Bloom Filter Test PASSED' if passed else '❌ Bloom Filter Test FAILED'}")
+    assert passed
+
+
+def test_windowed_vs_permanent_kinds():
+    """Test 2: Content-Hash nur im Zeitfenster, message_id immer"""
+    print_section("TEST 2: Zeitfenster vs. dauerhaft")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = DuplicateIndex(os.path.join(tmp_dir, "email_tracking.db"), document_db_path=None)
+        index.record([(KIND_MESSAGE_ID, "<old@test>", "<old@test>"),
+                      (KIND_CONTENT_HASH, "content-old", "<old@test>")])
+        conn = sqlite3.connect(index.db_path)
+        conn.execute("UPDATE duplicate_keys SET created_at = ?",
+                     ((datetime.utcnow() - timedelta(hours=48)).isoformat(),))
+        conn.commit()
+        conn.close()
+        message = index.check([(KIND_MESSAGE_ID, "<old@test>")], window_hours=24)
+        content = index.check([(KIND_CONTENT_HASH, "content-old")], window_hours=24)
+        content_wide = index.check([(KIND_CONTENT_HASH, "content-old")], window_hours=72)
+        expired = index.get_stats()["expired"]
+
+    print(f"  message_id nach 48h: {len(message)} | content_hash (24h): {len(content)} | (72h): {len(content_wide)}")
+
+    passed = len(message) == 1 and content == [] and len(content_wide) == 1 and expired == 1
+    print(f"\n{'✅ Window Test PASSED' if passed else '❌ Window Test FAILED'}")
+    assert passed
+
+
+def test_third_copy_matches_first_ref():
+    """Test 3: Kopie 3 verweist auf Kopie 1, Zeitfenster läuft trotzdem weiter"""
+    print_section("TEST 3: Erste Referenz bleibt")
+
+    key = heuristic_key("lieferant@example.com", "Rechnung", "RE-1.pdf")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = DuplicateIndex(os.path.join(tmp_dir, "email_tracking.db"), document_db_path=None)
+        index.record([(KIND_HEURISTIC, key, "1"), (KIND_CONTENT_HASH, "content", "<first@test>")])
+        conn = sqlite3.connect(index.db_path)
+        conn.execute("UPDATE duplicate_keys SET created_at = ?",
+                     ((datetime.utcnow() - timedelta(hours=20)).isoformat(),))
+        conn.commit()
+        conn.close()
+        index.record([(KIND_HEURISTIC, key, "2"), (KIND_CONTENT_HASH, "content", "<second@test>")])
+        index.record([(KIND_HEURISTIC, key, "3"), (KIND_CONTENT_HASH, "content", "<third@test>")])
+        heuristic_ref = _ref(index, KIND_HEURISTIC, key)
+        content_ref = _ref(index, KIND_CONTENT_HASH, "content")
+        created_at = index.check([(KIND_HEURISTIC, key)])[0]["created_at"]
+
+    refreshed = datetime.utcnow() - datetime.fromisoformat(created_at) < timedelta(hours=1)
+    print(f"  heuristic ref: {heuristic_ref} | content_hash ref: {content_ref} | Fenster erneuert: {refreshed}")
+
+    passed = heuristic_ref == "1" and content_ref == "<first@test>" and refreshed
+    print(f"\n{'✅ First Ref Test PASSED' if passed else '❌ First Ref Test FAILED'}")
+    assert passed
+
+
+def test_backfill_from_existing_tables():
+    """Test 4: Bestehende processed_emails / processed_documents landen im Index"""
+    print_section("TEST 4: Erstbefüllung")
+
+    recent = datetime.now().isoformat()
+    heuristic = heuristic_key("lieferant@example.com", "Rechnung", "RE.pdf")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tracking_path = os.path.join(tmp_dir, "email_tracking.db")
+        documents_path = os.path.join(tmp_dir, "email_data.db")
+        _create_processed_emails(tracking_path, [
+            ("<mail-1@test>", "info@test", recent, "content-a"),
+            ("<mail-2@test>", "info@test", recent, "content-a"),
+            ("<mail-3@test>", "info@test", recent, "content-a"),
+        ])
+        _create_documents(documents_path, [
+            ("<doc-1@test>", "lieferant@example.com", "Rechnung", "RE.pdf", "hash-1", "/RE-1.pdf", recent),
+            ("<doc-2@test>", "lieferant@example.com", "Rechnung", "RE.pdf", "hash-2", "/RE-2.pdf", recent),
+        ])
+        index = DuplicateIndex(tracking_path, document_db_path=documents_path)
+        refs = {
+            "message_id": _ref(index, KIND_MESSAGE_ID, "<mail-2@test>"),
+            "content_hash": _ref(index, KIND_CONTENT_HASH, "content-a"),
+            "document_message_id": _ref(index, KIND_DOCUMENT_MESSAGE, "<doc-2@test>"),
+            "document_hash": _ref(index, KIND_DOCUMENT_HASH, "hash-1"),
+            "onedrive_path": _ref(index, KIND_ONEDRIVE_PATH, "/RE-2.pdf"),
+            "heuristic": _ref(index, KIND_HEURISTIC, heuristic),
+        }
+        rebuild = index.last_rebuild
+
+    print(f"  Referenzen: {refs}")
+    print(f"  backfilled={rebuild['backfilled']} documents_synced={rebuild['documents_synced']}")
+
+    passed = refs == {
+        "message_id": "<mail-2@test>",
+        "content_hash": "<mail-1@test>",
+        "document_message_id": "2",
+        "document_hash": "1",
+        "onedrive_path": "2",
+        "heuristic": "1",
+    } and rebuild["documents_synced"] == 2
+    print(f"\n{'✅ Backfill Test PASSED' if passed else '❌ Backfill Test FAILED'}")
+    assert passed
+
+
+def test_resync_missing_document_keys():
+    """Test 5: Restore / fehlgeschlagenes record() → Schlüssel kommen per Watermark zurück"""
+    print_section("TEST 5: Nachziehen fehlender Dokument-Schlüssel")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tracking_path = os.path.join(tmp_dir, "email_tracking.db")
+        documents_path = os.path.join(tmp_dir, "email_data.db")
+        _create_documents(documents_path, [_document(1)])
+        index = DuplicateIndex(tracking_path, document_db_path=documents_path)
+
+        # Dokument 2 gespeichert, record() danach fehlgeschlagen
+        _insert_documents(documents_path, [_document(2)])
+        missing_before = index.check([(KIND_DOCUMENT_HASH, "hash-2")])
+        synced = index.sync_documents()
+        after_sync = _ref(index, KIND_DOCUMENT_HASH, "hash-2")
+
+        # Snapshot-Restore der Tracking-DB: Schlüssel und Watermark auf Stand vor Dokument 3/4
+        snapshot_path = os.path.join(tmp_dir, "snapshot.db")
+        source = sqlite3.connect(tracking_path)
+        snapshot = sqlite3.connect(snapshot_path)
+        source.backup(snapshot)
+        source.close()
+        snapshot.close()
+        _insert_documents(documents_path, [_document(3), _document(4)])
+        index.sync_documents()
+        restore = sqlite3.connect(tracking_path)
+        snapshot = sqlite3.connect(snapshot_path)
+        snapshot.backup(restore)
+        restore.close()
+        snapshot.close()
+        rebuild = index.rebuild()
+        restored_refs = [_ref(index, KIND_DOCUMENT_MESSAGE, f"<doc-{n}@test>") for n in (1, 2, 3, 4)]
+
+    print(f"  vor Sync: {missing_before} | synced={synced} | ref danach: {after_sync}")
+    print(f"  nach Restore: documents_synced={rebuild['documents_synced']} refs={restored_refs}")
+
+    passed = (missing_before == [] and synced == 1 and after_sync == "2"
+              and rebuild["documents_synced"] == 2 and restored_refs == ["1", "2", "3", "4"])
+    print(f"\n{'✅ Resync Test PASSED' if passed else '❌ Resync Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 DUPLICATE INDEX TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Bloom-Filter", test_bloom_negative_and_positive),
+        ("Zeitfenster vs. dauerhaft", test_windowed_vs_permanent_kinds),
+        ("Erste Referenz bleibt", test_third_copy_matches_first_ref),
+        ("Erstbefüllung", test_backfill_from_existing_tables),
+        ("Nachziehen fehlender Schlüssel", test_resync_missing_document_keys),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
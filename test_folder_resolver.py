@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+🧪 FOLDER RESOLVER TEST
+
+1. Gemeinsamer Task: Aufrufer, der die Auflösung gestartet hat, bricht ab →
+   die anderen Wartenden bekommen trotzdem die Ordner-ID (eigener HTTP-Client)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from modules.msgraph.folder_resolver import FolderResolver
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+class SlowGraphResolver(FolderResolver):
+    """GET auf den Ordnerpfad wartet auf ein Event (kein Netzwerk)"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.release = asyncio.Event()
+        self.clients = []
+
+    async def _get_item_id(self, client, drive_url, path, headers):
+        self.clients.append(client)
+        await self.release.wait()
+        if client.is_closed:
+            raise RuntimeError("client closed while resolving")
+        return "folder-id"
+
+
+async def _first_caller_leaves(db_path: str):
+    resolver = SlowGraphResolver(db_path)
+    first = asyncio.create_task(resolver.resolve("me", "Scan/Buchhaltung/2025", "token"))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(resolver.resolve("me", "Scan/Buchhaltung/2025", "token"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    resolver.release.set()
+    item_id = await second
+    return item_id, resolver.stats, first.cancelled(), len(resolver.clients)
+
+
+def test_shared_task_outlives_first_caller():
+    """Test 1: Abbruch des ersten Aufrufers schließt keinen Client unter den anderen"""
+    print_section("TEST 1: Gemeinsamer Task überlebt den ersten Aufrufer")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        item_id, stats, cancelled, lookups = asyncio.run(_first_caller_leaves(os.path.join(tmp_dir, "folders.db")))
+
+    print(f"  Erster abgebrochen: {cancelled} | Zweiter: {item_id} | GETs: {lookups} | coalesced={stats['coalesced']}")
+
+    passed = cancelled and item_id == "folder-id" and lookups == 1 and stats["coalesced"] == 1
+    print(f"\n{'✅ Shared Task Test PASSED' if passed else '❌ Shared Task Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 FOLDER RESOLVER TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Gemeinsamer Task", test_shared_task_outlives_first_caller),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
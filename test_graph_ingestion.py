@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+🧪 GRAPH INGESTION TEST (gegen den lokalen Graph-Ersatz)
+
+Testet Subscriptions, Notifications und Delta-Sync end-to-end ohne Tenant:
+1. Subscriptions anlegen (Validierungs-Handshake), verlängern, neu anlegen
+2. Start-Catch-up per Delta: nur Emails im Lookback, bekannte übersprungen
+3. Change Notification → Delta-Sync → Email eingereiht; falscher clientState abgelehnt
+4. Seiten, geänderte/gelöschte Emails, 429 Retry-After, abgelaufener Delta-Token
+5. Warteschlange voll → deltaLink bleibt stehen, später ohne Duplikate weiter
+6. Lifecycle-Events: missed → Sync, subscriptionRemoved → neu anlegen
+7. Notification während sync_all → kein zweiter Sync desselben Ordners
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import modules.msgraph.change_notifications as change_notifications
+from modules.msgraph.change_notifications import GraphIngestion
+from modules.msgraph.graph_standin import GraphStandIn
+from modules.scheduler.admission import AdmissionRejected
+from modules.scheduler.mailboxes import Mailbox, MailboxRegistry
+
+MAILBOXES = ["mj@cdtechnologies.de", "buchhaltung@cdtechnologies.de"]
+CLIENT_STATE = "test-client-state"
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+class NotificationReceiver:
+    """Öffentliche Webhook-URL des Orchestrators (validationToken-Echo + Weitergabe in den Event Loop)"""
+
+    def __init__(self, ingestion: GraphIngestion, loop: asyncio.AbstractEventLoop):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                parts = urlsplit(self.path)
+                token = parse_qs(parts.query).get("validationToken")
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                if token:
+                    body, status, content_type = token[0].encode(), 200, "text/plain"
+                else:
+                    handler = ingestion.handle_lifecycle if parts.path.endswith("/lifecycle") else ingestion.handle_notifications
+                    result = asyncio.run_coroutine_threadsafe(receiver._call(handler, json.loads(raw)), loop).result()
+                    body, status, content_type = json.dumps(result).encode(), 202, "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/webhook/graph"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    async def _call(handler, payload):
+        return handler(payload)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Harness:
+    """Stand-in + Ingestion + Receiver; dispatch sammelt die eingereihten Emails"""
+
+    def __init__(self, tmp_dir: str):
+        self.standin = GraphStandIn(page_size=10).start()
+        self.processed = set()          # "Duplicate Index": per Zapier bereits verarbeitet
+        self.dispatched = []
+        self.reject_after = None
+        self.ingestion = GraphIngestion(
+            db_path=os.path.join(tmp_dir, "email_tracking.db"),
+            base_url=self.standin.base_url,
+            folders="inbox:incoming,sentitems:outgoing",
+            registry=MailboxRegistry([Mailbox(address) for address in MAILBOXES]),
+            client_state=CLIENT_STATE,
+            enabled=True,
+            is_known=lambda message_id: message_id in self.processed,
+        )
+        self.receiver = NotificationReceiver(self.ingestion, asyncio.get_running_loop())
+
+        async def token_provider():
+            return "test-token"
+
+        self.ingestion.configure(
+            token_provider=token_provider,
+            dispatch=self.dispatch,
+            notification_url=f"{self.receiver.url}/notifications",
+            lifecycle_url=f"{self.receiver.url}/lifecycle",
+        )
+
+    def dispatch(self, mailbox: str, direction: str, message: dict):
+        if self.reject_after is not None and len(self.dispatched) >= self.reject_after:
+            raise AdmissionRejected(f"email:{mailbox}", 1, 50)
+        self.dispatched.append((mailbox, direction, message["id"]))
+
+    def ids(self) -> list:
+        return [message_id for _, _, message_id in self.dispatched]
+
+    async def wait_for(self, count: int, timeout: float = 5.0) -> bool:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while len(self.dispatched) < count and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.05)
+        return len(self.dispatched) == count
+
+    async def close(self):
+        await self.ingestion.stop()
+        self.receiver.stop()
+        self.standin.stop()
+
+
+async def check_subscriptions(h: Harness) -> bool:
+    """Test 1: Anlegen (mit Validierung), aktiv lassen, verlängern, neu anlegen"""
+    print_section("TEST 1: Subscriptions")
+
+    first = await h.ingestion.ensure_subscriptions()
+    second = await h.ingestion.ensure_subscriptions()
+    print(f"  1. Lauf: {sorted(set(first.values()))} ({len(first)} Subscriptions)")
+    print(f"  2. Lauf: {sorted(set(second.values()))}")
+
+    # Ablauf in 2h → PATCH; serverseitig entfernt → 404 → neu
+    soon = (datetime.now(timezone.utc) + timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    conn = sqlite3.connect(h.ingestion.db_path)
+    conn.execute("UPDATE graph_subscriptions SET expires_at = ?", (soon,))
+    conn.commit()
+    conn.close()
+    renewed = await h.ingestion.ensure_subscriptions()
+    conn = sqlite3.connect(h.ingestion.db_path)
+    conn.execute("UPDATE graph_subscriptions SET expires_at = ?", (soon,))
+    conn.commit()
+    conn.close()
+    h.standin.expire_subscriptions()
+    recreated = await h.ingestion.ensure_subscriptions()
+    print(f"  Ablauf bald: {sorted(set(renewed.values()))}, serverseitig entfernt: {sorted(set(recreated.values()))}")
+
+    targets = len(MAILBOXES) * 2
+    passed = (
+        len(first) == targets and set(first.values()) == {"created"}
+        and set(second.values()) == {"active"}
+        and set(renewed.values()) == {"renewed"}
+        and set(recreated.values()) == {"created"}
+        and len(h.standin.subscriptions) == targets
+    )
+    print(f"\n{'✅ Subscription Test PASSED' if passed else '❌ Subscription Test FAILED'}")
+    return passed
+
+
+async def check_catch_up(h: Harness) -> bool:
+    """Test 2: Emails während der Downtime per Delta nachholen"""
+    print_section("TEST 2: Startup Catch-up")
+
+    mailbox = MAILBOXES[0]
+    old = h.standin.add_message(mailbox, subject="Alt", received=datetime.now(timezone.utc) - timedelta(days=3))
+    zapier = h.standin.add_message(mailbox, subject="Schon per Zapier verarbeitet")
+    h.processed.add(zapier["id"])
+    new = [h.standin.add_message(mailbox, subject=f"Neu {i}") for i in range(2)]
+    sent = h.standin.add_message(MAILBOXES[1], folder="sentitems", subject="Angebot")
+
+    h.dispatched.clear()
+    results = await h.ingestion.sync_all()
+    again = await h.ingestion.sync_all()
+    print(f"  Eingereiht: {len(h.dispatched)} | zweiter Lauf: {sum(r.get('dispatched', 0) for r in again.values())}")
+
+    passed = (
+        all(r["status"] == "ok" for r in results.values())
+        and sorted(h.ids()) == sorted([m["id"] for m in new] + [sent["id"]])
+        and old["id"] not in h.ids() and zapier["id"] not in h.ids()
+        and (MAILBOXES[1], "outgoing", sent["id"]) in h.dispatched
+        and all(r.get("dispatched") == 0 for r in again.values())
+    )
+    print(f"\n{'✅ Catch-up Test PASSED' if passed else '❌ Catch-up Test FAILED'}")
+    return passed
+
+
+async def check_notifications(h: Harness) -> bool:
+    """Test 3: Notification → Delta-Sync; ungültiger clientState wird ignoriert"""
+    print_section("TEST 3: Change Notifications")
+
+    h.dispatched.clear()
+    message = await asyncio.to_thread(h.standin.deliver, MAILBOXES[1], "inbox", subject="Rechnung 4711")
+    delivered = await h.wait_for(1)
+    print(f"  Notification → eingereiht: {h.ids()}")
+
+    forged = h.ingestion.handle_notifications({"value": [{
+        "subscriptionId": h.standin.subscriptions[0]["id"], "clientState": "wrong", "changeType": "created",
+    }]})
+    print(f"  Falscher clientState: {forged}")
+
+    passed = (
+        delivered and h.dispatched == [(MAILBOXES[1], "incoming", message["id"])]
+        and forged["accepted"] == 0 and h.ingestion.stats["notifications_rejected"] == 1
+    )
+    print(f"\n{'✅ Notification Test PASSED' if passed else '❌ Notification Test FAILED'}")
+    return passed
+
+
+async def check_delta_edge_cases(h: Harness) -> bool:
+    """Test 4: Seiten, Änderungen/Löschungen, Throttling, abgelaufener Token"""
+    print_section("TEST 4: Delta Paging, Throttling, Token Expiry")
+
+    mailbox = MAILBOXES[0]
+    change_notifications.INGESTION_PAGE_SIZE = 10
+    h.dispatched.clear()
+    batch = [h.standin.add_message(mailbox, subject=f"Batch {i}") for i in range(25)]
+    h.standin.update_message(mailbox, batch[0]["id"], isRead=True)
+    h.standin.remove_message(mailbox, batch[1]["id"])
+    h.standin.throttle(1, retry_after=1)
+    result = await h.ingestion.sync_folder(mailbox, "inbox")
+    print(f"  25 Emails: {result}")
+    throttled = h.ingestion.registry.graph_budget(mailbox).stats["throttled"]
+
+    h.standin.expire_delta_tokens()
+    late = h.standin.add_message(mailbox, subject="Nach Token-Ablauf")
+    resync = await h.ingestion.sync_folder(mailbox, "inbox")
+    print(f"  Token abgelaufen: {resync} (resyncs={h.ingestion.stats['resyncs']})")
+
+    expected = [m["id"] for m in batch if m["id"] != batch[1]["id"]]
+    passed = (
+        result["status"] == "ok" and result["pages"] == 3 and throttled == 1
+        and h.ids()[:len(expected)] == expected[1:] + [batch[0]["id"]]
+        and resync["status"] == "ok" and resync["dispatched"] == 1 and h.ids()[-1] == late["id"]
+        and len(h.ids()) == len(set(h.ids()))
+    )
+    print(f"\n{'✅ Delta Edge Case Test PASSED' if passed else '❌ Delta Edge Case Test FAILED'}")
+    return passed
+
+
+async def check_admission_rejected(h: Harness) -> bool:
+    """Test 5: Warteschlange voll → deltaLink nicht weiter, Rest später ohne Duplikate"""
+    print_section("TEST 5: Queue Full → Deferred")
+
+    mailbox = MAILBOXES[1]
+    h.dispatched.clear()
+    h.reject_after = 2
+    messages = [h.standin.add_message(mailbox, subject=f"Stau {i}") for i in range(5)]
+    deferred = await h.ingestion.sync_folder(mailbox, "inbox")
+    h.reject_after = None
+    await h.ingestion.stop()  # Retry-Timer nicht abwarten
+    resumed = await h.ingestion.sync_folder(mailbox, "inbox")
+    print(f"  Erster Lauf: {deferred} | danach: {resumed}")
+
+    passed = (
+        deferred["status"] == "deferred" and resumed["status"] == "ok"
+        and h.ids() == [m["id"] for m in messages]
+    )
+    print(f"\n{'✅ Deferred Test PASSED' if passed else '❌ Deferred Test FAILED'}")
+    return passed
+
+
+async def check_lifecycle(h: Harness) -> bool:
+    """Test 6: missed → Delta-Sync, subscriptionRemoved → neue Subscription + Sync"""
+    print_section("TEST 6: Lifecycle Events")
+
+    mailbox = MAILBOXES[0]
+    h.dispatched.clear()
+    missed = h.standin.add_message(mailbox, subject="Verpasst")
+    subscription = next(s for s in h.standin.subscriptions if s["resource"] == f"users/{mailbox}/mailFolders('inbox')/messages")
+    await asyncio.to_thread(h.standin.lifecycle, subscription["id"], "missed")
+    synced = await h.wait_for(1)
+
+    await asyncio.to_thread(h.standin.lifecycle, subscription["id"], "subscriptionRemoved")
+    for _ in range(100):
+        await asyncio.sleep(0.02)
+        current = [s for s in h.standin.subscriptions if s["resource"] == subscription["resource"]]
+        if current:
+            break
+    print(f"  missed → {h.ids()} | neue Subscription: {bool(current) and current[0]['id'] != subscription['id']}")
+
+    passed = synced and h.ids() == [missed["id"]] and bool(current) and current[0]["id"] != subscription["id"]
+    print(f"\n{'✅ Lifecycle Test PASSED' if passed else '❌ Lifecycle Test FAILED'}")
+    return passed
+
+
+async def check_sync_all_coalesces(h: Harness) -> bool:
+    """Test 7: Notification während sync_all → kein zweiter paralleler Sync desselben Ordners"""
+    print_section("TEST 7: sync_all + Notification")
+
+    mailbox = MAILBOXES[0]
+    active, overlaps = {}, []
+    real_sync_folder = h.ingestion.sync_folder
+
+    async def tracking_sync_folder(box, folder):
+        key = (box, folder)
+        active[key] = active.get(key, 0) + 1
+        if active[key] > 1:
+            overlaps.append(key)
+        try:
+            await asyncio.sleep(0.05)
+            return await real_sync_folder(box, folder)
+        finally:
+            active[key] -= 1
+
+    h.ingestion.sync_folder = tracking_sync_folder
+    h.dispatched.clear()
+    h.standin.add_message(mailbox, subject="Während Catch-up")
+    catch_up = asyncio.create_task(h.ingestion.sync_all())
+    await asyncio.sleep(0.01)
+    h.ingestion.request_sync(mailbox, "inbox")
+    results = await catch_up
+    await asyncio.sleep(0.2)
+    print(f"  Überlappende Syncs: {overlaps} | coalesced: {h.ingestion.stats['syncs_coalesced']} | eingereiht: {len(h.ids())}")
+
+    passed = (
+        not overlaps and h.ingestion.stats["syncs_coalesced"] >= 1
+        and all(r["status"] == "ok" for r in results.values()) and len(h.ids()) == 1
+    )
+    print(f"\n{'✅ Sync Coalescing Test PASSED' if passed else '❌ Sync Coalescing Test FAILED'}")
+    return passed
+
+
+async def _run_check(check, subscribed: bool) -> bool:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        h = Harness(tmp_dir)
+        try:
+            if subscribed:
+                # Ausgangslage: Subscriptions aktiv, Delta-Links aller Ordner gesetzt
+                await h.ingestion.ensure_subscriptions()
+                await h.ingestion.sync_all()
+            return await check(h)
+        finally:
+            await h.close()
+
+
+def run_check(check, subscribed: bool = True) -> bool:
+    """Jeder Test mit eigenem Stand-in, eigener DB und eigener Ingestion"""
+    return asyncio.run(_run_check(check, subscribed))
+
+
+def test_subscriptions():
+    assert run_check(check_subscriptions, subscribed=False)
+
+
+def test_catch_up():
+    assert run_check(check_catch_up, subscribed=False)
+
+
+def test_notifications():
+    assert run_check(check_notifications)
+
+
+def test_delta_edge_cases():
+    assert run_check(check_delta_edge_cases)
+
+
+def test_admission_rejected():
+    assert run_check(check_admission_rejected)
+
+
+def test_lifecycle():
+    assert run_check(check_lifecycle)
+
+
+def test_sync_all_coalesces():
+    assert run_check(check_sync_all_coalesces)
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 GRAPH INGESTION TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Subscriptions", test_subscriptions),
+        ("Startup Catch-up", test_catch_up),
+        ("Change Notifications", test_notifications),
+        ("Delta Edge Cases", test_delta_edge_cases),
+        ("Queue Full → Deferred", test_admission_rejected),
+        ("Lifecycle Events", test_lifecycle),
+        ("sync_all + Notification", test_sync_all_coalesces),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
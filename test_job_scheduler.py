@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+🧪 JOB SCHEDULER TEST
+
+1. Derselbe Cron-Slot läuft nur einmal (auch bei zwei Workern / Re-Acquire)
+2. Abgebrochener Task (Shutdown) geht zurück auf pending
+3. Hängende running-Tasks werden im Worker-Loop periodisch requeued
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import modules.scheduler.job_scheduler as job_scheduler_module
+from modules.database.email_tracking_db import EmailTrackingDB
+from modules.scheduler.job_scheduler import JobScheduler
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+async def _run_slot_twice(db_path: str):
+    runs = []
+
+    async def job():
+        runs.append(datetime.now())
+
+    slot = JobScheduler.now().replace(second=0, microsecond=0)
+    results = []
+    # zwei Worker (eigene Owner) + zweiter Lauf desselben Owners
+    first = JobScheduler(db_path=db_path)
+    second = JobScheduler(db_path=db_path)
+    for scheduler in (first, second, first):
+        scheduler._init_schema()
+        scheduler.add_job("daily_report", "0 7 * * *", job)
+        scheduler_job = scheduler.jobs["daily_report"]
+        scheduler_job.next_run = slot
+        scheduler._save_state(scheduler_job, next_run_only=True)
+        scheduler_job.running = True
+        results.append((await scheduler._execute_job(scheduler_job))["status"])
+    return runs, results
+
+
+def test_duplicate_cron_slot():
+    """Test 1: Slot wird mit der Lease verbucht"""
+    print_section("TEST 1: Doppelter Cron-Slot")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        runs, results = asyncio.run(_run_slot_twice(os.path.join(tmp_dir, "scheduler.db")))
+
+    print(f"  Läufe: {len(runs)} | Status: {results}")
+
+    passed = len(runs) == 1 and results == ["success", "skipped_slot_done", "skipped_slot_done"]
+    print(f"\n{'✅ Cron Slot Test PASSED' if passed else '❌ Cron Slot Test FAILED'}")
+    assert passed
+
+
+def _task_row(db_path: str, task_uuid: str):
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT status, attempts FROM task_queue WHERE task_uuid = ?", (task_uuid,)).fetchone()
+    conn.close()
+    return row
+
+
+async def _cancel_running_task(db: EmailTrackingDB):
+    started = asyncio.Event()
+
+    async def slow_handler(task):
+        started.set()
+        await asyncio.sleep(30)
+
+    task_uuid = db.queue_task("slow", (datetime.now() - timedelta(seconds=1)).isoformat())
+    scheduler = JobScheduler(db_path=db.db_path, task_poll_interval=0.05)
+    scheduler.set_task_source(db, default_handler=slow_handler)
+    await scheduler.start()
+    await asyncio.wait_for(started.wait(), timeout=5)
+    status_while_running = _task_row(db.db_path, task_uuid)[0]
+    await scheduler.stop(timeout=0.1)
+    return task_uuid, status_while_running
+
+
+def test_cancelled_task_requeued():
+    """Test 2: Abbruch → pending (ohne Attempt-Zählung)"""
+    print_section("TEST 2: Abgebrochener Task")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = EmailTrackingDB(os.path.join(tmp_dir, "email_tracking.db"))
+        task_uuid, status_while_running = asyncio.run(_cancel_running_task(db))
+        status, attempts = _task_row(db.db_path, task_uuid)
+
+    print(f"  Während Lauf: {status_while_running} | Nach Shutdown: {status} (attempts={attempts})")
+
+    passed = status_while_running == "running" and status == "pending" and attempts == 0
+    print(f"\n{'✅ Cancel Requeue Test PASSED' if passed else '❌ Cancel Requeue Test FAILED'}")
+    assert passed
+
+
+async def _periodic_requeue(db: EmailTrackingDB, task_uuid: str):
+    handled = asyncio.Event()
+
+    async def handler(task):
+        handled.set()
+
+    scheduler = JobScheduler(db_path=db.db_path, task_poll_interval=0.05)
+    scheduler.set_task_source(db, default_handler=handler)
+    scheduler._init_schema()
+    loop_task = asyncio.create_task(scheduler._task_queue_loop())
+    try:
+        await asyncio.wait_for(handled.wait(), timeout=5)
+    finally:
+        loop_task.cancel()
+        await asyncio.gather(loop_task, return_exceptions=True)
+        await scheduler.registry.shutdown(timeout=1)
+
+
+def test_periodic_stale_requeue():
+    """Test 3: Stale-Requeue läuft im Loop, nicht nur beim Start"""
+    print_section("TEST 3: Periodischer Stale-Requeue")
+
+    original_interval = job_scheduler_module.STALE_REQUEUE_INTERVAL_SECONDS
+    job_scheduler_module.STALE_REQUEUE_INTERVAL_SECONDS = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = EmailTrackingDB(os.path.join(tmp_dir, "email_tracking.db"))
+            task_uuid = db.queue_task("stuck", (datetime.now() - timedelta(seconds=1)).isoformat())
+            conn = sqlite3.connect(db.db_path)
+            conn.execute("UPDATE task_queue SET status = 'running', last_attempt_at = ? WHERE task_uuid = ?",
+                         ((datetime.now() - timedelta(hours=2)).isoformat(), task_uuid))
+            conn.commit()
+            conn.close()
+            asyncio.run(_periodic_requeue(db, task_uuid))
+            status = _task_row(db.db_path, task_uuid)[0]
+    finally:
+        job_scheduler_module.STALE_REQUEUE_INTERVAL_SECONDS = original_interval
+
+    print(f"  Hängender Task nach Loop: {status}")
+
+    passed = status == "completed"
+    print(f"\n{'✅ Stale Requeue Test PASSED' if passed else '❌ Stale Requeue Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 JOB SCHEDULER TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Doppelter Cron-Slot", test_duplicate_cron_slot),
+        ("Abgebrochener Task", test_cancelled_task_requeued),
+        ("Periodischer Stale-Requeue", test_periodic_stale_requeue),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
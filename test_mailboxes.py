@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+🧪 MAILBOX REGISTRY TEST
+
+1. Fairness: ein volles Postfach hungert ein anderes nicht aus (Round Robin)
+2. Rejection: volle Warteschlange → 429 nur für dieses Postfach
+3. Unbekannte Adressen → gemeinsames "auto"-Postfach, Email-Pool wächst nicht
+4. Task vor dem Start abgebrochen → pending des Postfachs wird zurückgegeben
+"""
+
+import asyncio
+import sys
+
+from modules.scheduler.admission import (
+    CHANNEL_EMAIL,
+    AdmissionController,
+    AdmissionRejected,
+    ChannelPolicy,
+    spawn_with_ticket,
+)
+from modules.scheduler.mailboxes import AUTO_MAILBOX, Mailbox, MailboxRegistry
+
+SALES = "info@cdtechnologies.de"
+ACCOUNTING = "buchhaltung@cdtechnologies.de"
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+def _registry(queue_limit: int = 50) -> MailboxRegistry:
+    admission = AdmissionController({CHANNEL_EMAIL: ChannelPolicy(concurrency=2, queue_limit=200, priority=2)},
+                                    total_concurrency=3)
+    return MailboxRegistry(
+        [Mailbox(SALES, role="sales", concurrency=1, queue_limit=queue_limit),
+         Mailbox(ACCOUNTING, role="accounting", concurrency=1, queue_limit=queue_limit)],
+        admission=admission,
+    )
+
+
+async def _flooded_mailbox():
+    registry = _registry()
+    started = []
+
+    async def process(address: str, index: int):
+        started.append(address)
+        await asyncio.sleep(0.01)
+
+    tasks = [spawn_with_ticket(registry.admit(ACCOUNTING), process(ACCOUNTING, i), name=f"acc-{i}") for i in range(8)]
+    tasks += [spawn_with_ticket(registry.admit(SALES), process(SALES, i), name=f"sales-{i}") for i in range(2)]
+    await asyncio.gather(*tasks)
+    return started
+
+
+def test_round_robin_fairness():
+    """Test 1: Vertrieb muss nicht auf den Buchhaltungs-Rückstau warten"""
+    print_section("TEST 1: Fairness zwischen Postfächern")
+
+    started = asyncio.run(_flooded_mailbox())
+    last_sales = max(i for i, address in enumerate(started) if address == SALES)
+    print(f"  Startreihenfolge: {[a.split('@')[0] for a in started]}")
+    print(f"  Letzter Vertriebs-Start an Position {last_sales + 1} von {len(started)}")
+
+    passed = len(started) == 10 and last_sales < 5
+    print(f"\n{'✅ Fairness Test PASSED' if passed else '❌ Fairness Test FAILED'}")
+    assert passed
+
+
+def test_rejection_per_mailbox():
+    """Test 2: 429 trifft nur das volle Postfach"""
+    print_section("TEST 2: Rejection pro Postfach")
+
+    registry = _registry(queue_limit=3)
+    tickets = [registry.admit(ACCOUNTING) for _ in range(3)]
+    rejected = None
+    try:
+        registry.admit(ACCOUNTING)
+    except AdmissionRejected as e:
+        rejected = e
+    other = registry.admit(SALES)
+    for ticket in tickets + [other]:
+        ticket.discard()
+
+    print(f"  Abgelehnt: {rejected.channel if rejected else None} (retry after {rejected.retry_after if rejected else '-'}s)")
+    print(f"  Anderes Postfach angenommen: {other.mailbox.address}")
+
+    passed = rejected is not None and rejected.channel == f"{CHANNEL_EMAIL}:{ACCOUNTING}" and other.mailbox.address == SALES
+    print(f"\n{'✅ Rejection Test PASSED' if passed else '❌ Rejection Test FAILED'}")
+    assert passed
+
+
+def test_unknown_addresses_share_auto_pool():
+    """Test 3: 100 erfundene Adressen → ein Postfach, Pool unverändert"""
+    print_section("TEST 3: Unbekannte Adressen")
+
+    registry = _registry()
+    pool_before = registry.admission.get_stats()["channels"][CHANNEL_EMAIL]["concurrency"]
+    mailboxes = {registry.get(f"bogus-{i}@example.com").address for i in range(100)}
+    pool_after = registry.admission.get_stats()["channels"][CHANNEL_EMAIL]["concurrency"]
+
+    print(f"  Postfächer: {registry.addresses}")
+    print(f"  Email-Pool: {pool_before} → {pool_after} | konfiguriert: {registry.configured_addresses}")
+
+    passed = (mailboxes == {AUTO_MAILBOX} and pool_before == pool_after == 2
+              and len(registry.addresses) == 3 and registry.configured_addresses == [SALES, ACCOUNTING])
+    print(f"\n{'✅ Auto Pool Test PASSED' if passed else '❌ Auto Pool Test FAILED'}")
+    assert passed
+
+
+async def _cancel_before_start():
+    registry = _registry()
+
+    async def process():
+        pass
+
+    task = spawn_with_ticket(registry.admit(SALES), process(), name="sales-cancelled")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return registry.get_stats()["mailboxes"][SALES]["queued"]
+
+
+def test_cancel_before_start_releases_pending():
+    """Test 4: Kein Leck in Mailbox.pending"""
+    print_section("TEST 4: Abbruch vor dem Start")
+
+    queued = asyncio.run(_cancel_before_start())
+    print(f"  queued nach Abbruch: {queued}")
+
+    passed = queued == 0
+    print(f"\n{'✅ Pending Leak Test PASSED' if passed else '❌ Pending Leak Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 MAILBOX REGISTRY TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Fairness", test_round_robin_fairness),
+        ("Rejection pro Postfach", test_rejection_per_mailbox),
+        ("Unbekannte Adressen", test_unknown_addresses_share_auto_pool),
+        ("Abbruch vor dem Start", test_cancel_before_start_releases_pending),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+🧪 NOTIFICATION DISPATCHER TEST
+
+1. Normale Notifications: ein Request mit allen Einträgen pro Empfänger und Fenster
+2. Digest: low-Priority Notifications eines Fensters → EIN Request
+3. Digest-HTML: ein äußeres Dokument, keine verschachtelten <html>/<body>
+4. Rate Limit: ein gedrosselter Hook blockiert andere Hooks nicht
+"""
+
+import asyncio
+import sys
+import time
+
+from modules.zapier.notification_dispatcher import HookRateLimiter, NotificationDispatcher
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+class RecordingDispatcher(NotificationDispatcher):
+    """Dispatcher ohne Netzwerk: gesendete Payloads werden mitgeschrieben"""
+
+    def __init__(self, **kwargs):
+        super().__init__(webhook_url="http://zapier.invalid/hook", **kwargs)
+        self.posted = []
+
+    async def _post(self, payload):
+        self.posted.append((time.monotonic(), payload))
+        return 200, None
+
+
+async def _batch_lane():
+    dispatcher = RecordingDispatcher(batch_window_seconds=0.2)
+    await dispatcher.start()
+    for i in range(3):
+        await dispatcher.dispatch({"to": "mj@cdtechnologies.de", "subject": f"Info {i}"}, priority="medium")
+    await dispatcher.dispatch({"to": "buchhaltung@cdtechnologies.de", "subject": "Info"}, priority="medium")
+    await asyncio.sleep(0.5)
+    await dispatcher.stop()
+    return dispatcher.posted
+
+
+def test_batch_lane_groups_per_recipient():
+    """Test 1: medium-Notifications eines Fensters → ein Request pro Empfänger"""
+    print_section("TEST 1: Batch Lane pro Empfänger")
+
+    posted = asyncio.run(_batch_lane())
+    by_recipient = {p["to"]: p for _, p in posted}
+    print(f"  Requests: {len(posted)} | Typen: {[p.get('notification_type') for _, p in posted]}")
+
+    batch = by_recipient.get("mj@cdtechnologies.de", {})
+    single = by_recipient.get("buchhaltung@cdtechnologies.de", {})
+    passed = (len(posted) == 2 and batch.get("notification_type") == "batch"
+              and [n["subject"] for n in batch.get("notifications", [])] == ["Info 0", "Info 1", "Info 2"]
+              and single.get("subject") == "Info")
+    print(f"\n{'✅ Batch Lane Test PASSED' if passed else '❌ Batch Lane Test FAILED'}")
+    assert passed
+
+
+async def _digest_lane():
+    dispatcher = RecordingDispatcher(batch_window_seconds=0.2, digest_mode=True)
+    await dispatcher.start()
+    for i in range(4):
+        await dispatcher.dispatch({"to": "mj@cdtechnologies.de", "subject": f"Low {i}"}, priority="low")
+    await asyncio.sleep(0.5)
+    await dispatcher.stop()
+    return dispatcher.posted
+
+
+def test_digest_lane_merges_window():
+    """Test 2: low-Notifications eines Fensters werden zu einem Digest"""
+    print_section("TEST 2: Digest Lane")
+
+    posted = asyncio.run(_digest_lane())
+    print(f"  Requests: {len(posted)} | Typ: {[p.get('notification_type') for _, p in posted]}")
+
+    passed = len(posted) == 1 and posted[0][1]["notification_type"] == "digest" and len(posted[0][1]["digest_items"]) == 4
+    print(f"\n{'✅ Digest Test PASSED' if passed else '❌ Digest Test FAILED'}")
+    assert passed
+
+
+def test_digest_html_single_document():
+    """Test 3: Body-Fragmente statt kompletter Mails, Summary als Fallback"""
+    print_section("TEST 3: Digest HTML")
+
+    digest = NotificationDispatcher._build_digest([
+        {"subject": "Rechnung", "html_body": "<!DOCTYPE html><html><head><style>p{}</style></head>"
+                                            "<body><p>Rechnung eingegangen</p></body></html>"},
+        {"subject": "Angebot", "html_body": "<p>Angebot erstellt</p>"},
+        {"subject": "Notiz", "summary": "Nur <Summary>"},
+    ])
+    html_body = digest["html_body"].lower()
+    print(f"  <html>: {html_body.count('<html')} | <body>: {html_body.count('<body')} | <head>: {html_body.count('<head')}")
+
+    passed = (html_body.count("<html") == 1 and html_body.count("<body") == 1 and html_body.count("<head") == 1
+              and "<p>rechnung eingegangen</p>" in html_body and "<p>angebot erstellt</p>" in html_body
+              and "nur &lt;summary&gt;" in html_body and "<style>" not in html_body)
+    print(f"\n{'✅ Digest HTML Test PASSED' if passed else '❌ Digest HTML Test FAILED'}")
+    assert passed
+
+
+async def _rate_limiter_isolation():
+    limiter = HookRateLimiter(max_requests=1, period_seconds=1.0)
+    await limiter.acquire("hook-a")
+    throttled = asyncio.create_task(limiter.acquire("hook-a"))  # wartet ~1s
+    await asyncio.sleep(0.05)
+    started = time.monotonic()
+    await limiter.acquire("hook-b")
+    other_wait = time.monotonic() - started
+    await throttled
+    return other_wait
+
+
+def test_rate_limiter_does_not_block_other_hooks():
+    """Test 4: Sleep außerhalb des Locks"""
+    print_section("TEST 4: Rate Limiter Isolation")
+
+    other_wait = asyncio.run(_rate_limiter_isolation())
+    print(f"  Wartezeit hook-b während hook-a gedrosselt: {other_wait:.3f}s")
+
+    passed = other_wait < 0.2
+    print(f"\n{'✅ Rate Limiter Test PASSED' if passed else '❌ Rate Limiter Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 NOTIFICATION DISPATCHER TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Batch Lane pro Empfänger", test_batch_lane_groups_per_recipient),
+        ("Digest Lane", test_digest_lane_merges_window),
+        ("Digest HTML", test_digest_html_single_document),
+        ("Rate Limiter Isolation", test_rate_limiter_does_not_block_other_hooks),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
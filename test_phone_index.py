@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+🧪 PHONE INDEX TEST
+
+1. Parties und Leads werden mit Typ (entity_type) indexiert
+2. Refresh-Check im Event Loop läuft im Executor (blockiert den Loop nicht)
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import modules.weclapp.phone_index as phone_index_module
+from modules.weclapp.phone_index import PhoneIndex
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+def _create_sync_db(path: str):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE parties (id TEXT, name TEXT, phone TEXT, customerNumber TEXT, partyType TEXT)")
+    conn.execute("CREATE TABLE leads (id TEXT, firstName TEXT, lastName TEXT, phone TEXT, company TEXT)")
+    conn.execute("INSERT INTO parties VALUES ('p1', 'Muster GmbH', '0721 123456', 'K-1', 'ORGANIZATION')")
+    conn.execute("INSERT INTO leads VALUES ('l1', 'Max', 'Lead', '+49 721 123456', NULL)")
+    conn.execute("INSERT INTO leads VALUES ('l2', 'Erika', 'Nurlead', '0721 999999', NULL)")
+    conn.commit()
+    conn.close()
+
+
+def test_entity_types():
+    """Test 1: Treffer tragen ihren Typ (party/lead)"""
+    print_section("TEST 1: Party/Lead Typ")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "weclapp_sync.db")
+        _create_sync_db(db_path)
+        index = PhoneIndex(db_path)
+        index.refresh()
+        shared = index.lookup_exact("+49721123456")
+        lead_only = index.lookup_exact("0721999999")
+
+    types = sorted((e["entity_type"], e["contact_id"]) for e in shared)
+    print(f"  +49721123456 → {types}")
+    print(f"  +49721999999 → {[(e['entity_type'], e['contact_id']) for e in lead_only]}")
+
+    passed = types == [("lead", "l1"), ("party", "p1")] and [e["entity_type"] for e in lead_only] == ["lead"]
+    print(f"\n{'✅ Entity Type Test PASSED' if passed else '❌ Entity Type Test FAILED'}")
+    assert passed
+
+
+async def _lookup_while_refresh_is_slow(index: PhoneIndex):
+    loop_thread = threading.get_ident()
+    refresh_threads = []
+    real_refresh = index.refresh
+
+    def slow_refresh(force: bool = False):
+        refresh_threads.append(threading.get_ident())
+        time.sleep(0.3)
+        return real_refresh(force)
+
+    index.refresh = slow_refresh
+    index._last_check = time.monotonic() - phone_index_module.REFRESH_CHECK_INTERVAL_SECONDS - 1
+    started = time.monotonic()
+    index.lookup_exact("+49721123456")
+    lookup_seconds = time.monotonic() - started
+    await index._refresh_future
+    return lookup_seconds, refresh_threads, loop_thread
+
+
+def test_refresh_off_event_loop():
+    """Test 2: Lookup im Loop wartet nicht auf den Rebuild"""
+    print_section("TEST 2: Refresh im Executor")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "weclapp_sync.db")
+        _create_sync_db(db_path)
+        index = PhoneIndex(db_path)
+        index.refresh()
+        lookup_seconds, refresh_threads, loop_thread = asyncio.run(_lookup_while_refresh_is_slow(index))
+
+    print(f"  Lookup: {lookup_seconds * 1000:.1f}ms | Refresh im Loop-Thread: {loop_thread in refresh_threads}")
+
+    passed = lookup_seconds < 0.1 and len(refresh_threads) == 1 and loop_thread not in refresh_threads
+    print(f"\n{'✅ Executor Refresh Test PASSED' if passed else '❌ Executor Refresh Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 PHONE INDEX TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Party/Lead Typ", test_entity_types),
+        ("Refresh im Executor", test_refresh_off_event_loop),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
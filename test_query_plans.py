@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+🧪 QUERY PLAN REGRESSION TEST
+
+Prüft per EXPLAIN QUERY PLAN, dass keine Produktions-Abfrage einen Full Scan
+macht (SCAN <tabelle> oder AUTOMATIC INDEX):
+1. Schema-Migrationen laufen auf frischen Datenbanken durch (und idempotent),
+   ein abgebrochener Schritt wird komplett zurückgerollt
+2. Tracking-DB: alle Statements der heißen EmailTrackingDB-Methoden werden
+   mitgeschnitten (Trace-Callback) und einzeln geprüft
+3. email_data.db: Lookups aus production_langgraph_orchestrator.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+from modules.database.email_tracking_db import EmailTrackingDB
+from modules.database.duplicate_index import KIND_DOCUMENT_MESSAGE, KIND_HEURISTIC, heuristic_key
+from modules.database.email_search_index import EmailSearchIndex
+from modules.database.schema_migrations import EMAIL_DATA_MIGRATIONS, Migration, run_migrations
+
+# Lookups aus production_langgraph_orchestrator.py (email_data.db)
+EMAIL_DATA_QUERIES = {
+    "_sync_lookup_contact": ("""
+        SELECT DISTINCT weclapp_contact_id, weclapp_customer_id, sender, sender_name
+        FROM email_data
+        WHERE sender = ? AND weclapp_contact_id IS NOT NULL
+        ORDER BY id DESC
+        LIMIT 1
+    """, ("kunde@example.com",)),
+    "_check_duplicate_sync": ("""
+        SELECT id, processing_timestamp, onedrive_link
+        FROM processed_documents
+        WHERE id = ?
+    """, (1,)),
+    "_save_processed_document_sync (message_id)": (
+        "SELECT id FROM processed_documents WHERE message_id = ?", ("msg",)),
+    "_save_processed_document_sync (document_hash)": (
+        "SELECT id FROM processed_documents WHERE document_hash = ?", ("hash",)),
+    "_save_processed_document_sync (onedrive_path)": (
+        "SELECT id FROM processed_documents WHERE onedrive_path = ?", ("/path",)),
+    "email_search (message_id)": (
+        "SELECT id FROM email_data WHERE message_id = ?", ("msg",)),
+}
+
+# Bewusst akzeptierte Full Scans (Admin-/Fallback-Pfade, kein Hot Path)
+ALLOWED_FULL_SCANS = (
+    "subject LIKE",        # contact action fallback: email_id im Betreff suchen
+    "COUNT(*)",            # Statistiken
+)
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+def full_scans(conn: sqlite3.Connection, sql: str, params=()) -> list:
+    """Liefert alle Full-Scan-Zeilen des Query Plans"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [
+        detail for _, _, _, detail in plan
+        if (detail.startswith("SCAN ") and "CONSTANT ROW" not in detail and "VIRTUAL TABLE" not in detail)
+        or "AUTOMATIC" in detail
+    ]
+
+
+def test_migrations():
+    """Test 1: Migrationen auf frischer DB + zweiter Lauf ohne Änderungen"""
+    print_section("TEST 1: Schema Migrations")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "email_data.db")
+        first = run_migrations(db_path, EMAIL_DATA_MIGRATIONS, component="email_data_test")
+        second = run_migrations(db_path, EMAIL_DATA_MIGRATIONS, component="email_data_test")
+
+        expected = max(m.version for m in EMAIL_DATA_MIGRATIONS)
+        print(f"  1. Lauf: v{first['version']} ({len(first['applied'])} angewendet)")
+        print(f"  2. Lauf: v{second['version']} ({len(second['applied'])} angewendet)")
+
+        passed = first["version"] == expected and len(first["applied"]) == len(EMAIL_DATA_MIGRATIONS) and not second["applied"]
+        print(f"\n{'✅ Migration Test PASSED' if passed else '❌ Migration Test FAILED'}")
+    assert passed
+
+
+def test_migration_step_is_atomic():
+    """Test 1b: Absturz nach dem FTS-Anlegen → Rollback, Backfill beim nächsten Start"""
+    print_section("TEST 1b: Migration atomar (FTS Backfill)")
+
+    def crashing_search_index(cursor: sqlite3.Cursor):
+        EmailSearchIndex.init_schema(cursor)
+        raise RuntimeError("simulierter Absturz nach email_fts")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "email_data.db")
+        run_migrations(db_path, EMAIL_DATA_MIGRATIONS[:2], component="email_data_test")
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO email_data (subject, sender) VALUES ('Rechnung Mai', 'kunde@example.com')")
+        conn.commit()
+        conn.close()
+
+        crashed = False
+        try:
+            run_migrations(db_path, EMAIL_DATA_MIGRATIONS[:2] + [Migration(3, "FTS5 search index", crashing_search_index)],
+                           component="email_data_test")
+        except RuntimeError:
+            crashed = True
+
+        conn = sqlite3.connect(db_path)
+        fts_after_crash = conn.execute("SELECT name FROM sqlite_master WHERE name = 'email_fts'").fetchone()
+        conn.close()
+
+        run_migrations(db_path, EMAIL_DATA_MIGRATIONS, component="email_data_test")
+        conn = sqlite3.connect(db_path)
+        hits = conn.execute("SELECT rowid FROM email_fts WHERE email_fts MATCH '\"Rechnung\"'").fetchall()
+        conn.close()
+
+    print(f"  Absturz: {crashed} | email_fts nach Absturz: {bool(fts_after_crash)} | Treffer nach Neustart: {len(hits)}")
+
+    passed = crashed and fts_after_crash is None and len(hits) == 1
+    print(f"\n{'✅ Atomic Migration Test PASSED' if passed else '❌ Atomic Migration Test FAILED'}")
+    assert passed
+
+
+def test_tracking_queries():
+    """Test 2: Alle Statements der Tracking-DB Hot Paths ohne Full Scan"""
+    print_section("TEST 2: Tracking DB Query Plans")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = EmailTrackingDB(os.path.join(tmp_dir, "email_tracking.db"))
+
+        captured = []
+        real_connect = sqlite3.connect
+
+        def tracing_connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(captured.append)
+            return conn
+
+        sqlite3.connect = tracing_connect
+        try:
+            message_id = f"test-{uuid.uuid4()}"
+            db.check_email_duplicate(message_id, "Rechnung", "Body", "kunde@example.com")
+            db.save_email(message_id, "user@example.com", "kunde@example.com", "Rechnung", "Body", "",
+                          "WEG_A", {}, attachment_results=[{"filename": "r.pdf", "file_hash": "abc123"}])
+            db.check_email_duplicate(message_id, "Rechnung", "Body", "kunde@example.com")
+            db.check_duplicate_by_content("Rechnung", "Body", "kunde@example.com")
+            db.check_duplicate_attachments(["abc123", "def456"])
+            db.update_onedrive_upload(message_id, "/Rechnungen/r.pdf", "https://example.com/r.pdf")
+
+            comm_uuid = str(uuid.uuid4())
+            button_uuid = str(uuid.uuid4())
+            db.register_communication_with_buttons(
+                communication_uuid=comm_uuid, email_message_id=message_id, notification_type="test",
+                sent_via="test", recipient_email="user@example.com", subject="Test",
+                buttons=[{
+                    "button_uuid": button_uuid, "communication_uuid": comm_uuid, "email_message_id": message_id,
+                    "action_type": "ignore", "action_label": "Ignorieren", "action_config": None,
+                    "button_color": None, "button_icon": None,
+                    "expires_at": (datetime.now() - timedelta(days=1)).isoformat(),
+                }],
+                html_content="<p>Test</p>",
+            )
+            db.get_communication_content(comm_uuid)
+            db.get_button_info(button_uuid)
+            db.log_action_execution(button_uuid, "success", execution_result="ok")
+            db.get_execution_history(button_uuid=button_uuid)
+            db.get_execution_history(email_message_id=message_id)
+            db.sweep_expired_buttons(archive_after_days=0)
+
+            workflow_uuid = db.create_workflow(message_id, "test", "start")
+            db.update_workflow_state(workflow_uuid, new_stage="done", status="completed")
+
+            task_uuid = db.queue_task("test_task", datetime.now().isoformat(), task_data={"x": 1})
+            db.get_pending_tasks()
+            db.claim_task(task_uuid)
+            db.requeue_stale_tasks()
+            db.update_task_status(task_uuid, "failed", error_message="boom")
+            db.link_trip_to_opportunity("trip-1", "opp-1", "manual", email_message_id=message_id)
+        finally:
+            sqlite3.connect = real_connect
+
+        statements = list(dict.fromkeys(
+            sql.strip() for sql in captured
+            if sql.strip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT")
+        ))
+
+        conn = sqlite3.connect(db.db_path)
+        failures = []
+        for sql in statements:
+            scans = full_scans(conn, sql)
+            if scans and not any(marker in sql for marker in ALLOWED_FULL_SCANS):
+                failures.append((sql, scans))
+        conn.close()
+
+        print(f"  📊 {len(statements)} Statements geprüft")
+        for sql, scans in failures:
+            print(f"  ❌ {' '.join(sql.split())[:140]}")
+            print(f"     → {scans}")
+
+        passed = bool(statements) and not failures
+        print(f"\n{'✅ Tracking Query Plan Test PASSED' if passed else '❌ Tracking Query Plan Test FAILED'}")
+    assert passed
+
+
+def test_email_data_queries():
+    """Test 3: Lookups auf email_data.db ohne Full Scan"""
+    print_section("TEST 3: email_data.db Query Plans")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "email_data.db")
+        run_migrations(db_path, EMAIL_DATA_MIGRATIONS, component="email_data_test")
+
+        conn = sqlite3.connect(db_path)
+        failures = []
+        for name, (sql, params) in EMAIL_DATA_QUERIES.items():
+            scans = full_scans(conn, sql, params)
+            status = "❌" if scans else "✅"
+            print(f"  {status} {name}{f' → {scans}' if scans else ''}")
+            if scans:
+                failures.append(name)
+        conn.close()
+
+        passed = not failures
+        print(f"\n{'✅ email_data Query Plan Test PASSED' if passed else '❌ email_data Query Plan Test FAILED'}")
+    assert passed
+
+
+def test_duplicate_index_lookup():
+    """Test 4: Bestätigungsabfrage des Duplicate Index nutzt den Primary Key"""
+    print_section("TEST 4: Duplicate Index Query Plan")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = EmailTrackingDB(os.path.join(tmp_dir, "email_tracking.db"))
+        keys = [(KIND_DOCUMENT_MESSAGE, "msg"), (KIND_HEURISTIC, heuristic_key("a", "b", "c"))]
+        db.duplicate_index.record([(kind, key, "1") for kind, key in keys])
+
+        captured = []
+        real_connect = sqlite3.connect
+
+        def tracing_connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(captured.append)
+            return conn
+
+        sqlite3.connect = tracing_connect
+        try:
+            db.duplicate_index.check(keys)
+        finally:
+            sqlite3.connect = real_connect
+
+        conn = sqlite3.connect(db.db_path)
+        failures = [(sql, full_scans(conn, sql)) for sql in captured if sql.lstrip().upper().startswith("SELECT")]
+        failures = [(sql, scans) for sql, scans in failures if scans]
+        conn.close()
+
+        for sql, scans in failures:
+            print(f"  ❌ {' '.join(sql.split())[:140]} → {scans}")
+
+        passed = bool(captured) and not failures
+        print(f"\n{'✅ Duplicate Index Query Plan Test PASSED' if passed else '❌ Duplicate Index Query Plan Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 QUERY PLAN REGRESSION TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("Schema Migrations", test_migrations),
+        ("Migration atomar", test_migration_step_is_atomic),
+        ("Tracking DB Query Plans", test_tracking_queries),
+        ("email_data Query Plans", test_email_data_queries),
+        ("Duplicate Index Query Plan", test_duplicate_index_lookup),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -353,6 +353,63 @@ def test_trip_opportunity_linking():
     return True
 
 
+def test_bulk_registration_and_sweep():
+    """Test 7: Communication + Buttons in einer Transaktion, LRU & Sweeper"""
+    print_section("TEST 7: Bulk Registration & Expired Button Sweep")
+    
+    if not hasattr(test_button_registration, 'email_message_id'):
+        print("⚠️ Skipping (requires previous test)")
+        return False
+    
+    import uuid
+    from modules.auth.button_tokens import collect_buttons, create_button_url
+    
+    db = get_email_tracking_db()
+    email_message_id = test_button_registration.email_message_id
+    comm_uuid = str(uuid.uuid4())
+    
+    with collect_buttons() as buttons:
+        for action in ("create_contact", "create_supplier", "ignore"):
+            create_button_url("https://example.com", action, email_message_id, comm_uuid, ttl_days=1)
+    
+    if not db.register_communication_with_buttons(
+        communication_uuid=comm_uuid,
+        email_message_id=email_message_id,
+        notification_type="test_notification",
+        sent_via="test",
+        recipient_email="test@example.com",
+        subject="Bulk Test",
+        buttons=buttons,
+        html_content="<p>Bulk Test</p>"
+    ):
+        print("❌ Bulk registration failed")
+        return False
+    print(f"✅ Communication + {len(buttons)} buttons registered in one transaction")
+    
+    button_uuid = buttons[0]["button_uuid"]
+    if not db.get_button_info(button_uuid) or not db.get_cached_button_info(button_uuid):
+        print("❌ Button lookup / LRU failed")
+        return False
+    print("✅ Button lookup cached")
+    
+    # Buttons abgelaufen → Sweeper deaktiviert sie und leert den LRU-Eintrag
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE action_buttons SET expires_at = ? WHERE communication_uuid = ?",
+                 ((datetime.now() - timedelta(days=1)).isoformat(), comm_uuid))
+    conn.commit()
+    conn.close()
+    
+    sweep = db.sweep_expired_buttons()
+    info = db.get_button_info(button_uuid)
+    if sweep["deactivated"] < len(buttons) or not info or info["is_active"]:
+        print(f"❌ Sweep failed: {sweep}")
+        return False
+    
+    print(f"✅ Sweep: {sweep}")
+    print(f"\n✅ Bulk Registration Test PASSED")
+    return True
+
+
 def print_summary(results):
     """Print test summary"""
     print_section("🎯 TEST SUMMARY")
@@ -391,6 +448,7 @@ def main():
         results["Workflow Management"] = test_workflow_management()
         results["Task Queue"] = test_task_queue()
         results["Trip-Opportunity Linking"] = test_trip_opportunity_linking()
+        results["Bulk Registration & Sweep"] = test_bulk_registration_and_sweep()
     except Exception as e:
         print(f"\n❌ FATAL ERROR: {str(e)}")
         import traceback
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+🧪 WECLAPP CLIENT RETRY TEST
+
+1. POST wird bei 503 / Read-Timeout NICHT wiederholt (kein doppeltes Anlegen)
+2. POST wird bei 429 und Verbindungsfehler wiederholt
+3. GET/PUT werden bei 5xx und Transportfehlern wiederholt
+"""
+
+import asyncio
+import sys
+
+import httpx
+
+from modules.weclapp.weclapp_client import WeClappClient, WeClappError
+
+
+def print_section(title: str):
+    print(f"\n{'='*80}")
+    print(f"  {title}")
+    print(f"{'='*80}\n")
+
+
+class FastRetryClient(WeClappClient):
+    """Client ohne Backoff-Wartezeit, Antworten kommen aus einem MockTransport"""
+
+    def __init__(self, responses):
+        super().__init__(base_url="https://test.weclapp.invalid/webapp/api/v1/", token="test-token",
+                         rate_per_second=1000, burst=1000, max_retries=3)
+        self.responses = list(responses)
+        self.calls = 0
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return 0.0
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        outcome = self.responses[min(self.calls, len(self.responses)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={"id": "1"}, headers={"Retry-After": "0"})
+
+    def _session(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if loop not in self._sessions:
+            self._sessions[loop] = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+        return self._sessions[loop]
+
+
+async def _call(method: str, responses):
+    client = FastRetryClient(responses)
+    try:
+        await client.request(method, "opportunity", json={"name": "Test"} if method != "GET" else None)
+        outcome = "ok"
+    except WeClappError as e:
+        outcome = e.status_code
+    except httpx.TransportError as e:
+        outcome = type(e).__name__
+    finally:
+        await client.aclose()
+    return client.calls, outcome
+
+
+def _read_timeout():
+    return httpx.ReadTimeout("read timed out")
+
+
+def _connect_error():
+    return httpx.ConnectError("connection refused")
+
+
+def test_post_not_retried():
+    """Test 1: Server hat den POST evtl. schon verarbeitet → nicht wiederholen"""
+    print_section("TEST 1: POST ohne Retry bei 503 / Read-Timeout")
+
+    calls_503, outcome_503 = asyncio.run(_call("POST", [503, 201]))
+    calls_timeout, outcome_timeout = asyncio.run(_call("POST", [_read_timeout(), 201]))
+    print(f"  503: {calls_503} Call(s) → {outcome_503}")
+    print(f"  ReadTimeout: {calls_timeout} Call(s) → {outcome_timeout}")
+
+    passed = (calls_503, outcome_503) == (1, 503) and (calls_timeout, outcome_timeout) == (1, "ReadTimeout")
+    print(f"\n{'✅ POST No Retry Test PASSED' if passed else '❌ POST No Retry Test FAILED'}")
+    assert passed
+
+
+def test_post_retried_when_safe():
+    """Test 2: 429 / ConnectError → Request kam nie an, Retry ist sicher"""
+    print_section("TEST 2: POST Retry bei 429 / Verbindungsfehler")
+
+    calls_429, outcome_429 = asyncio.run(_call("POST", [429, 201]))
+    calls_connect, outcome_connect = asyncio.run(_call("POST", [_connect_error(), 201]))
+    print(f"  429: {calls_429} Call(s) → {outcome_429}")
+    print(f"  ConnectError: {calls_connect} Call(s) → {outcome_connect}")
+
+    passed = (calls_429, outcome_429) == (2, "ok") and (calls_connect, outcome_connect) == (2, "ok")
+    print(f"\n{'✅ POST Safe Retry Test PASSED' if passed else '❌ POST Safe Retry Test FAILED'}")
+    assert passed
+
+
+def test_idempotent_methods_retried():
+    """Test 3: GET/PUT behalten den vollen Retry"""
+    print_section("TEST 3: GET/PUT Retry")
+
+    calls_get, outcome_get = asyncio.run(_call("GET", [502, _read_timeout(), 200]))
+    calls_put, outcome_put = asyncio.run(_call("PUT", [503, 200]))
+    print(f"  GET: {calls_get} Call(s) → {outcome_get}")
+    print(f"  PUT: {calls_put} Call(s) → {outcome_put}")
+
+    passed = (calls_get, outcome_get) == (3, "ok") and (calls_put, outcome_put) == (2, "ok")
+    print(f"\n{'✅ Idempotent Retry Test PASSED' if passed else '❌ Idempotent Retry Test FAILED'}")
+    assert passed
+
+
+def main():
+    """Run all tests"""
+    print("\n🧪 WECLAPP CLIENT RETRY TEST SUITE")
+
+    results = {}
+    for name, test in (
+        ("POST ohne Retry", test_post_not_retried),
+        ("POST Retry wenn sicher", test_post_retried_when_safe),
+        ("GET/PUT Retry", test_idempotent_methods_retried),
+    ):
+        try:
+            test()
+            results[name] = True
+        except AssertionError:
+            results[name] = False
+
+    print_section("🎯 TEST SUMMARY")
+    for test_name, passed in results.items():
+        print(f"  {'✅ PASS' if passed else '❌ FAIL'}  {test_name}")
+
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)